@@ -1,7 +1,7 @@
 import base64
-import json
 import logging
 import secrets
+import time
 from typing import Optional
 
 import click
@@ -10,7 +10,6 @@ from werkzeug.exceptions import NotFound
 
 from constants.languages import languages
 from core.rag.datasource.vdb.vector_factory import Vector
-from core.rag.datasource.vdb.vector_type import VectorType
 from core.rag.models.document import Document
 from events.app_event import app_was_created
 from extensions.ext_database import db
@@ -19,11 +18,12 @@ from libs.helper import email as email_validate
 from libs.password import hash_password, password_pattern, valid_password
 from libs.rsa import generate_key_pair
 from models.account import Tenant
-from models.dataset import Dataset, DatasetCollectionBinding, DocumentSegment
-from models.dataset import Document as DatasetDocument
+from models.dataset import Dataset, DatasetCollectionBinding
 from models.model import Account, App, AppAnnotationSetting, AppMode, Conversation, MessageAnnotation
 from models.provider import Provider, ProviderModel
+from models.workflow import WorkflowGraphBlob, WorkflowRun
 from services.account_service import RegisterService, TenantService
+from services.vector_migration_service import VectorMigrationService, VectorMigrationStats
 
 
 @click.command('reset-password', help='Reset the account password.')
@@ -134,10 +134,15 @@ def reset_encrypt_key_pair():
 
 @click.command('vdb-migrate', help='migrate vector db.')
 @click.option('--scope', default='all', prompt=False, help='The scope of vector database to migrate, Default is All.')
-def vdb_migrate(scope: str):
+@click.option('--batch-size', default=500, help='Number of segments written to the vector db at once.')
+@click.option('--workers', default=4, help='Number of datasets migrated in parallel.')
+@click.option('--dry-run', is_flag=True, help='Only count the segments of the datasets to migrate.')
+@click.option('--verify', is_flag=True, help='Check a sample of the segments of the migrated datasets.')
+def vdb_migrate(scope: str, batch_size: int, workers: int, dry_run: bool, verify: bool):
     if scope in ['knowledge', 'all']:
-        migrate_knowledge_vector_database()
-    if scope in ['annotation', 'all']:
+        migrate_knowledge_vector_database(batch_size=batch_size, workers=workers, dry_run=dry_run, verify=verify)
+    # annotations are not counted nor verified
+    if scope in ['annotation', 'all'] and not dry_run and not verify:
         migrate_annotation_vector_database()
 
 
@@ -240,174 +245,38 @@ def migrate_annotation_vector_database():
                     fg='green'))
 
 
-def migrate_knowledge_vector_database():
+def migrate_knowledge_vector_database(batch_size: int = 500, workers: int = 4, dry_run: bool = False,
+                                      verify: bool = False):
     """
     Migrate vector database datas to target vector database .
     """
-    click.echo(click.style('Start migrate vector db.', fg='green'))
-    create_count = 0
-    skipped_count = 0
-    total_count = 0
-    config = current_app.config
-    vector_type = config.get('VECTOR_STORE')
-    page = 1
-    while True:
-        try:
-            datasets = db.session.query(Dataset).filter(Dataset.indexing_technique == 'high_quality') \
-                .order_by(Dataset.created_at.desc()).paginate(page=page, per_page=50)
-        except NotFound:
-            break
-
-        page += 1
-        for dataset in datasets:
-            total_count = total_count + 1
-            click.echo(f'Processing the {total_count} dataset {dataset.id}. '
-                       + f'{create_count} created, {skipped_count} skipped.')
-            try:
-                click.echo('Create dataset vdb index: {}'.format(dataset.id))
-                if dataset.index_struct_dict:
-                    if dataset.index_struct_dict['type'] == vector_type:
-                        skipped_count = skipped_count + 1
-                        continue
-                collection_name = ''
-                if vector_type == VectorType.WEAVIATE:
-                    dataset_id = dataset.id
-                    collection_name = Dataset.gen_collection_name_by_id(dataset_id)
-                    index_struct_dict = {
-                        "type": VectorType.WEAVIATE,
-                        "vector_store": {"class_prefix": collection_name}
-                    }
-                    dataset.index_struct = json.dumps(index_struct_dict)
-                elif vector_type == VectorType.QDRANT:
-                    if dataset.collection_binding_id:
-                        dataset_collection_binding = db.session.query(DatasetCollectionBinding). \
-                            filter(DatasetCollectionBinding.id == dataset.collection_binding_id). \
-                            one_or_none()
-                        if dataset_collection_binding:
-                            collection_name = dataset_collection_binding.collection_name
-                        else:
-                            raise ValueError('Dataset Collection Bindings is not exist!')
-                    else:
-                        dataset_id = dataset.id
-                        collection_name = Dataset.gen_collection_name_by_id(dataset_id)
-                    index_struct_dict = {
-                        "type": VectorType.QDRANT,
-                        "vector_store": {"class_prefix": collection_name}
-                    }
-                    dataset.index_struct = json.dumps(index_struct_dict)
-
-                elif vector_type == VectorType.MILVUS:
-                    dataset_id = dataset.id
-                    collection_name = Dataset.gen_collection_name_by_id(dataset_id)
-                    index_struct_dict = {
-                        "type": VectorType.MILVUS,
-                        "vector_store": {"class_prefix": collection_name}
-                    }
-                    dataset.index_struct = json.dumps(index_struct_dict)
-                elif vector_type == VectorType.RELYT:
-                    dataset_id = dataset.id
-                    collection_name = Dataset.gen_collection_name_by_id(dataset_id)
-                    index_struct_dict = {
-                        "type": 'relyt',
-                        "vector_store": {"class_prefix": collection_name}
-                    }
-                    dataset.index_struct = json.dumps(index_struct_dict)
-                elif vector_type == VectorType.TENCENT:
-                    dataset_id = dataset.id
-                    collection_name = Dataset.gen_collection_name_by_id(dataset_id)
-                    index_struct_dict = {
-                        "type": VectorType.TENCENT,
-                        "vector_store": {"class_prefix": collection_name}
-                    }
-                    dataset.index_struct = json.dumps(index_struct_dict)
-                elif vector_type == VectorType.PGVECTOR:
-                    dataset_id = dataset.id
-                    collection_name = Dataset.gen_collection_name_by_id(dataset_id)
-                    index_struct_dict = {
-                        "type": VectorType.PGVECTOR,
-                        "vector_store": {"class_prefix": collection_name}
-                    }
-                    dataset.index_struct = json.dumps(index_struct_dict)
-                elif vector_type == VectorType.OPENSEARCH:
-                    dataset_id = dataset.id
-                    collection_name = Dataset.gen_collection_name_by_id(dataset_id)
-                    index_struct_dict = {
-                        "type": VectorType.OPENSEARCH,
-                        "vector_store": {"class_prefix": collection_name}
-                    }
-                    dataset.index_struct = json.dumps(index_struct_dict)
-                else:
-                    raise ValueError(f"Vector store {vector_type} is not supported.")
+    vector_type = current_app.config.get('VECTOR_STORE')
+    if verify:
+        click.echo(click.style(f'Start verify vector db {vector_type}.', fg='green'))
+    elif dry_run:
+        click.echo(click.style(f'Start dry run of migrate vector db to {vector_type}.', fg='green'))
+    else:
+        click.echo(click.style(f'Start migrate vector db to {vector_type}.', fg='green'))
 
-                vector = Vector(dataset)
-                click.echo(f"Start to migrate dataset {dataset.id}.")
+    last_reported_at = time.perf_counter()
 
-                try:
-                    vector.delete()
-                    click.echo(
-                        click.style(f'Successfully delete vector index {collection_name} for dataset {dataset.id}.',
-                                    fg='green'))
-                except Exception as e:
-                    click.echo(
-                        click.style(f'Failed to delete vector index {collection_name} for dataset {dataset.id}.',
-                                    fg='red'))
-                    raise e
+    def report_progress(stats: VectorMigrationStats):
+        nonlocal last_reported_at
+        if time.perf_counter() - last_reported_at >= 10:
+            last_reported_at = time.perf_counter()
+            click.echo(f'Processed {stats.summary()}.')
 
-                dataset_documents = db.session.query(DatasetDocument).filter(
-                    DatasetDocument.dataset_id == dataset.id,
-                    DatasetDocument.indexing_status == 'completed',
-                    DatasetDocument.enabled == True,
-                    DatasetDocument.archived == False,
-                ).all()
+    stats = VectorMigrationService(
+        vector_type=vector_type,
+        batch_size=batch_size,
+        workers=workers,
+        dry_run=dry_run,
+        verify=verify,
+        on_progress=report_progress,
+    ).run()
 
-                documents = []
-                segments_count = 0
-                for dataset_document in dataset_documents:
-                    segments = db.session.query(DocumentSegment).filter(
-                        DocumentSegment.document_id == dataset_document.id,
-                        DocumentSegment.status == 'completed',
-                        DocumentSegment.enabled == True
-                    ).all()
-
-                    for segment in segments:
-                        document = Document(
-                            page_content=segment.content,
-                            metadata={
-                                "doc_id": segment.index_node_id,
-                                "doc_hash": segment.index_node_hash,
-                                "document_id": segment.document_id,
-                                "dataset_id": segment.dataset_id,
-                            }
-                        )
-
-                        documents.append(document)
-                        segments_count = segments_count + 1
-
-                if documents:
-                    try:
-                        click.echo(click.style(
-                            f'Start to created vector index with {len(documents)} documents of {segments_count} segments for dataset {dataset.id}.',
-                            fg='green'))
-                        vector.create(documents)
-                        click.echo(
-                            click.style(f'Successfully created vector index for dataset {dataset.id}.', fg='green'))
-                    except Exception as e:
-                        click.echo(click.style(f'Failed to created vector index for dataset {dataset.id}.', fg='red'))
-                        raise e
-                db.session.add(dataset)
-                db.session.commit()
-                click.echo(f'Successfully migrated dataset {dataset.id}.')
-                create_count += 1
-            except Exception as e:
-                db.session.rollback()
-                click.echo(
-                    click.style('Create dataset index error: {} {}'.format(e.__class__.__name__, str(e)),
-                                fg='red'))
-                continue
-
-    click.echo(
-        click.style(f'Congratulations! Create {create_count} dataset indexes, and skipped {skipped_count} datasets.',
-                    fg='green'))
+    click.echo(click.style(f'Congratulations! Processed {stats.summary()}.',
+                           fg='red' if stats.failed_datasets else 'green'))
 
 
 @click.command('convert-to-agent-apps', help='Convert Agent Assistant to Agent App.')
@@ -633,6 +502,46 @@ where sites.id is null limit 1000"""
     click.echo(click.style('Congratulations! Fix app related site missing issue successful!', fg='green'))
 
 
+@click.command('migrate-workflow-run-graphs', help='Move the graphs of workflow runs to the workflow graph blobs.')
+@click.option('--batch-size', default=500, prompt=False, help='number of workflow runs migrated per batch.')
+def migrate_workflow_run_graphs(batch_size: int):
+    """
+    Move the graphs copied into the workflow runs created before the graph blobs to the graph blobs.
+    """
+    click.echo(click.style('Start migrate workflow run graphs.', fg='green'))
+
+    migrated_count = 0
+    last_id = None
+    while True:
+        query = db.session.query(WorkflowRun.id, WorkflowRun.graph).filter(
+            WorkflowRun.graph_hash.is_(None),
+            WorkflowRun.graph.isnot(None)
+        )
+        if last_id:
+            query = query.filter(WorkflowRun.id > last_id)
+        workflow_runs = query.order_by(WorkflowRun.id).limit(batch_size).all()
+        if not workflow_runs:
+            break
+
+        last_id = workflow_runs[-1].id
+        run_ids_by_hash = {}
+        for workflow_run in workflow_runs:
+            graph_hash = WorkflowGraphBlob.store(workflow_run.graph)
+            run_ids_by_hash.setdefault(graph_hash, []).append(workflow_run.id)
+
+        for graph_hash, run_ids in run_ids_by_hash.items():
+            db.session.query(WorkflowRun).filter(WorkflowRun.id.in_(run_ids)).update(
+                {WorkflowRun.graph_hash: graph_hash, WorkflowRun.graph: None},
+                synchronize_session=False
+            )
+        db.session.commit()
+
+        migrated_count += len(workflow_runs)
+        click.echo('Migrated {} workflow runs.'.format(migrated_count))
+
+    click.echo(click.style('Congratulations! Migrated {} workflow run graphs.'.format(migrated_count), fg='green'))
+
+
 def register_commands(app):
     app.cli.add_command(reset_password)
     app.cli.add_command(reset_email)
@@ -643,3 +552,4 @@ def register_commands(app):
     app.cli.add_command(create_tenant)
     app.cli.add_command(upgrade_db)
     app.cli.add_command(fix_app_site_missing)
+    app.cli.add_command(migrate_workflow_run_graphs)
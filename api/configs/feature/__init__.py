@@ -1,6 +1,6 @@
 from typing import Optional
 
-from pydantic import AliasChoices, BaseModel, Field, NonNegativeInt, PositiveInt, computed_field
+from pydantic import AliasChoices, BaseModel, Field, NonNegativeFloat, NonNegativeInt, PositiveInt, computed_field
 
 from configs.feature.hosted_service import HostedServiceConfig
 
@@ -18,6 +18,28 @@ class SecurityConfig(BaseModel):
     )
 
 
+class ServiceAPIConfig(BaseModel):
+    """
+    Service API configs
+    """
+    API_TOKEN_CACHE_TTL: NonNegativeInt = Field(
+        description='time in seconds service API tokens are cached in redis, 0 to disable the cache',
+        default=600,
+    )
+
+    API_TOKEN_MEMORY_CACHE_TTL: NonNegativeInt = Field(
+        description='time in seconds service API tokens are cached in memory of each process,'
+                    ' deleted tokens are still accepted by the other processes for at most this long',
+        default=10,
+    )
+
+    API_TOKEN_LAST_USED_UPDATE_INTERVAL: PositiveInt = Field(
+        description='interval in seconds at which the last used time of service API tokens is written'
+                    ' to the database',
+        default=60,
+    )
+
+
 class AppExecutionConfig(BaseModel):
     """
     App Execution configs
@@ -110,6 +132,11 @@ class FileUploadConfig(BaseModel):
         default=10,
     )
 
+    UPLOAD_FILE_DEDUPLICATION_ENABLED: bool = Field(
+        description='whether to store identical uploaded files of a tenant only once',
+        default=True,
+    )
+
     BATCH_UPLOAD_LIMIT: NonNegativeInt = Field(
         description='',  # todo: to be clarified
         default=20,
@@ -148,6 +175,39 @@ class HttpConfig(BaseModel):
         return self.inner_WEB_API_CORS_ALLOW_ORIGINS.split(',')
 
 
+class IdentityCacheConfig(BaseModel):
+    """
+    Identity cache configs
+    """
+    IDENTITY_CACHE_TTL: NonNegativeInt = Field(
+        description='time in seconds the account of console requests and the app, site and end user'
+                    ' of web app requests are cached in redis, 0 to disable the cache',
+        default=300,
+    )
+
+
+class AnnotationReplyConfig(BaseModel):
+    """
+    Annotation reply configs
+    """
+    ANNOTATION_REPLY_CACHE_TTL: NonNegativeInt = Field(
+        description='time in seconds the annotation found by the vector search of a query is cached in redis,'
+                    ' 0 to disable the cache',
+        default=600,
+    )
+
+    ANNOTATION_REPLY_EXACT_MATCH_MAX_APPS: NonNegativeInt = Field(
+        description='number of apps whose annotation questions are kept in memory of each process to reply'
+                    ' to the queries matching a question exactly, 0 to disable the exact match',
+        default=1000,
+    )
+
+    ANNOTATION_HIT_HISTORY_FLUSH_INTERVAL: PositiveInt = Field(
+        description='interval in seconds at which the annotation hit histories are written to the database',
+        default=60,
+    )
+
+
 class InnerAPIConfig(BaseModel):
     """
     Inner API configs
@@ -214,6 +274,22 @@ class BillingConfig(BaseModel):
         default=False,
     )
 
+    BILLING_API_TIMEOUT: PositiveInt = Field(
+        description='timeout in seconds for requests to the billing API',
+        default=10,
+    )
+
+    BILLING_INFO_CACHE_TTL: NonNegativeInt = Field(
+        description='time in seconds the billing info of a tenant is used without being refreshed,'
+                    ' 0 to disable the cache',
+        default=60,
+    )
+
+    BILLING_INFO_STALE_TTL: NonNegativeInt = Field(
+        description='time in seconds an expired billing info is still used while it is refreshed in background',
+        default=600,
+    )
+
 
 class UpdateConfig(BaseModel):
     """
@@ -287,6 +363,11 @@ class ModerationConfig(BaseModel):
         default=300,
     )
 
+    OUTPUT_MODERATION_MAX_WORKERS: PositiveInt = Field(
+        description='max number of output moderation checks run concurrently by a process',
+        default=20,
+    )
+
 
 class ToolConfig(BaseModel):
     """
@@ -298,6 +379,37 @@ class ToolConfig(BaseModel):
         default=3600,
     )
 
+    AGENT_TOOL_CALL_MAX_WORKERS: PositiveInt = Field(
+        description='max number of tool calls of an agent turn invoked concurrently, 1 to invoke them one by one',
+        default=5,
+    )
+
+    AGENT_TOOL_CALL_TIMEOUT: PositiveInt = Field(
+        description='timeout in seconds of a tool call invoked by an agent',
+        default=300,
+    )
+
+    TOOL_RESULT_CACHE_ENABLED: bool = Field(
+        description='whether to cache the results of the tools declaring a cache ttl',
+        default=False,
+    )
+
+    TOOL_RESULT_CACHE_MEMORY_SIZE: PositiveInt = Field(
+        description='max number of tool results cached in the memory of each process',
+        default=256,
+    )
+
+    TOOL_RESULT_CACHE_MAX_BINARY_SIZE: NonNegativeInt = Field(
+        description='max total size in bytes of the binaries of a cached tool result,'
+                    ' larger results are not cached',
+        default=1048576,
+    )
+
+    API_TOOL_RESULT_CACHE_TTL: NonNegativeInt = Field(
+        description='seconds the results of GET api tools are cached for, 0 to disable',
+        default=0,
+    )
+
 
 class MailConfig(BaseModel):
     """
@@ -391,6 +503,38 @@ class DataSetConfig(BaseModel):
         default=30,
     )
 
+    PURGE_BATCH_SLEEP_SECONDS: NonNegativeFloat = Field(
+        description='pause in seconds between two chunks of rows deleted by cleanup tasks,'
+                    ' to throttle the load on the database',
+        default=0.1,
+    )
+
+    HIT_TESTING_PROJECTION_METHOD: str = Field(
+        description='projection of the embeddings of hit testing records to 2-D positions, pca or tsne',
+        default='pca',
+    )
+
+    HIT_TESTING_BATCH_MAX_QUERIES: PositiveInt = Field(
+        description='max number of queries of a batch hit testing',
+        default=50,
+    )
+
+    RETRIEVAL_CACHE_TTL: NonNegativeInt = Field(
+        description='time in seconds the segments retrieved for a query from the datasets of an app are cached,'
+                    ' 0 to disable the cache',
+        default=300,
+    )
+
+    RETRIEVAL_CACHE_MEMORY_SIZE: PositiveInt = Field(
+        description='max number of retrievals cached in the memory of each process',
+        default=1024,
+    )
+
+    RETRIEVAL_CACHE_MAX_DOCUMENTS: PositiveInt = Field(
+        description='max number of segments of a cached retrieval, larger retrievals are not cached',
+        default=100,
+    )
+
 
 class WorkspaceConfig(BaseModel):
     """
@@ -420,9 +564,44 @@ class ImageFormatConfig(BaseModel):
         default='base64',
     )
 
+    MULTIMODAL_IMAGE_MAX_RESOLUTION: NonNegativeInt = Field(
+        description='max width or height in pixels of base64 images sent to models, larger ones are downscaled,'
+                    ' 0 to send images in original size',
+        default=0,
+    )
+
+    MULTIMODAL_LOW_DETAIL_IMAGE_DOWNSCALE_ENABLED: bool = Field(
+        description='whether to downscale base64 images sent with low detail to 512 pixels,'
+                    ' for models which process low detail images at that resolution',
+        default=False,
+    )
+
+    MULTIMODAL_IMAGE_CACHE_ENABLED: bool = Field(
+        description='whether to cache base64 encoded images sent to models',
+        default=True,
+    )
+
+    MULTIMODAL_IMAGE_CACHE_MEMORY_SIZE: NonNegativeInt = Field(
+        description='max size in Megabytes of base64 encoded images cached in memory of each process',
+        default=64,
+    )
+
+    MULTIMODAL_IMAGE_CACHE_DISK_SIZE: NonNegativeInt = Field(
+        description='max size in Megabytes of base64 encoded images cached on local disk of each process,'
+                    ' 0 to disable the disk cache',
+        default=512,
+    )
+
+    MULTIMODAL_IMAGE_CACHE_DIR: Optional[str] = Field(
+        description='parent directory of the disk caches of base64 encoded images,'
+                    ' every process uses its own subdirectory, default to a temporary directory',
+        default=None,
+    )
+
 
 class FeatureConfig(
     # place the configs in alphabet order
+    AnnotationReplyConfig,
     AppExecutionConfig,
     BillingConfig,
     CodeExecutionSandboxConfig,
@@ -431,6 +610,7 @@ class FeatureConfig(
     FileAccessConfig,
     FileUploadConfig,
     HttpConfig,
+    IdentityCacheConfig,
     ImageFormatConfig,
     InnerAPIConfig,
     IndexingConfig,
@@ -441,6 +621,7 @@ class FeatureConfig(
     OAuthConfig,
     RagEtlConfig,
     SecurityConfig,
+    ServiceAPIConfig,
     ToolConfig,
     UpdateConfig,
     WorkflowConfig,
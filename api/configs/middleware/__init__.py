@@ -10,6 +10,7 @@ from configs.middleware.storage.google_cloud_storage_config import GoogleCloudSt
 from configs.middleware.storage.oci_storage_config import OCIStorageConfig
 from configs.middleware.storage.tencent_cos_storage_config import TencentCloudCOSStorageConfig
 from configs.middleware.vdb.chroma_config import ChromaConfig
+from configs.middleware.vdb.local_vector_config import LocalVectorConfig
 from configs.middleware.vdb.milvus_config import MilvusConfig
 from configs.middleware.vdb.opensearch_config import OpenSearchConfig
 from configs.middleware.vdb.oracle_config import OracleConfig
@@ -42,6 +43,16 @@ class VectorStoreConfig(BaseModel):
         default=None,
     )
 
+    VECTOR_STORE_CLIENT_IDLE_TIMEOUT: NonNegativeInt = Field(
+        description='seconds after which the unused clients of a vector store are dropped, 0 to keep them',
+        default=600,
+    )
+
+    VECTOR_STORE_CLIENT_HEALTH_CHECK_INTERVAL: NonNegativeInt = Field(
+        description='minimum seconds between two health checks of a client of a vector store',
+        default=60,
+    )
+
 
 class KeywordStoreConfig(BaseModel):
     KEYWORD_STORE: str = Field(
@@ -173,6 +184,7 @@ class MiddlewareConfig(
     # configs of vdb and vdb providers
     VectorStoreConfig,
     ChromaConfig,
+    LocalVectorConfig,
     MilvusConfig,
     OpenSearchConfig,
     OracleConfig,
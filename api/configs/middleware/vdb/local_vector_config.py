@@ -0,0 +1,29 @@
+from pydantic import BaseModel, Field, PositiveFloat, PositiveInt
+
+
+class LocalVectorConfig(BaseModel):
+    """
+    Local vector store configs
+    """
+
+    LOCAL_VECTOR_PATH: str = Field(
+        description='directory of the local vector store, relative to the api directory if not absolute',
+        default='storage/vector_store',
+    )
+
+    LOCAL_VECTOR_IVF_MIN_ROWS: PositiveInt = Field(
+        description='number of vectors of a collection from which it is searched with an IVF index'
+                    ' instead of exhaustively',
+        default=4096,
+    )
+
+    LOCAL_VECTOR_IVF_PROBE_COUNT: PositiveInt = Field(
+        description='number of clusters of the IVF index searched for a query,'
+                    ' higher improves the recall and slows down searches',
+        default=16,
+    )
+
+    LOCAL_VECTOR_COMPACTION_RATIO: PositiveFloat = Field(
+        description='ratio of deleted vectors of a collection from which its files are compacted',
+        default=0.2,
+    )
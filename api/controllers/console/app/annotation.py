@@ -1,4 +1,4 @@
-from flask import request
+from flask import Response, request, stream_with_context
 from flask_login import current_user
 from flask_restful import Resource, marshal, marshal_with, reqparse
 from werkzeug.exceptions import Forbidden
@@ -101,7 +101,8 @@ class AnnotationReplyActionStatusApi(Resource):
         return {
             'job_id': job_id,
             'job_status': job_status,
-            'error_msg': error_msg
+            'error_msg': error_msg,
+            **AppAnnotationService.get_batch_import_progress(job_id)
         }, 200
 
 
@@ -140,6 +141,11 @@ class AnnotationExportApi(Resource):
             raise Forbidden()
 
         app_id = str(app_id)
+        if request.args.get('format') == 'csv':
+            generator = AppAnnotationService.export_annotation_csv_by_app_id(app_id)
+            return Response(stream_with_context(generator), status=200, mimetype='text/csv', headers={
+                'Content-Disposition': 'attachment; filename=annotations.csv'
+            })
         annotation_list = AppAnnotationService.export_annotation_list_by_app_id(app_id)
         response = {
             'data': marshal(annotation_list, annotation_fields)
@@ -250,7 +256,8 @@ class AnnotationBatchImportStatusApi(Resource):
         return {
             'job_id': job_id,
             'job_status': job_status,
-            'error_msg': error_msg
+            'error_msg': error_msg,
+            **AppAnnotationService.get_batch_import_progress(job_id)
         }, 200
 
 
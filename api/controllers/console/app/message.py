@@ -22,10 +22,11 @@ from core.model_runtime.errors.invoke import InvokeError
 from extensions.ext_database import db
 from fields.conversation_fields import annotation_fields, message_detail_fields
 from libs.helper import uuid_value
-from libs.infinite_scroll_pagination import InfiniteScrollPagination
+from libs.infinite_scroll_pagination import InfiniteScrollPagination, KeysetCursor, paginate_by_keyset
 from libs.login import login_required
 from models.model import AppMode, Conversation, Message, MessageAnnotation, MessageFeedback
 from services.annotation_service import AppAnnotationService
+from services.app_statistic_service import AppStatisticRollupService
 from services.errors.conversation import ConversationNotExistsError
 from services.errors.message import MessageNotExistsError, SuggestedQuestionsAfterAnswerDisabledError
 from services.message_service import MessageService
@@ -58,34 +59,19 @@ class ChatMessageListApi(Resource):
         if not conversation:
             raise NotFound("Conversation Not Exists.")
 
+        base_query = db.session.query(Message).filter(Message.conversation_id == conversation.id)
+
+        cursor = None
         if args['first_id']:
-            first_message = db.session.query(Message) \
-                .filter(Message.conversation_id == conversation.id, Message.id == args['first_id']).first()
+            first_message = base_query.filter(Message.id == args['first_id']).first()
 
             if not first_message:
                 raise NotFound("First message not found")
 
-            history_messages = db.session.query(Message).filter(
-                Message.conversation_id == conversation.id,
-                Message.created_at < first_message.created_at,
-                Message.id != first_message.id
-            ) \
-                .order_by(Message.created_at.desc()).limit(args['limit']).all()
-        else:
-            history_messages = db.session.query(Message).filter(Message.conversation_id == conversation.id) \
-                .order_by(Message.created_at.desc()).limit(args['limit']).all()
-
-        has_more = False
-        if len(history_messages) == args['limit']:
-            current_page_first_message = history_messages[-1]
-            rest_count = db.session.query(Message).filter(
-                Message.conversation_id == conversation.id,
-                Message.created_at < current_page_first_message.created_at,
-                Message.id != current_page_first_message.id
-            ).count()
+            cursor = KeysetCursor.of(first_message)
 
-            if rest_count > 0:
-                has_more = True
+        history_messages, has_more = paginate_by_keyset(base_query, Message, args['limit'], cursor)
+        Message.preload_relations(history_messages)
 
         history_messages = list(reversed(history_messages))
 
@@ -138,6 +124,9 @@ class MessageFeedbackApi(Resource):
 
         db.session.commit()
 
+        # feedback counts are rolled up by the creation time of the message
+        AppStatisticRollupService.mark_dirty(app_model.id, message.created_at)
+
         return {'result': 'success'}
 
 
@@ -1,3 +1,4 @@
+import copy
 import json
 
 from flask import request
@@ -85,7 +86,7 @@ class ModelConfigResource(Resource):
                 tool_map[key] = tool_runtime
 
             # encrypt agent tool parameters if it's secret-input
-            agent_mode = new_app_model_config.agent_mode_dict
+            agent_mode = copy.deepcopy(new_app_model_config.agent_mode_dict)
             for tool in agent_mode.get('tools') or []:
                 agent_tool_entity = AgentToolEntity(**tool)
 
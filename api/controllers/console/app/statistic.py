@@ -1,7 +1,3 @@
-from datetime import datetime
-from decimal import Decimal
-
-import pytz
 from flask import jsonify
 from flask_login import current_user
 from flask_restful import Resource, reqparse
@@ -10,10 +6,10 @@ from controllers.console import api
 from controllers.console.app.wraps import get_app_model
 from controllers.console.setup import setup_required
 from controllers.console.wraps import account_initialization_required
-from extensions.ext_database import db
 from libs.helper import datetime_string
 from libs.login import login_required
 from models.model import AppMode
+from services.app_statistic_service import AppStatisticService
 
 
 class DailyConversationStatistic(Resource):
@@ -30,46 +26,12 @@ class DailyConversationStatistic(Resource):
         parser.add_argument('end', type=datetime_string('%Y-%m-%d %H:%M'), location='args')
         args = parser.parse_args()
 
-        sql_query = '''
-        SELECT date(DATE_TRUNC('day', created_at AT TIME ZONE 'UTC' AT TIME ZONE :tz )) AS date, count(distinct messages.conversation_id) AS conversation_count
-            FROM messages where app_id = :app_id 
-        '''
-        arg_dict = {'tz': account.timezone, 'app_id': app_model.id}
-
-        timezone = pytz.timezone(account.timezone)
-        utc_timezone = pytz.utc
-
-        if args['start']:
-            start_datetime = datetime.strptime(args['start'], '%Y-%m-%d %H:%M')
-            start_datetime = start_datetime.replace(second=0)
-
-            start_datetime_timezone = timezone.localize(start_datetime)
-            start_datetime_utc = start_datetime_timezone.astimezone(utc_timezone)
-
-            sql_query += ' and created_at >= :start'
-            arg_dict['start'] = start_datetime_utc
-
-        if args['end']:
-            end_datetime = datetime.strptime(args['end'], '%Y-%m-%d %H:%M')
-            end_datetime = end_datetime.replace(second=0)
-
-            end_datetime_timezone = timezone.localize(end_datetime)
-            end_datetime_utc = end_datetime_timezone.astimezone(utc_timezone)
-
-            sql_query += ' and created_at < :end'
-            arg_dict['end'] = end_datetime_utc
-
-        sql_query += ' GROUP BY date order by date'
-
-        response_data = []
-
-        with db.engine.begin() as conn:
-            rs = conn.execute(db.text(sql_query), arg_dict)
-            for i in rs:
-                response_data.append({
-                    'date': str(i.date),
-                    'conversation_count': i.conversation_count
-                })
+        response_data = AppStatisticService.get_daily_conversations(
+            app_id=app_model.id,
+            timezone=account.timezone,
+            start=args['start'],
+            end=args['end']
+        )
 
         return jsonify({
             'data': response_data
@@ -90,46 +52,12 @@ class DailyTerminalsStatistic(Resource):
         parser.add_argument('end', type=datetime_string('%Y-%m-%d %H:%M'), location='args')
         args = parser.parse_args()
 
-        sql_query = '''
-                SELECT date(DATE_TRUNC('day', created_at AT TIME ZONE 'UTC' AT TIME ZONE :tz )) AS date, count(distinct messages.from_end_user_id) AS terminal_count
-                    FROM messages where app_id = :app_id 
-                '''
-        arg_dict = {'tz': account.timezone, 'app_id': app_model.id}
-
-        timezone = pytz.timezone(account.timezone)
-        utc_timezone = pytz.utc
-
-        if args['start']:
-            start_datetime = datetime.strptime(args['start'], '%Y-%m-%d %H:%M')
-            start_datetime = start_datetime.replace(second=0)
-
-            start_datetime_timezone = timezone.localize(start_datetime)
-            start_datetime_utc = start_datetime_timezone.astimezone(utc_timezone)
-
-            sql_query += ' and created_at >= :start'
-            arg_dict['start'] = start_datetime_utc
-
-        if args['end']:
-            end_datetime = datetime.strptime(args['end'], '%Y-%m-%d %H:%M')
-            end_datetime = end_datetime.replace(second=0)
-
-            end_datetime_timezone = timezone.localize(end_datetime)
-            end_datetime_utc = end_datetime_timezone.astimezone(utc_timezone)
-
-            sql_query += ' and created_at < :end'
-            arg_dict['end'] = end_datetime_utc
-
-        sql_query += ' GROUP BY date order by date'
-
-        response_data = []
-
-        with db.engine.begin() as conn:
-            rs = conn.execute(db.text(sql_query), arg_dict)            
-            for i in rs:
-                response_data.append({
-                    'date': str(i.date),
-                    'terminal_count': i.terminal_count
-                })
+        response_data = AppStatisticService.get_daily_terminals(
+            app_id=app_model.id,
+            timezone=account.timezone,
+            start=args['start'],
+            end=args['end']
+        )
 
         return jsonify({
             'data': response_data
@@ -137,6 +65,7 @@ class DailyTerminalsStatistic(Resource):
 
 
 class DailyTokenCostStatistic(Resource):
+
     @setup_required
     @login_required
     @account_initialization_required
@@ -149,50 +78,12 @@ class DailyTokenCostStatistic(Resource):
         parser.add_argument('end', type=datetime_string('%Y-%m-%d %H:%M'), location='args')
         args = parser.parse_args()
 
-        sql_query = '''
-                SELECT date(DATE_TRUNC('day', created_at AT TIME ZONE 'UTC' AT TIME ZONE :tz )) AS date, 
-                    (sum(messages.message_tokens) + sum(messages.answer_tokens)) as token_count,
-                    sum(total_price) as total_price
-                    FROM messages where app_id = :app_id 
-                '''
-        arg_dict = {'tz': account.timezone, 'app_id': app_model.id}
-
-        timezone = pytz.timezone(account.timezone)
-        utc_timezone = pytz.utc
-
-        if args['start']:
-            start_datetime = datetime.strptime(args['start'], '%Y-%m-%d %H:%M')
-            start_datetime = start_datetime.replace(second=0)
-
-            start_datetime_timezone = timezone.localize(start_datetime)
-            start_datetime_utc = start_datetime_timezone.astimezone(utc_timezone)
-
-            sql_query += ' and created_at >= :start'
-            arg_dict['start'] = start_datetime_utc
-
-        if args['end']:
-            end_datetime = datetime.strptime(args['end'], '%Y-%m-%d %H:%M')
-            end_datetime = end_datetime.replace(second=0)
-
-            end_datetime_timezone = timezone.localize(end_datetime)
-            end_datetime_utc = end_datetime_timezone.astimezone(utc_timezone)
-
-            sql_query += ' and created_at < :end'
-            arg_dict['end'] = end_datetime_utc
-
-        sql_query += ' GROUP BY date order by date'
-
-        response_data = []
-
-        with db.engine.begin() as conn:
-            rs = conn.execute(db.text(sql_query), arg_dict)
-            for i in rs:
-                response_data.append({
-                    'date': str(i.date),
-                    'token_count': i.token_count,
-                    'total_price': i.total_price,
-                    'currency': 'USD'
-                })
+        response_data = AppStatisticService.get_daily_token_costs(
+            app_id=app_model.id,
+            timezone=account.timezone,
+            start=args['start'],
+            end=args['end']
+        )
 
         return jsonify({
             'data': response_data
@@ -200,6 +91,7 @@ class DailyTokenCostStatistic(Resource):
 
 
 class AverageSessionInteractionStatistic(Resource):
+
     @setup_required
     @login_required
     @account_initialization_required
@@ -212,52 +104,12 @@ class AverageSessionInteractionStatistic(Resource):
         parser.add_argument('end', type=datetime_string('%Y-%m-%d %H:%M'), location='args')
         args = parser.parse_args()
 
-        sql_query = """SELECT date(DATE_TRUNC('day', c.created_at AT TIME ZONE 'UTC' AT TIME ZONE :tz )) AS date, 
-AVG(subquery.message_count) AS interactions
-FROM (SELECT m.conversation_id, COUNT(m.id) AS message_count
-    FROM conversations c
-    JOIN messages m ON c.id = m.conversation_id
-    WHERE c.override_model_configs IS NULL AND c.app_id = :app_id"""
-        arg_dict = {'tz': account.timezone, 'app_id': app_model.id}
-
-        timezone = pytz.timezone(account.timezone)
-        utc_timezone = pytz.utc
-
-        if args['start']:
-            start_datetime = datetime.strptime(args['start'], '%Y-%m-%d %H:%M')
-            start_datetime = start_datetime.replace(second=0)
-
-            start_datetime_timezone = timezone.localize(start_datetime)
-            start_datetime_utc = start_datetime_timezone.astimezone(utc_timezone)
-
-            sql_query += ' and c.created_at >= :start'
-            arg_dict['start'] = start_datetime_utc
-
-        if args['end']:
-            end_datetime = datetime.strptime(args['end'], '%Y-%m-%d %H:%M')
-            end_datetime = end_datetime.replace(second=0)
-
-            end_datetime_timezone = timezone.localize(end_datetime)
-            end_datetime_utc = end_datetime_timezone.astimezone(utc_timezone)
-
-            sql_query += ' and c.created_at < :end'
-            arg_dict['end'] = end_datetime_utc
-
-        sql_query += """
-        GROUP BY m.conversation_id) subquery
-LEFT JOIN conversations c on c.id=subquery.conversation_id
-GROUP BY date
-ORDER BY date"""
-
-        response_data = []
-        
-        with db.engine.begin() as conn:
-            rs = conn.execute(db.text(sql_query), arg_dict)
-            for i in rs:
-                response_data.append({
-                    'date': str(i.date),
-                    'interactions': float(i.interactions.quantize(Decimal('0.01')))
-                })
+        response_data = AppStatisticService.get_daily_average_session_interactions(
+            app_id=app_model.id,
+            timezone=account.timezone,
+            start=args['start'],
+            end=args['end']
+        )
 
         return jsonify({
             'data': response_data
@@ -265,6 +117,7 @@ ORDER BY date"""
 
 
 class UserSatisfactionRateStatistic(Resource):
+
     @setup_required
     @login_required
     @account_initialization_required
@@ -277,49 +130,12 @@ class UserSatisfactionRateStatistic(Resource):
         parser.add_argument('end', type=datetime_string('%Y-%m-%d %H:%M'), location='args')
         args = parser.parse_args()
 
-        sql_query = '''
-                        SELECT date(DATE_TRUNC('day', m.created_at AT TIME ZONE 'UTC' AT TIME ZONE :tz )) AS date, 
-                            COUNT(m.id) as message_count, COUNT(mf.id) as feedback_count 
-                            FROM messages m
-                            LEFT JOIN message_feedbacks mf on mf.message_id=m.id
-                            WHERE m.app_id = :app_id 
-                        '''
-        arg_dict = {'tz': account.timezone, 'app_id': app_model.id}
-
-        timezone = pytz.timezone(account.timezone)
-        utc_timezone = pytz.utc
-
-        if args['start']:
-            start_datetime = datetime.strptime(args['start'], '%Y-%m-%d %H:%M')
-            start_datetime = start_datetime.replace(second=0)
-
-            start_datetime_timezone = timezone.localize(start_datetime)
-            start_datetime_utc = start_datetime_timezone.astimezone(utc_timezone)
-
-            sql_query += ' and m.created_at >= :start'
-            arg_dict['start'] = start_datetime_utc
-
-        if args['end']:
-            end_datetime = datetime.strptime(args['end'], '%Y-%m-%d %H:%M')
-            end_datetime = end_datetime.replace(second=0)
-
-            end_datetime_timezone = timezone.localize(end_datetime)
-            end_datetime_utc = end_datetime_timezone.astimezone(utc_timezone)
-
-            sql_query += ' and m.created_at < :end'
-            arg_dict['end'] = end_datetime_utc
-
-        sql_query += ' GROUP BY date order by date'
-
-        response_data = []
-
-        with db.engine.begin() as conn:
-            rs = conn.execute(db.text(sql_query), arg_dict)
-            for i in rs:
-                response_data.append({
-                    'date': str(i.date),
-                    'rate': round((i.feedback_count * 1000 / i.message_count) if i.message_count > 0 else 0, 2),
-                })
+        response_data = AppStatisticService.get_daily_user_satisfaction_rates(
+            app_id=app_model.id,
+            timezone=account.timezone,
+            start=args['start'],
+            end=args['end']
+        )
 
         return jsonify({
             'data': response_data
@@ -327,6 +143,7 @@ class UserSatisfactionRateStatistic(Resource):
 
 
 class AverageResponseTimeStatistic(Resource):
+
     @setup_required
     @login_required
     @account_initialization_required
@@ -339,48 +156,12 @@ class AverageResponseTimeStatistic(Resource):
         parser.add_argument('end', type=datetime_string('%Y-%m-%d %H:%M'), location='args')
         args = parser.parse_args()
 
-        sql_query = '''
-                SELECT date(DATE_TRUNC('day', created_at AT TIME ZONE 'UTC' AT TIME ZONE :tz )) AS date, 
-                    AVG(provider_response_latency) as latency
-                    FROM messages
-                    WHERE app_id = :app_id
-                '''
-        arg_dict = {'tz': account.timezone, 'app_id': app_model.id}
-
-        timezone = pytz.timezone(account.timezone)
-        utc_timezone = pytz.utc
-
-        if args['start']:
-            start_datetime = datetime.strptime(args['start'], '%Y-%m-%d %H:%M')
-            start_datetime = start_datetime.replace(second=0)
-
-            start_datetime_timezone = timezone.localize(start_datetime)
-            start_datetime_utc = start_datetime_timezone.astimezone(utc_timezone)
-
-            sql_query += ' and created_at >= :start'
-            arg_dict['start'] = start_datetime_utc
-
-        if args['end']:
-            end_datetime = datetime.strptime(args['end'], '%Y-%m-%d %H:%M')
-            end_datetime = end_datetime.replace(second=0)
-
-            end_datetime_timezone = timezone.localize(end_datetime)
-            end_datetime_utc = end_datetime_timezone.astimezone(utc_timezone)
-
-            sql_query += ' and created_at < :end'
-            arg_dict['end'] = end_datetime_utc
-
-        sql_query += ' GROUP BY date order by date'
-
-        response_data = []
-
-        with db.engine.begin() as conn:
-            rs = conn.execute(db.text(sql_query), arg_dict)            
-            for i in rs:
-                response_data.append({
-                    'date': str(i.date),
-                    'latency': round(i.latency * 1000, 4)
-                })
+        response_data = AppStatisticService.get_daily_average_response_times(
+            app_id=app_model.id,
+            timezone=account.timezone,
+            start=args['start'],
+            end=args['end']
+        )
 
         return jsonify({
             'data': response_data
@@ -388,6 +169,7 @@ class AverageResponseTimeStatistic(Resource):
 
 
 class TokensPerSecondStatistic(Resource):
+
     @setup_required
     @login_required
     @account_initialization_required
@@ -400,49 +182,12 @@ class TokensPerSecondStatistic(Resource):
         parser.add_argument('end', type=datetime_string('%Y-%m-%d %H:%M'), location='args')
         args = parser.parse_args()
 
-        sql_query = '''SELECT date(DATE_TRUNC('day', created_at AT TIME ZONE 'UTC' AT TIME ZONE :tz )) AS date, 
-    CASE 
-        WHEN SUM(provider_response_latency) = 0 THEN 0
-        ELSE (SUM(answer_tokens) / SUM(provider_response_latency))
-    END as tokens_per_second
-FROM messages
-WHERE app_id = :app_id'''
-        arg_dict = {'tz': account.timezone, 'app_id': app_model.id}
-
-        timezone = pytz.timezone(account.timezone)
-        utc_timezone = pytz.utc
-
-        if args['start']:
-            start_datetime = datetime.strptime(args['start'], '%Y-%m-%d %H:%M')
-            start_datetime = start_datetime.replace(second=0)
-
-            start_datetime_timezone = timezone.localize(start_datetime)
-            start_datetime_utc = start_datetime_timezone.astimezone(utc_timezone)
-
-            sql_query += ' and created_at >= :start'
-            arg_dict['start'] = start_datetime_utc
-
-        if args['end']:
-            end_datetime = datetime.strptime(args['end'], '%Y-%m-%d %H:%M')
-            end_datetime = end_datetime.replace(second=0)
-
-            end_datetime_timezone = timezone.localize(end_datetime)
-            end_datetime_utc = end_datetime_timezone.astimezone(utc_timezone)
-
-            sql_query += ' and created_at < :end'
-            arg_dict['end'] = end_datetime_utc
-
-        sql_query += ' GROUP BY date order by date'
-
-        response_data = []
-
-        with db.engine.begin() as conn:
-            rs = conn.execute(db.text(sql_query), arg_dict)
-            for i in rs:
-                response_data.append({
-                    'date': str(i.date),
-                    'tps': round(i.tokens_per_second, 4)
-                })
+        response_data = AppStatisticService.get_daily_tokens_per_second(
+            app_id=app_model.id,
+            timezone=account.timezone,
+            start=args['start'],
+            end=args['end']
+        )
 
         return jsonify({
             'data': response_data
@@ -187,15 +187,8 @@ class DatasetDocumentListApi(Resource):
         paginated_documents = query.paginate(
             page=page, per_page=limit, max_per_page=100, error_out=False)
         documents = paginated_documents.items
+        Document.preload_aggregates(documents)
         if fetch:
-            for document in documents:
-                completed_segments = DocumentSegment.query.filter(DocumentSegment.completed_at.isnot(None),
-                                                                  DocumentSegment.document_id == str(document.id),
-                                                                  DocumentSegment.status != 're_segment').count()
-                total_segments = DocumentSegment.query.filter(DocumentSegment.document_id == str(document.id),
-                                                              DocumentSegment.status != 're_segment').count()
-                document.completed_segments = completed_segments
-                document.total_segments = total_segments
             data = marshal(documents, document_with_segments_fields)
         else:
             data = marshal(documents, document_fields)
@@ -510,15 +503,9 @@ class DocumentBatchIndexingStatusApi(DocumentResource):
         dataset_id = str(dataset_id)
         batch = str(batch)
         documents = self.get_batch_documents(dataset_id, batch)
+        Document.preload_aggregates(documents)
         documents_status = []
         for document in documents:
-            completed_segments = DocumentSegment.query.filter(DocumentSegment.completed_at.isnot(None),
-                                                              DocumentSegment.document_id == str(document.id),
-                                                              DocumentSegment.status != 're_segment').count()
-            total_segments = DocumentSegment.query.filter(DocumentSegment.document_id == str(document.id),
-                                                          DocumentSegment.status != 're_segment').count()
-            document.completed_segments = completed_segments
-            document.total_segments = total_segments
             if document.is_paused:
                 document.indexing_status = 'paused'
             documents_status.append(marshal(document, document_status_fields))
@@ -538,18 +525,6 @@ class DocumentIndexingStatusApi(DocumentResource):
         document_id = str(document_id)
         document = self.get_document(dataset_id, document_id)
 
-        completed_segments = DocumentSegment.query \
-            .filter(DocumentSegment.completed_at.isnot(None),
-                    DocumentSegment.document_id == str(document_id),
-                    DocumentSegment.status != 're_segment') \
-            .count()
-        total_segments = DocumentSegment.query \
-            .filter(DocumentSegment.document_id == str(document_id),
-                    DocumentSegment.status != 're_segment') \
-            .count()
-
-        document.completed_segments = completed_segments
-        document.total_segments = total_segments
         if document.is_paused:
             document.indexing_status = 'paused'
         return marshal(document, document_status_fields)
@@ -48,6 +48,7 @@ class HitTestingApi(Resource):
         parser = reqparse.RequestParser()
         parser.add_argument('query', type=str, location='json')
         parser.add_argument('retrieval_model', type=dict, required=False, location='json')
+        parser.add_argument('with_positions', type=bool, required=False, default=False, location='json')
         args = parser.parse_args()
 
         HitTestingService.hit_testing_args_check(args)
@@ -58,7 +59,8 @@ class HitTestingApi(Resource):
                 query=args['query'],
                 account=current_user,
                 retrieval_model=args['retrieval_model'],
-                limit=10
+                limit=10,
+                with_positions=args['with_positions']
             )
 
             return {"query": response['query'], 'records': marshal(response['records'], hit_testing_record_fields)}
@@ -83,4 +85,70 @@ class HitTestingApi(Resource):
             raise InternalServerError(str(e))
 
 
+
+class HitTestingBatchApi(Resource):
+
+    @setup_required
+    @login_required
+    @account_initialization_required
+    def post(self, dataset_id):
+        dataset_id_str = str(dataset_id)
+
+        dataset = DatasetService.get_dataset(dataset_id_str)
+        if dataset is None:
+            raise NotFound("Dataset not found.")
+
+        try:
+            DatasetService.check_dataset_permission(dataset, current_user)
+        except services.errors.account.NoPermissionError as e:
+            raise Forbidden(str(e))
+
+        parser = reqparse.RequestParser()
+        parser.add_argument('queries', type=list, required=True, nullable=False, location='json')
+        parser.add_argument('retrieval_model', type=dict, required=False, location='json')
+        args = parser.parse_args()
+
+        HitTestingService.batch_hit_testing_args_check(args)
+
+        try:
+            response = HitTestingService.batch_retrieve(
+                dataset=dataset,
+                queries=args['queries'],
+                account=current_user,
+                retrieval_model=args['retrieval_model']
+            )
+
+            return {
+                'results': [
+                    {
+                        'query': result['query'],
+                        'records': marshal(result['records'], hit_testing_record_fields),
+                        'recall': result['recall'],
+                        'reciprocal_rank': result['reciprocal_rank'],
+                    } for result in response['results']
+                ],
+                'metrics': response['metrics']
+            }
+        except services.errors.index.IndexNotInitializedError:
+            raise DatasetNotInitializedError()
+        except ProviderTokenNotInitError as ex:
+            raise ProviderNotInitializeError(ex.description)
+        except QuotaExceededError:
+            raise ProviderQuotaExceededError()
+        except ModelCurrentlyNotSupportError:
+            raise ProviderModelCurrentlyNotSupportError()
+        except LLMBadRequestError:
+            raise ProviderNotInitializeError(
+                "No Embedding Model or Reranking Model available. Please configure a valid provider "
+                "in the Settings -> Model Provider.")
+        except InvokeError as e:
+            raise CompletionRequestError(e.description)
+        except ValueError as e:
+            raise ValueError(str(e))
+        except Exception as e:
+            logging.exception("Batch hit testing failed.")
+            raise InternalServerError(str(e))
+
+
 api.add_resource(HitTestingApi, '/datasets/<uuid:dataset_id>/hit-testing')
+api.add_resource(HitTestingBatchApi, '/datasets/<uuid:dataset_id>/hit-testing/batch')
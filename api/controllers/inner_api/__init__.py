@@ -5,5 +5,5 @@ from libs.external_api import ExternalApi
 bp = Blueprint('inner_api', __name__, url_prefix='/inner/api')
 api = ExternalApi(bp)
 
+from .billing import billing
 from .workspace import workspace
-
@@ -0,0 +1,25 @@
+from flask_restful import Resource, reqparse
+
+from controllers.console.setup import setup_required
+from controllers.inner_api import api
+from controllers.inner_api.wraps import inner_api_only
+from services.feature_service import FeatureService
+
+
+class BillingInfoInvalidate(Resource):
+
+    @setup_required
+    @inner_api_only
+    def post(self):
+        parser = reqparse.RequestParser()
+        parser.add_argument('tenant_id', type=str, required=True, location='json')
+        args = parser.parse_args()
+
+        FeatureService.invalidate_billing_info(args['tenant_id'])
+
+        return {
+            'result': 'success'
+        }
+
+
+api.add_resource(BillingInfoInvalidate, '/billing/invalidate')
@@ -19,7 +19,7 @@ from core.errors.error import ProviderTokenNotInitError
 from extensions.ext_database import db
 from fields.document_fields import document_fields, document_status_fields
 from libs.login import current_user
-from models.dataset import Dataset, Document, DocumentSegment
+from models.dataset import Dataset, Document
 from services.dataset_service import DocumentService
 from services.file_service import FileService
 
@@ -342,6 +342,7 @@ class DocumentListApi(DatasetApiResource):
         paginated_documents = query.paginate(
             page=page, per_page=limit, max_per_page=100, error_out=False)
         documents = paginated_documents.items
+        Document.preload_aggregates(documents)
 
         response = {
             'data': marshal(documents, document_fields),
@@ -370,15 +371,9 @@ class DocumentIndexingStatusApi(DatasetApiResource):
         documents = DocumentService.get_batch_documents(dataset_id, batch)
         if not documents:
             raise NotFound('Documents not found.')
+        Document.preload_aggregates(documents)
         documents_status = []
         for document in documents:
-            completed_segments = DocumentSegment.query.filter(DocumentSegment.completed_at.isnot(None),
-                                                              DocumentSegment.document_id == str(document.id),
-                                                              DocumentSegment.status != 're_segment').count()
-            total_segments = DocumentSegment.query.filter(DocumentSegment.document_id == str(document.id),
-                                                          DocumentSegment.status != 're_segment').count()
-            document.completed_segments = completed_segments
-            document.total_segments = total_segments
             if document.is_paused:
                 document.indexing_status = 'paused'
             documents_status.append(marshal(document, document_status_fields))
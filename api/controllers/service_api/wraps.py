@@ -1,5 +1,4 @@
 from collections.abc import Callable
-from datetime import datetime, timezone
 from enum import Enum
 from functools import wraps
 from typing import Optional
@@ -13,7 +12,8 @@ from werkzeug.exceptions import Forbidden, Unauthorized
 from extensions.ext_database import db
 from libs.login import _get_user
 from models.account import Account, Tenant, TenantAccountJoin, TenantStatus
-from models.model import ApiToken, App, EndUser
+from models.model import App, EndUser
+from services.api_token_service import ApiTokenService
 from services.feature_service import FeatureService
 
 
@@ -180,16 +180,12 @@ def validate_and_get_api_token(scope=None):
     if auth_scheme != 'bearer':
         raise Unauthorized("Authorization scheme must be 'Bearer'")
 
-    api_token = db.session.query(ApiToken).filter(
-        ApiToken.token == auth_token,
-        ApiToken.type == scope,
-    ).first()
+    api_token = ApiTokenService.get_api_token(auth_token, scope)
 
     if not api_token:
         raise Unauthorized("Access token is invalid")
 
-    api_token.last_used_at = datetime.now(timezone.utc).replace(tzinfo=None)
-    db.session.commit()
+    ApiTokenService.record_last_used(api_token.id)
 
     return api_token
 
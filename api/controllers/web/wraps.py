@@ -1,4 +1,5 @@
 from functools import wraps
+from typing import Optional
 
 from flask import request
 from flask_restful import Resource
@@ -9,6 +10,7 @@ from extensions.ext_database import db
 from libs.passport import PassportService
 from models.model import App, EndUser, Site
 from services.feature_service import FeatureService
+from services.identity_cache_service import IdentityCacheService
 
 
 def validate_jwt_token(view=None):
@@ -42,15 +44,15 @@ def decode_jwt_token():
             raise Unauthorized('Invalid Authorization header format. Expected \'Bearer <api-key>\' format.')
         decoded = PassportService().verify(tk)
         app_code = decoded.get('app_code')
-        app_model = db.session.query(App).filter(App.id == decoded['app_id']).first()
-        site = db.session.query(Site).filter(Site.code == app_code).first()
+        app_model, site, end_user = IdentityCacheService.load_web_identity(
+            decoded['app_id'], app_code, decoded['end_user_id'], _load_web_identity
+        )
         if not app_model:
             raise NotFound()
         if not app_code or not site:
             raise BadRequest('Site URL is no longer valid.')
         if app_model.enable_site is False:
             raise BadRequest('Site is disabled.')
-        end_user = db.session.query(EndUser).filter(EndUser.id == decoded['end_user_id']).first()
         if not end_user:
             raise NotFound()
 
@@ -64,6 +66,14 @@ def decode_jwt_token():
         raise Unauthorized(e.description)
 
 
+def _load_web_identity(app_id: str, app_code: Optional[str], end_user_id: str) \
+        -> tuple[Optional[App], Optional[Site], Optional[EndUser]]:
+    app_model = db.session.query(App).filter(App.id == app_id).first()
+    site = db.session.query(Site).filter(Site.code == app_code).first() if app_code else None
+    end_user = db.session.query(EndUser).filter(EndUser.id == end_user_id).first()
+    return app_model, site, end_user
+
+
 def _validate_web_sso_token(decoded, system_features):
     # Check if SSO is enforced for web, and if the token source is not SSO, raise an error and redirect to SSO login
     if system_features.sso_enforced_for_web:
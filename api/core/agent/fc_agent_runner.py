@@ -1,8 +1,13 @@
 import json
 import logging
+import threading
+import time
 from collections.abc import Generator
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from copy import deepcopy
-from typing import Any, Union
+from typing import Any, Optional, Union
+
+from flask import Flask, current_app
 
 from core.agent.base_agent_runner import BaseAgentRunner
 from core.app.apps.base_app_queue_manager import PublishFrom
@@ -17,10 +22,13 @@ from core.model_runtime.entities.message_entities import (
     ToolPromptMessage,
     UserPromptMessage,
 )
+from core.ops.ops_trace_manager import TraceQueueManager
 from core.prompt.agent_history_prompt_transform import AgentHistoryPromptTransform
 from core.tools.entities.tool_entities import ToolInvokeMeta
+from core.tools.tool.tool import Tool
 from core.tools.tool_engine import ToolEngine
-from models.model import Message
+from extensions.ext_database import db
+from models.model import Message, MessageFile
 
 logger = logging.getLogger(__name__)
 
@@ -225,57 +233,31 @@ class FunctionCallAgentRunner(BaseAgentRunner):
             
             final_answer += response + '\n'
 
-            # call tools
+            # call tools, the calls of a turn are independent so they run concurrently
             tool_responses = []
-            for tool_call_id, tool_call_name, tool_call_args in tool_calls:
-                tool_instance = tool_instances.get(tool_call_name)
-                if not tool_instance:
-                    tool_response = {
-                        "tool_call_id": tool_call_id,
-                        "tool_call_name": tool_call_name,
-                        "tool_response": f"there is not a tool named {tool_call_name}",
-                        "meta": ToolInvokeMeta.error_instance(f"there is not a tool named {tool_call_name}").to_dict()
-                    }
-                else:
-                    # invoke tool
-                    tool_invoke_response, message_files, tool_invoke_meta = ToolEngine.agent_invoke(
-                        tool=tool_instance,
-                        tool_parameters=tool_call_args,
-                        user_id=self.user_id,
-                        tenant_id=self.tenant_id,
-                        message=self.message,
-                        invoke_from=self.application_generate_entity.invoke_from,
-                        agent_tool_callback=self.agent_callback,
-                        trace_manager=trace_manager,
-                    )
-                    # publish files
-                    for message_file_id, save_as in message_files:
-                        if save_as:
-                            self.variables_pool.set_file(tool_name=tool_call_name, value=message_file_id, name=save_as)
-
-                        # publish message file
-                        self.queue_manager.publish(QueueMessageFileEvent(
-                            message_file_id=message_file_id
-                        ), PublishFrom.APPLICATION_MANAGER)
-                        # add message file ids
-                        message_file_ids.append(message_file_id)
-                    
-                    tool_response = {
-                        "tool_call_id": tool_call_id,
-                        "tool_call_name": tool_call_name,
-                        "tool_response": tool_invoke_response,
-                        "meta": tool_invoke_meta.to_dict()
-                    }
-                
+            for tool_response, message_files in self._invoke_tools(tool_calls, tool_instances, trace_manager):
+                # publish files
+                for message_file_id, save_as in message_files:
+                    if save_as:
+                        self.variables_pool.set_file(
+                            tool_name=tool_response['tool_call_name'], value=message_file_id, name=save_as)
+
+                    # publish message file
+                    self.queue_manager.publish(QueueMessageFileEvent(
+                        message_file_id=message_file_id
+                    ), PublishFrom.APPLICATION_MANAGER)
+                    # add message file ids
+                    message_file_ids.append(message_file_id)
+
                 tool_responses.append(tool_response)
                 if tool_response['tool_response'] is not None:
                     self._current_thoughts.append(
                         ToolPromptMessage(
                             content=tool_response['tool_response'],
-                            tool_call_id=tool_call_id,
-                            name=tool_call_name,
+                            tool_call_id=tool_response['tool_call_id'],
+                            name=tool_response['tool_call_name'],
                         )
-                    ) 
+                    )
 
             if len(tool_responses) > 0:
                 # save agent thought
@@ -317,6 +299,121 @@ class FunctionCallAgentRunner(BaseAgentRunner):
             system_fingerprint=''
         )), PublishFrom.APPLICATION_MANAGER)
 
+    def _invoke_tools(self, tool_calls: list[tuple[str, str, dict[str, Any]]],
+                      tool_instances: dict[str, Tool],
+                      trace_manager: Optional[TraceQueueManager] = None) -> list[tuple[dict, list[tuple[str, str]]]]:
+        """
+        Invoke the tool calls of a turn on a bounded thread pool.
+
+        Every call is given AGENT_TOOL_CALL_TIMEOUT seconds from the moment it starts,
+        a call which is still running after that is reported to the model as timed out,
+        and the message files it creates once it eventually returns are deleted.
+
+        :return: tool response and message files of every tool call, in the order of the tool calls
+        """
+        if not tool_calls:
+            return []
+
+        flask_app = current_app._get_current_object()
+        max_workers = min(flask_app.config.get('AGENT_TOOL_CALL_MAX_WORKERS'), len(tool_calls))
+        timeout = flask_app.config.get('AGENT_TOOL_CALL_TIMEOUT')
+
+        # the message is bound to the session of this thread, the workers query it in their own session
+        message_id = self.message.id
+        state = _ToolCallsState()
+        results = {}
+        executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='agent_tool_call')
+        try:
+            futures = {
+                executor.submit(self._invoke_tool, flask_app, state, index, tool_call, tool_instances,
+                                message_id, trace_manager): index
+                for index, tool_call in enumerate(tool_calls)
+            }
+
+            pending = set(futures.keys())
+            while pending:
+                done, pending = wait(pending, timeout=1, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[futures[future]] = future.result()
+
+                for future in list(pending):
+                    index = futures[future]
+                    if not state.time_out(index, timeout):
+                        continue
+
+                    # the thread can not be interrupted, its result will be discarded
+                    pending.discard(future)
+                    tool_call_id, tool_call_name, _ = tool_calls[index]
+                    error = f"tool invoke timeout, {tool_call_name} did not respond in {timeout} seconds"
+                    logger.warning(f'Agent tool call {tool_call_id} of {tool_call_name} timed out')
+                    results[index] = ({
+                        "tool_call_id": tool_call_id,
+                        "tool_call_name": tool_call_name,
+                        "tool_response": error,
+                        "meta": ToolInvokeMeta.error_instance(error).to_dict()
+                    }, [])
+        finally:
+            # do not wait for the timed out calls
+            executor.shutdown(wait=False)
+
+        return [results[index] for index in range(len(tool_calls))]
+
+    def _invoke_tool(self, flask_app: Flask, state: '_ToolCallsState', index: int,
+                     tool_call: tuple[str, str, dict[str, Any]],
+                     tool_instances: dict[str, Tool],
+                     message_id: str,
+                     trace_manager: Optional[TraceQueueManager] = None) -> tuple[dict, list[tuple[str, str]]]:
+        """
+        Invoke a tool call in a worker thread.
+        """
+        state.start(index)
+        tool_call_id, tool_call_name, tool_call_args = tool_call
+        tool_instance = tool_instances.get(tool_call_name)
+        if not tool_instance:
+            state.finish(index)
+            return {
+                "tool_call_id": tool_call_id,
+                "tool_call_name": tool_call_name,
+                "tool_response": f"there is not a tool named {tool_call_name}",
+                "meta": ToolInvokeMeta.error_instance(f"there is not a tool named {tool_call_name}").to_dict()
+            }, []
+
+        # calls of the same tool must not share its runtime
+        tool = tool_instance.fork_tool_runtime(
+            runtime=tool_instance.runtime.model_dump() if tool_instance.runtime else {})
+        tool.load_variables(tool_instance.variables)
+
+        with flask_app.app_context():
+            message = db.session.query(Message).filter(Message.id == message_id).first()
+            tool_invoke_response, message_files, tool_invoke_meta = ToolEngine.agent_invoke(
+                tool=tool,
+                tool_parameters=tool_call_args,
+                user_id=self.user_id,
+                tenant_id=self.tenant_id,
+                message=message,
+                invoke_from=self.application_generate_entity.invoke_from,
+                agent_tool_callback=self.agent_callback,
+                trace_manager=trace_manager,
+            )
+
+            if not state.finish(index):
+                # the call timed out and the agent thought has been saved without it
+                message_file_ids = [message_file_id for message_file_id, _ in message_files]
+                if message_file_ids:
+                    db.session.query(MessageFile).filter(
+                        MessageFile.id.in_(message_file_ids)
+                    ).delete(synchronize_session=False)
+                    db.session.commit()
+                logger.info(f'Discarded the late result of agent tool call {tool_call_id} of {tool_call_name}')
+                return {}, []
+
+        return {
+            "tool_call_id": tool_call_id,
+            "tool_call_name": tool_call_name,
+            "tool_response": tool_invoke_response,
+            "meta": tool_invoke_meta.to_dict()
+        }, message_files
+
     def check_tool_calls(self, llm_result_chunk: LLMResultChunk) -> bool:
         """
         Check if there is any tool call in llm result chunk
@@ -436,3 +533,43 @@ class FunctionCallAgentRunner(BaseAgentRunner):
             # clear messages after the first iteration
             prompt_messages = self._clear_user_prompt_image_messages(prompt_messages)
         return prompt_messages
+
+
+class _ToolCallsState:
+    """
+    Start time and outcome of the tool calls of a turn, shared by the agent thread and the workers.
+
+    A call either finishes or times out, whichever happens first under the lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._started_at: dict[int, float] = {}
+        self._finished: set[int] = set()
+        self._timed_out: set[int] = set()
+
+    def start(self, index: int) -> None:
+        with self._lock:
+            self._started_at[index] = time.perf_counter()
+
+    def finish(self, index: int) -> bool:
+        """
+        :return: False if the call has already timed out
+        """
+        with self._lock:
+            if index in self._timed_out:
+                return False
+            self._finished.add(index)
+            return True
+
+    def time_out(self, index: int, timeout: float) -> bool:
+        """
+        :return: True if the call has been running for longer than the timeout and is now timed out
+        """
+        with self._lock:
+            if index in self._finished or index not in self._started_at:
+                return False
+            if time.perf_counter() - self._started_at[index] <= timeout:
+                return False
+            self._timed_out.add(index)
+            return True
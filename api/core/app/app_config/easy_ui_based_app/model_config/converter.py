@@ -67,11 +67,8 @@ class ModelConfigConverter:
                 raise QuotaExceededError(f"Model provider {provider_name} quota exceeded.")
 
         # model config
-        completion_params = model_config.parameters
-        stop = []
-        if 'stop' in completion_params:
-            stop = completion_params['stop']
-            del completion_params['stop']
+        completion_params = dict(model_config.parameters)
+        stop = completion_params.pop('stop', [])
 
         # get model mode
         model_mode = model_config.mode
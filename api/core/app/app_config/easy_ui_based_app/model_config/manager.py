@@ -18,11 +18,9 @@ class ModelConfigManager:
         if not model_config:
             raise ValueError("model is required")
 
-        completion_params = model_config.get('completion_params')
-        stop = []
-        if 'stop' in completion_params:
-            stop = completion_params['stop']
-            del completion_params['stop']
+        # the config may be shared, the stop words are removed from a copy
+        completion_params = dict(model_config.get('completion_params'))
+        stop = completion_params.pop('stop', [])
 
         # get model mode
         model_mode = model_config.get('mode')
@@ -1,3 +1,4 @@
+import copy
 import logging
 import os
 import threading
@@ -232,7 +233,8 @@ class CompletionAppGenerator(MessageBasedAppGenerator):
 
         app_model_config = message.app_model_config
         override_model_config_dict = app_model_config.to_dict()
-        model_dict = override_model_config_dict['model']
+        # the model config of the row is shared, the completion params are overridden on a copy
+        model_dict = copy.deepcopy(override_model_config_dict['model'])
         completion_params = model_dict.get('completion_params')
         completion_params['temperature'] = 0.9
         model_dict['completion_params'] = completion_params
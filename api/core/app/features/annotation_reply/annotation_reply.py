@@ -2,6 +2,7 @@ import logging
 from typing import Optional
 
 from core.app.entities.app_invoke_entities import InvokeFrom
+from core.app.features.annotation_reply.annotation_reply_cache import AnnotationReplyCache
 from core.rag.datasource.vdb.vector_factory import Vector
 from extensions.ext_database import db
 from models.dataset import Dataset
@@ -33,63 +34,99 @@ class AnnotationReplyFeature:
         if not annotation_setting:
             return None
 
-        collection_binding_detail = annotation_setting.collection_binding_detail
+        if invoke_from in [InvokeFrom.SERVICE_API, InvokeFrom.WEB_APP]:
+            from_source = 'api'
+        else:
+            from_source = 'console'
 
         try:
             score_threshold = annotation_setting.score_threshold or 1
-            embedding_provider_name = collection_binding_detail.provider_name
-            embedding_model_name = collection_binding_detail.model_name
-
-            dataset_collection_binding = DatasetCollectionBindingService.get_dataset_collection_binding(
-                embedding_provider_name,
-                embedding_model_name,
-                'annotation'
-            )
-
-            dataset = Dataset(
-                id=app_record.id,
-                tenant_id=app_record.tenant_id,
-                indexing_technique='high_quality',
-                embedding_model_provider=embedding_provider_name,
-                embedding_model=embedding_model_name,
-                collection_binding_id=dataset_collection_binding.id
-            )
-
-            vector = Vector(dataset, attributes=['doc_id', 'annotation_id', 'app_id'])
-
-            documents = vector.search_by_vector(
-                query=query,
-                top_k=1,
-                score_threshold=score_threshold,
-                filter={
-                    'group_id': [dataset.id]
-                }
-            )
-
-            if documents:
-                annotation_id = documents[0].metadata['annotation_id']
-                score = documents[0].metadata['score']
-                annotation = AppAnnotationService.get_annotation_by_id(annotation_id)
-                if annotation:
-                    if invoke_from in [InvokeFrom.SERVICE_API, InvokeFrom.WEB_APP]:
-                        from_source = 'api'
-                    else:
-                        from_source = 'console'
-
-                    # insert annotation history
-                    AppAnnotationService.add_annotation_history(annotation.id,
-                                                                app_record.id,
-                                                                annotation.question,
-                                                                annotation.content,
-                                                                query,
-                                                                user_id,
-                                                                message.id,
-                                                                from_source,
-                                                                score)
-
-                    return annotation
+            version = AnnotationReplyCache.get_version(app_record.id)
+            annotation = None
+            score = None
+            if version is not None:
+                # the queries repeating the question of an annotation are replied without a vector search
+                annotation_id = AnnotationReplyCache.match_question(app_record.id, version, query)
+                if annotation_id:
+                    annotation = AppAnnotationService.get_annotation_by_id(annotation_id)
+                    score = 1.0
+                    if annotation and (AnnotationReplyCache.normalize_query(annotation.question or '')
+                                       != AnnotationReplyCache.normalize_query(query)):
+                        annotation = None
+
+                if not annotation:
+                    cached = AnnotationReplyCache.get_search_result(app_record.id, version, score_threshold, query)
+                    if cached is not None:
+                        if not cached:
+                            return None
+                        annotation = AppAnnotationService.get_annotation_by_id(cached['annotation_id'])
+                        score = cached['score']
+
+            if not annotation:
+                annotation_id, score = self._search(app_record, annotation_setting, query, score_threshold)
+                if version is not None:
+                    AnnotationReplyCache.set_search_result(app_record.id, version, score_threshold, query,
+                                                           annotation_id, score)
+                if annotation_id:
+                    annotation = AppAnnotationService.get_annotation_by_id(annotation_id)
+
+            if annotation:
+                # the annotation history is written by a periodic batched flush
+                AppAnnotationService.record_annotation_history(annotation.id,
+                                                               app_record.id,
+                                                               annotation.question,
+                                                               annotation.content,
+                                                               query,
+                                                               user_id,
+                                                               message.id,
+                                                               from_source,
+                                                               score)
+
+                return annotation
         except Exception as e:
             logger.warning(f'Query annotation failed, exception: {str(e)}.')
             return None
 
         return None
+
+    @staticmethod
+    def _search(app_record: App, annotation_setting: AppAnnotationSetting, query: str,
+                score_threshold: float) -> tuple[Optional[str], Optional[float]]:
+        """
+        Search the annotation whose question is the closest to a query.
+
+        :return: the annotation id and its score, or None
+        """
+        collection_binding_detail = annotation_setting.collection_binding_detail
+        embedding_provider_name = collection_binding_detail.provider_name
+        embedding_model_name = collection_binding_detail.model_name
+
+        dataset_collection_binding = DatasetCollectionBindingService.get_dataset_collection_binding(
+            embedding_provider_name,
+            embedding_model_name,
+            'annotation'
+        )
+
+        dataset = Dataset(
+            id=app_record.id,
+            tenant_id=app_record.tenant_id,
+            indexing_technique='high_quality',
+            embedding_model_provider=embedding_provider_name,
+            embedding_model=embedding_model_name,
+            collection_binding_id=dataset_collection_binding.id
+        )
+
+        vector = Vector(dataset, attributes=['doc_id', 'annotation_id', 'app_id'])
+
+        documents = vector.search_by_vector(
+            query=query,
+            top_k=1,
+            score_threshold=score_threshold,
+            filter={
+                'group_id': [dataset.id]
+            }
+        )
+
+        if not documents:
+            return None, None
+        return documents[0].metadata['annotation_id'], documents[0].metadata['score']
@@ -0,0 +1,130 @@
+import hashlib
+import json
+import logging
+import re
+import threading
+import unicodedata
+from typing import Optional
+
+from flask import current_app
+
+from core.helper.lru_cache import LRUCache
+from extensions.ext_database import db
+from extensions.ext_redis import redis_client
+from models.model import MessageAnnotation
+
+logger = logging.getLogger(__name__)
+
+
+class AnnotationReplyCache:
+    """
+    Caches of the annotation reply of the apps, checked before the vector search of a query.
+
+    The questions of the annotations of an app are hashed into an index kept in memory of the process,
+    which replies to the queries matching a question exactly, and the annotation found by the vector search
+    of a query is cached in redis. Both are tagged with the annotation version of the app, which is bumped
+    when its annotations or their index change, see `invalidate`.
+    """
+
+    _question_indexes: Optional[LRUCache] = None
+    _lock = threading.Lock()
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        return re.sub(r'\s+', ' ', unicodedata.normalize('NFKC', query)).strip().casefold()
+
+    @classmethod
+    def get_version(cls, app_id: str) -> Optional[str]:
+        """
+        Get the annotation version of an app, None when the caches can not be used.
+        """
+        try:
+            version = redis_client.get(cls._version_key(app_id))
+        except Exception:
+            logger.warning('Failed to get the annotation version', exc_info=True)
+            return None
+        return version.decode('utf-8') if version else '0'
+
+    @classmethod
+    def invalidate(cls, app_id: str) -> None:
+        """
+        Invalidate the cached annotation replies of an app, once its annotations or their index changed.
+        """
+        try:
+            redis_client.incr(cls._version_key(app_id))
+        except Exception:
+            logger.exception(f'Failed to invalidate the annotation replies of app {app_id}')
+
+    @classmethod
+    def match_question(cls, app_id: str, version: str, query: str) -> Optional[str]:
+        """
+        Get the id of an annotation whose question matches a query, after normalization.
+        """
+        max_apps = current_app.config.get('ANNOTATION_REPLY_EXACT_MATCH_MAX_APPS')
+        if not max_apps:
+            return None
+
+        with cls._lock:
+            if cls._question_indexes is None or cls._question_indexes.capacity != max_apps:
+                cls._question_indexes = LRUCache(max_apps)
+            cached = cls._question_indexes.get(app_id)
+
+        if cached and cached[0] == version:
+            question_index = cached[1]
+        else:
+            # the questions are loaded outside of the lock, a concurrent load of the same app is harmless
+            question_index = {}
+            annotations = db.session.query(MessageAnnotation.id, MessageAnnotation.question).filter(
+                MessageAnnotation.app_id == app_id
+            )
+            for annotation_id, question in annotations:
+                if question:
+                    question_index.setdefault(cls._hash(cls.normalize_query(question)), annotation_id)
+            with cls._lock:
+                cls._question_indexes.put(app_id, (version, question_index))
+
+        return question_index.get(cls._hash(cls.normalize_query(query)))
+
+    @classmethod
+    def get_search_result(cls, app_id: str, version: str, score_threshold: float,
+                          query: str) -> Optional[dict]:
+        """
+        Get the cached vector search of a query.
+
+        :return: None when it is not cached, else a dict with the annotation_id and the score of the annotation
+            found, which is empty when no annotation was found
+        """
+        if not current_app.config.get('ANNOTATION_REPLY_CACHE_TTL'):
+            return None
+        try:
+            cached = redis_client.get(cls._search_result_key(app_id, version, score_threshold, query))
+        except Exception:
+            logger.warning('Failed to get the annotation reply from cache', exc_info=True)
+            return None
+        return json.loads(cached) if cached else None
+
+    @classmethod
+    def set_search_result(cls, app_id: str, version: str, score_threshold: float, query: str,
+                          annotation_id: Optional[str], score: Optional[float]) -> None:
+        ttl = current_app.config.get('ANNOTATION_REPLY_CACHE_TTL')
+        if not ttl:
+            return
+        result = {'annotation_id': annotation_id, 'score': score} if annotation_id else {}
+        try:
+            redis_client.setex(cls._search_result_key(app_id, version, score_threshold, query), ttl,
+                               json.dumps(result))
+        except Exception:
+            logger.warning('Failed to set the annotation reply to cache', exc_info=True)
+
+    @staticmethod
+    def _hash(text: str) -> bytes:
+        return hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+
+    @staticmethod
+    def _version_key(app_id: str) -> str:
+        return f'annotation_reply:version:{app_id}'
+
+    @classmethod
+    def _search_result_key(cls, app_id: str, version: str, score_threshold: float, query: str) -> str:
+        query_hash = hashlib.sha256(cls.normalize_query(query).encode('utf-8')).hexdigest()
+        return f'annotation_reply:result:{app_id}:{version}:{score_threshold}:{query_hash}'
@@ -33,6 +33,7 @@ from models.model import EndUser
 from models.workflow import (
     CreatedByRole,
     Workflow,
+    WorkflowGraphBlob,
     WorkflowNodeExecution,
     WorkflowNodeExecutionStatus,
     WorkflowNodeExecutionTriggeredFrom,
@@ -80,7 +81,7 @@ class WorkflowCycleManage(WorkflowIterationCycleManage):
             type=workflow.type,
             triggered_from=triggered_from.value,
             version=workflow.version,
-            graph=workflow.graph,
+            graph_hash=WorkflowGraphBlob.store(workflow.graph) if workflow.graph else None,
             inputs=json.dumps(inputs),
             status=WorkflowRunStatus.RUNNING.value,
             created_by_role=(CreatedByRole.ACCOUNT.value
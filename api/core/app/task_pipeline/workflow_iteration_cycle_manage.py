@@ -200,7 +200,7 @@ class WorkflowIterationCycleManage(WorkflowCycleStateManager):
             WorkflowNodeExecution.id == current_iteration.node_execution_id
         ).first()
 
-        original_node_execution_metadata = workflow_node_execution.execution_metadata_dict
+        original_node_execution_metadata = dict(workflow_node_execution.execution_metadata_dict or {})
         if original_node_execution_metadata:
             original_node_execution_metadata['current_index'] = event.index
             original_node_execution_metadata['steps_boundary'] = current_iteration.iteration_steps_boundary
@@ -224,7 +224,7 @@ class WorkflowIterationCycleManage(WorkflowCycleStateManager):
         workflow_node_execution.outputs = json.dumps(WorkflowEngineManager.handle_special_values(event.outputs)) if event.outputs else None
         workflow_node_execution.elapsed_time = time.perf_counter() - current_iteration.started_at
 
-        original_node_execution_metadata = workflow_node_execution.execution_metadata_dict
+        original_node_execution_metadata = dict(workflow_node_execution.execution_metadata_dict or {})
         if original_node_execution_metadata:
             original_node_execution_metadata['steps_boundary'] = current_iteration.iteration_steps_boundary
             original_node_execution_metadata['total_tokens'] = current_iteration.total_tokens
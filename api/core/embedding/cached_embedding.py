@@ -25,17 +25,8 @@ class CacheEmbedding(Embeddings):
     def embed_documents(self, texts: list[str]) -> list[list[float]]:
         """Embed search docs in batches of 10."""
         # use doc embedding cache or store if not exists
-        text_embeddings = [None for _ in range(len(texts))]
-        embedding_queue_indices = []
-        for i, text in enumerate(texts):
-            hash = helper.generate_text_hash(text)
-            embedding = db.session.query(Embedding).filter_by(model_name=self._model_instance.model,
-                                                              hash=hash,
-                                                              provider_name=self._model_instance.provider).first()
-            if embedding:
-                text_embeddings[i] = embedding.get_embedding()
-            else:
-                embedding_queue_indices.append(i)
+        text_embeddings = self.get_cached_embeddings(texts)
+        embedding_queue_indices = [i for i, embedding in enumerate(text_embeddings) if embedding is None]
         if embedding_queue_indices:
             embedding_queue_texts = [texts[i] for i in embedding_queue_indices]
             embedding_queue_embeddings = []
@@ -83,6 +74,19 @@ class CacheEmbedding(Embeddings):
 
         return text_embeddings
 
+    def get_cached_embeddings(self, texts: list[str]) -> list[Optional[list[float]]]:
+        """Get the cached embeddings of texts with one query, None for the texts which were never embedded."""
+        hashes = [helper.generate_text_hash(text) for text in texts]
+        embeddings = {}
+        if hashes:
+            embeddings = {
+                embedding.hash: embedding.get_embedding() for embedding in
+                db.session.query(Embedding).filter(Embedding.model_name == self._model_instance.model,
+                                                   Embedding.provider_name == self._model_instance.provider,
+                                                   Embedding.hash.in_(set(hashes))).all()
+            }
+        return [embeddings.get(hash) for hash in hashes]
+
     def embed_query(self, text: str) -> list[float]:
         """Embed query text."""
         # use doc embedding cache or store if not exists
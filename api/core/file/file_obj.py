@@ -1,6 +1,7 @@
 import enum
 from typing import Optional
 
+from flask import current_app
 from pydantic import BaseModel
 
 from core.app.app_config.entities import FileExtraConfig
@@ -10,6 +11,8 @@ from core.model_runtime.entities.message_entities import ImagePromptMessageConte
 from extensions.ext_database import db
 from models.model import UploadFile
 
+LOW_DETAIL_IMAGE_MAX_RESOLUTION = 512
+
 
 class FileType(enum.Enum):
     IMAGE = 'image'
@@ -106,14 +109,24 @@ class FileVar(BaseModel):
     def prompt_message_content(self) -> ImagePromptMessageContent:
         if self.type == FileType.IMAGE:
             image_config = self.extra_config.image_config
+            detail = ImagePromptMessageContent.DETAIL.HIGH \
+                if image_config.get("detail") == "high" else ImagePromptMessageContent.DETAIL.LOW
+
+            max_resolution = None
+            if detail == ImagePromptMessageContent.DETAIL.LOW \
+                    and current_app.config.get('MULTIMODAL_LOW_DETAIL_IMAGE_DOWNSCALE_ENABLED'):
+                # models process low detail images at a fixed low resolution, no need to send more pixels
+                max_resolution = min(
+                    current_app.config.get('MULTIMODAL_IMAGE_MAX_RESOLUTION') or LOW_DETAIL_IMAGE_MAX_RESOLUTION,
+                    LOW_DETAIL_IMAGE_MAX_RESOLUTION
+                )
 
             return ImagePromptMessageContent(
-                data=self.data,
-                detail=ImagePromptMessageContent.DETAIL.HIGH
-                if image_config.get("detail") == "high" else ImagePromptMessageContent.DETAIL.LOW
+                data=self._get_data(max_resolution=max_resolution),
+                detail=detail
             )
 
-    def _get_data(self, force_url: bool = False) -> Optional[str]:
+    def _get_data(self, force_url: bool = False, max_resolution: Optional[int] = None) -> Optional[str]:
         if self.type == FileType.IMAGE:
             if self.transfer_method == FileTransferMethod.REMOTE_URL:
                 return self.url
@@ -126,7 +139,8 @@ class FileVar(BaseModel):
 
                 return UploadFileParser.get_image_data(
                     upload_file=upload_file,
-                    force_url=force_url
+                    force_url=force_url,
+                    max_resolution=max_resolution
                 )
             elif self.transfer_method == FileTransferMethod.TOOL_FILE:
                 extension = self.extension
@@ -0,0 +1,293 @@
+import base64
+import hashlib
+import io
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from flask import current_app
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+# formats that can not be resized without losing content (vector or animated images)
+NON_RESIZABLE_MIME_TYPES = ['image/svg+xml', 'image/gif']
+
+# cache statistics are logged every this many lookups
+STATS_LOG_INTERVAL = 1000
+
+
+class ImagePayloadCacheStats(BaseModel):
+    memory_hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    memory_items: int = 0
+    memory_bytes: int = 0
+    disk_items: int = 0
+    disk_bytes: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.memory_hits + self.disk_hits + self.misses
+        return (self.memory_hits + self.disk_hits) / total if total else 0.0
+
+
+class ImagePayloadCache:
+    """
+    Bounded two-tier (memory + disk) cache of base64 `data:` URLs of images sent to vision models.
+
+    The disk tier of every process lives in its own private subdirectory of the cache directory,
+    so that its index always matches the files it holds. Subdirectories left by dead processes
+    are removed when a cache is created.
+    """
+
+    def __init__(self, memory_limit: int, disk_limit: int, cache_dir: Optional[str] = None):
+        """
+        :param memory_limit: max total size in bytes of payloads kept in memory
+        :param disk_limit: max total size in bytes of payloads kept on disk, 0 to disable the disk tier
+        :param cache_dir: parent directory of the disk tiers of all the processes
+        """
+        self.memory_limit = memory_limit
+        self.disk_limit = disk_limit
+        self.cache_dir = cache_dir or os.path.join(tempfile.gettempdir(), 'dify_image_payload_cache')
+        self.pid = os.getpid()
+        self._process_dir: Optional[str] = None
+        self._memory: OrderedDict[str, str] = OrderedDict()
+        self._memory_bytes = 0
+        self._disk: OrderedDict[str, int] = OrderedDict()
+        self._disk_bytes = 0
+        self._stats = ImagePayloadCacheStats()
+        self._lookups = 0
+        self._lock = threading.Lock()
+
+        if self.disk_limit:
+            self._remove_stale_process_dirs()
+
+    def get(self, key: str) -> Optional[str]:
+        payload = self._get(key)
+        self._log_stats()
+        return payload
+
+    def _get(self, key: str) -> Optional[str]:
+        with self._lock:
+            payload = self._memory.get(key)
+            if payload is not None:
+                self._memory.move_to_end(key)
+                self._stats.memory_hits += 1
+                return payload
+
+            if key not in self._disk:
+                self._stats.misses += 1
+                return None
+
+            self._disk.move_to_end(key)
+
+        try:
+            with open(self._disk_path(key), encoding='utf-8') as f:
+                payload = f.read()
+        except OSError:
+            with self._lock:
+                self._drop_disk_entry(key)
+                self._stats.misses += 1
+            return None
+
+        with self._lock:
+            self._stats.disk_hits += 1
+            self._put_memory(key, payload)
+
+        return payload
+
+    def set(self, key: str, payload: str) -> None:
+        with self._lock:
+            self._put_memory(key, payload)
+
+        if not self.disk_limit or len(payload) > self.disk_limit:
+            return
+
+        try:
+            self._ensure_process_dir()
+            # write to a temporary file first so concurrent readers never see a partial payload
+            tmp_path = f'{self._disk_path(key)}.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(payload)
+            os.replace(tmp_path, self._disk_path(key))
+        except OSError:
+            logger.exception('Failed to write image payload cache to disk')
+            return
+
+        with self._lock:
+            if key in self._disk:
+                self._disk_bytes -= self._disk.pop(key)
+            self._disk[key] = len(payload)
+            self._disk_bytes += len(payload)
+            while self._disk_bytes > self.disk_limit:
+                evicted_key, size = self._disk.popitem(last=False)
+                self._disk_bytes -= size
+                self._stats.evictions += 1
+                self._remove_disk_file(evicted_key)
+
+    def get_stats(self) -> ImagePayloadCacheStats:
+        with self._lock:
+            return self._stats.model_copy(update={
+                'memory_items': len(self._memory),
+                'memory_bytes': self._memory_bytes,
+                'disk_items': len(self._disk),
+                'disk_bytes': self._disk_bytes,
+            })
+
+    def clear(self) -> None:
+        with self._lock:
+            self._disk.clear()
+            self._disk_bytes = 0
+            if self._process_dir:
+                shutil.rmtree(self._process_dir, ignore_errors=True)
+                self._process_dir = None
+            self._memory.clear()
+            self._memory_bytes = 0
+            self._stats = ImagePayloadCacheStats()
+            self._lookups = 0
+
+    def _log_stats(self) -> None:
+        with self._lock:
+            self._lookups += 1
+            if self._lookups % STATS_LOG_INTERVAL:
+                return
+
+        stats = self.get_stats()
+        logger.info(f'Image payload cache: hit rate {stats.hit_rate:.2%}, '
+                    f'{stats.memory_hits} memory hits, {stats.disk_hits} disk hits, {stats.misses} misses, '
+                    f'{stats.evictions} evictions, {stats.memory_items} items ({stats.memory_bytes} bytes) in memory, '
+                    f'{stats.disk_items} items ({stats.disk_bytes} bytes) on disk')
+
+    def _ensure_process_dir(self) -> None:
+        if self._process_dir and os.path.isdir(self._process_dir):
+            return
+
+        # payloads contain tenant image content, keep them readable by the current user only
+        os.makedirs(self.cache_dir, mode=0o700, exist_ok=True)
+        self._process_dir = tempfile.mkdtemp(prefix=f'{self.pid}-', dir=self.cache_dir)
+
+    def _remove_stale_process_dirs(self) -> None:
+        try:
+            entries = os.listdir(self.cache_dir)
+        except OSError:
+            return
+
+        for entry in entries:
+            pid = entry.split('-', 1)[0]
+            if not pid.isdigit() or int(pid) == self.pid or _is_process_alive(int(pid)):
+                continue
+            shutil.rmtree(os.path.join(self.cache_dir, entry), ignore_errors=True)
+
+    def _put_memory(self, key: str, payload: str) -> None:
+        if len(payload) > self.memory_limit:
+            return
+
+        if key in self._memory:
+            self._memory_bytes -= len(self._memory.pop(key))
+
+        self._memory[key] = payload
+        self._memory_bytes += len(payload)
+        while self._memory_bytes > self.memory_limit:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+            self._stats.evictions += 1
+
+    def _drop_disk_entry(self, key: str) -> None:
+        size = self._disk.pop(key, None)
+        if size is not None:
+            self._disk_bytes -= size
+            self._remove_disk_file(key)
+
+    def _remove_disk_file(self, key: str) -> None:
+        try:
+            os.remove(self._disk_path(key))
+        except OSError:
+            pass
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self._process_dir or self.cache_dir, hashlib.sha256(key.encode()).hexdigest())
+
+
+def _is_process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # the process exists but belongs to another user
+        return True
+    return True
+
+
+def encode_image_payload(data: bytes, mime_type: str, max_resolution: Optional[int] = None) -> str:
+    """
+    Encode image to a base64 `data:` URL, downscaling it so that its longest side fits max_resolution.
+
+    :param data: image content
+    :param mime_type: image mime type
+    :param max_resolution: max width or height in pixels, None or 0 to keep the original size
+    :return: data URL
+    """
+    if max_resolution and mime_type not in NON_RESIZABLE_MIME_TYPES:
+        data = _downscale_image(data, max_resolution)
+
+    encoded_string = base64.b64encode(data).decode('utf-8')
+    return f'data:{mime_type};base64,{encoded_string}'
+
+
+def _downscale_image(data: bytes, max_resolution: int) -> bytes:
+    try:
+        from PIL import Image
+    except ImportError:
+        return data
+
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            if max(image.size) <= max_resolution:
+                return data
+
+            image_format = image.format
+            image.thumbnail((max_resolution, max_resolution))
+            output = io.BytesIO()
+            if image_format == 'JPEG':
+                image.save(output, format=image_format, quality=85, optimize=True)
+            else:
+                image.save(output, format=image_format)
+    except Exception:
+        logger.warning('Failed to downscale image, sending the original one', exc_info=True)
+        return data
+
+    resized = output.getvalue()
+    return resized if len(resized) < len(data) else data
+
+
+_image_payload_cache: Optional[ImagePayloadCache] = None
+_image_payload_cache_lock = threading.Lock()
+
+
+def get_image_payload_cache() -> Optional[ImagePayloadCache]:
+    """
+    Get the process-wide image payload cache, None when it is disabled.
+    """
+    global _image_payload_cache
+    config = current_app.config
+    if not config.get('MULTIMODAL_IMAGE_CACHE_ENABLED'):
+        return None
+
+    # a cache inherited from the parent process shares its disk tier, create a new one
+    if _image_payload_cache is None or _image_payload_cache.pid != os.getpid():
+        with _image_payload_cache_lock:
+            if _image_payload_cache is None or _image_payload_cache.pid != os.getpid():
+                _image_payload_cache = ImagePayloadCache(
+                    memory_limit=config.get('MULTIMODAL_IMAGE_CACHE_MEMORY_SIZE') * 1024 * 1024,
+                    disk_limit=config.get('MULTIMODAL_IMAGE_CACHE_DISK_SIZE') * 1024 * 1024,
+                    cache_dir=config.get('MULTIMODAL_IMAGE_CACHE_DIR'),
+                )
+
+    return _image_payload_cache
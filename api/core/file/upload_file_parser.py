@@ -8,6 +8,7 @@ from typing import Optional
 
 from flask import current_app
 
+from core.file.image_payload_cache import encode_image_payload, get_image_payload_cache
 from extensions.ext_storage import storage
 
 IMAGE_EXTENSIONS = ['jpg', 'jpeg', 'png', 'webp', 'gif', 'svg']
@@ -16,7 +17,16 @@ IMAGE_EXTENSIONS.extend([ext.upper() for ext in IMAGE_EXTENSIONS])
 
 class UploadFileParser:
     @classmethod
-    def get_image_data(cls, upload_file, force_url: bool = False) -> Optional[str]:
+    def get_image_data(cls, upload_file, force_url: bool = False,
+                       max_resolution: Optional[int] = None) -> Optional[str]:
+        """
+        Get image data, signed url or base64 data url depending on config MULTIMODAL_SEND_IMAGE_FORMAT
+
+        :param upload_file: UploadFile object
+        :param force_url: return signed url regardless of the config
+        :param max_resolution: downscale base64 data so that its longest side fits, None to use the config
+        :return:
+        """
         if not upload_file:
             return None
 
@@ -26,6 +36,18 @@ class UploadFileParser:
         if current_app.config['MULTIMODAL_SEND_IMAGE_FORMAT'] == 'url' or force_url:
             return cls.get_signed_temp_image_url(upload_file.id)
         else:
+            if max_resolution is None:
+                max_resolution = current_app.config.get('MULTIMODAL_IMAGE_MAX_RESOLUTION')
+
+            image_payload_cache = get_image_payload_cache()
+            cache_key = None
+            if image_payload_cache:
+                content_id = f'{upload_file.tenant_id}:{upload_file.hash}' if upload_file.hash else upload_file.id
+                cache_key = f'{content_id}:{upload_file.mime_type}:{max_resolution or 0}'
+                payload = image_payload_cache.get(cache_key)
+                if payload:
+                    return payload
+
             # get image file base64
             try:
                 data = storage.load(upload_file.key)
@@ -33,8 +55,11 @@ class UploadFileParser:
                 logging.error(f'File not found: {upload_file.key}')
                 return None
 
-            encoded_string = base64.b64encode(data).decode('utf-8')
-            return f'data:{upload_file.mime_type};base64,{encoded_string}'
+            payload = encode_image_payload(data, upload_file.mime_type, max_resolution)
+            if image_payload_cache:
+                image_payload_cache.set(cache_key, payload)
+
+            return payload
 
     @classmethod
     def get_signed_temp_image_url(cls, upload_file_id) -> str:
@@ -1,27 +1,242 @@
 """
 Proxy requests to avoid SSRF
 """
+import logging
 import os
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+from typing import Any, Optional
 
 import httpx
 
+logger = logging.getLogger(__name__)
+
 SSRF_PROXY_ALL_URL = os.getenv('SSRF_PROXY_ALL_URL', '')
 SSRF_PROXY_HTTP_URL = os.getenv('SSRF_PROXY_HTTP_URL', '')
 SSRF_PROXY_HTTPS_URL = os.getenv('SSRF_PROXY_HTTPS_URL', '')
 
+SSRF_DEFAULT_TIMEOUT = float(os.getenv('SSRF_DEFAULT_TIMEOUT', '5'))
+SSRF_MAX_CONNECTIONS = int(os.getenv('SSRF_MAX_CONNECTIONS', '100'))
+SSRF_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv('SSRF_MAX_KEEPALIVE_CONNECTIONS', '20'))
+SSRF_KEEPALIVE_EXPIRY = float(os.getenv('SSRF_KEEPALIVE_EXPIRY', '5'))
+SSRF_MAX_CONNECTIONS_PER_HOST = int(os.getenv('SSRF_MAX_CONNECTIONS_PER_HOST', '20'))
+SSRF_MAX_RETRIES = int(os.getenv('SSRF_MAX_RETRIES', '1'))
+SSRF_HTTP2_ENABLED = os.getenv('SSRF_HTTP2_ENABLED', 'false').lower() == 'true'
+
 proxies = {
     'http://': SSRF_PROXY_HTTP_URL,
     'https://': SSRF_PROXY_HTTPS_URL
 } if SSRF_PROXY_HTTP_URL and SSRF_PROXY_HTTPS_URL else None
 
+# metrics are logged every this many requests
+METRICS_LOG_INTERVAL = 1000
 
-def make_request(method, url, **kwargs):
+
+class ResponseTooLargeError(ValueError):
+    """
+    Raised when the body of a response exceeds the size it is read with.
+    """
+    def __init__(self, max_size: int, size: Optional[int] = None):
+        self.max_size = max_size
+        self.size = size
+        super().__init__(f'Response body is larger than {max_size} bytes')
+
+
+class _Metrics:
+    """
+    Connection reuse of the shared client, new connections are counted from the httpcore trace events.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.connections = 0
+        self.tls_handshakes = 0
+        self._lock = threading.Lock()
+
+    def trace(self, event_name: str, info: dict) -> None:
+        if event_name == 'connection.connect_tcp.complete':
+            with self._lock:
+                self.connections += 1
+        elif event_name == 'connection.start_tls.complete':
+            with self._lock:
+                self.tls_handshakes += 1
+
+    def count_request(self) -> None:
+        with self._lock:
+            self.requests += 1
+            requests = self.requests
+        if requests % METRICS_LOG_INTERVAL == 0:
+            logger.info(f'SSRF proxy client metrics: {get_metrics()}')
+
+    def to_dict(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'connections': self.connections,
+                'reused_connections': max(self.requests - self.connections, 0),
+                'tls_handshakes': self.tls_handshakes,
+                'reuse_rate': (self.requests - self.connections) / self.requests if self.requests else 0.0,
+            }
+
+
+class _RejectCookiePolicy(DefaultCookiePolicy):
+    """
+    The client is shared by all the requests of the process, the cookies set by a response
+    must not be sent with the requests of other tools, nodes or tenants.
+    """
+    def set_ok(self, cookie, request) -> bool:
+        return False
+
+
+_client: Optional[httpx.Client] = None
+_client_pid: Optional[int] = None
+_client_lock = threading.Lock()
+_host_slots: dict[str, threading.BoundedSemaphore] = {}
+_host_slots_pid: Optional[int] = None
+_host_slots_lock = threading.Lock()
+_metrics = _Metrics()
+
+
+def _http2_enabled() -> bool:
+    if not SSRF_HTTP2_ENABLED:
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        logger.warning('SSRF_HTTP2_ENABLED is set but the h2 package is not installed, using HTTP/1.1')
+        return False
+    return True
+
+
+def _create_client() -> httpx.Client:
+    http2 = _http2_enabled()
+    limits = httpx.Limits(
+        max_connections=SSRF_MAX_CONNECTIONS,
+        max_keepalive_connections=SSRF_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=SSRF_KEEPALIVE_EXPIRY,
+    )
+
+    def transport(proxy: Optional[str] = None) -> httpx.HTTPTransport:
+        # only failed connections are retried, a request is never sent twice
+        return httpx.HTTPTransport(proxy=proxy, limits=limits, retries=SSRF_MAX_RETRIES, http2=http2)
+
+    mounts = None
     if SSRF_PROXY_ALL_URL:
-        return httpx.request(method=method, url=url, proxy=SSRF_PROXY_ALL_URL, **kwargs)
+        default_transport = transport(SSRF_PROXY_ALL_URL)
     elif proxies:
-        return httpx.request(method=method, url=url, proxies=proxies, **kwargs)
+        default_transport = transport()
+        mounts = {pattern: transport(proxy) for pattern, proxy in proxies.items()}
     else:
-        return httpx.request(method=method, url=url, **kwargs)
+        default_transport = transport()
+
+    return httpx.Client(
+        transport=default_transport,
+        mounts=mounts,
+        timeout=SSRF_DEFAULT_TIMEOUT,
+        cookies=CookieJar(policy=_RejectCookiePolicy()),
+    )
+
+
+def get_client() -> httpx.Client:
+    """
+    Get the pooled client of the process, the connections of a parent process are not reused after a fork.
+    """
+    global _client, _client_pid
+    if _client is None or _client_pid != os.getpid():
+        with _client_lock:
+            if _client is None or _client_pid != os.getpid():
+                _client = _create_client()
+                _client_pid = os.getpid()
+    return _client
+
+
+def get_metrics() -> dict[str, Any]:
+    """
+    Get the connection reuse metrics of the pooled client of the process.
+    """
+    return _metrics.to_dict()
+
+
+@contextmanager
+def _host_slot(url: Any, timeout: Any) -> Iterator[None]:
+    """
+    Hold one of the SSRF_MAX_CONNECTIONS_PER_HOST slots of the host of the url,
+    so that a slow host can not take all the connections of the pool.
+    """
+    global _host_slots_pid
+    origin = httpx.URL(url)
+    host = f'{origin.scheme}://{origin.host}:{origin.port or ""}'
+    with _host_slots_lock:
+        # slots held by the threads of a parent process are never released in a forked one
+        if _host_slots_pid != os.getpid():
+            _host_slots.clear()
+            _host_slots_pid = os.getpid()
+        slot = _host_slots.get(host)
+        if slot is None:
+            slot = _host_slots[host] = threading.BoundedSemaphore(SSRF_MAX_CONNECTIONS_PER_HOST)
+
+    wait_timeout = _connect_timeout(timeout)
+    if not slot.acquire(timeout=wait_timeout):
+        raise httpx.PoolTimeout(f'No connection to {origin.host} available in {wait_timeout} seconds')
+    try:
+        yield
+    finally:
+        slot.release()
+
+
+def _connect_timeout(timeout: Any) -> Optional[float]:
+    if isinstance(timeout, httpx.Timeout):
+        return timeout.connect
+    if isinstance(timeout, tuple):
+        return timeout[0]
+    return timeout
+
+
+def _with_trace(kwargs: dict) -> dict:
+    extensions = dict(kwargs.pop('extensions', None) or {})
+    extensions.setdefault('trace', _metrics.trace)
+    kwargs['extensions'] = extensions
+    return kwargs
+
+
+def make_request(method, url, **kwargs):
+    _metrics.count_request()
+    with _host_slot(url, kwargs.get('timeout', SSRF_DEFAULT_TIMEOUT)):
+        return get_client().request(method=method, url=url, **_with_trace(kwargs))
+
+
+@contextmanager
+def stream(method, url, **kwargs) -> Iterator[httpx.Response]:
+    """
+    Send a request without reading the body of the response, the body can be read
+    in chunks with `iter_bytes` or with `read_limited`.
+    """
+    _metrics.count_request()
+    with _host_slot(url, kwargs.get('timeout', SSRF_DEFAULT_TIMEOUT)):
+        with get_client().stream(method=method, url=url, **_with_trace(kwargs)) as response:
+            yield response
+
+
+def read_limited(response: httpx.Response, max_size: int) -> bytes:
+    """
+    Read the body of a streamed response, stop as soon as it exceeds max_size bytes.
+
+    :raises ResponseTooLargeError: the body is larger than max_size
+    """
+    content_length = response.headers.get('content-length')
+    if content_length and content_length.isdigit() and int(content_length) > max_size:
+        raise ResponseTooLargeError(max_size, int(content_length))
+
+    chunks = []
+    size = 0
+    for chunk in response.iter_bytes():
+        size += len(chunk)
+        if size > max_size:
+            raise ResponseTooLargeError(max_size)
+        chunks.append(chunk)
+    return b''.join(chunks)
 
 
 def get(url, **kwargs):
@@ -0,0 +1,168 @@
+import base64
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from flask import current_app
+
+from core.tools.entities.tool_entities import ToolInvokeMessage
+from core.tools.tool.tool import Tool
+from extensions.ext_redis import redis_client
+
+logger = logging.getLogger(__name__)
+
+
+class _MemoryTier:
+    """
+    Process-wide LRU of serialized tool results with their expiry time.
+    """
+
+    def __init__(self):
+        self._items: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            expire_at, payload = item
+            if expire_at < time.monotonic():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return payload
+
+    def set(self, key: str, payload: str, ttl: int, capacity: int) -> None:
+        with self._lock:
+            self._items[key] = (time.monotonic() + ttl, payload)
+            self._items.move_to_end(key)
+            while len(self._items) > capacity:
+                self._items.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+
+_memory_tier = _MemoryTier()
+
+
+class ToolResultCache:
+    """
+    Cache of the results of idempotent tool invocations, in memory and in redis.
+
+    Results are keyed by the tool, its parameters and the credentials it is invoked with,
+    only the tools declaring a cache ttl are cached.
+    """
+
+    def __init__(self, tool: Tool, tool_parameters: dict, ttl: int):
+        self.ttl = ttl
+        runtime = tool.runtime
+        # parameters set by the runtime override the ones of the call, see Tool.invoke
+        parameters = {**tool_parameters, **(runtime.runtime_parameters or {})}
+        credentials = runtime.credentials or {}
+        key = json.dumps({
+            'provider_type': tool.tool_provider_type().value,
+            'provider': tool.identity.provider,
+            'tool': tool.identity.name,
+            'parameters': parameters,
+            'tenant_id': runtime.tenant_id,
+            'credentials': hashlib.sha256(
+                json.dumps(credentials, sort_keys=True, default=str).encode('utf-8')
+            ).hexdigest(),
+        }, sort_keys=True, ensure_ascii=False, default=str)
+        self.cache_key = f'tool_result:{hashlib.sha256(key.encode("utf-8")).hexdigest()}'
+
+    @classmethod
+    def for_tool(cls, tool: Tool, tool_parameters: dict) -> Optional['ToolResultCache']:
+        """
+        Get the cache of the results of the tool, None if they can not be cached.
+        """
+        if not current_app.config.get('TOOL_RESULT_CACHE_ENABLED'):
+            return None
+
+        ttl = tool.get_cache_ttl()
+        if not ttl or not tool.runtime:
+            return None
+
+        return cls(tool, tool_parameters, ttl)
+
+    def get(self) -> Optional[list[ToolInvokeMessage]]:
+        """
+        Get the cached result of the invocation.
+
+        :return: the tool invoke messages, None if they are not cached
+        """
+        payload = _memory_tier.get(self.cache_key)
+        if payload is None:
+            try:
+                cached = redis_client.get(self.cache_key)
+            except Exception:
+                logger.warning('Failed to get tool result from cache', exc_info=True)
+                return None
+            if not cached:
+                return None
+
+            payload = cached.decode('utf-8')
+            self._set_memory(payload)
+
+        try:
+            return self._loads(payload)
+        except (ValueError, KeyError):
+            return None
+
+    def set(self, messages: list[ToolInvokeMessage]) -> None:
+        """
+        Cache the result of the invocation, results with binaries larger than
+        TOOL_RESULT_CACHE_MAX_BINARY_SIZE are not cached.
+        """
+        binary_size = sum(len(message.message) for message in messages if isinstance(message.message, bytes))
+        if binary_size > current_app.config.get('TOOL_RESULT_CACHE_MAX_BINARY_SIZE'):
+            return
+
+        try:
+            payload = self._dumps(messages)
+        except (TypeError, ValueError):
+            # meta data which can not be serialized
+            return
+
+        self._set_memory(payload)
+        try:
+            redis_client.setex(self.cache_key, self.ttl, payload)
+        except Exception:
+            logger.warning('Failed to set tool result to cache', exc_info=True)
+
+    def _set_memory(self, payload: str) -> None:
+        _memory_tier.set(self.cache_key, payload, self.ttl, current_app.config.get('TOOL_RESULT_CACHE_MEMORY_SIZE'))
+
+    @staticmethod
+    def _dumps(messages: list[ToolInvokeMessage]) -> str:
+        items = []
+        for message in messages:
+            is_binary = isinstance(message.message, bytes)
+            items.append({
+                'type': message.type.value,
+                'message': base64.b64encode(message.message).decode('ascii') if is_binary else message.message,
+                'binary': is_binary,
+                'meta': message.meta,
+                'save_as': message.save_as,
+            })
+        return json.dumps(items, ensure_ascii=False)
+
+    @staticmethod
+    def _loads(payload: str) -> list[ToolInvokeMessage]:
+        messages = []
+        for item in json.loads(payload):
+            message = ToolInvokeMessage(
+                type=ToolInvokeMessage.MessageType(item['type']),
+                message=base64.b64decode(item['message']) if item['binary'] else item['message'],
+                save_as=item['save_as'],
+            )
+            message.meta = item['meta']
+            messages.append(message)
+        return messages
@@ -74,6 +74,18 @@ class Moderation(Extensible, ABC):
         """
         raise NotImplementedError
 
+    def moderation_for_new_outputs(self, text: str, checked_length: int) -> ModerationOutputsResult:
+        """
+        Moderation for streamed outputs.
+        The first `checked_length` characters of the text have already passed the moderation,
+        moderations which can check the new text on its own override this method to skip them.
+
+        :param text: LLM output content so far
+        :param checked_length: length of the content which has already passed the moderation
+        :return:
+        """
+        return self.moderation_for_outputs(text)
+
     @classmethod
     def _validate_inputs_and_outputs_config(self, config: dict, is_preset_response_required: bool) -> None:
         # inputs_config
@@ -46,3 +46,14 @@ class ModerationFactory:
         :return:
         """
         return self.__extension_instance.moderation_for_outputs(text)
+
+    def moderation_for_new_outputs(self, text: str, checked_length: int) -> ModerationOutputsResult:
+        """
+        Moderation for streamed outputs, of which the first `checked_length` characters
+        have already passed the moderation.
+
+        :param text: LLM output content so far
+        :param checked_length: length of the content which has already passed the moderation
+        :return:
+        """
+        return self.__extension_instance.moderation_for_new_outputs(text, checked_length)
@@ -0,0 +1,85 @@
+from collections import deque
+from functools import lru_cache
+
+
+class KeywordMatcher:
+    """
+    Case-insensitive Aho–Corasick automaton of a list of keywords.
+
+    The text is scanned once whatever the number of keywords, instead of once per keyword.
+    """
+
+    def __init__(self, keywords: list[str]):
+        # transitions, failure link and whether a keyword ends there, for every state
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._output: list[bool] = [False]
+        self.max_keyword_length = 0
+
+        for keyword in keywords:
+            keyword = keyword.lower()
+            if not keyword:
+                continue
+            self.max_keyword_length = max(self.max_keyword_length, len(keyword))
+            state = 0
+            for char in keyword:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(False)
+                    self._goto[state][char] = next_state
+                state = next_state
+            self._output[state] = True
+
+        self._build_failure_links()
+
+    def _build_failure_links(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                # a keyword ending at the failure state also ends here
+                self._output[next_state] = self._output[next_state] or self._output[self._fail[next_state]]
+
+    def search(self, text: str) -> bool:
+        """
+        Check whether any of the keywords appears in the text.
+        """
+        if not self.max_keyword_length:
+            return False
+
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for char in text.lower():
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                return True
+        return False
+
+    def search_new_text(self, text: str, checked_length: int) -> bool:
+        """
+        Check whether any of the keywords appears in the text, of which the first checked_length
+        characters are known not to contain any of them.
+
+        Only the new text and the overlap a keyword can span with the checked text are scanned.
+        """
+        start = max(checked_length - self.max_keyword_length + 1, 0)
+        return self.search(text[start:])
+
+
+@lru_cache(maxsize=128)
+def get_keyword_matcher(keywords: str) -> KeywordMatcher:
+    """
+    Get the matcher of the newline separated keywords of a moderation config,
+    matchers are built once per process for every config.
+    """
+    return KeywordMatcher(keywords.split('\n'))
@@ -1,4 +1,5 @@
 from core.moderation.base import Moderation, ModerationAction, ModerationInputsResult, ModerationOutputsResult
+from core.moderation.keywords.keyword_matcher import KeywordMatcher, get_keyword_matcher
 
 
 class KeywordsModeration(Moderation):
@@ -31,35 +32,26 @@ class KeywordsModeration(Moderation):
             if query:
                 inputs['query__'] = query
 
-            # Filter out empty values
-            keywords_list = [keyword for keyword in self.config['keywords'].split('\n') if keyword]
-
-            flagged = self._is_violated(inputs, keywords_list)
+            flagged = self._is_violated(inputs, get_keyword_matcher(self.config['keywords']))
 
         return ModerationInputsResult(flagged=flagged, action=ModerationAction.DIRECT_OUTPUT, preset_response=preset_response)
 
     def moderation_for_outputs(self, text: str) -> ModerationOutputsResult:
+        return self.moderation_for_new_outputs(text, 0)
+
+    def moderation_for_new_outputs(self, text: str, checked_length: int) -> ModerationOutputsResult:
         flagged = False
         preset_response = ""
 
         if self.config['outputs_config']['enabled']:
-            # Filter out empty values
-            keywords_list = [keyword for keyword in self.config['keywords'].split('\n') if keyword]
-
-            flagged = self._is_violated({'text': text}, keywords_list)
+            flagged = get_keyword_matcher(self.config['keywords']).search_new_text(text, checked_length)
             preset_response = self.config['outputs_config']['preset_response']
 
         return ModerationOutputsResult(flagged=flagged, action=ModerationAction.DIRECT_OUTPUT, preset_response=preset_response)
 
-    def _is_violated(self, inputs: dict, keywords_list: list) -> bool:
+    def _is_violated(self, inputs: dict, keyword_matcher: KeywordMatcher) -> bool:
         for value in inputs.values():
-            if self._check_keywords_in_value(keywords_list, value):
+            if keyword_matcher.search(value):
                 return True
 
         return False
-
-    def _check_keywords_in_value(self, keywords_list, value):
-        for keyword in keywords_list:
-            if keyword.lower() in value.lower():
-                return True
-        return False
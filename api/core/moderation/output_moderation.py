@@ -1,10 +1,10 @@
 import logging
 import threading
-import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from typing import Any, Optional
 
 from flask import Flask, current_app
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, PrivateAttr
 
 from core.app.apps.base_app_queue_manager import AppQueueManager, PublishFrom
 from core.app.entities.queue_entities import QueueMessageReplaceEvent
@@ -13,6 +13,24 @@ from core.moderation.factory import ModerationFactory
 
 logger = logging.getLogger(__name__)
 
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor(flask_app: Flask) -> ThreadPoolExecutor:
+    """
+    Get the executor shared by the output moderations of all the streams of the process.
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=flask_app.config.get('OUTPUT_MODERATION_MAX_WORKERS'),
+                    thread_name_prefix='output_moderation'
+                )
+    return _executor
+
 
 class ModerationRule(BaseModel):
     type: str
@@ -20,6 +38,12 @@ class ModerationRule(BaseModel):
 
 
 class OutputModeration(BaseModel):
+    """
+    Moderation of a streamed answer.
+
+    A check of the buffer is submitted to a process-wide bounded executor each time the buffer grows
+    by the buffer size, one check at a time per stream. The whole completion is checked when the stream ends.
+    """
     DEFAULT_BUFFER_SIZE: int = 300
 
     tenant_id: str
@@ -28,13 +52,21 @@ class OutputModeration(BaseModel):
     rule: ModerationRule
     queue_manager: AppQueueManager
 
-    thread: Optional[threading.Thread] = None
-    thread_running: bool = True
     buffer: str = ''
     is_final_chunk: bool = False
     final_output: Optional[str] = None
     model_config = ConfigDict(arbitrary_types_allowed=True)
 
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _flask_app: Optional[Flask] = PrivateAttr(default=None)
+    _buffer_size: int = PrivateAttr(default=0)
+    # length of the buffer which passed the moderation
+    _checked_length: int = PrivateAttr(default=0)
+    # length of the buffer of the last submitted check
+    _submitted_length: int = PrivateAttr(default=0)
+    _future: Optional[Future] = PrivateAttr(default=None)
+    _stopped: bool = PrivateAttr(default=False)
+
     def should_direct_output(self):
         return self.final_output is not None
 
@@ -42,10 +74,15 @@ class OutputModeration(BaseModel):
         return self.final_output
 
     def append_new_token(self, token: str):
-        self.buffer += token
+        with self._lock:
+            self.buffer += token
 
-        if not self.thread:
-            self.thread = self.start_thread()
+            if not self._flask_app:
+                self._flask_app = current_app._get_current_object()
+                buffer_size = int(current_app.config.get('OUTPUT_MODERATION_BUFFER_SIZE', self.DEFAULT_BUFFER_SIZE))
+                self._buffer_size = buffer_size if buffer_size > 0 else self.DEFAULT_BUFFER_SIZE
+
+            self._submit_check()
 
     def moderation_completion(self, completion: str, public_event: bool = False) -> str:
         self.buffer = completion
@@ -75,63 +112,69 @@ class OutputModeration(BaseModel):
 
         return final_output
 
-    def start_thread(self) -> threading.Thread:
-        buffer_size = int(current_app.config.get('MODERATION_BUFFER_SIZE', self.DEFAULT_BUFFER_SIZE))
-        thread = threading.Thread(target=self.worker, kwargs={
-            'flask_app': current_app._get_current_object(),
-            'buffer_size': buffer_size if buffer_size > 0 else self.DEFAULT_BUFFER_SIZE
-        })
-
-        thread.start()
-
-        return thread
-
-    def stop_thread(self):
-        if self.thread and self.thread.is_alive():
-            self.thread_running = False
-
-    def worker(self, flask_app: Flask, buffer_size: int):
-        with flask_app.app_context():
-            current_length = 0
-            while self.thread_running:
-                moderation_buffer = self.buffer
-                buffer_length = len(moderation_buffer)
-                if not self.is_final_chunk:
-                    chunk_length = buffer_length - current_length
-                    if 0 <= chunk_length < buffer_size:
-                        time.sleep(1)
-                        continue
-
-                current_length = buffer_length
-
-                result = self.moderation(
-                    tenant_id=self.tenant_id,
-                    app_id=self.app_id,
-                    moderation_buffer=moderation_buffer
-                )
-
-                if not result or not result.flagged:
-                    continue
-
-                if result.action == ModerationAction.DIRECT_OUTPUT:
-                    final_output = result.preset_response
-                    self.final_output = final_output
-                else:
-                    final_output = result.text + self.buffer[len(moderation_buffer):]
-
-                # trigger replace event
-                if self.thread_running:
-                    self.queue_manager.publish(
-                        QueueMessageReplaceEvent(
-                            text=final_output
-                        ),
-                        PublishFrom.TASK_PIPELINE
-                    )
+    def stop(self):
+        """
+        Stop moderating the stream, the check waiting for a worker is cancelled
+        and the result of the running one is discarded.
+        """
+        with self._lock:
+            self._stopped = True
+            if self._future:
+                self._future.cancel()
+                self._future = None
+
+    def _submit_check(self):
+        """
+        Submit a check of the buffer if it has grown by the buffer size since the last one,
+        must be called with the lock held.
+        """
+        if self._stopped or self._future or self.final_output is not None:
+            return
+
+        if len(self.buffer) - self._submitted_length < self._buffer_size:
+            return
+
+        self._submitted_length = len(self.buffer)
+        self._future = _get_executor(self._flask_app).submit(self._check, self.buffer, self._checked_length)
+
+    def _check(self, moderation_buffer: str, checked_length: int):
+        with self._flask_app.app_context():
+            result = self.moderation(
+                tenant_id=self.tenant_id,
+                app_id=self.app_id,
+                moderation_buffer=moderation_buffer,
+                checked_length=checked_length
+            )
 
-                if result.action == ModerationAction.DIRECT_OUTPUT:
-                    break
+        with self._lock:
+            if self._stopped:
+                # the completion is moderated on its own when the stream ends
+                return
+
+            self._future = None
+            if not result or not result.flagged:
+                if result:
+                    self._checked_length = len(moderation_buffer)
+                # the buffer may have grown by the buffer size during the check
+                self._submit_check()
+                return
+
+            if result.action == ModerationAction.DIRECT_OUTPUT:
+                final_output = result.preset_response
+                self.final_output = final_output
+            else:
+                final_output = result.text + self.buffer[len(moderation_buffer):]
+
+            # trigger replace event
+            self.queue_manager.publish(
+                QueueMessageReplaceEvent(
+                    text=final_output
+                ),
+                PublishFrom.TASK_PIPELINE
+            )
 
-    def moderation(self, tenant_id: str, app_id: str, moderation_buffer: str) -> Optional[ModerationOutputsResult]:
+    def moderation(self, tenant_id: str, app_id: str, moderation_buffer: str,
+                   checked_length: int = 0) -> Optional[ModerationOutputsResult]:
         try:
             moderation_factory = ModerationFactory(
                 name=self.rule.type,
@@ -140,7 +183,8 @@ class OutputModeration(BaseModel):
                 config=self.rule.config
             )
 
-            result: ModerationOutputsResult = moderation_factory.moderation_for_outputs(moderation_buffer)
+            result: ModerationOutputsResult = moderation_factory.moderation_for_new_outputs(
+                moderation_buffer, checked_length)
             return result
         except Exception as e:
             logger.error("Moderation Output error: %s", e)
@@ -23,4 +23,12 @@ class BaseTraceInstance(ABC):
         Abstract method to trace activities.
         Subclasses must implement specific tracing logic for activities.
         """
-        ...
\ No newline at end of file
+        ...
+
+    def flush(self):  # noqa: B027
+        """
+        Send the traces buffered by the client of the trace instance.
+        Trace instances are cached per app, the clients sending traces in the background
+        are flushed after every batch of traces.
+        """
+        ...
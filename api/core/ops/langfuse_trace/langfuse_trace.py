@@ -414,6 +414,10 @@ class LangFuseDataTrace(BaseTraceInstance):
 
         generation.end(**format_generation_data)
 
+    def flush(self):
+        # the client queues the events and sends them in batched ingestion requests
+        self.langfuse_client.flush()
+
     def api_check(self):
         try:
             return self.langfuse_client.auth_check()
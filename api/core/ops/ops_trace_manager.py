@@ -4,6 +4,7 @@ import os
 import queue
 import threading
 import time
+import uuid
 from datetime import timedelta
 from enum import Enum
 from typing import Any, Optional, Union
@@ -12,6 +13,7 @@ from uuid import UUID
 from flask import current_app
 
 from core.helper.encrypter import decrypt_token, encrypt_token, obfuscated_token
+from core.ops.base_trace_instance import BaseTraceInstance
 from core.ops.entities.config_entity import (
     LangfuseConfig,
     LangSmithConfig,
@@ -30,6 +32,7 @@ from core.ops.langfuse_trace.langfuse_trace import LangFuseDataTrace
 from core.ops.langsmith_trace.langsmith_trace import LangSmithDataTrace
 from core.ops.utils import get_message_data
 from extensions.ext_database import db
+from extensions.ext_redis import redis_client
 from models.model import App, AppModelConfig, Conversation, Message, MessageAgentThought, MessageFile, TraceAppConfig
 from models.workflow import WorkflowAppLog, WorkflowRun
 from tasks.ops_trace_task import process_trace_tasks
@@ -49,6 +52,10 @@ provider_config_map = {
     }
 }
 
+# trace instances of the apps, with the version of the tracing config they are built from
+ops_trace_instances: dict[str, tuple[Optional[str], Optional[BaseTraceInstance]]] = {}
+ops_trace_instances_lock = threading.Lock()
+
 
 class OpsTraceManager:
     @classmethod
@@ -180,9 +187,36 @@ class OpsTraceManager:
         if app_id is None:
             return None
 
+        try:
+            version = redis_client.get(cls._tracing_config_version_key(app_id))
+        except Exception:
+            logging.warning("Failed to get tracing config version, trace instance is not cached", exc_info=True)
+            return cls._create_ops_trace_instance(app_id)
+
+        version = version.decode('utf-8') if version else None
+        cached = ops_trace_instances.get(app_id)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        tracing_instance = cls._create_ops_trace_instance(app_id)
+        with ops_trace_instances_lock:
+            ops_trace_instances[app_id] = (version, tracing_instance)
+
+        return tracing_instance
+
+    @classmethod
+    def _create_ops_trace_instance(cls, app_id: str) -> Optional[BaseTraceInstance]:
+        """
+        Create the trace instance of the app from its tracing config
+        :param app_id: app id
+        :return: the trace instance, None if tracing is not enabled
+        """
         app: App = db.session.query(App).filter(
             App.id == app_id
         ).first()
+        if not app:
+            return None
+
         app_ops_trace_config = json.loads(app.tracing) if app.tracing else None
 
         if app_ops_trace_config is not None:
@@ -190,15 +224,34 @@ class OpsTraceManager:
         else:
             return None
 
+        if not app_ops_trace_config.get('enabled'):
+            return None
+
         # decrypt_token
         decrypt_trace_config = cls.get_decrypted_tracing_config(app_id, tracing_provider)
-        if app_ops_trace_config.get('enabled'):
-            trace_instance, config_class = provider_config_map[tracing_provider]['trace_instance'], \
-                provider_config_map[tracing_provider]['config_class']
-            tracing_instance = trace_instance(config_class(**decrypt_trace_config))
-            return tracing_instance
+        if decrypt_trace_config is None:
+            return None
+
+        trace_instance, config_class = provider_config_map[tracing_provider]['trace_instance'], \
+            provider_config_map[tracing_provider]['config_class']
+        return trace_instance(config_class(**decrypt_trace_config))
+
+    @staticmethod
+    def _tracing_config_version_key(app_id: str) -> str:
+        return f'ops_trace_config_version:{app_id}'
 
-        return None
+    @classmethod
+    def invalidate_ops_trace_instance(cls, app_id: str):
+        """
+        Drop the cached trace instances of the app in every process, to be called
+        when its tracing config is changed
+        :param app_id: app id
+        :return:
+        """
+        with ops_trace_instances_lock:
+            ops_trace_instances.pop(str(app_id), None)
+        # a new random version never matches the one an instance was cached with
+        redis_client.set(cls._tracing_config_version_key(str(app_id)), uuid.uuid4().hex)
 
     @classmethod
     def get_app_config_through_message_id(cls, message_id: str):
@@ -237,6 +290,7 @@ class OpsTraceManager:
             }
         )
         db.session.commit()
+        cls.invalidate_ops_trace_instance(app_id)
 
     @classmethod
     def get_app_tracing_config(cls, app_id: str):
@@ -554,6 +608,9 @@ class TraceTask:
             "workflow_run_id": message_data.workflow_run_id,
             "from_source": message_data.from_source,
         }
+        # whether the documents were cached, the hit rate of the cache and the time saved
+        if kwargs.get("retrieval_cache"):
+            metadata["retrieval_cache"] = kwargs.get("retrieval_cache")
 
         dataset_retrieval_trace_info = DatasetRetrievalTraceInfo(
             message_id=message_id,
@@ -678,7 +735,9 @@ class TraceQueueManager:
         self.app_id = app_id
         self.conversation_id = conversation_id
         self.message_id = message_id
-        self.trace_instance = OpsTraceManager.get_ops_trace_instance(app_id, conversation_id, message_id)
+        self.trace_instance = OpsTraceManager.get_ops_trace_instance(
+            app_id=app_id, message_id=message_id, conversation_id=conversation_id
+        )
         self.flask_app = current_app._get_current_object()
         if trace_manager_timer is None:
             self.start_timer()
@@ -688,7 +747,8 @@ class TraceQueueManager:
         global trace_manager_queue
         try:
             if self.trace_instance:
-                trace_manager_queue.put(trace_task)
+                # the queue is shared by the managers of all the apps, tasks keep the source they are traced for
+                trace_manager_queue.put(((self.app_id, self.conversation_id, self.message_id), trace_task))
         except Exception as e:
             logging.debug(f"Error adding trace task: {e}")
         finally:
@@ -721,15 +781,29 @@ class TraceQueueManager:
             trace_manager_timer.daemon = False
             trace_manager_timer.start()
 
-    def send_to_celery(self, tasks: list[TraceTask]):
+    def send_to_celery(self, tasks: list[tuple[tuple, TraceTask]]):
+        """
+        Send the collected trace tasks to celery, one celery task for the traces of every source
+        """
+        traces_by_source: dict[tuple, list[dict]] = {}
         with self.flask_app.app_context():
-            for task in tasks:
-                trace_info = task.execute()
-                task_data = {
-                    "app_id": self.app_id,
-                    "conversation_id": self.conversation_id,
-                    "message_id": self.message_id,
+            for source, task in tasks:
+                try:
+                    trace_info = task.execute()
+                except Exception:
+                    logging.exception(f"Error executing trace task {task.trace_type}")
+                    continue
+
+                traces_by_source.setdefault(source, []).append({
                     "trace_info_type": type(trace_info).__name__,
                     "trace_info": trace_info.model_dump() if trace_info else {},
-                }
-                process_trace_tasks.delay(task_data)
+                })
+
+        for (app_id, conversation_id, message_id), traces in traces_by_source.items():
+            task_data = {
+                "app_id": app_id,
+                "conversation_id": conversation_id,
+                "message_id": message_id,
+                "traces": traces,
+            }
+            process_trace_tasks.delay(task_data)
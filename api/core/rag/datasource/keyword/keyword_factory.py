@@ -5,6 +5,7 @@ from flask import current_app
 from core.rag.datasource.keyword.jieba.jieba import Jieba
 from core.rag.datasource.keyword.keyword_base import BaseKeyword
 from core.rag.models.document import Document
+from core.rag.retrieval.retrieval_cache import RetrievalCache
 from models.dataset import Dataset
 
 
@@ -29,18 +30,22 @@ class Keyword:
 
     def create(self, texts: list[Document], **kwargs):
         self._keyword_processor.create(texts, **kwargs)
+        self._on_index_changed()
 
     def add_texts(self, texts: list[Document], **kwargs):
         self._keyword_processor.add_texts(texts, **kwargs)
+        self._on_index_changed()
 
     def text_exists(self, id: str) -> bool:
         return self._keyword_processor.text_exists(id)
 
     def delete_by_ids(self, ids: list[str]) -> None:
         self._keyword_processor.delete_by_ids(ids)
+        self._on_index_changed()
 
     def delete(self) -> None:
         self._keyword_processor.delete()
+        self._on_index_changed()
 
     def search(
             self, query: str,
@@ -48,6 +53,10 @@ class Keyword:
     ) -> list[Document]:
         return self._keyword_processor.search(query, **kwargs)
 
+    def _on_index_changed(self) -> None:
+        # the retrievals cached before the change are no longer used
+        RetrievalCache.bump_dataset_version(self._dataset.id)
+
     def __getattr__(self, name):
         if self._keyword_processor is not None:
             method = getattr(self._keyword_processor, name)
@@ -8,6 +8,7 @@ from pydantic import BaseModel
 
 from core.rag.datasource.entity.embedding import Embeddings
 from core.rag.datasource.vdb.vector_base import BaseVector
+from core.rag.datasource.vdb.vector_client_registry import vector_client_registry
 from core.rag.datasource.vdb.vector_factory import AbstractVectorFactory
 from core.rag.datasource.vdb.vector_type import VectorType
 from core.rag.models.document import Document
@@ -45,7 +46,11 @@ class ChromaVector(BaseVector):
     def __init__(self, collection_name: str, config: ChromaConfig):
         super().__init__(collection_name)
         self._client_config = config
-        self._client = chromadb.HttpClient(**self._client_config.to_chroma_params())
+        self._client = vector_client_registry.get_client(
+            VectorType.CHROMA, config,
+            create=lambda: chromadb.HttpClient(**config.to_chroma_params()),
+            check_health=lambda client: client.heartbeat(),
+        )
 
     def get_type(self) -> str:
         return VectorType.CHROMA
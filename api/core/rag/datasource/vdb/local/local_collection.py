@@ -0,0 +1,525 @@
+import fcntl
+import json
+import math
+import os
+import re
+import shutil
+import threading
+import uuid
+from collections import defaultdict
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import Any, Optional
+
+import numpy as np
+
+# the metadata fields whose rows are indexed, to filter searches by them
+FILTER_FIELDS = ('group_id', 'document_id')
+
+# words, and single han characters as chinese is not separated by spaces
+TOKEN_PATTERN = re.compile(r'[\u4e00-\u9fff]|[^\W_\u4e00-\u9fff]+')
+
+# rows of vectors scored at once, to bound the memory read from the vectors file
+SCORE_CHUNK_ROWS = 16384
+
+
+def tokenize(text: str) -> list[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    """
+    Okapi BM25 index of the texts of a collection, kept in memory beside its vectors.
+    """
+
+    K1 = 1.5
+    B = 0.75
+
+    def __init__(self):
+        # term -> row -> term frequency
+        self._postings: dict[str, dict[int, int]] = defaultdict(dict)
+        self._row_terms: dict[int, list[str]] = {}
+        self._lengths: dict[int, int] = {}
+        self._total_length = 0
+
+    def add(self, row: int, text: str) -> None:
+        tokens = tokenize(text)
+        frequencies: dict[str, int] = defaultdict(int)
+        for token in tokens:
+            frequencies[token] += 1
+        for term, frequency in frequencies.items():
+            self._postings[term][row] = frequency
+        self._row_terms[row] = list(frequencies)
+        self._lengths[row] = len(tokens)
+        self._total_length += len(tokens)
+
+    def remove(self, row: int) -> None:
+        for term in self._row_terms.pop(row, []):
+            postings = self._postings[term]
+            postings.pop(row, None)
+            if not postings:
+                del self._postings[term]
+        self._total_length -= self._lengths.pop(row, 0)
+
+    def search(self, query: str, top_k: int, allowed_rows: Optional[set[int]] = None) -> list[tuple[int, float]]:
+        if not self._lengths:
+            return []
+
+        row_count = len(self._lengths)
+        average_length = self._total_length / row_count or 1
+        scores: dict[int, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (row_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for row, frequency in postings.items():
+                if allowed_rows is not None and row not in allowed_rows:
+                    continue
+                length_norm = 1 - self.B + self.B * self._lengths[row] / average_length
+                scores[row] += idf * frequency * (self.K1 + 1) / (frequency + self.K1 * length_norm)
+
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+
+
+class IVFIndex:
+    """
+    Inverted file index of normalized vectors: the vectors are clustered with spherical k-means,
+    and a search only scores the vectors of the clusters closest to the query.
+
+    Rows appended after the index was built, from `indexed_rows` on, are not in any cluster
+    and are scored exhaustively until the index is rebuilt.
+    """
+
+    KMEANS_ITERATIONS = 10
+    KMEANS_MAX_SAMPLES = 32768
+
+    def __init__(self, centroids: np.ndarray, lists: list[np.ndarray], indexed_rows: int):
+        self.centroids = centroids
+        self.lists = lists
+        self.indexed_rows = indexed_rows
+        self.size = sum(len(rows) for rows in lists)
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, rows: np.ndarray, indexed_rows: int) -> 'IVFIndex':
+        """
+        :param vectors: the vectors of the collection
+        :param rows: the live rows to index
+        :param indexed_rows: the number of rows of the collection when the index is built
+        """
+        # deterministic, so that the same rows always give the same index
+        rng = np.random.default_rng(0)
+        list_count = max(1, int(math.sqrt(len(rows))))
+        samples = rows if len(rows) <= cls.KMEANS_MAX_SAMPLES \
+            else np.sort(rng.choice(rows, cls.KMEANS_MAX_SAMPLES, replace=False))
+        data = np.asarray(vectors[samples], dtype=np.float32)
+
+        centroids = data[rng.choice(len(data), list_count, replace=False)]
+        for _ in range(cls.KMEANS_ITERATIONS):
+            assignments = np.argmax(data @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, data)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            # the centroids of empty clusters are kept
+            centroids = np.where(norms > 0, sums / np.maximum(norms, 1e-12), centroids)
+
+        assignments = np.concatenate([
+            np.argmax(np.asarray(vectors[chunk], dtype=np.float32) @ centroids.T, axis=1)
+            for chunk in np.array_split(rows, max(1, math.ceil(len(rows) / SCORE_CHUNK_ROWS)))
+        ])
+        order = np.argsort(assignments, kind='stable')
+        boundaries = np.searchsorted(assignments[order], np.arange(list_count + 1))
+        lists = [rows[order[boundaries[i]:boundaries[i + 1]]] for i in range(list_count)]
+        return cls(centroids, lists, indexed_rows)
+
+    def candidates(self, query: np.ndarray, probe_count: int) -> np.ndarray:
+        closest = np.argsort(self.centroids @ query)[::-1][:probe_count]
+        return np.concatenate([self.lists[i] for i in closest])
+
+    def save(self, path: str) -> None:
+        lengths = np.array([len(rows) for rows in self.lists], dtype=np.int64)
+        rows = np.concatenate(self.lists) if self.lists else np.zeros(0, dtype=np.int64)
+        temp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+        with open(temp_path, 'wb') as f:
+            np.savez(f, centroids=self.centroids, lengths=lengths, rows=rows,
+                     indexed_rows=np.array(self.indexed_rows))
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'IVFIndex':
+        with np.load(path) as data:
+            boundaries = np.concatenate([[0], np.cumsum(data['lengths'])])
+            rows = data['rows']
+            lists = [rows[boundaries[i]:boundaries[i + 1]] for i in range(len(data['lengths']))]
+            return cls(data['centroids'], lists, int(data['indexed_rows']))
+
+
+class LocalCollection:
+    """
+    Collection of vectors stored in files, shared by the processes of a host.
+
+    A collection is a directory holding generations of files, and the name of its current generation:
+    - vectors.f32, the normalized float32 vectors, one row per record, memory-mapped to be searched
+    - records.jsonl, the id, text and metadata of each row
+    - tombstones.txt, the deleted rows
+    - ivf.npz, the IVF index of the vectors, once the collection has `ivf_min_rows` rows
+
+    Files are only appended to, under a file lock, and each process reads what the others appended.
+    When deleted rows make up `compaction_ratio` of a generation, the live rows are copied
+    to a new generation which replaces it.
+    """
+
+    def __init__(self, path: str, ivf_min_rows: int, ivf_probe_count: int, compaction_ratio: float):
+        self._path = path
+        self._ivf_min_rows = ivf_min_rows
+        self._ivf_probe_count = ivf_probe_count
+        self._compaction_ratio = compaction_ratio
+        self._lock = threading.RLock()
+        self._reset(None)
+
+    def add(self, ids: list[str], texts: list[str], metadatas: list[dict], embeddings: list[list[float]]) -> None:
+        """
+        Add records, replacing the records of the same ids.
+        """
+        if not ids:
+            return
+
+        # the last record of an id added twice is kept
+        last_indices = list({id: i for i, id in enumerate(ids)}.values())
+        vectors = np.asarray([embeddings[i] for i in last_indices], dtype=np.float32)
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+        with self._write_lock():
+            if self._generation is None:
+                self._switch_generation(self._create_generation(vectors.shape[1]))
+            elif vectors.shape[1] != self._dimension:
+                raise ValueError(f'Dimension {vectors.shape[1]} of the vectors does not match '
+                                 f'the dimension {self._dimension} of the collection.')
+
+            replaced_rows = [self._row_by_id[ids[i]] for i in last_indices if ids[i] in self._row_by_id]
+            self._append_tombstones(replaced_rows)
+            # the vectors are written before the records, a record is only read once its vector is written
+            with open(self._file('vectors.f32'), 'ab') as f:
+                f.write(vectors.tobytes())
+            with open(self._file('records.jsonl'), 'a', encoding='utf-8') as f:
+                f.write(''.join(
+                    json.dumps({'id': ids[i], 'text': texts[i], 'metadata': metadatas[i]}, ensure_ascii=False) + '\n'
+                    for i in last_indices
+                ))
+            self._refresh()
+            self._maybe_build_ivf()
+
+    def delete_ids(self, ids: list[str]) -> None:
+        with self._write_lock():
+            self._delete_rows([self._row_by_id[id] for id in ids if id in self._row_by_id])
+
+    def delete_where(self, key: str, value: Any) -> None:
+        with self._write_lock():
+            self._delete_rows(self._rows_where(key, value))
+
+    def get_ids_where(self, key: str, value: Any) -> list[str]:
+        with self._lock:
+            self._refresh()
+            return [self._ids[row] for row in self._rows_where(key, value)]
+
+    def contains(self, id: str) -> bool:
+        with self._lock:
+            self._refresh()
+            return id in self._row_by_id
+
+    def drop(self) -> None:
+        with self._write_lock():
+            self._drop_files()
+
+    def search_by_vector(self, query_vector: list[float], top_k: int, score_threshold: float = 0.0,
+                         filters: Optional[dict[str, list]] = None) -> list[tuple[str, str, dict, float]]:
+        """
+        Search the live rows closest to a vector by cosine similarity.
+
+        :param filters: metadata field -> values, rows match one of the values of each field
+        :return: the id, text, metadata and score of the rows, best first
+        """
+        query = np.asarray(query_vector, dtype=np.float32)
+        query /= max(float(np.linalg.norm(query)), 1e-12)
+
+        with self._lock:
+            self._refresh()
+            if self._vectors is None or top_k <= 0:
+                return []
+            if query.shape[0] != self._dimension:
+                raise ValueError(f'Dimension {query.shape[0]} of the query does not match '
+                                 f'the dimension {self._dimension} of the collection.')
+
+            allowed_rows = self._filtered_rows(filters)
+            if allowed_rows is not None:
+                allowed_rows = np.fromiter(sorted(allowed_rows), dtype=np.int64, count=len(allowed_rows))
+
+            if self._ivf is None or (allowed_rows is not None and len(allowed_rows) <= self._ivf_min_rows):
+                # exhaustive search
+                rows = allowed_rows if allowed_rows is not None else np.flatnonzero(self._live)
+            else:
+                rows = np.concatenate([
+                    self._ivf.candidates(query, self._ivf_probe_count),
+                    np.arange(self._ivf.indexed_rows, len(self._ids)),
+                ])
+                rows = rows[self._live[rows]]
+                if allowed_rows is not None:
+                    rows = rows[np.isin(rows, allowed_rows)]
+            if not len(rows):
+                return []
+
+            scores = np.concatenate([
+                np.asarray(self._vectors[chunk], dtype=np.float32) @ query
+                for chunk in np.array_split(rows, math.ceil(len(rows) / SCORE_CHUNK_ROWS))
+            ])
+            if top_k < len(rows):
+                best = np.argpartition(-scores, top_k)[:top_k]
+            else:
+                best = np.arange(len(rows))
+            best = best[np.argsort(-scores[best], kind='stable')]
+
+            return [
+                self._result(int(rows[i]), float(scores[i]))
+                for i in best if scores[i] >= score_threshold
+            ]
+
+    def search_by_full_text(self, query: str, top_k: int,
+                            filters: Optional[dict[str, list]] = None) -> list[tuple[str, str, dict, float]]:
+        with self._lock:
+            self._refresh()
+            return [
+                self._result(row, score)
+                for row, score in self._bm25.search(query, top_k, self._filtered_rows(filters))
+            ]
+
+    def compact(self) -> None:
+        """
+        Copy the live rows to a new generation replacing the current one, which drops the deleted rows.
+        """
+        with self._write_lock():
+            self._compact()
+
+    def _reset(self, generation: Optional[str]) -> None:
+        self._generation = generation
+        self._dimension = 0
+        self._ids: list[str] = []
+        self._texts: list[str] = []
+        self._metadatas: list[dict] = []
+        self._live = np.zeros(0, dtype=bool)
+        self._row_by_id: dict[str, int] = {}
+        self._rows_by_field: dict[str, dict[Any, set[int]]] = {field: defaultdict(set) for field in FILTER_FIELDS}
+        self._bm25 = BM25Index()
+        self._tombstone_count = 0
+        self._records_offset = 0
+        self._tombstones_offset = 0
+        self._vectors: Optional[np.ndarray] = None
+        self._ivf: Optional[IVFIndex] = None
+        self._ivf_mtime: Optional[int] = None
+
+    def _file(self, name: str, generation: Optional[str] = None) -> str:
+        return os.path.join(self._path, generation or self._generation, name)
+
+    @contextmanager
+    def _write_lock(self) -> Iterator[None]:
+        """
+        Lock the collection for the threads and processes writing it, and read what the others wrote.
+        """
+        with self._lock:
+            lock_path = f'{self._path}.lock'
+            os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+            with open(lock_path, 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    self._refresh()
+                    self._repair()
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _current_generation(self) -> Optional[str]:
+        try:
+            with open(os.path.join(self._path, 'CURRENT'), encoding='utf-8') as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def _create_generation(self, dimension: int) -> str:
+        generation = uuid.uuid4().hex
+        os.makedirs(os.path.join(self._path, generation))
+        with open(self._file('meta.json', generation), 'w', encoding='utf-8') as f:
+            json.dump({'dimension': dimension}, f)
+        for name in ('vectors.f32', 'records.jsonl', 'tombstones.txt'):
+            open(self._file(name, generation), 'wb').close()
+        return generation
+
+    def _switch_generation(self, generation: str) -> None:
+        temp_path = os.path.join(self._path, f'CURRENT.{generation}.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(generation)
+        os.replace(temp_path, os.path.join(self._path, 'CURRENT'))
+        self._refresh()
+
+    def _refresh(self) -> None:
+        """
+        Read the rows and tombstones appended since the last refresh, by this process or another one,
+        and reload everything when the generation was replaced.
+        """
+        try:
+            self._read_appended()
+        except FileNotFoundError:
+            # readers do not hold the file lock, the generation being read was replaced and deleted
+            # by another process in between, reload the generation which replaced it
+            self._reset(None)
+            self._read_appended()
+
+    def _read_appended(self) -> None:
+        generation = self._current_generation()
+        if generation != self._generation:
+            self._reset(generation)
+            if generation is None:
+                return
+            with open(self._file('meta.json'), encoding='utf-8') as f:
+                self._dimension = json.load(f)['dimension']
+        elif generation is None:
+            return
+
+        with open(self._file('records.jsonl'), 'rb') as f:
+            f.seek(self._records_offset)
+            data = f.read()
+        # a record being written by another process is read once its line is complete
+        data = data[:data.rfind(b'\n') + 1]
+        if data:
+            self._records_offset += len(data)
+            first_row = len(self._ids)
+            lines = data.splitlines()
+            self._live = np.concatenate([self._live, np.ones(len(lines), dtype=bool)])
+            for row, line in enumerate(lines, start=first_row):
+                record = json.loads(line)
+                self._ids.append(record['id'])
+                self._texts.append(record['text'])
+                self._metadatas.append(record['metadata'])
+                self._row_by_id[record['id']] = row
+                for field in FILTER_FIELDS:
+                    value = record['metadata'].get(field)
+                    if value is not None:
+                        self._rows_by_field[field][value].add(row)
+                self._bm25.add(row, record['text'])
+            self._vectors = np.memmap(self._file('vectors.f32'), dtype=np.float32, mode='r',
+                                      shape=(len(self._ids), self._dimension))
+
+        with open(self._file('tombstones.txt'), 'rb') as f:
+            f.seek(self._tombstones_offset)
+            data = f.read()
+        data = data[:data.rfind(b'\n') + 1]
+        if data:
+            self._tombstones_offset += len(data)
+            for row in map(int, data.split()):
+                self._mark_deleted(row)
+
+        try:
+            ivf_mtime = os.stat(self._file('ivf.npz')).st_mtime_ns
+        except FileNotFoundError:
+            ivf_mtime = None
+        if ivf_mtime != self._ivf_mtime:
+            self._ivf = IVFIndex.load(self._file('ivf.npz')) if ivf_mtime else None
+            self._ivf_mtime = ivf_mtime
+
+    def _repair(self) -> None:
+        """
+        Truncate what a writer which crashed appended partially, after the last complete row.
+        """
+        if self._generation is None:
+            return
+
+        vectors_size = len(self._ids) * self._dimension * 4
+        for name, size in (('vectors.f32', vectors_size), ('records.jsonl', self._records_offset),
+                           ('tombstones.txt', self._tombstones_offset)):
+            if os.path.getsize(self._file(name)) > size:
+                os.truncate(self._file(name), size)
+
+    def _mark_deleted(self, row: int) -> None:
+        if row >= len(self._ids) or not self._live[row]:
+            return
+
+        self._live[row] = False
+        self._tombstone_count += 1
+        id = self._ids[row]
+        if self._row_by_id.get(id) == row:
+            del self._row_by_id[id]
+        for field in FILTER_FIELDS:
+            value = self._metadatas[row].get(field)
+            if value is not None:
+                self._rows_by_field[field][value].discard(row)
+        self._bm25.remove(row)
+
+    def _append_tombstones(self, rows: list[int]) -> None:
+        if rows:
+            with open(self._file('tombstones.txt'), 'a', encoding='utf-8') as f:
+                f.write(''.join(f'{row}\n' for row in rows))
+
+    def _delete_rows(self, rows: list[int]) -> None:
+        if not rows:
+            return
+
+        self._append_tombstones(rows)
+        self._refresh()
+        if self._tombstone_count > self._compaction_ratio * len(self._ids):
+            self._compact()
+
+    def _rows_where(self, key: str, value: Any) -> list[int]:
+        if key in FILTER_FIELDS:
+            return sorted(self._rows_by_field[key].get(value, ()))
+        return [row for row in np.flatnonzero(self._live).tolist() if self._metadatas[row].get(key) == value]
+
+    def _filtered_rows(self, filters: Optional[dict[str, list]]) -> Optional[set[int]]:
+        allowed_rows = None
+        for key, values in (filters or {}).items():
+            rows = set()
+            for value in values:
+                rows.update(self._rows_where(key, value))
+            allowed_rows = rows if allowed_rows is None else allowed_rows & rows
+        return allowed_rows
+
+    def _result(self, row: int, score: float) -> tuple[str, str, dict, float]:
+        return self._ids[row], self._texts[row], dict(self._metadatas[row]), score
+
+    def _maybe_build_ivf(self) -> None:
+        live_rows = np.flatnonzero(self._live)
+        if len(live_rows) < self._ivf_min_rows:
+            return
+        # the index is rebuilt once the rows appended after it, which are searched exhaustively,
+        # are a quarter of its rows
+        if self._ivf is not None and len(self._ids) - self._ivf.indexed_rows <= self._ivf.size // 4:
+            return
+
+        IVFIndex.build(self._vectors, live_rows, len(self._ids)).save(self._file('ivf.npz'))
+        self._refresh()
+
+    def _compact(self) -> None:
+        old_generation = self._generation
+        live_rows = np.flatnonzero(self._live)
+        if not len(live_rows):
+            self._drop_files()
+            return
+
+        generation = self._create_generation(self._dimension)
+        with open(self._file('vectors.f32', generation), 'ab') as f:
+            for chunk in np.array_split(live_rows, math.ceil(len(live_rows) / SCORE_CHUNK_ROWS)):
+                f.write(np.asarray(self._vectors[chunk], dtype=np.float32).tobytes())
+        with open(self._file('records.jsonl', generation), 'a', encoding='utf-8') as f:
+            for row in live_rows.tolist():
+                f.write(json.dumps({'id': self._ids[row], 'text': self._texts[row], 'metadata': self._metadatas[row]},
+                                   ensure_ascii=False) + '\n')
+        if len(live_rows) >= self._ivf_min_rows:
+            vectors = np.memmap(self._file('vectors.f32', generation), dtype=np.float32, mode='r',
+                                shape=(len(live_rows), self._dimension))
+            IVFIndex.build(vectors, np.arange(len(live_rows)), len(live_rows)) \
+                .save(self._file('ivf.npz', generation))
+
+        self._switch_generation(generation)
+        # the processes still reading the old generation keep their open files
+        shutil.rmtree(os.path.join(self._path, old_generation), ignore_errors=True)
+
+    def _drop_files(self) -> None:
+        shutil.rmtree(self._path, ignore_errors=True)
+        self._reset(None)
@@ -0,0 +1,164 @@
+import json
+import os
+import threading
+from typing import Any, Optional
+
+from flask import current_app
+from pydantic import BaseModel
+
+from core.rag.datasource.entity.embedding import Embeddings
+from core.rag.datasource.vdb.local.local_collection import LocalCollection
+from core.rag.datasource.vdb.vector_base import BaseVector
+from core.rag.datasource.vdb.vector_client_registry import vector_client_registry
+from core.rag.datasource.vdb.vector_factory import AbstractVectorFactory
+from core.rag.datasource.vdb.vector_type import VectorType
+from core.rag.models.document import Document
+from extensions.ext_database import db
+from models.dataset import Dataset, DatasetCollectionBinding
+
+
+class LocalVectorConfig(BaseModel):
+    path: str
+    ivf_min_rows: int = 4096
+    ivf_probe_count: int = 16
+    compaction_ratio: float = 0.2
+
+
+class LocalVectorStore:
+    """
+    The collections of a directory opened by the process, which keep their rows in memory between requests.
+    """
+
+    def __init__(self, config: LocalVectorConfig):
+        self._config = config
+        self._collections: dict[str, LocalCollection] = {}
+        self._lock = threading.Lock()
+
+    def get_collection(self, collection_name: str) -> LocalCollection:
+        with self._lock:
+            collection = self._collections.get(collection_name)
+            if not collection:
+                collection = LocalCollection(
+                    path=os.path.join(self._config.path, collection_name),
+                    ivf_min_rows=self._config.ivf_min_rows,
+                    ivf_probe_count=self._config.ivf_probe_count,
+                    compaction_ratio=self._config.compaction_ratio,
+                )
+                self._collections[collection_name] = collection
+            return collection
+
+
+class LocalVector(BaseVector):
+    """
+    Vectors stored in local files by the API and worker processes, for deployments without a vector database.
+    The rows of all the datasets of a collection carry the dataset id as `group_id`, and searches only
+    return the rows of the dataset.
+    """
+
+    def __init__(self, collection_name: str, group_id: str, config: LocalVectorConfig):
+        super().__init__(collection_name)
+        self._group_id = group_id
+        store = vector_client_registry.get_client(VectorType.LOCAL, config, create=lambda: LocalVectorStore(config))
+        self._collection = store.get_collection(collection_name)
+
+    def get_type(self) -> str:
+        return VectorType.LOCAL
+
+    def create(self, texts: list[Document], embeddings: list[list[float]], **kwargs):
+        if texts:
+            self.add_texts(texts, embeddings, **kwargs)
+
+    def add_texts(self, documents: list[Document], embeddings: list[list[float]], **kwargs):
+        metadatas = [{**(document.metadata or {}), 'group_id': self._group_id} for document in documents]
+        self._collection.add(
+            ids=self._get_uuids(documents),
+            texts=[document.page_content for document in documents],
+            metadatas=metadatas,
+            embeddings=embeddings,
+        )
+
+    def text_exists(self, id: str) -> bool:
+        return self._collection.contains(id)
+
+    def delete_by_ids(self, ids: list[str]) -> None:
+        self._collection.delete_ids(ids)
+
+    def get_ids_by_metadata_field(self, key: str, value: str):
+        return self._collection.get_ids_where(key, value) or None
+
+    def delete_by_metadata_field(self, key: str, value: str) -> None:
+        self._collection.delete_where(key, value)
+
+    def delete(self) -> None:
+        # the collection may be shared with other datasets by a collection binding
+        self._collection.delete_where('group_id', self._group_id)
+
+    def search_by_vector(self, query_vector: list[float], **kwargs: Any) -> list[Document]:
+        score_threshold = kwargs.get('score_threshold', .0) if kwargs.get('score_threshold', .0) else 0.0
+        results = self._collection.search_by_vector(
+            query_vector,
+            top_k=kwargs.get('top_k', 4),
+            score_threshold=score_threshold,
+            filters=self._get_filters(kwargs.get('document_ids_filter')),
+        )
+        return self._to_documents(results)
+
+    def search_by_full_text(self, query: str, **kwargs: Any) -> list[Document]:
+        results = self._collection.search_by_full_text(
+            query,
+            top_k=kwargs.get('top_k', 4),
+            filters=self._get_filters(kwargs.get('document_ids_filter')),
+        )
+        return self._to_documents(results)
+
+    def _get_filters(self, document_ids: Optional[list[str]]) -> dict[str, list]:
+        filters = {'group_id': [self._group_id]}
+        if document_ids:
+            filters['document_id'] = document_ids
+        return filters
+
+    @staticmethod
+    def _to_documents(results: list[tuple[str, str, dict, float]]) -> list[Document]:
+        documents = []
+        for _, text, metadata, score in results:
+            metadata['score'] = score
+            documents.append(Document(page_content=text, metadata=metadata))
+        return documents
+
+
+class LocalVectorFactory(AbstractVectorFactory):
+    def init_vector(self, dataset: Dataset, attributes: list, embeddings: Embeddings) -> LocalVector:
+        if dataset.collection_binding_id:
+            dataset_collection_binding = db.session.query(DatasetCollectionBinding). \
+                filter(DatasetCollectionBinding.id == dataset.collection_binding_id). \
+                one_or_none()
+            if dataset_collection_binding:
+                collection_name = dataset_collection_binding.collection_name
+            else:
+                raise ValueError('Dataset Collection Bindings is not exist!')
+        else:
+            if dataset.index_struct_dict:
+                class_prefix: str = dataset.index_struct_dict['vector_store']['class_prefix']
+                collection_name = class_prefix
+            else:
+                dataset_id = dataset.id
+                collection_name = Dataset.gen_collection_name_by_id(dataset_id)
+
+        if not dataset.index_struct_dict:
+            dataset.index_struct = json.dumps(
+                self.gen_index_struct_dict(VectorType.LOCAL, collection_name))
+
+        config = current_app.config
+        path = config.get('LOCAL_VECTOR_PATH')
+        if not os.path.isabs(path):
+            path = os.path.join(current_app.root_path, path)
+        return LocalVector(
+            collection_name=collection_name,
+            group_id=dataset.id,
+            config=LocalVectorConfig(
+                path=path,
+                ivf_min_rows=config.get('LOCAL_VECTOR_IVF_MIN_ROWS'),
+                ivf_probe_count=config.get('LOCAL_VECTOR_IVF_PROBE_COUNT'),
+                compaction_ratio=config.get('LOCAL_VECTOR_COMPACTION_RATIO'),
+            )
+        )
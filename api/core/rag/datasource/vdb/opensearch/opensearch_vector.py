@@ -12,6 +12,7 @@ from pydantic import BaseModel, model_validator
 from core.rag.datasource.entity.embedding import Embeddings
 from core.rag.datasource.vdb.field import Field
 from core.rag.datasource.vdb.vector_base import BaseVector
+from core.rag.datasource.vdb.vector_client_registry import vector_client_registry
 from core.rag.datasource.vdb.vector_factory import AbstractVectorFactory
 from core.rag.datasource.vdb.vector_type import VectorType
 from core.rag.models.document import Document
@@ -60,7 +61,11 @@ class OpenSearchVector(BaseVector):
     def __init__(self, collection_name: str, config: OpenSearchConfig):
         super().__init__(collection_name)
         self._client_config = config
-        self._client = OpenSearch(**config.to_opensearch_params())
+        self._client = vector_client_registry.get_client(
+            VectorType.OPENSEARCH, config,
+            create=lambda: OpenSearch(**config.to_opensearch_params()),
+            check_health=lambda client: client.ping(),
+        )
 
     def get_type(self) -> str:
         return VectorType.OPENSEARCH
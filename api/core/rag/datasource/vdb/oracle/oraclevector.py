@@ -11,6 +11,7 @@ from pydantic import BaseModel, model_validator
 
 from core.rag.datasource.entity.embedding import Embeddings
 from core.rag.datasource.vdb.vector_base import BaseVector
+from core.rag.datasource.vdb.vector_client_registry import vector_client_registry
 from core.rag.datasource.vdb.vector_factory import AbstractVectorFactory
 from core.rag.datasource.vdb.vector_type import VectorType
 from core.rag.models.document import Document
@@ -55,7 +56,10 @@ CREATE TABLE IF NOT EXISTS {table_name} (
 class OracleVector(BaseVector):
     def __init__(self, collection_name: str, config: OracleVectorConfig):
         super().__init__(collection_name)
-        self.pool = self._create_connection_pool(config)
+        self.pool = vector_client_registry.get_client(
+            VectorType.ORACLE, config,
+            create=lambda: self._create_connection_pool(config),
+        )
         self.table_name = f"embedding_{collection_name}"
 
     def get_type(self) -> str:
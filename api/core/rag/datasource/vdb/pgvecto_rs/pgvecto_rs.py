@@ -7,7 +7,7 @@ from flask import current_app
 from numpy import ndarray
 from pgvecto_rs.sqlalchemy import Vector
 from pydantic import BaseModel, model_validator
-from sqlalchemy import Float, String, create_engine, insert, select, text
+from sqlalchemy import Engine, Float, String, create_engine, insert, select, text
 from sqlalchemy import text as sql_text
 from sqlalchemy.dialects import postgresql
 from sqlalchemy.orm import Mapped, Session, mapped_column
@@ -15,6 +15,7 @@ from sqlalchemy.orm import Mapped, Session, mapped_column
 from core.rag.datasource.entity.embedding import Embeddings
 from core.rag.datasource.vdb.pgvecto_rs.collection import CollectionORM
 from core.rag.datasource.vdb.vector_base import BaseVector
+from core.rag.datasource.vdb.vector_client_registry import vector_client_registry
 from core.rag.datasource.vdb.vector_factory import AbstractVectorFactory
 from core.rag.datasource.vdb.vector_type import VectorType
 from core.rag.models.document import Document
@@ -52,10 +53,11 @@ class PGVectoRS(BaseVector):
         super().__init__(collection_name)
         self._client_config = config
         self._url = f"postgresql+psycopg2://{config.user}:{config.password}@{config.host}:{config.port}/{config.database}"
-        self._client = create_engine(self._url)
-        with Session(self._client) as session:
-            session.execute(text("CREATE EXTENSION IF NOT EXISTS vectors"))
-            session.commit()
+        # connections of the pool are checked when they are checked out
+        self._client = vector_client_registry.get_client(
+            VectorType.PGVECTO_RS, config,
+            create=lambda: self._create_engine(self._url),
+        )
         self._fields = []
 
         class _Table(CollectionORM):
@@ -72,6 +74,14 @@ class PGVectoRS(BaseVector):
         self._table = _Table
         self._distance_op = "<=>"
 
+    @staticmethod
+    def _create_engine(url: str) -> Engine:
+        engine = create_engine(url, pool_pre_ping=True)
+        with Session(engine) as session:
+            session.execute(text("CREATE EXTENSION IF NOT EXISTS vectors"))
+            session.commit()
+        return engine
+
     def get_type(self) -> str:
         return VectorType.PGVECTO_RS
 
@@ -10,6 +10,7 @@ from pydantic import BaseModel, model_validator
 
 from core.rag.datasource.entity.embedding import Embeddings
 from core.rag.datasource.vdb.vector_base import BaseVector
+from core.rag.datasource.vdb.vector_client_registry import vector_client_registry
 from core.rag.datasource.vdb.vector_factory import AbstractVectorFactory
 from core.rag.datasource.vdb.vector_type import VectorType
 from core.rag.models.document import Document
@@ -52,14 +53,19 @@ CREATE TABLE IF NOT EXISTS {table_name} (
 class PGVector(BaseVector):
     def __init__(self, collection_name: str, config: PGVectorConfig):
         super().__init__(collection_name)
-        self.pool = self._create_connection_pool(config)
+        self.pool = vector_client_registry.get_client(
+            VectorType.PGVECTOR, config,
+            create=lambda: self._create_connection_pool(config),
+            check_health=lambda pool: not pool.closed,
+        )
         self.table_name = f"embedding_{collection_name}"
 
     def get_type(self) -> str:
         return VectorType.PGVECTOR
 
     def _create_connection_pool(self, config: PGVectorConfig):
-        return psycopg2.pool.SimpleConnectionPool(
+        # the pool is shared by the threads of the process
+        return psycopg2.pool.ThreadedConnectionPool(
             1,
             5,
             host=config.host,
@@ -20,6 +20,7 @@ except ImportError:
     from sqlalchemy.ext.declarative import declarative_base
 
 from core.rag.datasource.vdb.vector_base import BaseVector
+from core.rag.datasource.vdb.vector_client_registry import vector_client_registry
 from core.rag.models.document import Document
 from extensions.ext_redis import redis_client
 
@@ -55,7 +56,11 @@ class RelytVector(BaseVector):
         self.embedding_dimension = 1536
         self._client_config = config
         self._url = f"postgresql+psycopg2://{config.user}:{config.password}@{config.host}:{config.port}/{config.database}"
-        self.client = create_engine(self._url)
+        # connections of the pool are checked when they are checked out
+        self.client = vector_client_registry.get_client(
+            VectorType.RELYT, config,
+            create=lambda: create_engine(self._url, pool_pre_ping=True),
+        )
         self._fields = []
         self._group_id = group_id
 
@@ -10,6 +10,7 @@ from tcvectordb.model.document import Filter
 
 from core.rag.datasource.entity.embedding import Embeddings
 from core.rag.datasource.vdb.vector_base import BaseVector
+from core.rag.datasource.vdb.vector_client_registry import vector_client_registry
 from core.rag.datasource.vdb.vector_factory import AbstractVectorFactory
 from core.rag.datasource.vdb.vector_type import VectorType
 from core.rag.models.document import Document
@@ -46,19 +47,19 @@ class TencentVector(BaseVector):
     def __init__(self, collection_name: str, config: TencentConfig):
         super().__init__(collection_name)
         self._client_config = config
-        self._client = VectorDBClient(**self._client_config.to_tencent_params())
-        self._db = self._init_database()
-
-    def _init_database(self):
-        exists = False
-        for db in self._client.list_databases():
-            if db.database_name == self._client_config.database:
-                exists = True
-                break
-        if exists:
-            return self._client.database(self._client_config.database)
-        else:
-            return self._client.create_database(database_name=self._client_config.database)
+        # the database is looked up once with the client
+        self._client, self._db = vector_client_registry.get_client(
+            VectorType.TENCENT, config,
+            create=lambda: self._init_client(config),
+        )
+
+    @staticmethod
+    def _init_client(config: TencentConfig) -> tuple[VectorDBClient, Any]:
+        client = VectorDBClient(**config.to_tencent_params())
+        for db in client.list_databases():
+            if db.database_name == config.database:
+                return client, client.database(config.database)
+        return client, client.create_database(database_name=config.database)
 
     def get_type(self) -> str:
         return 'tencent'
@@ -11,6 +11,7 @@ from sqlalchemy.orm import Session, declarative_base
 
 from core.rag.datasource.entity.embedding import Embeddings
 from core.rag.datasource.vdb.vector_base import BaseVector
+from core.rag.datasource.vdb.vector_client_registry import vector_client_registry
 from core.rag.datasource.vdb.vector_factory import AbstractVectorFactory
 from core.rag.datasource.vdb.vector_type import VectorType
 from core.rag.models.document import Document
@@ -70,7 +71,11 @@ class TiDBVector(BaseVector):
         self._url = (f"mysql+pymysql://{config.user}:{config.password}@{config.host}:{config.port}/{config.database}?"
                      f"ssl_verify_cert=true&ssl_verify_identity=true&program_name={config.program_name}")
         self._distance_func = distance_func.lower()
-        self._engine = create_engine(self._url)
+        # connections of the pool are checked when they are checked out
+        self._engine = vector_client_registry.get_client(
+            VectorType.TIDB_VECTOR, config,
+            create=lambda: create_engine(self._url, pool_pre_ping=True),
+        )
         self._orm_base = declarative_base()
         self._dimension = 1536
 
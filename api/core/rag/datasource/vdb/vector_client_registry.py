@@ -0,0 +1,175 @@
+import logging
+import os
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any, Optional, TypeVar
+
+from flask import current_app
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+
+@dataclass
+class _RegisteredClient:
+    client: Any
+    check_health: Optional[Callable[[Any], Any]]
+    last_used_at: float
+    last_checked_at: float
+
+
+@dataclass
+class _BackendMetrics:
+    clients: int = 0
+    created: int = 0
+    reused: int = 0
+    evicted: int = 0
+    unhealthy: int = 0
+
+
+class VectorClientRegistry:
+    """
+    Clients of the vector stores shared by the vectors of a process, one per backend and config.
+
+    Clients idle for VECTOR_STORE_CLIENT_IDLE_TIMEOUT seconds are evicted, and clients are health checked
+    at most every VECTOR_STORE_CLIENT_HEALTH_CHECK_INTERVAL seconds when they are reused and replaced when
+    the check fails. Evicted clients may still be used by vectors created before, so they are not closed,
+    their connections are released when the last of these vectors is garbage collected.
+    """
+
+    def __init__(self):
+        # (vector type, config) -> client
+        self._clients: dict[tuple[str, str], _RegisteredClient] = {}
+        self._creation_locks: dict[tuple[str, str], threading.Lock] = {}
+        self._metrics: dict[str, _BackendMetrics] = {}
+        # clients inherited from the parent process, see _check_fork
+        self._inherited_clients: list[Any] = []
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def get_client(self, vector_type: str, config: BaseModel | str, create: Callable[[], T],
+                   check_health: Optional[Callable[[T], Any]] = None) -> T:
+        """
+        Get the client of a backend and config, created once per process.
+
+        :param vector_type: the vector type of the backend
+        :param config: the config of the client, clients of equal configs are shared
+        :param create: creates the client
+        :param check_health: raises or returns False when the client can not be used anymore
+        """
+        key = (vector_type, config.model_dump_json() if isinstance(config, BaseModel) else config)
+        now = time.monotonic()
+        health_check_interval = current_app.config.get('VECTOR_STORE_CLIENT_HEALTH_CHECK_INTERVAL')
+
+        with self._lock:
+            self._check_fork()
+            self._evict_idle_clients(now)
+            metrics = self._metrics.setdefault(vector_type, _BackendMetrics())
+            registered = self._clients.get(key)
+            needs_check = False
+            if registered:
+                registered.last_used_at = now
+                if registered.check_health and now - registered.last_checked_at >= health_check_interval:
+                    registered.last_checked_at = now
+                    needs_check = True
+            creation_lock = self._creation_locks.setdefault(key, threading.Lock())
+
+        if registered:
+            if not needs_check or self._is_healthy(vector_type, registered):
+                self._count(metrics, 'reused')
+                return registered.client
+
+            with self._lock:
+                if self._clients.get(key) is registered:
+                    del self._clients[key]
+                    metrics.clients -= 1
+            self._count(metrics, 'unhealthy')
+
+        # the clients of a config are created one at a time, the other threads wait and reuse it
+        with creation_lock:
+            with self._lock:
+                registered = self._clients.get(key)
+            if registered:
+                self._count(metrics, 'reused')
+                return registered.client
+
+            client = create()
+            now = time.monotonic()
+            with self._lock:
+                self._check_fork()
+                self._clients[key] = _RegisteredClient(client, check_health, now, now)
+                metrics = self._metrics.setdefault(vector_type, _BackendMetrics())
+                metrics.clients += 1
+            self._count(metrics, 'created')
+            return client
+
+    def get_metrics(self) -> dict[str, dict[str, int]]:
+        """
+        Get the number of clients of each backend kept by the process,
+        and how many were created, reused, evicted as idle and replaced as unhealthy.
+        """
+        with self._lock:
+            self._check_fork()
+            return {
+                vector_type: {
+                    'clients': metrics.clients,
+                    'created': metrics.created,
+                    'reused': metrics.reused,
+                    'evicted': metrics.evicted,
+                    'unhealthy': metrics.unhealthy,
+                }
+                for vector_type, metrics in self._metrics.items()
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._clients.clear()
+            self._creation_locks.clear()
+            self._metrics.clear()
+
+    def _check_fork(self) -> None:
+        """
+        Drop the clients inherited from the parent process by a forked worker.
+
+        Their sockets are shared with the parent, the child does not use them, and keeps them referenced
+        so that they are not closed by the garbage collector, which would also close them for the parent.
+        """
+        pid = os.getpid()
+        if pid == self._pid:
+            return
+
+        self._inherited_clients.extend(registered.client for registered in self._clients.values())
+        self._clients.clear()
+        self._creation_locks.clear()
+        self._metrics.clear()
+        self._pid = pid
+
+    def _evict_idle_clients(self, now: float) -> None:
+        idle_timeout = current_app.config.get('VECTOR_STORE_CLIENT_IDLE_TIMEOUT')
+        if not idle_timeout:
+            return
+
+        for key in [key for key, registered in self._clients.items() if now - registered.last_used_at > idle_timeout]:
+            del self._clients[key]
+            metrics = self._metrics[key[0]]
+            metrics.clients -= 1
+            metrics.evicted += 1
+
+    @staticmethod
+    def _is_healthy(vector_type: str, registered: _RegisteredClient) -> bool:
+        try:
+            return registered.check_health(registered.client) is not False
+        except Exception:
+            logger.warning(f'Health check of {vector_type} client failed', exc_info=True)
+            return False
+
+    def _count(self, metrics: _BackendMetrics, name: str) -> None:
+        with self._lock:
+            setattr(metrics, name, getattr(metrics, name) + 1)
+
+
+vector_client_registry = VectorClientRegistry()
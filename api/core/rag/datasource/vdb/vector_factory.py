@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import Any
+from typing import Any, Optional
 
 from flask import current_app
 
@@ -10,6 +10,7 @@ from core.rag.datasource.entity.embedding import Embeddings
 from core.rag.datasource.vdb.vector_base import BaseVector
 from core.rag.datasource.vdb.vector_type import VectorType
 from core.rag.models.document import Document
+from core.rag.retrieval.retrieval_cache import RetrievalCache
 from models.dataset import Dataset
 
 
@@ -84,6 +85,9 @@ class Vector:
             case VectorType.OPENSEARCH:
                 from core.rag.datasource.vdb.opensearch.opensearch_vector import OpenSearchVectorFactory
                 return OpenSearchVectorFactory
+            case VectorType.LOCAL:
+                from core.rag.datasource.vdb.local.local_vector import LocalVectorFactory
+                return LocalVectorFactory
             case _:
                 raise ValueError(f"Vector store {vector_type} is not supported.")
 
@@ -95,6 +99,7 @@ class Vector:
                 embeddings=embeddings,
                 **kwargs
             )
+            self._on_index_changed()
 
     def add_texts(self, documents: list[Document], **kwargs):
         if kwargs.get('duplicate_check', False):
@@ -105,15 +110,18 @@ class Vector:
             embeddings=embeddings,
             **kwargs
         )
+        self._on_index_changed()
 
     def text_exists(self, id: str) -> bool:
         return self._vector_processor.text_exists(id)
 
     def delete_by_ids(self, ids: list[str]) -> None:
         self._vector_processor.delete_by_ids(ids)
+        self._on_index_changed()
 
     def delete_by_metadata_field(self, key: str, value: str) -> None:
         self._vector_processor.delete_by_metadata_field(key, value)
+        self._on_index_changed()
 
     def search_by_vector(
             self, query: str,
@@ -122,14 +130,29 @@ class Vector:
         query_vector = self._embeddings.embed_query(query)
         return self._vector_processor.search_by_vector(query_vector, **kwargs)
 
+    def search_by_embedding(
+            self, query_vector: list[float],
+            **kwargs: Any
+    ) -> list[Document]:
+        return self._vector_processor.search_by_vector(query_vector, **kwargs)
+
     def search_by_full_text(
             self, query: str,
             **kwargs: Any
     ) -> list[Document]:
         return self._vector_processor.search_by_full_text(query, **kwargs)
 
+    def get_cached_embeddings(self, texts: list[str]) -> list[Optional[list[float]]]:
+        return self._embeddings.get_cached_embeddings(texts)
+
     def delete(self) -> None:
         self._vector_processor.delete()
+        self._on_index_changed()
+
+    def _on_index_changed(self) -> None:
+        # the retrievals cached before the change are no longer used
+        if self._dataset.id:
+            RetrievalCache.bump_dataset_version(self._dataset.id)
 
     def _get_embeddings(self) -> Embeddings:
         model_manager = ModelManager()
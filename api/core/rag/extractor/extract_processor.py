@@ -1,3 +1,5 @@
+import json
+import logging
 import re
 import tempfile
 from pathlib import Path
@@ -85,11 +87,49 @@ class ExtractProcessor:
     @classmethod
     def extract(cls, extract_setting: ExtractSetting, is_automatic: bool = False,
                 file_path: str = None) -> list[Document]:
+        upload_file: UploadFile = extract_setting.upload_file
+        if extract_setting.datasource_type != DatasourceType.FILE.value or file_path \
+                or not upload_file or not upload_file.hash:
+            return cls._extract(extract_setting, is_automatic, file_path)
+
+        # upload files with the same content share their extraction result
+        cache_key = cls._extraction_cache_key(upload_file, is_automatic)
+        try:
+            if storage.exists(cache_key):
+                cached_documents = json.loads(storage.load_once(cache_key))
+                return [Document(**document) for document in cached_documents]
+        except Exception:
+            logging.exception(f'Failed to load cached extraction of upload file {upload_file.id}')
+
+        documents = cls._extract(extract_setting, is_automatic, file_path)
+        try:
+            storage.save(cache_key, json.dumps([document.model_dump() for document in documents]).encode('utf-8'))
+        except Exception:
+            logging.exception(f'Failed to cache extraction of upload file {upload_file.id}')
+
+        return documents
+
+    @classmethod
+    def delete_cached_extraction(cls, upload_file: UploadFile) -> None:
+        for is_automatic in [False, True]:
+            storage.delete(cls._extraction_cache_key(upload_file, is_automatic))
+
+    @staticmethod
+    def _extraction_cache_key(upload_file: UploadFile, is_automatic: bool) -> str:
+        etl_type = current_app.config['ETL_TYPE']
+        mode = 'automatic' if is_automatic else 'custom'
+        return (f'upload_files/{upload_file.tenant_id}/extractions/'
+                f'{upload_file.hash}.{etl_type}.{mode}.{upload_file.extension.lower()}.json')
+
+    @classmethod
+    def _extract(cls, extract_setting: ExtractSetting, is_automatic: bool = False,
+                 file_path: str = None) -> list[Document]:
         if extract_setting.datasource_type == DatasourceType.FILE.value:
             with tempfile.TemporaryDirectory() as temp_dir:
                 if not file_path:
                     upload_file: UploadFile = extract_setting.upload_file
-                    suffix = Path(upload_file.key).suffix
+                    # deduplicated content may be stored under the key of a file with another extension
+                    suffix = '.' + upload_file.extension
                     file_path = f"{temp_dir}/{next(tempfile._get_candidate_names())}{suffix}"
                     storage.download(upload_file.key, file_path)
                 input_file = Path(file_path)
@@ -17,6 +17,7 @@ from core.ops.utils import measure_time
 from core.rag.datasource.retrieval_service import RetrievalService
 from core.rag.models.document import Document
 from core.rag.rerank.rerank import RerankRunner
+from core.rag.retrieval.retrieval_cache import RetrievalCache
 from core.rag.retrieval.retrival_methods import RetrievalMethod
 from core.rag.retrieval.router.multi_dataset_function_call_router import FunctionCallMultiDatasetRouter
 from core.rag.retrieval.router.multi_dataset_react_route import ReactMultiDatasetRouter
@@ -268,16 +269,26 @@ class DatasetRetrieval:
                     score_threshold = retrieval_model_config.get("score_threshold")
 
                 with measure_time() as timer:
-                    results = RetrievalService.retrieve(
-                        retrival_method=retrival_method, dataset_id=dataset.id,
-                        query=query,
-                        top_k=top_k, score_threshold=score_threshold,
-                        reranking_model=reranking_model
+                    results, retrieval_cache = RetrievalCache.retrieve(
+                        [dataset.id],
+                        {
+                            'retrival_method': retrival_method,
+                            'top_k': top_k,
+                            'score_threshold': score_threshold,
+                            'reranking_model': reranking_model,
+                        },
+                        query,
+                        lambda: RetrievalService.retrieve(
+                            retrival_method=retrival_method, dataset_id=dataset.id,
+                            query=query,
+                            top_k=top_k, score_threshold=score_threshold,
+                            reranking_model=reranking_model
+                        )
                     )
                 self._on_query(query, [dataset_id], app_id, user_from, user_id)
 
                 if results:
-                    self._on_retrival_end(results, message_id, timer)
+                    self._on_retrival_end(results, message_id, timer, retrieval_cache)
 
                 return results
         return []
@@ -296,9 +307,43 @@ class DatasetRetrieval:
             reranking_model_name: str,
             message_id: Optional[str] = None,
     ):
+        dataset_ids = [dataset.id for dataset in available_datasets]
+        with measure_time() as timer:
+            all_documents, retrieval_cache = RetrievalCache.retrieve(
+                dataset_ids,
+                {
+                    # the retrieval settings of the datasets
+                    'datasets': {
+                        dataset.id: [dataset.indexing_technique, dataset.retrieval_model]
+                        for dataset in available_datasets
+                    },
+                    'top_k': top_k,
+                    'score_threshold': score_threshold,
+                    'reranking_model': [reranking_provider_name, reranking_model_name],
+                },
+                query,
+                lambda: self._multiple_retrieve(tenant_id, available_datasets, query, top_k, score_threshold,
+                                                reranking_provider_name, reranking_model_name)
+            )
+        self._on_query(query, dataset_ids, app_id, user_from, user_id)
+
+        if all_documents:
+            self._on_retrival_end(all_documents, message_id, timer, retrieval_cache)
+
+        return all_documents
+
+    def _multiple_retrieve(
+            self,
+            tenant_id: str,
+            available_datasets: list,
+            query: str,
+            top_k: int,
+            score_threshold: float,
+            reranking_provider_name: str,
+            reranking_model_name: str,
+    ) -> list[Document]:
         threads = []
         all_documents = []
-        dataset_ids = [dataset.id for dataset in available_datasets]
         for dataset in available_datasets:
             retrieval_thread = threading.Thread(target=self._retriever, kwargs={
                 'flask_app': current_app._get_current_object(),
@@ -322,21 +367,15 @@ class DatasetRetrieval:
 
         rerank_runner = RerankRunner(rerank_model_instance)
 
-        with measure_time() as timer:
-            all_documents = rerank_runner.run(
-                query, all_documents,
-                score_threshold,
-                top_k
-            )
-        self._on_query(query, dataset_ids, app_id, user_from, user_id)
-
-        if all_documents:
-            self._on_retrival_end(all_documents, message_id, timer)
-
-        return all_documents
+        return rerank_runner.run(
+            query, all_documents,
+            score_threshold,
+            top_k
+        )
 
     def _on_retrival_end(
-        self, documents: list[Document], message_id: Optional[str] = None, timer: Optional[dict] = None
+        self, documents: list[Document], message_id: Optional[str] = None, timer: Optional[dict] = None,
+        retrieval_cache: Optional[dict] = None
     ) -> None:
         """Handle retrival end."""
         for document in documents:
@@ -364,7 +403,8 @@ class DatasetRetrieval:
                     TraceTaskName.DATASET_RETRIEVAL_TRACE,
                     message_id=message_id,
                     documents=documents,
-                    timer=timer
+                    timer=timer,
+                    retrieval_cache=retrieval_cache
                 )
             )
 
@@ -0,0 +1,238 @@
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from collections.abc import Callable
+from typing import Optional
+
+from flask import current_app
+
+from core.rag.models.document import Document
+from extensions.ext_database import db
+from extensions.ext_redis import redis_client
+from models.dataset import DocumentSegment
+
+logger = logging.getLogger(__name__)
+
+
+class _MemoryTier:
+    """
+    Process-wide LRU of serialized retrievals with their expiry time.
+    """
+
+    def __init__(self):
+        self._items: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            expire_at, payload = item
+            if expire_at < time.monotonic():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return payload
+
+    def set(self, key: str, payload: str, ttl: int, capacity: int) -> None:
+        with self._lock:
+            self._items[key] = (time.monotonic() + ttl, payload)
+            self._items.move_to_end(key)
+            while len(self._items) > capacity:
+                self._items.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+
+class _Stats:
+    """
+    Lookups of the retrieval cache by the process.
+    """
+
+    def __init__(self):
+        self.lookups = 0
+        self.hits = 0
+        self._lock = threading.Lock()
+
+    def add(self, hit: bool) -> float:
+        """
+        :return: the hit rate
+        """
+        with self._lock:
+            self.lookups += 1
+            self.hits += int(hit)
+            return self.hits / self.lookups
+
+
+_memory_tier = _MemoryTier()
+_stats = _Stats()
+
+
+class RetrievalCache:
+    """
+    Cache of the segments retrieved for a query from datasets, in memory and in redis.
+
+    Retrievals are keyed by the datasets with their content versions, the retrieval config and the normalized
+    query. Only the index node ids, the datasets and the scores of the segments are cached, the segments are
+    loaded from the database on a hit, and the ones which are no longer completed and enabled are skipped.
+    The content version of a dataset is bumped whenever its vector or keyword index is written,
+    see `bump_dataset_version`.
+    """
+
+    def __init__(self, cache_key: str, ttl: int):
+        self.cache_key = cache_key
+        self.ttl = ttl
+
+    @classmethod
+    def retrieve(cls, dataset_ids: list[str], retrieval_config: dict, query: str,
+                 retriever: Callable[[], list[Document]]) -> tuple[list[Document], Optional[dict]]:
+        """
+        Get the documents retrieved for a query, from the cache or from the retriever.
+
+        :param retrieval_config: everything else the documents retrieved depend on
+        :param retriever: retrieves the documents when they are not cached
+        :return: the documents, and for the retrieval trace whether they were cached, the hit rate of the cache
+            in the process and the time saved, None when the cache is not used
+        """
+        cache = cls._for_query(dataset_ids, retrieval_config, query)
+        if not cache:
+            return retriever(), None
+
+        start_at = time.perf_counter()
+        cached = cache._get()
+        if cached is not None:
+            documents, latency = cached
+            return documents, {
+                'hit': True,
+                'hit_rate': _stats.add(True),
+                'saved_latency': max(latency - (time.perf_counter() - start_at), 0.0),
+            }
+
+        documents = retriever()
+        cache._set(documents, time.perf_counter() - start_at)
+        return documents, {
+            'hit': False,
+            'hit_rate': _stats.add(False),
+            'saved_latency': 0.0,
+        }
+
+    @classmethod
+    def bump_dataset_version(cls, dataset_id: str) -> None:
+        """
+        Invalidate the cached retrievals of a dataset, once its index was written.
+        """
+        try:
+            redis_client.incr(cls._version_key(dataset_id))
+        except Exception:
+            logger.exception(f'Failed to bump the content version of dataset {dataset_id}')
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        return re.sub(r'\s+', ' ', unicodedata.normalize('NFKC', query)).strip()
+
+    @classmethod
+    def _for_query(cls, dataset_ids: list[str], retrieval_config: dict, query: str) -> Optional['RetrievalCache']:
+        ttl = current_app.config.get('RETRIEVAL_CACHE_TTL')
+        if not ttl or not dataset_ids:
+            return None
+
+        dataset_ids = sorted(dataset_ids)
+        try:
+            versions = redis_client.mget([cls._version_key(dataset_id) for dataset_id in dataset_ids])
+        except Exception:
+            logger.warning('Failed to get the content versions of the datasets', exc_info=True)
+            return None
+
+        key = json.dumps({
+            'datasets': {
+                dataset_id: version.decode('utf-8') if version else '0'
+                for dataset_id, version in zip(dataset_ids, versions)
+            },
+            'config': retrieval_config,
+            'query': cls.normalize_query(query),
+        }, sort_keys=True, ensure_ascii=False, default=str)
+        return cls(f'retrieval:{hashlib.sha256(key.encode("utf-8")).hexdigest()}', ttl)
+
+    def _get(self) -> Optional[tuple[list[Document], float]]:
+        """
+        :return: the documents and the latency of their retrieval, None if they are not cached
+        """
+        payload = _memory_tier.get(self.cache_key)
+        if payload is None:
+            try:
+                cached = redis_client.get(self.cache_key)
+            except Exception:
+                logger.warning('Failed to get retrieval from cache', exc_info=True)
+                return None
+            if not cached:
+                return None
+
+            payload = cached.decode('utf-8')
+            self._set_memory(payload)
+
+        data = json.loads(payload)
+        return self._load_documents(data['documents']), data['latency']
+
+    def _set(self, documents: list[Document], latency: float) -> None:
+        if len(documents) > current_app.config.get('RETRIEVAL_CACHE_MAX_DOCUMENTS'):
+            return
+        # documents which are not segments of a dataset can not be loaded again
+        if not all(document.metadata.get('doc_id') and document.metadata.get('dataset_id') for document in documents):
+            return
+
+        payload = json.dumps({
+            'documents': [
+                [document.metadata.get('doc_id'), document.metadata.get('dataset_id'), document.metadata.get('score')]
+                for document in documents
+            ],
+            'latency': latency,
+        })
+        self._set_memory(payload)
+        try:
+            redis_client.setex(self.cache_key, self.ttl, payload)
+        except Exception:
+            logger.warning('Failed to set retrieval to cache', exc_info=True)
+
+    def _set_memory(self, payload: str) -> None:
+        _memory_tier.set(self.cache_key, payload, self.ttl, current_app.config.get('RETRIEVAL_CACHE_MEMORY_SIZE'))
+
+    @staticmethod
+    def _load_documents(items: list[list]) -> list[Document]:
+        if not items:
+            return []
+
+        segments = db.session.query(DocumentSegment).filter(
+            DocumentSegment.dataset_id.in_({dataset_id for _, dataset_id, _ in items}),
+            DocumentSegment.index_node_id.in_([index_node_id for index_node_id, _, _ in items]),
+            DocumentSegment.status == 'completed',
+            DocumentSegment.enabled == True,
+        ).all()
+        segments_by_node = {(segment.dataset_id, segment.index_node_id): segment for segment in segments}
+
+        documents = []
+        for index_node_id, dataset_id, score in items:
+            segment = segments_by_node.get((dataset_id, index_node_id))
+            if not segment:
+                continue
+            metadata = {
+                'doc_id': segment.index_node_id,
+                'doc_hash': segment.index_node_hash,
+                'document_id': segment.document_id,
+                'dataset_id': segment.dataset_id,
+            }
+            if score is not None:
+                metadata['score'] = score
+            documents.append(Document(page_content=segment.content, metadata=metadata))
+        return documents
+
+    @staticmethod
+    def _version_key(dataset_id: str) -> str:
+        return f'dataset_content_version:{dataset_id}'
@@ -197,6 +197,7 @@ class ToolIdentity(BaseModel):
     label: I18nObject = Field(..., description="The label of the tool")
     provider: str = Field(..., description="The provider of the tool")
     icon: Optional[str] = None
+    cache_ttl: Optional[int] = Field(default=None, description="Seconds the results of the tool can be cached for")
 
 class ToolCredentialsOption(BaseModel):
     value: str = Field(..., description="The value of the option")
@@ -380,6 +381,7 @@ class ToolInvokeMeta(BaseModel):
     time_cost: float = Field(..., description="The time cost of the tool invoke")
     error: Optional[str] = None
     tool_config: Optional[dict] = None
+    cache_hit: Optional[bool] = None
 
     @classmethod
     def empty(cls) -> 'ToolInvokeMeta':
@@ -400,6 +402,7 @@ class ToolInvokeMeta(BaseModel):
             'time_cost': self.time_cost,
             'error': self.error,
             'tool_config': self.tool_config,
+            'cache_hit': self.cache_hit,
         }
     
 class ToolLabel(BaseModel):
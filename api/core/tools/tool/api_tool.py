@@ -4,6 +4,7 @@ from typing import Any
 from urllib.parse import urlencode
 
 import httpx
+from flask import current_app
 
 import core.helper.ssrf_proxy as ssrf_proxy
 from core.tools.entities.tool_bundle import ApiToolBundle
@@ -57,6 +58,14 @@ class ApiTool(Tool):
     def tool_provider_type(self) -> ToolProviderType:
         return ToolProviderType.API
 
+    def get_cache_ttl(self) -> int:
+        """
+            only the results of GET requests can be cached
+        """
+        if self.api_bundle.method.lower() != 'get':
+            return 0
+        return current_app.config.get('API_TOOL_RESULT_CACHE_TTL', 0)
+
     def assembling_request(self, parameters: dict[str, Any]) -> dict[str, Any]:
         headers = {}
         credentials = self.runtime.credentials or {}
@@ -86,6 +86,21 @@ class DatasetRetrieverTool(Tool):
     def tool_provider_type(self) -> ToolProviderType:
         return ToolProviderType.DATASET_RETRIEVAL
 
+    def fork_tool_runtime(self, runtime: dict[str, Any]) -> 'DatasetRetrieverTool':
+        """
+            fork a new tool with meta data, the retrieval tool is shared
+
+            :param runtime: the runtime of the new tool
+            :return: the new tool
+        """
+        return self.__class__(
+            retrival_tool=self.retrival_tool,
+            identity=self.identity.model_copy() if self.identity else None,
+            parameters=self.parameters.copy() if self.parameters else None,
+            description=self.description.model_copy() if self.description else None,
+            runtime=Tool.Runtime(**runtime),
+        )
+
     def _invoke(self, user_id: str, tool_parameters: dict[str, Any]) -> ToolInvokeMessage | list[ToolInvokeMessage]:
         """
         invoke dataset retriever tool
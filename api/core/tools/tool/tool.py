@@ -83,6 +83,16 @@ class Tool(BaseModel, ABC):
 
             :return: the tool provider type
         """
+
+    def get_cache_ttl(self) -> int:
+        """
+            get the seconds the results of the tool can be cached for, 0 if they can not be cached
+
+            :return: the cache ttl
+        """
+        if self.identity and self.identity.cache_ttl:
+            return self.identity.cache_ttl
+        return 0
     
     def load_variables(self, variables: ToolRuntimeVariablePool):
         """
@@ -10,6 +10,7 @@ from core.app.entities.app_invoke_entities import InvokeFrom
 from core.callback_handler.agent_tool_callback_handler import DifyAgentCallbackHandler
 from core.callback_handler.workflow_tool_callback_handler import DifyWorkflowCallbackHandler
 from core.file.file_obj import FileTransferMethod
+from core.helper.tool_result_cache import ToolResultCache
 from core.ops.ops_trace_manager import TraceQueueManager
 from core.tools.entities.tool_entities import ToolInvokeMessage, ToolInvokeMessageBinary, ToolInvokeMeta, ToolParameter
 from core.tools.errors import (
@@ -127,9 +128,11 @@ class ToolEngine:
                         user_id: str, workflow_id: str, 
                         workflow_tool_callback: DifyWorkflowCallbackHandler,
                         workflow_call_depth: int,
-                        ) -> list[ToolInvokeMessage]:
+                        ) -> tuple[list[ToolInvokeMessage], Optional[bool]]:
         """
         Workflow invokes the tool with the given arguments.
+
+        :return: the tool invoke messages, and whether they come from the cache, None if the tool is not cached
         """
         try:
             # hit the callback handler
@@ -141,7 +144,7 @@ class ToolEngine:
             if isinstance(tool, WorkflowTool):
                 tool.workflow_call_depth = workflow_call_depth + 1
 
-            response = tool.invoke(user_id, tool_parameters)
+            response, cache_hit = ToolEngine._invoke_with_cache(tool, tool_parameters, user_id)
 
             # hit the callback handler
             workflow_tool_callback.on_tool_end(
@@ -150,7 +153,7 @@ class ToolEngine:
                 tool_outputs=response,
             )
 
-            return response
+            return response, cache_hit
         except Exception as e:
             workflow_tool_callback.on_tool_error(e)
             raise e
@@ -170,7 +173,7 @@ class ToolEngine:
             'tool_icon': tool.identity.icon
         })
         try:
-            response = tool.invoke(user_id, tool_parameters)
+            response, meta.cache_hit = ToolEngine._invoke_with_cache(tool, tool_parameters, user_id)
         except Exception as e:
             meta.error = str(e)
             raise ToolEngineInvokeError(meta)
@@ -179,6 +182,26 @@ class ToolEngine:
             meta.time_cost = (ended_at - started_at).total_seconds()
 
         return meta, response
+
+    @staticmethod
+    def _invoke_with_cache(tool: Tool, tool_parameters: dict, user_id: str) \
+          -> tuple[list[ToolInvokeMessage], Optional[bool]]:
+        """
+        Invoke the tool, or get its result from the cache if the tool declares a cache ttl.
+
+        :return: the tool invoke messages, and whether they come from the cache, None if the tool is not cached
+        """
+        cache = ToolResultCache.for_tool(tool, tool_parameters)
+        if not cache:
+            return tool.invoke(user_id, tool_parameters), None
+
+        response = cache.get()
+        if response is not None:
+            return response, True
+
+        response = tool.invoke(user_id, tool_parameters)
+        cache.set(response)
+        return response, False
     
     @staticmethod
     def _convert_tool_response_to_str(tool_response: list[ToolInvokeMessage]) -> str:
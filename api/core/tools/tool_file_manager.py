@@ -6,7 +6,7 @@ import os
 import time
 from collections.abc import Generator
 from mimetypes import guess_extension, guess_type
-from typing import Optional, Union
+from typing import IO, Optional, Union
 from uuid import uuid4
 
 from flask import current_app
@@ -76,6 +76,27 @@ class ToolFileManager:
 
         return tool_file
 
+    @staticmethod
+    def create_file_by_stream(user_id: str, tenant_id: str,
+                              conversation_id: Optional[str], stream: IO[bytes],
+                              mimetype: str
+                              ) -> ToolFile:
+        """
+        create file from a stream, without reading it into memory
+        """
+        extension = guess_extension(mimetype) or '.bin'
+        unique_name = uuid4().hex
+        filename = f"tools/{tenant_id}/{unique_name}{extension}"
+        storage.save_stream(filename, stream)
+
+        tool_file = ToolFile(user_id=user_id, tenant_id=tenant_id,
+                             conversation_id=conversation_id, file_key=filename, mimetype=mimetype)
+
+        db.session.add(tool_file)
+        db.session.commit()
+
+        return tool_file
+
     @staticmethod
     def create_file_by_url(user_id: str, tenant_id: str,
                            conversation_id: str, file_url: str,
@@ -72,6 +72,7 @@ class NodeRunMetadataKey(Enum):
     TOTAL_PRICE = 'total_price'
     CURRENCY = 'currency'
     TOOL_INFO = 'tool_info'
+    TOOL_CACHE_HIT = 'tool_cache_hit'
     ITERATION_ID = 'iteration_id'
     ITERATION_INDEX = 'iteration_index'
 
@@ -1,8 +1,11 @@
+import codecs
 import json
 import os
+import tempfile
+from collections.abc import Callable
 from copy import deepcopy
 from random import randint
-from typing import Any, Optional, Union
+from typing import IO, Any, Optional, Union
 from urllib.parse import urlencode
 
 import httpx
@@ -17,15 +20,36 @@ MAX_BINARY_SIZE = int(os.environ.get('HTTP_REQUEST_NODE_MAX_BINARY_SIZE', 1024 *
 READABLE_MAX_BINARY_SIZE = f'{MAX_BINARY_SIZE / 1024 / 1024:.2f}MB'
 MAX_TEXT_SIZE = int(os.environ.get('HTTP_REQUEST_NODE_MAX_TEXT_SIZE', 1024 * 1024))  # 1MB
 READABLE_MAX_TEXT_SIZE = f'{MAX_TEXT_SIZE / 1024 / 1024:.2f}MB'
+# file responses larger than this are spooled to disk while they are read
+FILE_SPOOL_MEMORY_SIZE = 1024 * 1024
+
+
+def _readable_size(size: int) -> str:
+    if size < 1024:
+        return f'{size} bytes'
+    elif size < 1024 * 1024:
+        return f'{(size / 1024):.2f} KB'
+    else:
+        return f'{(size / 1024 / 1024):.2f} MB'
 
 
 class HttpExecutorResponse:
     headers: dict[str, str]
     response: httpx.Response
 
-    def __init__(self, response: httpx.Response = None):
+    def __init__(self, response: httpx.Response = None, text: Optional[str] = None,
+                 file: Optional[IO[bytes]] = None, size: Optional[int] = None):
+        """
+        :param response: the response, its body is not read when the text or the file is given
+        :param text: the decoded body of a streamed text response
+        :param file: the spooled body of a streamed file response
+        :param size: the size in bytes of the streamed body
+        """
         self.response = response
         self.headers = dict(response.headers) if isinstance(self.response, httpx.Response) else {}
+        self.text = text
+        self.file = file
+        self._size = size
 
     @property
     def is_file(self) -> bool:
@@ -52,6 +76,10 @@ class HttpExecutorResponse:
 
     @property
     def content(self) -> str:
+        if self.text is not None:
+            return self.text
+        if self.file is not None:
+            return self.body.decode(self.response.encoding or 'utf-8', errors='replace')
         if isinstance(self.response, httpx.Response):
             return self.response.text
         else:
@@ -59,6 +87,11 @@ class HttpExecutorResponse:
 
     @property
     def body(self) -> bytes:
+        if self.file is not None:
+            self.file.seek(0)
+            return self.file.read()
+        if self.text is not None:
+            return self.text.encode(self.response.encoding or 'utf-8')
         if isinstance(self.response, httpx.Response):
             return self.response.content
         else:
@@ -73,16 +106,20 @@ class HttpExecutorResponse:
 
     @property
     def size(self) -> int:
+        if self._size is not None:
+            return self._size
         return len(self.body)
 
     @property
     def readable_size(self) -> str:
-        if self.size < 1024:
-            return f'{self.size} bytes'
-        elif self.size < 1024 * 1024:
-            return f'{(self.size / 1024):.2f} KB'
-        else:
-            return f'{(self.size / 1024 / 1024):.2f} MB'
+        return _readable_size(self.size)
+
+    def close(self) -> None:
+        """
+        remove the spooled body of a file response
+        """
+        if self.file is not None:
+            self.file.close()
 
 
 class HttpExecutor:
@@ -214,27 +251,54 @@ class HttpExecutor:
 
         return headers
 
-    def _validate_and_parse_response(self, response: httpx.Response) -> HttpExecutorResponse:
+    def _read_response(self, response: httpx.Response) -> HttpExecutorResponse:
         """
-            validate the response
+            read the body of a streamed response, stop as soon as it exceeds the max size
+
+            files are spooled to a temporary file, texts are decoded while they are read
         """
-        if isinstance(response, httpx.Response):
-            executor_response = HttpExecutorResponse(response)
-        else:
+        if not isinstance(response, httpx.Response):
             raise ValueError(f'Invalid response type {type(response)}')
 
-        if executor_response.is_file:
-            if executor_response.size > MAX_BINARY_SIZE:
-                raise ValueError(
-                    f'File size is too large, max size is {READABLE_MAX_BINARY_SIZE}, but current size is {executor_response.readable_size}.')
-        else:
-            if executor_response.size > MAX_TEXT_SIZE:
-                raise ValueError(
-                    f'Text size is too large, max size is {READABLE_MAX_TEXT_SIZE}, but current size is {executor_response.readable_size}.')
+        if HttpExecutorResponse(response).is_file:
+            file = tempfile.SpooledTemporaryFile(max_size=FILE_SPOOL_MEMORY_SIZE)
+            try:
+                size = self._read_body(response, MAX_BINARY_SIZE, file.write,
+                                       f'File size is too large, max size is {READABLE_MAX_BINARY_SIZE}')
+            except Exception:
+                file.close()
+                raise
+            file.seek(0)
+            return HttpExecutorResponse(response, file=file, size=size)
+
+        decoder = codecs.getincrementaldecoder(response.encoding or 'utf-8')(errors='replace')
+        parts = []
+        size = self._read_body(response, MAX_TEXT_SIZE, lambda chunk: parts.append(decoder.decode(chunk)),
+                               f'Text size is too large, max size is {READABLE_MAX_TEXT_SIZE}')
+        parts.append(decoder.decode(b'', final=True))
+        return HttpExecutorResponse(response, text=''.join(parts), size=size)
 
-        return executor_response
+    @staticmethod
+    def _read_body(response: httpx.Response, max_size: int, write: Callable[[bytes], Any], error: str) -> int:
+        """
+            pass the chunks of the body to write
 
-    def _do_http_request(self, headers: dict[str, Any]) -> httpx.Response:
+            :return: the size of the body
+        """
+        content_length = response.headers.get('content-length')
+        if content_length and content_length.isdigit() and int(content_length) > max_size:
+            raise ValueError(f'{error}, but current size is {_readable_size(int(content_length))}.')
+
+        size = 0
+        for chunk in response.iter_bytes():
+            size += len(chunk)
+            if size > max_size:
+                raise ValueError(f'{error}, but the response exceeds it.')
+            write(chunk)
+
+        return size
+
+    def _do_http_request(self, headers: dict[str, Any]) -> HttpExecutorResponse:
         """
             do http request depending on api bundle
         """
@@ -247,10 +311,10 @@ class HttpExecutor:
         }
 
         if self.method in ('get', 'head', 'post', 'put', 'delete', 'patch'):
-            response = getattr(ssrf_proxy, self.method)(data=self.body, files=self.files, **kwargs)
+            with ssrf_proxy.stream(self.method.upper(), data=self.body, files=self.files, **kwargs) as response:
+                return self._read_response(response)
         else:
             raise ValueError(f'Invalid http method {self.method}')
-        return response
 
     def invoke(self) -> HttpExecutorResponse:
         """
@@ -260,10 +324,7 @@ class HttpExecutor:
         headers = self._assembling_headers()
 
         # do http request
-        response = self._do_http_request(headers)
-
-        # validate response
-        return self._validate_and_parse_response(response)
+        return self._do_http_request(headers)
 
     def to_raw_request(self, mask_authorization_header: Optional[bool] = True) -> str:
         """
@@ -73,22 +73,25 @@ class HttpRequestNode(BaseNode):
                 process_data=process_data
             )
 
-        files = self.extract_files(http_executor.server_url, response)
-
-        return NodeRunResult(
-            status=WorkflowNodeExecutionStatus.SUCCEEDED,
-            outputs={
-                'status_code': response.status_code,
-                'body': response.content if not files else '',
-                'headers': response.headers,
-                'files': files,
-            },
-            process_data={
-                'request': http_executor.to_raw_request(
-                    mask_authorization_header=node_data.mask_authorization_header
-                ),
-            }
-        )
+        try:
+            files = self.extract_files(http_executor.server_url, response)
+
+            return NodeRunResult(
+                status=WorkflowNodeExecutionStatus.SUCCEEDED,
+                outputs={
+                    'status_code': response.status_code,
+                    'body': response.content if not files else '',
+                    'headers': response.headers,
+                    'files': files,
+                },
+                process_data={
+                    'request': http_executor.to_raw_request(
+                        mask_authorization_header=node_data.mask_authorization_header
+                    ),
+                }
+            )
+        finally:
+            response.close()
 
     def _get_request_timeout(self, node_data: HttpRequestNodeData) -> HttpRequestNodeData.Timeout:
         timeout = node_data.timeout
@@ -132,7 +135,7 @@ class HttpRequestNode(BaseNode):
         Extract files from response
         """
         files = []
-        mimetype, file_binary = response.extract_file()
+        mimetype = response.get_content_type() if response.is_file else ''
         # if not image, return directly
         if 'image' not in mimetype:
             return files
@@ -143,13 +146,24 @@ class HttpRequestNode(BaseNode):
             # extract extension if possible
             extension = guess_extension(mimetype) or '.bin'
 
-            tool_file = ToolFileManager.create_file_by_raw(
-                user_id=self.user_id, 
-                tenant_id=self.tenant_id, 
-                conversation_id=None, 
-                file_binary=file_binary, 
-                mimetype=mimetype,
-            )
+            if response.file is not None:
+                # the streamed body is saved without being read into memory
+                response.file.seek(0)
+                tool_file = ToolFileManager.create_file_by_stream(
+                    user_id=self.user_id,
+                    tenant_id=self.tenant_id,
+                    conversation_id=None,
+                    stream=response.file,
+                    mimetype=mimetype,
+                )
+            else:
+                tool_file = ToolFileManager.create_file_by_raw(
+                    user_id=self.user_id, 
+                    tenant_id=self.tenant_id, 
+                    conversation_id=None, 
+                    file_binary=response.body, 
+                    mimetype=mimetype,
+                )
 
             files.append(FileVar(
                 tenant_id=self.tenant_id,
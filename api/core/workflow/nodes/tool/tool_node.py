@@ -55,7 +55,7 @@ class ToolNode(BaseNode):
         parameters = self._generate_parameters(variable_pool, node_data, tool_runtime)
 
         try:
-            messages = ToolEngine.workflow_invoke(
+            messages, cache_hit = ToolEngine.workflow_invoke(
                 tool=tool_runtime,
                 tool_parameters=parameters,
                 user_id=self.user_id,
@@ -76,6 +76,12 @@ class ToolNode(BaseNode):
         # convert tool messages
         plain_text, files, json = self._convert_tool_messages(messages)
 
+        metadata = {
+            NodeRunMetadataKey.TOOL_INFO: tool_info
+        }
+        if cache_hit is not None:
+            metadata[NodeRunMetadataKey.TOOL_CACHE_HIT] = cache_hit
+
         return NodeRunResult(
             status=WorkflowNodeExecutionStatus.SUCCEEDED,
             outputs={
@@ -83,9 +89,7 @@ class ToolNode(BaseNode):
                 'files': files,
                 'json': json
             },
-            metadata={
-                NodeRunMetadataKey.TOOL_INFO: tool_info
-            },
+            metadata=metadata,
             inputs=parameters
         )
 
@@ -42,6 +42,10 @@ def init_app(app: Flask) -> Celery:
     imports = [
         "schedule.clean_embedding_cache_task",
         "schedule.clean_unused_datasets_task",
+        "schedule.rollup_app_statistics_task",
+        "schedule.flush_api_token_last_used_task",
+        "schedule.flush_account_last_active_task",
+        "schedule.flush_annotation_hit_histories_task",
     ]
 
     beat_schedule = {
@@ -52,6 +56,22 @@ def init_app(app: Flask) -> Celery:
         'clean_unused_datasets_task': {
             'task': 'schedule.clean_unused_datasets_task.clean_unused_datasets_task',
             'schedule': timedelta(days=1),
+        },
+        'rollup_app_statistics_task': {
+            'task': 'schedule.rollup_app_statistics_task.rollup_app_statistics_task',
+            'schedule': timedelta(minutes=15),
+        },
+        'flush_api_token_last_used_task': {
+            'task': 'schedule.flush_api_token_last_used_task.flush_api_token_last_used_task',
+            'schedule': timedelta(seconds=app.config["API_TOKEN_LAST_USED_UPDATE_INTERVAL"]),
+        },
+        'flush_account_last_active_task': {
+            'task': 'schedule.flush_account_last_active_task.flush_account_last_active_task',
+            'schedule': timedelta(minutes=1),
+        },
+        'flush_annotation_hit_histories_task': {
+            'task': 'schedule.flush_annotation_hit_histories_task.flush_annotation_hit_histories_task',
+            'schedule': timedelta(seconds=app.config["ANNOTATION_HIT_HISTORY_FLUSH_INTERVAL"]),
         }
     }
     celery_app.conf.update(
@@ -1,5 +1,5 @@
 from collections.abc import Generator
-from typing import Union
+from typing import IO, Union
 
 from flask import Flask
 
@@ -48,6 +48,9 @@ class Storage:
     def save(self, filename, data):
         self.storage_runner.save(filename, data)
 
+    def save_stream(self, filename, stream: IO[bytes]):
+        self.storage_runner.save_stream(filename, stream)
+
     def load(self, filename: str, stream: bool = False) -> Union[bytes, Generator]:
         if stream:
             return self.load_stream(filename)
@@ -1,5 +1,6 @@
 from collections.abc import Generator
 from contextlib import closing
+from typing import IO
 
 import oss2 as aliyun_s3
 from flask import Flask
@@ -33,6 +34,9 @@ class AliyunStorage(BaseStorage):
     def save(self, filename, data):
         self.client.put_object(filename, data)
 
+    def save_stream(self, filename, stream: IO[bytes]):
+        self.client.put_object(filename, stream)
+
     def load_once(self, filename: str) -> bytes:
         with closing(self.client.get_object(filename)) as obj:
             data = obj.read()
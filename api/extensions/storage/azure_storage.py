@@ -1,6 +1,7 @@
 from collections.abc import Generator
 from contextlib import closing
 from datetime import datetime, timedelta, timezone
+from typing import IO
 
 from azure.storage.blob import AccountSasPermissions, BlobServiceClient, ResourceTypes, generate_account_sas
 from flask import Flask
@@ -26,6 +27,11 @@ class AzureStorage(BaseStorage):
         blob_container = client.get_container_client(container=self.bucket_name)
         blob_container.upload_blob(filename, data)
 
+    def save_stream(self, filename, stream: IO[bytes]):
+        client = self._sync_client()
+        blob_container = client.get_container_client(container=self.bucket_name)
+        blob_container.upload_blob(filename, stream)
+
     def load_once(self, filename: str) -> bytes:
         client = self._sync_client()
         blob = client.get_container_client(container=self.bucket_name)
@@ -1,6 +1,7 @@
 """Abstract interface for file storage implementations."""
 from abc import ABC, abstractmethod
 from collections.abc import Generator
+from typing import IO
 
 from flask import Flask
 
@@ -17,6 +18,13 @@ class BaseStorage(ABC):
     def save(self, filename, data):
         raise NotImplementedError
 
+    def save_stream(self, filename, stream: IO[bytes]):
+        """Save the content of a readable binary stream.
+
+        Backends that can upload from a file object override this to avoid reading it into memory.
+        """
+        self.save(filename, stream.read())
+
     @abstractmethod
     def load_once(self, filename: str) -> bytes:
         raise NotImplementedError
@@ -1,6 +1,7 @@
 import os
 import shutil
 from collections.abc import Generator
+from typing import IO
 
 from flask import Flask
 
@@ -30,6 +31,18 @@ class LocalStorage(BaseStorage):
         with open(os.path.join(os.getcwd(), filename), "wb") as f:
             f.write(data)
 
+    def save_stream(self, filename, stream: IO[bytes]):
+        if not self.folder or self.folder.endswith('/'):
+            filename = self.folder + filename
+        else:
+            filename = self.folder + '/' + filename
+
+        folder = os.path.dirname(filename)
+        os.makedirs(folder, exist_ok=True)
+
+        with open(os.path.join(os.getcwd(), filename), "wb") as f:
+            shutil.copyfileobj(stream, f)
+
     def load_once(self, filename: str) -> bytes:
         if not self.folder or self.folder.endswith('/'):
             filename = self.folder + filename
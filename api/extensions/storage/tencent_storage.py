@@ -1,4 +1,5 @@
 from collections.abc import Generator
+from typing import IO
 
 from flask import Flask
 from qcloud_cos import CosConfig, CosS3Client
@@ -25,6 +26,9 @@ class TencentStorage(BaseStorage):
     def save(self, filename, data):
         self.client.put_object(Bucket=self.bucket_name, Body=data, Key=filename)
 
+    def save_stream(self, filename, stream: IO[bytes]):
+        self.client.put_object(Bucket=self.bucket_name, Body=stream, Key=filename)
+
     def load_once(self, filename: str) -> bytes:
         data = self.client.get_object(Bucket=self.bucket_name, Key=filename)['Body'].get_raw_stream().read()
         return data
@@ -0,0 +1,157 @@
+import logging
+import time
+from collections.abc import Callable, Generator
+from typing import Any, Optional
+
+from flask import current_app
+from sqlalchemy import delete, select
+
+from extensions.ext_database import db
+from extensions.ext_redis import redis_client
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_EXPIRE_SECONDS = 7 * 24 * 60 * 60
+
+
+class BatchPurger:
+    """
+    Set-based purge of the rows of a model matching some filters.
+
+    Rows are walked in primary key order with keyset pagination and deleted in chunks,
+    each chunk in its own short transaction:
+
+        DELETE FROM table WHERE id IN (SELECT id FROM table WHERE ... AND id > :cursor ORDER BY id LIMIT :n)
+
+    The cursor is checkpointed in redis after every chunk when a checkpoint key is given,
+    so an interrupted purge resumes where it stopped instead of rescanning the table.
+    """
+
+    def __init__(self, model: Any,
+                 filters: Optional[list] = None,
+                 batch_size: int = 1000,
+                 sleep_seconds: Optional[float] = None,
+                 checkpoint_key: Optional[str] = None,
+                 before_delete: Optional[Callable[[list[str]], None]] = None,
+                 progress_callback: Optional[Callable[[int, int], None]] = None):
+        """
+        :param model: model class, its primary key must be `id`
+        :param filters: filters of the rows to purge
+        :param batch_size: rows deleted per transaction
+        :param sleep_seconds: pause between two chunks to throttle the load on the database,
+            default to the PURGE_BATCH_SLEEP_SECONDS config
+        :param checkpoint_key: redis key to store the cursor in, makes the purge resumable
+        :param before_delete: called with the ids of every chunk before it is deleted,
+            in the same transaction, e.g. to delete dependent rows
+        :param progress_callback: called with (rows deleted by the chunk, total rows deleted) after every chunk
+        """
+        self.model = model
+        self.filters = filters or []
+        self.batch_size = batch_size
+        if sleep_seconds is None:
+            sleep_seconds = current_app.config.get('PURGE_BATCH_SLEEP_SECONDS', 0.0)
+        self.sleep_seconds = sleep_seconds
+        self.checkpoint_key = checkpoint_key
+        self.before_delete = before_delete
+        self.progress_callback = progress_callback
+
+    def run(self) -> int:
+        """
+        Purge all the matching rows.
+
+        :return: number of deleted rows
+        """
+        total_deleted = 0
+        start_at = time.perf_counter()
+        for deleted in self._purge_batches():
+            total_deleted += deleted
+            logger.info(f'Purged {deleted} rows from {self.model.__tablename__}, '
+                        f'total {total_deleted}, latency {time.perf_counter() - start_at:.2f}s')
+            if self.progress_callback:
+                self.progress_callback(deleted, total_deleted)
+
+        self._clear_checkpoint()
+        return total_deleted
+
+    def _purge_batches(self) -> Generator[int, None, None]:
+        cursor = self._load_checkpoint()
+        while True:
+            try:
+                if self.before_delete:
+                    ids = db.session.scalars(self._select_ids(cursor)).all()
+                    if ids:
+                        self.before_delete(list(ids))
+                        db.session.execute(
+                            delete(self.model).where(self.model.id.in_(ids)).execution_options(
+                                synchronize_session=False)
+                        )
+                else:
+                    ids = db.session.scalars(
+                        delete(self.model)
+                        .where(self.model.id.in_(self._select_ids(cursor).scalar_subquery()))
+                        .returning(self.model.id)
+                        .execution_options(synchronize_session=False)
+                    ).all()
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+
+            if not ids:
+                break
+
+            cursor = max(str(_id) for _id in ids)
+            self._save_checkpoint(cursor)
+            yield len(ids)
+
+            if len(ids) < self.batch_size:
+                break
+
+            if self.sleep_seconds:
+                time.sleep(self.sleep_seconds)
+
+    def _select_ids(self, cursor: Optional[str]):
+        stmt = select(self.model.id).where(*self.filters)
+        if cursor:
+            stmt = stmt.where(self.model.id > cursor)
+        return stmt.order_by(self.model.id).limit(self.batch_size)
+
+    def _load_checkpoint(self) -> Optional[str]:
+        if not self.checkpoint_key:
+            return None
+
+        cursor = redis_client.get(self.checkpoint_key)
+        if cursor:
+            cursor = cursor.decode('utf-8')
+            logger.info(f'Resume purging {self.model.__tablename__} after {cursor}')
+        return cursor
+
+    def _save_checkpoint(self, cursor: str) -> None:
+        if self.checkpoint_key:
+            redis_client.setex(self.checkpoint_key, CHECKPOINT_EXPIRE_SECONDS, cursor)
+
+    def _clear_checkpoint(self) -> None:
+        if self.checkpoint_key:
+            redis_client.delete(self.checkpoint_key)
+
+
+def iter_id_batches(model: Any, filters: Optional[list] = None,
+                    batch_size: int = 1000) -> Generator[list[str], None, None]:
+    """
+    Iterate over the ids of the rows of a model matching some filters in primary key order,
+    with keyset pagination so that rows are neither skipped nor repeated when they are modified meanwhile.
+    """
+    cursor = None
+    while True:
+        stmt = select(model.id).where(*(filters or []))
+        if cursor:
+            stmt = stmt.where(model.id > cursor)
+        ids = db.session.scalars(stmt.order_by(model.id).limit(batch_size)).all()
+        if not ids:
+            break
+
+        yield list(ids)
+
+        if len(ids) < batch_size:
+            break
+        cursor = ids[-1]
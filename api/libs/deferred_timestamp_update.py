@@ -0,0 +1,94 @@
+import logging
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import Column, bindparam
+
+from extensions.ext_database import db
+from extensions.ext_redis import redis_client
+
+logger = logging.getLogger(__name__)
+
+FLUSH_LOCK_TIMEOUT = 600
+FLUSH_BATCH_SIZE = 500
+# rows whose last record is kept in memory of each process, beyond that the records are forgotten
+RECORDED_ROWS_SIZE = 10000
+
+
+class DeferredTimestampUpdate:
+    """
+    Timestamps of rows, such as a last used time, recorded in a redis hash by the requests
+    and written to the database by a periodic batched flush, instead of one write transaction per request.
+    """
+
+    def __init__(self, column: Column, name: str):
+        """
+        :param column: the timestamp column, of a table with an `id` primary key
+        :param name: the name of the redis hash of the records
+        """
+        self.column = column
+        self.key = name
+        self.flushing_key = f'{name}:flushing'
+        self.lock_name = f'{name}_flush_lock'
+        # row id -> when its timestamp was last recorded by this process
+        self._recorded: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def record(self, row_id: str, value: datetime, interval: float) -> None:
+        """
+        Record the timestamp of a row, every process records it at most once per interval seconds.
+        """
+        now = time.monotonic()
+        with self._lock:
+            recorded = self._recorded.get(row_id)
+            if recorded is not None and now - recorded < interval:
+                return
+            if len(self._recorded) >= RECORDED_ROWS_SIZE:
+                self._recorded.clear()
+            self._recorded[row_id] = now
+
+        try:
+            redis_client.hset(self.key, row_id, value.isoformat())
+        except Exception:
+            logger.warning(f'Failed to record {self.key}', exc_info=True)
+
+    def flush(self) -> int:
+        """
+        Write the timestamps recorded since the previous flush to the database.
+
+        :return: the number of rows updated
+        """
+        lock = redis_client.lock(self.lock_name, timeout=FLUSH_LOCK_TIMEOUT)
+        if not lock.acquire(blocking=False):
+            logger.info(f'Flush of {self.key} is already running, skip.')
+            return 0
+
+        try:
+            # the records of a failed flush are written before the new ones are taken
+            if not redis_client.exists(self.flushing_key):
+                if not redis_client.exists(self.key):
+                    return 0
+                redis_client.rename(self.key, self.flushing_key)
+
+            values = [
+                {'row_id': row_id.decode('utf-8'), 'row_value': datetime.fromisoformat(value.decode('utf-8'))}
+                for row_id, value in redis_client.hgetall(self.flushing_key).items()
+            ]
+
+            table = self.column.table
+            # an executemany of the update, rows deleted since they were recorded match no row
+            statement = table.update().where(table.c.id == bindparam('row_id')).values(
+                {self.column.name: bindparam('row_value')}
+            )
+            for i in range(0, len(values), FLUSH_BATCH_SIZE):
+                db.session.execute(statement, values[i:i + FLUSH_BATCH_SIZE])
+                db.session.commit()
+
+            redis_client.delete(self.flushing_key)
+            return len(values)
+        finally:
+            try:
+                lock.release()
+            except Exception:
+                logger.exception(f'Failed to release the flush lock of {self.key}')
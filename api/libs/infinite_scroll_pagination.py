@@ -1,6 +1,55 @@
+from datetime import datetime
+from typing import Any, NamedTuple, Optional
+
+from sqlalchemy import tuple_
+
 
 class InfiniteScrollPagination:
     def __init__(self, data, limit, has_more):
         self.data = data
         self.limit = limit
         self.has_more = has_more
+
+
+class KeysetCursor(NamedTuple):
+    """
+    Position of a row in a `created_at, id` ordered list.
+
+    `id` breaks the ties between rows created in the same second, so that they are neither skipped nor repeated.
+    """
+    created_at: datetime
+    id: str
+
+    @classmethod
+    def of(cls, row: Any) -> 'KeysetCursor':
+        return cls(created_at=row.created_at, id=str(row.id))
+
+
+def paginate_by_keyset(query, model: Any, limit: int,
+                       cursor: Optional[KeysetCursor] = None,
+                       descending: bool = True) -> tuple[list, bool]:
+    """
+    Fetch the page of rows following the cursor, ordered by `(created_at, id)`.
+
+    One row more than the limit is fetched to tell whether there are more rows after the page,
+    instead of counting them.
+
+    :param query: query of the rows to paginate, with all the filters applied
+    :param model: model class, must have `created_at` and `id` columns
+    :param limit: max number of rows of the page
+    :param cursor: position of the last row of the previous page, None for the first page
+    :param descending: walk from the newest rows to the oldest ones
+    :return: rows of the page and whether there are more rows after it
+    """
+    keys = tuple_(model.created_at, model.id)
+    if cursor:
+        position = (cursor.created_at, cursor.id)
+        query = query.filter(keys < position if descending else keys > position)
+
+    if descending:
+        query = query.order_by(model.created_at.desc(), model.id.desc())
+    else:
+        query = query.order_by(model.created_at.asc(), model.id.asc())
+
+    rows = query.limit(limit + 1).all()
+    return rows[:limit], len(rows) > limit
@@ -1,8 +1,16 @@
+import json
+from collections.abc import Callable
 from enum import Enum
+from typing import Any, Optional
 
 from sqlalchemy import CHAR, TypeDecorator
 from sqlalchemy.dialects.postgresql import UUID
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 
 class CreatedByRole(Enum):
     """
@@ -69,3 +77,54 @@ class StringUUID(TypeDecorator):
         if value is None:
             return value
         return str(value)
+
+
+def loads_json(text: str) -> Any:
+    """
+    Parse JSON with orjson when it is installed, and with json for what orjson rejects, such as NaN.
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(text)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(text)
+
+
+class JSONProperty:
+    """
+    Read-only property of the JSON of a text column, parsed once per value of the column.
+
+    The parsed value is kept with the row and parsed again when another value is assigned to the column
+    or the row is refreshed. It is shared by the accesses to the property and must not be modified,
+    copy it first, then assign the dumped copy to the column.
+    """
+
+    def __init__(self, column_name: str, default: Optional[Callable[[], Any]] = None):
+        """
+        :param column_name: the name of the column
+        :param default: returns the value of the property when the column is empty
+        """
+        self.column_name = column_name
+        self.default = default
+        self.cache_key = f'_{column_name}_json'
+
+    def __set_name__(self, owner, name):
+        self.cache_key = f'_{name}_json'
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+
+        text = getattr(instance, self.column_name)
+        if not text:
+            return self.default() if self.default else None
+
+        cached = instance.__dict__.get(self.cache_key)
+        # the text of the row is the same object as long as the column is not assigned or refreshed
+        if cached is not None and cached[0] is text:
+            return cached[1]
+
+        value = loads_json(text)
+        instance.__dict__[self.cache_key] = (text, value)
+        return value
@@ -10,8 +10,9 @@ import time
 from json import JSONDecodeError
 
 from flask import current_app
-from sqlalchemy import func
+from sqlalchemy import event, func
 from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Session
 
 from core.rag.retrieval.retrival_methods import RetrievalMethod
 from extensions.ext_database import db
@@ -53,6 +54,60 @@ class Dataset(db.Model):
     collection_binding_id = db.Column(StringUUID, nullable=True)
     retrieval_model = db.Column(JSONB, nullable=True)
 
+    # aggregates loaded by `preload_aggregates`, None when they are queried on access.
+    # They are dropped as soon as the session writes, see `_reset_preloaded_aggregates`.
+    _preloaded = None
+
+    @classmethod
+    def preload_aggregates(cls, datasets: list['Dataset']) -> None:
+        """
+        Load the app count, document count, word count and tags of a page of datasets
+        with one query per aggregate, instead of one query per dataset and aggregate when they are marshalled.
+        """
+        if not datasets:
+            return
+
+        dataset_ids = [dataset.id for dataset in datasets]
+        preloaded = {
+            dataset_id: {
+                'app_count': 0,
+                'document_count': 0,
+                'word_count': None,
+                'tags': [],
+            } for dataset_id in dataset_ids
+        }
+
+        app_counts = db.session.query(AppDatasetJoin.dataset_id, func.count(AppDatasetJoin.id)).filter(
+            AppDatasetJoin.dataset_id.in_(dataset_ids),
+            App.id == AppDatasetJoin.app_id
+        ).group_by(AppDatasetJoin.dataset_id).all()
+        for dataset_id, app_count in app_counts:
+            preloaded[dataset_id]['app_count'] = app_count
+
+        document_aggregates = db.session.query(
+            Document.dataset_id, func.count(Document.id), func.sum(Document.word_count)
+        ).filter(Document.dataset_id.in_(dataset_ids)).group_by(Document.dataset_id).all()
+        for dataset_id, document_count, word_count in document_aggregates:
+            preloaded[dataset_id]['document_count'] = document_count
+            preloaded[dataset_id]['word_count'] = word_count
+
+        tenant_ids = {dataset.id: dataset.tenant_id for dataset in datasets}
+        tag_bindings = db.session.query(TagBinding.target_id, TagBinding.tenant_id, Tag).join(
+            Tag,
+            Tag.id == TagBinding.tag_id
+        ).filter(
+            TagBinding.target_id.in_(dataset_ids),
+            Tag.tenant_id == TagBinding.tenant_id,
+            Tag.type == 'knowledge'
+        ).all()
+        for dataset_id, tenant_id, tag in tag_bindings:
+            if tenant_ids[dataset_id] == tenant_id:
+                preloaded[dataset_id]['tags'].append(tag)
+
+        for dataset in datasets:
+            dataset._preloaded = preloaded[dataset.id]
+        db.session.info.setdefault('preloaded_aggregates', []).extend(datasets)
+
     @property
     def dataset_keyword_table(self):
         dataset_keyword_table = db.session.query(DatasetKeywordTable).filter(
@@ -77,11 +132,15 @@ class Dataset(db.Model):
 
     @property
     def app_count(self):
+        if self._preloaded is not None:
+            return self._preloaded['app_count']
         return db.session.query(func.count(AppDatasetJoin.id)).filter(AppDatasetJoin.dataset_id == self.id,
                                                                       App.id == AppDatasetJoin.app_id).scalar()
 
     @property
     def document_count(self):
+        if self._preloaded is not None:
+            return self._preloaded['document_count']
         return db.session.query(func.count(Document.id)).filter(Document.dataset_id == self.id).scalar()
 
     @property
@@ -103,6 +162,8 @@ class Dataset(db.Model):
 
     @property
     def word_count(self):
+        if self._preloaded is not None:
+            return self._preloaded['word_count']
         return Document.query.with_entities(func.coalesce(func.sum(Document.word_count))) \
             .filter(Document.dataset_id == self.id).scalar()
 
@@ -130,6 +191,8 @@ class Dataset(db.Model):
 
     @property
     def tags(self):
+        if self._preloaded is not None:
+            return self._preloaded['tags']
         tags = db.session.query(Tag).join(
             TagBinding,
             Tag.id == TagBinding.tag_id
@@ -204,6 +267,8 @@ class Document(db.Model):
         db.Index('document_dataset_id_idx', 'dataset_id'),
         db.Index('document_is_paused_idx', 'is_paused'),
         db.Index('document_tenant_idx', 'tenant_id'),
+        db.Index('document_upload_file_id_idx', db.text("(data_source_info::jsonb ->> 'upload_file_id')"),
+                 postgresql_where=db.text("data_source_type = 'upload_file'")),
     )
 
     # initial fields
@@ -273,6 +338,64 @@ class Document(db.Model):
 
     DATA_SOURCES = ['upload_file', 'notion_import', 'website_crawl']
 
+    # aggregates of the segments and upload file loaded by `preload_aggregates`, None when they are queried
+    # on access. They are dropped as soon as the session writes, see `_reset_preloaded_aggregates`.
+    _preloaded = None
+
+    @classmethod
+    def preload_aggregates(cls, documents: list['Document']) -> None:
+        """
+        Load the segment counts, hit count and upload file of a page of documents with one query each,
+        instead of one query per document and aggregate when they are marshalled.
+        """
+        if not documents:
+            return
+
+        document_ids = [document.id for document in documents]
+        preloaded = {
+            document_id: {
+                'segment_count': 0,
+                'hit_count': None,
+                'total_segments': 0,
+                'completed_segments': 0,
+                'upload_file': None,
+            } for document_id in document_ids
+        }
+
+        not_re_segment = DocumentSegment.status != 're_segment'
+        segment_aggregates = db.session.query(
+            DocumentSegment.document_id,
+            func.count(DocumentSegment.id),
+            func.sum(DocumentSegment.hit_count),
+            func.count(DocumentSegment.id).filter(not_re_segment),
+            func.count(DocumentSegment.id).filter(not_re_segment, DocumentSegment.completed_at.isnot(None)),
+        ).filter(DocumentSegment.document_id.in_(document_ids)).group_by(DocumentSegment.document_id).all()
+        for document_id, segment_count, hit_count, total_segments, completed_segments in segment_aggregates:
+            preloaded[document_id].update({
+                'segment_count': segment_count,
+                'hit_count': hit_count,
+                'total_segments': total_segments,
+                'completed_segments': completed_segments,
+            })
+
+        upload_file_ids = {}
+        for document in documents:
+            if document.data_source_type == 'upload_file' and document.data_source_info:
+                upload_file_id = (document.data_source_info_dict or {}).get('upload_file_id')
+                if upload_file_id:
+                    upload_file_ids[document.id] = upload_file_id
+        if upload_file_ids:
+            upload_files = {
+                upload_file.id: upload_file for upload_file in
+                db.session.query(UploadFile).filter(UploadFile.id.in_(set(upload_file_ids.values()))).all()
+            }
+            for document_id, upload_file_id in upload_file_ids.items():
+                preloaded[document_id]['upload_file'] = upload_files.get(upload_file_id)
+
+        for document in documents:
+            document._preloaded = preloaded[document.id]
+        db.session.info.setdefault('preloaded_aggregates', []).extend(documents)
+
     @property
     def display_status(self):
         status = None
@@ -307,10 +430,13 @@ class Document(db.Model):
     def data_source_detail_dict(self):
         if self.data_source_info:
             if self.data_source_type == 'upload_file':
-                data_source_info_dict = json.loads(self.data_source_info)
-                file_detail = db.session.query(UploadFile). \
-                    filter(UploadFile.id == data_source_info_dict['upload_file_id']). \
-                    one_or_none()
+                if self._preloaded is not None:
+                    file_detail = self._preloaded['upload_file']
+                else:
+                    data_source_info_dict = json.loads(self.data_source_info)
+                    file_detail = db.session.query(UploadFile). \
+                        filter(UploadFile.id == data_source_info_dict['upload_file_id']). \
+                        one_or_none()
                 if file_detail:
                     return {
                         'upload_file': {
@@ -345,13 +471,32 @@ class Document(db.Model):
 
     @property
     def segment_count(self):
+        if self._preloaded is not None:
+            return self._preloaded['segment_count']
         return DocumentSegment.query.filter(DocumentSegment.document_id == self.id).count()
 
     @property
     def hit_count(self):
+        if self._preloaded is not None:
+            return self._preloaded['hit_count']
         return DocumentSegment.query.with_entities(func.coalesce(func.sum(DocumentSegment.hit_count))) \
             .filter(DocumentSegment.document_id == self.id).scalar()
 
+    @property
+    def completed_segments(self):
+        if self._preloaded is not None:
+            return self._preloaded['completed_segments']
+        return DocumentSegment.query.filter(DocumentSegment.completed_at.isnot(None),
+                                            DocumentSegment.document_id == self.id,
+                                            DocumentSegment.status != 're_segment').count()
+
+    @property
+    def total_segments(self):
+        if self._preloaded is not None:
+            return self._preloaded['total_segments']
+        return DocumentSegment.query.filter(DocumentSegment.document_id == self.id,
+                                            DocumentSegment.status != 're_segment').count()
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -496,12 +641,34 @@ class DocumentSegment(db.Model):
     error = db.Column(db.Text, nullable=True)
     stopped_at = db.Column(db.DateTime, nullable=True)
 
+    # document loaded by `preload_documents`, None when it is queried on access.
+    # It is dropped as soon as the session writes, see `_reset_preloaded_aggregates`.
+    _preloaded = None
+
+    @classmethod
+    def preload_documents(cls, segments: list['DocumentSegment']) -> None:
+        """
+        Load the documents of segments with one query, instead of one query per segment when they are marshalled.
+        """
+        if not segments:
+            return
+
+        documents = {
+            document.id: document for document in
+            db.session.query(Document).filter(Document.id.in_({segment.document_id for segment in segments})).all()
+        }
+        for segment in segments:
+            segment._preloaded = {'document': documents.get(segment.document_id)}
+        db.session.info.setdefault('preloaded_aggregates', []).extend(segments)
+
     @property
     def dataset(self):
         return db.session.query(Dataset).filter(Dataset.id == self.dataset_id).first()
 
     @property
     def document(self):
+        if self._preloaded is not None:
+            return self._preloaded['document']
         return db.session.query(Document).filter(Document.id == self.document_id).first()
 
     @property
@@ -663,3 +830,39 @@ class DatasetCollectionBinding(db.Model):
     type = db.Column(db.String(40), server_default=db.text("'dataset'::character varying"), nullable=False)
     collection_name = db.Column(db.String(64), nullable=False)
     created_at = db.Column(db.DateTime, nullable=False, server_default=db.text('CURRENT_TIMESTAMP(0)'))
+
+
+class VectorMigrationCheckpoint(db.Model):
+    """
+    Progress of the migration of the vectors of a dataset to a vector store, to resume it after a failure.
+    """
+    __tablename__ = 'vector_migration_checkpoints'
+    __table_args__ = (
+        db.PrimaryKeyConstraint('id', name='vector_migration_checkpoint_pkey'),
+        db.UniqueConstraint('vector_type', 'dataset_id', name='vector_migration_checkpoint_dataset_idx'),
+    )
+
+    id = db.Column(StringUUID, nullable=False, server_default=db.text('uuid_generate_v4()'))
+    vector_type = db.Column(db.String(40), nullable=False)
+    dataset_id = db.Column(StringUUID, nullable=False)
+    # migrating, completed or failed
+    status = db.Column(db.String(20), nullable=False)
+    # the segments are migrated in the order of their ids, up to this one
+    last_segment_id = db.Column(StringUUID, nullable=True)
+    migrated_count = db.Column(db.Integer, nullable=False, server_default=db.text('0'))
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, server_default=db.text('CURRENT_TIMESTAMP(0)'))
+    updated_at = db.Column(db.DateTime, nullable=False, server_default=db.text('CURRENT_TIMESTAMP(0)'))
+
+
+@event.listens_for(Session, 'after_flush')
+@event.listens_for(Session, 'after_commit')
+@event.listens_for(Session, 'after_rollback')
+def _reset_preloaded_aggregates(session, *args):
+    """
+    Drop the aggregates preloaded on the datasets, documents and segments of a session whenever it writes,
+    so that they are queried again instead of returning stale counts.
+    """
+    preloaded_rows = session.info.pop('preloaded_aggregates', None)
+    for row in preloaded_rows or []:
+        row._preloaded = None
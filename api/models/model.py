@@ -6,14 +6,15 @@ from typing import Optional
 
 from flask import current_app, request
 from flask_login import UserMixin
-from sqlalchemy import Float, func, text
+from sqlalchemy import Float, event, func, text
+from sqlalchemy.orm import Session
 
 from core.file.tool_file_parser import ToolFileParser
 from core.file.upload_file_parser import UploadFileParser
 from extensions.ext_database import db
 from libs.helper import generate_string
 
-from . import StringUUID
+from . import JSONProperty, StringUUID
 from .account import Account, Tenant
 
 
@@ -240,33 +241,14 @@ class AppModelConfig(db.Model):
         app = db.session.query(App).filter(App.id == self.app_id).first()
         return app
 
-    @property
-    def model_dict(self) -> dict:
-        return json.loads(self.model) if self.model else None
-
-    @property
-    def suggested_questions_list(self) -> list:
-        return json.loads(self.suggested_questions) if self.suggested_questions else []
-
-    @property
-    def suggested_questions_after_answer_dict(self) -> dict:
-        return json.loads(self.suggested_questions_after_answer) if self.suggested_questions_after_answer \
-            else {"enabled": False}
-
-    @property
-    def speech_to_text_dict(self) -> dict:
-        return json.loads(self.speech_to_text) if self.speech_to_text \
-            else {"enabled": False}
-
-    @property
-    def text_to_speech_dict(self) -> dict:
-        return json.loads(self.text_to_speech) if self.text_to_speech \
-            else {"enabled": False}
-
-    @property
-    def retriever_resource_dict(self) -> dict:
-        return json.loads(self.retriever_resource) if self.retriever_resource \
-            else {"enabled": True}
+    # the JSON of the columns is parsed once per row, the values are shared and must not be modified
+    model_dict = JSONProperty('model')
+    suggested_questions_list = JSONProperty('suggested_questions', default=list)
+    suggested_questions_after_answer_dict = JSONProperty('suggested_questions_after_answer',
+                                                         default=lambda: {"enabled": False})
+    speech_to_text_dict = JSONProperty('speech_to_text', default=lambda: {"enabled": False})
+    text_to_speech_dict = JSONProperty('text_to_speech', default=lambda: {"enabled": False})
+    retriever_resource_dict = JSONProperty('retriever_resource', default=lambda: {"enabled": True})
 
     @property
     def annotation_reply_dict(self) -> dict:
@@ -287,53 +269,27 @@ class AppModelConfig(db.Model):
         else:
             return {"enabled": False}
 
-    @property
-    def more_like_this_dict(self) -> dict:
-        return json.loads(self.more_like_this) if self.more_like_this else {"enabled": False}
-
-    @property
-    def sensitive_word_avoidance_dict(self) -> dict:
-        return json.loads(self.sensitive_word_avoidance) if self.sensitive_word_avoidance \
-            else {"enabled": False, "type": "", "configs": []}
-
-    @property
-    def external_data_tools_list(self) -> list[dict]:
-        return json.loads(self.external_data_tools) if self.external_data_tools \
-            else []
-
-    @property
-    def user_input_form_list(self) -> dict:
-        return json.loads(self.user_input_form) if self.user_input_form else []
-
-    @property
-    def agent_mode_dict(self) -> dict:
-        return json.loads(self.agent_mode) if self.agent_mode else {"enabled": False, "strategy": None, "tools": [],
-                                                                    "prompt": None}
-
-    @property
-    def chat_prompt_config_dict(self) -> dict:
-        return json.loads(self.chat_prompt_config) if self.chat_prompt_config else {}
-
-    @property
-    def completion_prompt_config_dict(self) -> dict:
-        return json.loads(self.completion_prompt_config) if self.completion_prompt_config else {}
+    more_like_this_dict = JSONProperty('more_like_this', default=lambda: {"enabled": False})
+    sensitive_word_avoidance_dict = JSONProperty('sensitive_word_avoidance',
+                                                 default=lambda: {"enabled": False, "type": "", "configs": []})
+    external_data_tools_list = JSONProperty('external_data_tools', default=list)
+    user_input_form_list = JSONProperty('user_input_form', default=list)
+    agent_mode_dict = JSONProperty('agent_mode',
+                                   default=lambda: {"enabled": False, "strategy": None, "tools": [], "prompt": None})
+    chat_prompt_config_dict = JSONProperty('chat_prompt_config', default=dict)
+    completion_prompt_config_dict = JSONProperty('completion_prompt_config', default=dict)
+    _dataset_configs_json = JSONProperty('dataset_configs')
+    file_upload_dict = JSONProperty('file_upload', default=lambda: {
+        "image": {"enabled": False, "number_limits": 3, "detail": "high",
+                  "transfer_methods": ["remote_url", "local_file"]}})
 
     @property
     def dataset_configs_dict(self) -> dict:
-        if self.dataset_configs:
-            dataset_configs = json.loads(self.dataset_configs)
-            if 'retrieval_model' not in dataset_configs:
-                return {'retrieval_model': 'single'}
-            else:
-                return dataset_configs
+        dataset_configs = self._dataset_configs_json
+        if dataset_configs and 'retrieval_model' in dataset_configs:
+            return dataset_configs
         return {'retrieval_model': 'single'}
 
-    @property
-    def file_upload_dict(self) -> dict:
-        return json.loads(self.file_upload) if self.file_upload else {
-            "image": {"enabled": False, "number_limits": 3, "detail": "high",
-                      "transfer_methods": ["remote_url", "local_file"]}}
-
     def to_dict(self) -> dict:
         return {
             "opening_statement": self.opening_statement,
@@ -485,7 +441,12 @@ class Conversation(db.Model):
     __tablename__ = 'conversations'
     __table_args__ = (
         db.PrimaryKeyConstraint('id', name='conversation_pkey'),
-        db.Index('conversation_app_from_user_idx', 'app_id', 'from_source', 'from_end_user_id')
+        db.Index('conversation_app_from_user_idx', 'app_id', 'from_source', 'from_end_user_id'),
+        db.Index('conversation_app_created_at_idx', 'app_id', 'created_at'),
+        db.Index('conversation_end_user_created_at_idx',
+                 'app_id', 'from_source', 'from_end_user_id', 'created_at', 'id'),
+        db.Index('conversation_account_created_at_idx',
+                 'app_id', 'from_source', 'from_account_id', 'created_at', 'id'),
     )
 
     id = db.Column(StringUUID, server_default=db.text('uuid_generate_v4()'))
@@ -626,7 +587,9 @@ class Message(db.Model):
         db.Index('message_conversation_id_idx', 'conversation_id'),
         db.Index('message_end_user_idx', 'app_id', 'from_source', 'from_end_user_id'),
         db.Index('message_account_idx', 'app_id', 'from_source', 'from_account_id'),
-        db.Index('message_workflow_run_id_idx', 'conversation_id', 'workflow_run_id')
+        db.Index('message_workflow_run_id_idx', 'conversation_id', 'workflow_run_id'),
+        db.Index('message_created_at_idx', 'created_at'),
+        db.Index('message_conversation_created_at_idx', 'conversation_id', 'created_at', 'id'),
     )
 
     id = db.Column(StringUUID, server_default=db.text('uuid_generate_v4()'))
@@ -660,6 +623,75 @@ class Message(db.Model):
     agent_based = db.Column(db.Boolean, nullable=False, server_default=db.text('false'))
     workflow_run_id = db.Column(StringUUID)
 
+    # related rows loaded by `preload_relations`, None when they are queried on access.
+    # They are dropped as soon as the session writes, see `_reset_preloaded_message_relations`.
+    _preloaded = None
+
+    @classmethod
+    def preload_relations(cls, messages: list['Message']) -> None:
+        """
+        Load the feedbacks, annotations, annotation hit histories, agent thoughts, retriever resources and files
+        of a page of messages with one query per relation, instead of one query per message and relation
+        when they are marshalled.
+        """
+        if not messages:
+            return
+
+        message_ids = [message.id for message in messages]
+        preloaded = {
+            message_id: {
+                'feedbacks': [],
+                'annotation': None,
+                'annotation_hit_history': None,
+                'agent_thoughts': [],
+                'retriever_resources': [],
+                'message_files': [],
+            } for message_id in message_ids
+        }
+
+        feedbacks = db.session.query(MessageFeedback).filter(MessageFeedback.message_id.in_(message_ids)).all()
+        for feedback in feedbacks:
+            preloaded[feedback.message_id]['feedbacks'].append(feedback)
+
+        annotations = db.session.query(MessageAnnotation).filter(MessageAnnotation.message_id.in_(message_ids)).all()
+        for annotation in annotations:
+            if preloaded[annotation.message_id]['annotation'] is None:
+                preloaded[annotation.message_id]['annotation'] = annotation
+
+        hit_histories = db.session.query(AppAnnotationHitHistory) \
+            .filter(AppAnnotationHitHistory.message_id.in_(message_ids)).all()
+        hit_annotation_ids = {hit_history.annotation_id for hit_history in hit_histories}
+        hit_annotations = {}
+        if hit_annotation_ids:
+            hit_annotations = {
+                annotation.id: annotation for annotation in
+                db.session.query(MessageAnnotation).filter(MessageAnnotation.id.in_(hit_annotation_ids)).all()
+            }
+        for hit_history in hit_histories:
+            if preloaded[hit_history.message_id]['annotation_hit_history'] is None:
+                preloaded[hit_history.message_id]['annotation_hit_history'] = \
+                    hit_annotations.get(hit_history.annotation_id)
+
+        agent_thoughts = db.session.query(MessageAgentThought) \
+            .filter(MessageAgentThought.message_id.in_(message_ids)) \
+            .order_by(MessageAgentThought.position.asc()).all()
+        for agent_thought in agent_thoughts:
+            preloaded[agent_thought.message_id]['agent_thoughts'].append(agent_thought)
+
+        retriever_resources = db.session.query(DatasetRetrieverResource) \
+            .filter(DatasetRetrieverResource.message_id.in_(message_ids)) \
+            .order_by(DatasetRetrieverResource.position.asc()).all()
+        for retriever_resource in retriever_resources:
+            preloaded[retriever_resource.message_id]['retriever_resources'].append(retriever_resource)
+
+        message_files = db.session.query(MessageFile).filter(MessageFile.message_id.in_(message_ids)).all()
+        for message_file in message_files:
+            preloaded[message_file.message_id]['message_files'].append(message_file)
+
+        for message in messages:
+            message._preloaded = preloaded[message.id]
+        db.session.info.setdefault('preloaded_messages', []).extend(messages)
+
     @property
     def re_sign_file_url_answer(self) -> str:
         if not self.answer:
@@ -727,28 +759,43 @@ class Message(db.Model):
 
     @property
     def user_feedback(self):
+        if self._preloaded is not None:
+            return next((f for f in self._preloaded['feedbacks'] if f.from_source == 'user'), None)
+
         feedback = db.session.query(MessageFeedback).filter(MessageFeedback.message_id == self.id,
                                                             MessageFeedback.from_source == 'user').first()
         return feedback
 
     @property
     def admin_feedback(self):
+        if self._preloaded is not None:
+            return next((f for f in self._preloaded['feedbacks'] if f.from_source == 'admin'), None)
+
         feedback = db.session.query(MessageFeedback).filter(MessageFeedback.message_id == self.id,
                                                             MessageFeedback.from_source == 'admin').first()
         return feedback
 
     @property
     def feedbacks(self):
+        if self._preloaded is not None:
+            return self._preloaded['feedbacks']
+
         feedbacks = db.session.query(MessageFeedback).filter(MessageFeedback.message_id == self.id).all()
         return feedbacks
 
     @property
     def annotation(self):
+        if self._preloaded is not None:
+            return self._preloaded['annotation']
+
         annotation = db.session.query(MessageAnnotation).filter(MessageAnnotation.message_id == self.id).first()
         return annotation
 
     @property
     def annotation_hit_history(self):
+        if self._preloaded is not None:
+            return self._preloaded['annotation_hit_history']
+
         annotation_history = (db.session.query(AppAnnotationHitHistory)
                               .filter(AppAnnotationHitHistory.message_id == self.id).first())
         if annotation_history:
@@ -770,22 +817,29 @@ class Message(db.Model):
     def in_debug_mode(self):
         return self.override_model_configs is not None
 
-    @property
-    def message_metadata_dict(self) -> dict:
-        return json.loads(self.message_metadata) if self.message_metadata else {}
+    message_metadata_dict = JSONProperty('message_metadata', default=dict)
 
     @property
     def agent_thoughts(self):
+        if self._preloaded is not None:
+            return self._preloaded['agent_thoughts']
+
         return db.session.query(MessageAgentThought).filter(MessageAgentThought.message_id == self.id) \
             .order_by(MessageAgentThought.position.asc()).all()
 
     @property
     def retriever_resources(self):
+        if self._preloaded is not None:
+            return self._preloaded['retriever_resources']
+
         return db.session.query(DatasetRetrieverResource).filter(DatasetRetrieverResource.message_id == self.id) \
             .order_by(DatasetRetrieverResource.position.asc()).all()
 
     @property
     def message_files(self):
+        if self._preloaded is not None:
+            return self._preloaded['message_files']
+
         return db.session.query(MessageFile).filter(MessageFile.message_id == self.id).all()
 
     @property
@@ -883,6 +937,19 @@ class Message(db.Model):
         )
 
 
+@event.listens_for(Session, 'after_flush')
+@event.listens_for(Session, 'after_commit')
+@event.listens_for(Session, 'after_rollback')
+def _reset_preloaded_message_relations(session, *args):
+    """
+    Drop the relations preloaded on the messages of a session whenever it writes,
+    so that they are queried again instead of returning stale rows.
+    """
+    preloaded_messages = session.info.pop('preloaded_messages', None)
+    for message in preloaded_messages or []:
+        message._preloaded = None
+
+
 class MessageFeedback(db.Model):
     __tablename__ = 'message_feedbacks'
     __table_args__ = (
@@ -1166,6 +1233,83 @@ class UploadFile(db.Model):
     hash = db.Column(db.String(255), nullable=True)
 
 
+class UploadFileBlob(db.Model):
+    """
+    Content-addressed storage object shared by all upload files of a tenant with the same hash,
+    in the same storage type.
+    """
+    __tablename__ = 'upload_file_blobs'
+    __table_args__ = (
+        db.PrimaryKeyConstraint('id', name='upload_file_blob_pkey'),
+        db.UniqueConstraint('tenant_id', 'hash', 'storage_type', name='unique_upload_file_blob_tenant_hash_storage')
+    )
+
+    id = db.Column(StringUUID, server_default=db.text('uuid_generate_v4()'))
+    tenant_id = db.Column(StringUUID, nullable=False)
+    hash = db.Column(db.String(255), nullable=False)
+    storage_type = db.Column(db.String(255), nullable=False)
+    key = db.Column(db.String(255), nullable=False)
+    size = db.Column(db.BigInteger, nullable=False)
+    ref_count = db.Column(db.Integer, nullable=False, server_default=db.text('1'))
+    created_at = db.Column(db.DateTime, nullable=False, server_default=db.text('CURRENT_TIMESTAMP(0)'))
+    updated_at = db.Column(db.DateTime, nullable=False, server_default=db.text('CURRENT_TIMESTAMP(0)'))
+
+
+class AppStatisticBucket(db.Model):
+    """
+    Pre-aggregated message statistics of an app per 15 minutes bucket (UTC),
+    every timezone offset is a multiple of 15 minutes so buckets always fall into a single local day.
+    Session interactions are bucketed by the creation time of the conversation.
+    """
+    __tablename__ = 'app_statistic_buckets'
+    __table_args__ = (
+        db.PrimaryKeyConstraint('app_id', 'bucket_start', name='app_statistic_bucket_pkey'),
+    )
+
+    app_id = db.Column(StringUUID, nullable=False)
+    bucket_start = db.Column(db.DateTime, nullable=False)
+    message_count = db.Column(db.Integer, nullable=False, server_default=db.text('0'))
+    feedback_count = db.Column(db.Integer, nullable=False, server_default=db.text('0'))
+    message_tokens = db.Column(db.BigInteger, nullable=False, server_default=db.text('0'))
+    answer_tokens = db.Column(db.BigInteger, nullable=False, server_default=db.text('0'))
+    total_price = db.Column(db.Numeric(20, 7), nullable=False, server_default=db.text('0'))
+    provider_response_latency = db.Column(db.Float, nullable=False, server_default=db.text('0'))
+    session_conversation_count = db.Column(db.Integer, nullable=False, server_default=db.text('0'))
+    session_message_count = db.Column(db.Integer, nullable=False, server_default=db.text('0'))
+    updated_at = db.Column(db.DateTime, nullable=False, server_default=db.text('CURRENT_TIMESTAMP(0)'))
+
+
+class AppStatisticBucketMember(db.Model):
+    """
+    Distinct conversations and end users having messages in a statistic bucket,
+    distinct counts are not additive so they are rolled up as sets.
+    """
+    __tablename__ = 'app_statistic_bucket_members'
+    __table_args__ = (
+        db.PrimaryKeyConstraint('app_id', 'bucket_start', 'member_type', 'member_id',
+                                name='app_statistic_bucket_member_pkey'),
+    )
+
+    app_id = db.Column(StringUUID, nullable=False)
+    bucket_start = db.Column(db.DateTime, nullable=False)
+    member_type = db.Column(db.String(40), nullable=False)
+    member_id = db.Column(StringUUID, nullable=False)
+
+
+class StatisticRollupWatermark(db.Model):
+    """
+    Buckets before the watermark are rolled up.
+    """
+    __tablename__ = 'statistic_rollup_watermarks'
+    __table_args__ = (
+        db.PrimaryKeyConstraint('name', name='statistic_rollup_watermark_pkey'),
+    )
+
+    name = db.Column(db.String(255), nullable=False)
+    watermark = db.Column(db.DateTime, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False, server_default=db.text('CURRENT_TIMESTAMP(0)'))
+
+
 class ApiRequest(db.Model):
     __tablename__ = 'api_requests'
     __table_args__ = (
@@ -1,10 +1,14 @@
+import hashlib
 import json
 from enum import Enum
+from functools import lru_cache
 from typing import Optional, Union
 
+from sqlalchemy.dialects.postgresql import insert
+
 from extensions.ext_database import db
 from libs import helper
-from models import StringUUID
+from models import JSONProperty, StringUUID, loads_json
 from models.account import Account
 
 
@@ -121,13 +125,8 @@ class Workflow(db.Model):
     def updated_by_account(self):
         return Account.query.get(self.updated_by) if self.updated_by else None
 
-    @property
-    def graph_dict(self):
-        return json.loads(self.graph) if self.graph else None
-
-    @property
-    def features_dict(self):
-        return json.loads(self.features) if self.features else {}
+    graph_dict = JSONProperty('graph')
+    features_dict = JSONProperty('features', default=dict)
 
     def user_input_form(self, to_old_structure: bool = False) -> list:
         # get start node from graph
@@ -240,7 +239,8 @@ class WorkflowRun(db.Model):
         `app-run` for (published) app execution
 
     - version (string) Version
-    - graph (text) Workflow canvas configuration (JSON)
+    - graph (text) `optional` Workflow canvas configuration (JSON), only kept by the runs created before graph_hash
+    - graph_hash (string) `optional` Hash of the workflow canvas configuration, see WorkflowGraphBlob
     - inputs (text) Input parameters
     - status (string) Execution status, `running` / `succeeded` / `failed` / `stopped`
     - outputs (text) `optional` Output content
@@ -275,6 +275,7 @@ class WorkflowRun(db.Model):
     triggered_from = db.Column(db.String(255), nullable=False)
     version = db.Column(db.String(255), nullable=False)
     graph = db.Column(db.Text)
+    graph_hash = db.Column(db.String(64))
     inputs = db.Column(db.Text)
     status = db.Column(db.String(255), nullable=False)
     outputs = db.Column(db.Text)
@@ -300,17 +301,15 @@ class WorkflowRun(db.Model):
         return EndUser.query.get(self.created_by) \
             if created_by_role == CreatedByRole.END_USER else None
 
-    @property
-    def graph_dict(self):
-        return json.loads(self.graph) if self.graph else None
-
-    @property
-    def inputs_dict(self):
-        return json.loads(self.inputs) if self.inputs else None
+    _graph_json = JSONProperty('graph')
+    inputs_dict = JSONProperty('inputs')
+    outputs_dict = JSONProperty('outputs')
 
     @property
-    def outputs_dict(self):
-        return json.loads(self.outputs) if self.outputs else None
+    def graph_dict(self):
+        if self.graph_hash:
+            return WorkflowGraphBlob.get_graph_dict(self.graph_hash)
+        return self._graph_json
 
     @property
     def message(self) -> Optional['Message']:
@@ -374,6 +373,71 @@ class WorkflowRun(db.Model):
         )
 
 
+class WorkflowGraphBlob(db.Model):
+    """
+    Workflow Graph Blob, the workflow canvas configurations of the runs, stored once per content
+
+    Attributes:
+
+    - hash (string) SHA-256 of the graph
+    - graph (text) Workflow canvas configuration (JSON)
+    - created_at (timestamp) Creation time
+    """
+
+    __tablename__ = 'workflow_graph_blobs'
+    __table_args__ = (
+        db.PrimaryKeyConstraint('hash', name='workflow_graph_blob_pkey'),
+    )
+
+    hash = db.Column(db.String(64), nullable=False)
+    graph = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, server_default=db.text('CURRENT_TIMESTAMP(0)'))
+
+    @classmethod
+    def store(cls, graph: str) -> str:
+        """
+        Store a graph, committed at once so that the runs of other processes can reference it.
+
+        :return: the hash of the graph
+        """
+        graph_hash = hashlib.sha256(graph.encode('utf-8')).hexdigest()
+        if graph_hash in _stored_graph_hashes:
+            return graph_hash
+
+        db.session.execute(
+            insert(cls).values(hash=graph_hash, graph=graph).on_conflict_do_nothing(index_elements=['hash'])
+        )
+        db.session.commit()
+        if len(_stored_graph_hashes) >= STORED_GRAPH_HASHES_SIZE:
+            _stored_graph_hashes.clear()
+        _stored_graph_hashes.add(graph_hash)
+        return graph_hash
+
+    @classmethod
+    def get_graph_dict(cls, graph_hash: str) -> Optional[dict]:
+        """
+        Get the parsed graph of a hash, shared by the runs of the process and must not be modified.
+        """
+        try:
+            return _load_graph_dict(graph_hash)
+        except KeyError:
+            return None
+
+
+# hashes of the graphs known to be stored, kept by each process, beyond that they are forgotten
+STORED_GRAPH_HASHES_SIZE = 1024
+_stored_graph_hashes: set[str] = set()
+
+
+@lru_cache(maxsize=256)
+def _load_graph_dict(graph_hash: str) -> dict:
+    graph = db.session.query(WorkflowGraphBlob.graph).filter(WorkflowGraphBlob.hash == graph_hash).scalar()
+    if graph is None:
+        # missing graphs are not cached
+        raise KeyError(graph_hash)
+    return loads_json(graph)
+
+
 class WorkflowNodeExecutionTriggeredFrom(Enum):
     """
     Workflow Node Execution Triggered From Enum
@@ -510,21 +574,10 @@ class WorkflowNodeExecution(db.Model):
         return EndUser.query.get(self.created_by) \
             if created_by_role == CreatedByRole.END_USER else None
 
-    @property
-    def inputs_dict(self):
-        return json.loads(self.inputs) if self.inputs else None
-
-    @property
-    def outputs_dict(self):
-        return json.loads(self.outputs) if self.outputs else None
-
-    @property
-    def process_data_dict(self):
-        return json.loads(self.process_data) if self.process_data else None
-
-    @property
-    def execution_metadata_dict(self):
-        return json.loads(self.execution_metadata) if self.execution_metadata else None
+    inputs_dict = JSONProperty('inputs')
+    outputs_dict = JSONProperty('outputs')
+    process_data_dict = JSONProperty('process_data')
+    execution_metadata_dict = JSONProperty('execution_metadata')
 
     @property
     def extras(self):
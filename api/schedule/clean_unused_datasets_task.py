@@ -3,11 +3,12 @@ import time
 
 import click
 from flask import current_app
-from werkzeug.exceptions import NotFound
+from sqlalchemy import exists, not_
 
 import app
 from core.rag.index_processor.index_processor_factory import IndexProcessorFactory
 from extensions.ext_database import db
+from libs.batch_purge import iter_id_batches
 from models.dataset import Dataset, DatasetQuery, Document
 
 
@@ -17,45 +18,48 @@ def clean_unused_datasets_task():
     clean_days = int(current_app.config.get('CLEAN_DAY_SETTING'))
     start_at = time.perf_counter()
     thirty_days_ago = datetime.datetime.now() - datetime.timedelta(days=clean_days)
-    page = 1
-    while True:
-        try:
-            datasets = db.session.query(Dataset).filter(Dataset.created_at < thirty_days_ago) \
-                .order_by(Dataset.created_at.desc()).paginate(page=page, per_page=50)
-        except NotFound:
-            break
-        page += 1
+
+    # datasets neither queried nor having documents updated recently, resolved by the database in one query per page
+    unused_filters = [
+        Dataset.created_at < thirty_days_ago,
+        not_(exists().where(
+            DatasetQuery.dataset_id == Dataset.id,
+            DatasetQuery.created_at > thirty_days_ago
+        )),
+        not_(exists().where(
+            Document.dataset_id == Dataset.id,
+            Document.indexing_status == 'completed',
+            Document.enabled == True,
+            Document.archived == False,
+            Document.updated_at > thirty_days_ago
+        )),
+        # skip datasets already cleaned by a previous run
+        exists().where(
+            Document.dataset_id == Dataset.id,
+            Document.enabled == True
+        )
+    ]
+    for dataset_ids in iter_id_batches(Dataset, unused_filters, batch_size=50):
+        datasets = db.session.query(Dataset).filter(Dataset.id.in_(dataset_ids)).all()
         for dataset in datasets:
-            dataset_query = db.session.query(DatasetQuery).filter(
-                DatasetQuery.created_at > thirty_days_ago,
-                DatasetQuery.dataset_id == dataset.id
-            ).all()
-            if not dataset_query or len(dataset_query) == 0:
-                documents = db.session.query(Document).filter(
-                    Document.dataset_id == dataset.id,
-                    Document.indexing_status == 'completed',
-                    Document.enabled == True,
-                    Document.archived == False,
-                    Document.updated_at > thirty_days_ago
-                ).all()
-                if not documents or len(documents) == 0:
-                    try:
-                        # remove index
-                        index_processor = IndexProcessorFactory(dataset.doc_form).init_index_processor()
-                        index_processor.clean(dataset, None)
+            try:
+                # remove index
+                index_processor = IndexProcessorFactory(dataset.doc_form).init_index_processor()
+                index_processor.clean(dataset, None)
 
-                        # update document
-                        update_params = {
-                            Document.enabled: False
-                        }
+                # update document
+                update_params = {
+                    Document.enabled: False
+                }
 
-                        Document.query.filter_by(dataset_id=dataset.id).update(update_params)
-                        db.session.commit()
-                        click.echo(click.style('Cleaned unused dataset {} from db success!'.format(dataset.id),
-                                               fg='green'))
-                    except Exception as e:
-                        click.echo(
-                            click.style('clean dataset index error: {} {}'.format(e.__class__.__name__, str(e)),
-                                        fg='red'))
+                Document.query.filter_by(dataset_id=dataset.id).update(update_params)
+                db.session.commit()
+                click.echo(click.style('Cleaned unused dataset {} from db success!'.format(dataset.id),
+                                       fg='green'))
+            except Exception as e:
+                db.session.rollback()
+                click.echo(
+                    click.style('clean dataset index error: {} {}'.format(e.__class__.__name__, str(e)),
+                                fg='red'))
     end_at = time.perf_counter()
     click.echo(click.style('Cleaned unused dataset from db success latency: {}'.format(end_at - start_at), fg='green'))
@@ -0,0 +1,16 @@
+import time
+
+import click
+
+import app
+from services.account_service import AccountService
+
+
+@app.celery.task(queue='dataset')
+def flush_account_last_active_task():
+    click.echo(click.style('Start flush account last active time.', fg='green'))
+    start_at = time.perf_counter()
+    count = AccountService.flush_last_active_at()
+    end_at = time.perf_counter()
+    click.echo(click.style('Flushed last active time of {} accounts latency: {}'.format(count, end_at - start_at),
+                           fg='green'))
@@ -0,0 +1,16 @@
+import time
+
+import click
+
+import app
+from services.annotation_service import AppAnnotationService
+
+
+@app.celery.task(queue='dataset')
+def flush_annotation_hit_histories_task():
+    click.echo(click.style('Start flush annotation hit histories.', fg='green'))
+    start_at = time.perf_counter()
+    count = AppAnnotationService.flush_annotation_histories()
+    end_at = time.perf_counter()
+    click.echo(click.style('Flushed {} annotation hit histories latency: {}'.format(count, end_at - start_at),
+                           fg='green'))
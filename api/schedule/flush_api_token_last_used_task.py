@@ -0,0 +1,16 @@
+import time
+
+import click
+
+import app
+from services.api_token_service import ApiTokenService
+
+
+@app.celery.task(queue='dataset')
+def flush_api_token_last_used_task():
+    click.echo(click.style('Start flush API token last used time.', fg='green'))
+    start_at = time.perf_counter()
+    count = ApiTokenService.flush_last_used_at()
+    end_at = time.perf_counter()
+    click.echo(click.style('Flushed last used time of {} API tokens latency: {}'.format(count, end_at - start_at),
+                           fg='green'))
@@ -0,0 +1,15 @@
+import time
+
+import click
+
+import app
+from services.app_statistic_service import AppStatisticRollupService
+
+
+@app.celery.task(queue='dataset')
+def rollup_app_statistics_task():
+    click.echo(click.style('Start rollup app statistics.', fg='green'))
+    start_at = time.perf_counter()
+    AppStatisticRollupService.rollup()
+    end_at = time.perf_counter()
+    click.echo(click.style('Rolled up app statistics success latency: {}'.format(end_at - start_at), fg='green'))
@@ -13,6 +13,7 @@ from werkzeug.exceptions import Unauthorized
 from constants.languages import language_timezone_mapping, languages
 from events.tenant_event import tenant_was_created
 from extensions.ext_redis import redis_client
+from libs.deferred_timestamp_update import DeferredTimestampUpdate
 from libs.passport import PassportService
 from libs.password import compare_password, hash_password, valid_password
 from libs.rsa import generate_key_pair
@@ -32,13 +33,34 @@ from services.errors.account import (
     RoleAlreadyAssignedError,
     TenantNotFound,
 )
+from services.identity_cache_service import IdentityCacheService
 from tasks.mail_invite_member_task import send_invite_member_mail_task
 
+# accounts are active once they are used within this interval in seconds
+ACCOUNT_LAST_ACTIVE_UPDATE_INTERVAL = 600
+
+account_last_active_at = DeferredTimestampUpdate(Account.__table__.c.last_active_at, 'account_last_active_at')
+
 
 class AccountService:
 
     @staticmethod
     def load_user(user_id: str) -> Account:
+        account = IdentityCacheService.load_account(user_id, AccountService._load_user_with_current_tenant)
+        if not account:
+            return None
+
+        if account.status in [AccountStatus.BANNED.value, AccountStatus.CLOSED.value]:
+            raise Unauthorized("Account is banned or closed.")
+
+        # written to the database by a periodic flush instead of in the request
+        account_last_active_at.record(account.id, datetime.now(timezone.utc).replace(tzinfo=None),
+                                      ACCOUNT_LAST_ACTIVE_UPDATE_INTERVAL)
+
+        return account
+
+    @staticmethod
+    def _load_user_with_current_tenant(user_id: str) -> Optional[Account]:
         account = Account.query.filter_by(id=user_id).first()
         if not account:
             return None
@@ -59,12 +81,14 @@ class AccountService:
             available_ta.current = True
             db.session.commit()
 
-        if datetime.now(timezone.utc).replace(tzinfo=None) - account.last_active_at > timedelta(minutes=10):
-            account.last_active_at = datetime.now(timezone.utc).replace(tzinfo=None)
-            db.session.commit()
-
         return account
 
+    @staticmethod
+    def flush_last_active_at() -> int:
+        """
+        Write the last active time of the accounts recorded since the previous flush to the database.
+        """
+        return account_last_active_at.flush()
 
     @staticmethod
     def get_account_jwt_token(account, *, exp: timedelta = timedelta(days=30)):
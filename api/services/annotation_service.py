@@ -1,23 +1,34 @@
+import csv
 import datetime
+import io
+import json
+import logging
 import uuid
+from collections import Counter
+from collections.abc import Generator
 
-import pandas as pd
 from flask_login import current_user
-from sqlalchemy import or_
+from sqlalchemy import and_, bindparam, or_, update
+from sqlalchemy.dialects.postgresql import insert
 from werkzeug.datastructures import FileStorage
 from werkzeug.exceptions import NotFound
 
 from extensions.ext_database import db
 from extensions.ext_redis import redis_client
+from extensions.ext_storage import storage
 from models.model import App, AppAnnotationHitHistory, AppAnnotationSetting, Message, MessageAnnotation
 from services.feature_service import FeatureService
 from tasks.annotation.add_annotation_to_index_task import add_annotation_to_index_task
-from tasks.annotation.batch_import_annotations_task import batch_import_annotations_task
+from tasks.annotation.batch_import_annotations_task import batch_import_annotations_task, iter_annotation_csv_chunks
 from tasks.annotation.delete_annotation_index_task import delete_annotation_index_task
 from tasks.annotation.disable_annotation_reply_task import disable_annotation_reply_task
 from tasks.annotation.enable_annotation_reply_task import enable_annotation_reply_task
 from tasks.annotation.update_annotation_to_index_task import update_annotation_to_index_task
 
+ANNOTATION_HIT_HISTORIES_KEY = 'annotation_hit_histories'
+ANNOTATION_HIT_HISTORIES_FLUSH_LOCK = 'annotation_hit_histories_flush_lock'
+ANNOTATION_HIT_HISTORIES_FLUSH_BATCH_SIZE = 500
+
 
 class AppAnnotationService:
     @classmethod
@@ -162,6 +173,50 @@ class AppAnnotationService:
                        .order_by(MessageAnnotation.created_at.desc()).all())
         return annotations
 
+    @classmethod
+    def export_annotation_csv_by_app_id(cls, app_id: str, batch_size: int = 1000) -> Generator[str, None, None]:
+        """
+        Export the annotations of an app as CSV lines, in the format of the batch import,
+        loading the annotations in batches.
+        """
+        # get app info
+        app = db.session.query(App).filter(
+            App.id == app_id,
+            App.tenant_id == current_user.current_tenant_id,
+            App.status == 'normal'
+        ).first()
+
+        if not app:
+            raise NotFound("App not found")
+
+        def generate() -> Generator[str, None, None]:
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(['question', 'answer'])
+            last_annotation = None
+            while True:
+                query = (db.session.query(MessageAnnotation.id, MessageAnnotation.created_at,
+                                          MessageAnnotation.question, MessageAnnotation.content)
+                         .filter(MessageAnnotation.app_id == app_id))
+                if last_annotation:
+                    query = query.filter(or_(
+                        MessageAnnotation.created_at < last_annotation.created_at,
+                        and_(MessageAnnotation.created_at == last_annotation.created_at,
+                             MessageAnnotation.id < last_annotation.id)
+                    ))
+                annotations = (query.order_by(MessageAnnotation.created_at.desc(), MessageAnnotation.id.desc())
+                               .limit(batch_size).all())
+                for annotation in annotations:
+                    writer.writerow([annotation.question, annotation.content])
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+                if len(annotations) < batch_size:
+                    return
+                last_annotation = annotations[-1]
+
+        return generate()
+
     @classmethod
     def insert_app_annotation_directly(cls, args: dict, app_id: str) -> MessageAnnotation:
         # get app info
@@ -274,30 +329,30 @@ class AppAnnotationService:
             raise NotFound("App not found")
 
         try:
-            # Skip the first row
-            df = pd.read_csv(file)
-            result = []
-            for index, row in df.iterrows():
-                content = {
-                    'question': row[0],
-                    'answer': row[1]
-                }
-                result.append(content)
-            if len(result) == 0:
+            # the file is only counted here, the task reads it from the storage in chunks
+            total = sum(len(contents) for contents in iter_annotation_csv_chunks(file.stream))
+            if total == 0:
                 raise ValueError("The CSV file is empty.")
             # check annotation limit
             features = FeatureService.get_features(current_user.current_tenant_id)
             if features.billing.enabled:
                 annotation_quota_limit = features.annotation_quota_limit
-                if annotation_quota_limit.limit < len(result) + annotation_quota_limit.size:
+                if annotation_quota_limit.limit < total + annotation_quota_limit.size:
                     raise ValueError("The number of annotations exceeds the limit of your subscription.")
             # async job
             job_id = str(uuid.uuid4())
+            file_key = 'annotation_imports/{}.csv'.format(job_id)
+            file.stream.seek(0)
+            storage.save_stream(file_key, file.stream)
             indexing_cache_key = 'app_annotation_batch_import_{}'.format(str(job_id))
+            progress_cache_key = 'app_annotation_batch_import_progress_{}'.format(str(job_id))
+            redis_client.hset(progress_cache_key, mapping={'total': total, 'processed': 0})
+            redis_client.expire(progress_cache_key, 600)
             # send batch add segments task
             redis_client.setnx(indexing_cache_key, 'waiting')
-            batch_import_annotations_task.delay(str(job_id), result, app_id,
-                                                current_user.current_tenant_id, current_user.id)
+            batch_import_annotations_task.delay(str(job_id), [], app_id,
+                                                current_user.current_tenant_id, current_user.id,
+                                                file_key=file_key)
         except Exception as e:
             return {
                 'error_msg': str(e)
@@ -307,6 +362,15 @@ class AppAnnotationService:
             'job_status': 'waiting'
         }
 
+    @classmethod
+    def get_batch_import_progress(cls, job_id: str) -> dict:
+        progress_cache_key = 'app_annotation_batch_import_progress_{}'.format(str(job_id))
+        progress = redis_client.hgetall(progress_cache_key)
+        return {
+            'total_count': int(progress.get(b'total', 0)),
+            'processed_count': int(progress.get(b'processed', 0)),
+        }
+
     @classmethod
     def get_annotation_hit_histories(cls, app_id: str, annotation_id: str, page, limit):
         # get app info
@@ -366,6 +430,83 @@ class AppAnnotationService:
         db.session.add(annotation_hit_history)
         db.session.commit()
 
+    @classmethod
+    def record_annotation_history(cls, annotation_id: str, app_id: str, annotation_question: str,
+                                  annotation_content: str, query: str, user_id: str,
+                                  message_id: str, from_source: str, score: float):
+        """
+        Record an annotation hit, which is written to the database with the hit count of the annotation
+        by the next `flush_annotation_histories`.
+        """
+        record = {
+            'id': str(uuid.uuid4()),
+            'annotation_id': annotation_id,
+            'app_id': app_id,
+            'account_id': user_id,
+            'question': query,
+            'source': from_source,
+            'score': score,
+            'message_id': message_id,
+            'annotation_question': annotation_question,
+            'annotation_content': annotation_content,
+            'created_at': datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None).isoformat(),
+        }
+        try:
+            redis_client.rpush(ANNOTATION_HIT_HISTORIES_KEY, json.dumps(record))
+        except Exception:
+            logging.warning('Failed to record the annotation hit history, it is written now', exc_info=True)
+            cls.add_annotation_history(annotation_id, app_id, annotation_question, annotation_content, query,
+                                       user_id, message_id, from_source, score)
+
+    @classmethod
+    def flush_annotation_histories(cls) -> int:
+        """
+        Write the annotation hits recorded since the previous flush to the database.
+
+        The hits are taken from redis once written, a hit written again after a failed flush is not
+        inserted twice nor counted twice.
+
+        :return: the number of hits written
+        """
+        lock = redis_client.lock(ANNOTATION_HIT_HISTORIES_FLUSH_LOCK, timeout=600)
+        if not lock.acquire(blocking=False):
+            logging.info('Flush of the annotation hit histories is already running, skip.')
+            return 0
+
+        count = 0
+        try:
+            while True:
+                records = redis_client.lrange(ANNOTATION_HIT_HISTORIES_KEY, 0, ANNOTATION_HIT_HISTORIES_FLUSH_BATCH_SIZE - 1)
+                if not records:
+                    return count
+                rows = []
+                for record in records:
+                    row = json.loads(record)
+                    row['created_at'] = datetime.datetime.fromisoformat(row['created_at'])
+                    rows.append(row)
+
+                inserted = db.session.execute(
+                    insert(AppAnnotationHitHistory).values(rows)
+                    .on_conflict_do_nothing(index_elements=['id'])
+                    .returning(AppAnnotationHitHistory.annotation_id)
+                ).scalars().all()
+                hit_counts = Counter(inserted)
+                if hit_counts:
+                    db.session.execute(
+                        update(MessageAnnotation.__table__)
+                        .where(MessageAnnotation.__table__.c.id == bindparam('annotation_id'))
+                        .values(hit_count=MessageAnnotation.__table__.c.hit_count + bindparam('hits')),
+                        [{'annotation_id': annotation_id, 'hits': hits} for annotation_id, hits in hit_counts.items()]
+                    )
+                db.session.commit()
+                redis_client.ltrim(ANNOTATION_HIT_HISTORIES_KEY, len(records), -1)
+                count += len(inserted)
+        finally:
+            try:
+                lock.release()
+            except Exception:
+                logging.exception('Failed to release the flush lock of the annotation hit histories')
+
     @classmethod
     def get_app_annotation_setting_by_app_id(cls, app_id: str):
         # get app info
@@ -0,0 +1,173 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from extensions.ext_database import db
+from extensions.ext_redis import redis_client
+from libs.deferred_timestamp_update import DeferredTimestampUpdate
+from models.model import ApiToken
+
+logger = logging.getLogger(__name__)
+
+API_TOKEN_LAST_USED_AT_KEY = 'api_token_last_used_at'
+# entries kept in memory of each process, beyond that expired entries are evicted
+API_TOKEN_MEMORY_CACHE_SIZE = 10000
+
+api_token_last_used_at = DeferredTimestampUpdate(ApiToken.__table__.c.last_used_at, API_TOKEN_LAST_USED_AT_KEY)
+
+
+class ApiTokenService:
+    """
+    Authentication of service API tokens.
+
+    Tokens are cached in memory for API_TOKEN_MEMORY_CACHE_TTL seconds and in redis for API_TOKEN_CACHE_TTL
+    seconds, deleted tokens are dropped from redis and are accepted by the other processes for at most
+    API_TOKEN_MEMORY_CACHE_TTL seconds. The last use of the tokens is recorded in redis and written to
+    the database by a periodic batched flush.
+    """
+
+    # token cache key -> (expire at, token data)
+    _memory_cache: dict[str, tuple[float, dict]] = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_api_token(cls, token: str, scope: Optional[str]) -> Optional[ApiToken]:
+        """
+        Get the API token of a scope.
+
+        :return: the API token, detached from the session when it is cached, None if it does not exist
+        """
+        if not current_app.config.get('API_TOKEN_CACHE_TTL'):
+            return cls._query_api_token(token, scope)
+
+        cache_key = cls._cache_key(token, scope)
+        data = cls._get_memory(cache_key)
+        if data is None:
+            data = cls._get_redis(cache_key)
+            if data is None:
+                api_token = cls._query_api_token(token, scope)
+                if not api_token:
+                    return None
+
+                data = {
+                    'id': api_token.id,
+                    'app_id': api_token.app_id,
+                    'tenant_id': api_token.tenant_id,
+                    'type': api_token.type,
+                }
+                cls._set_redis(cache_key, data)
+                cls._set_memory(cache_key, data)
+                return api_token
+
+            cls._set_memory(cache_key, data)
+
+        return ApiToken(token=token, **data)
+
+    @classmethod
+    def invalidate(cls, token: str, scope: Optional[str]) -> None:
+        """
+        Drop a token from the caches, to be called when it is deleted.
+        """
+        cache_key = cls._cache_key(token, scope)
+        with cls._lock:
+            cls._memory_cache.pop(cache_key, None)
+        try:
+            redis_client.delete(cache_key)
+        except Exception:
+            logger.exception('Failed to delete API token from cache')
+
+    @staticmethod
+    def invalidate_on_commit(token: str, scope: Optional[str]) -> None:
+        """
+        Drop a token from the caches once the transaction deleting it is committed,
+        so that a request can not cache it again from the row before the deletion.
+        """
+        db.session.info.setdefault('deleted_api_tokens', set()).add((token, scope))
+
+    @classmethod
+    def record_last_used(cls, api_token_id: str) -> None:
+        """
+        Record the use of a token, every process records it at most once per API_TOKEN_LAST_USED_UPDATE_INTERVAL
+        seconds and the records are written to the database by flush_last_used_at.
+        """
+        api_token_last_used_at.record(api_token_id, datetime.now(timezone.utc).replace(tzinfo=None),
+                                      current_app.config.get('API_TOKEN_LAST_USED_UPDATE_INTERVAL'))
+
+    @classmethod
+    def flush_last_used_at(cls) -> int:
+        """
+        Write the last used time of the tokens recorded since the previous flush to the database.
+
+        :return: the number of tokens updated
+        """
+        return api_token_last_used_at.flush()
+
+    @staticmethod
+    def _query_api_token(token: str, scope: Optional[str]) -> Optional[ApiToken]:
+        return db.session.query(ApiToken).filter(
+            ApiToken.token == token,
+            ApiToken.type == scope,
+        ).first()
+
+    @staticmethod
+    def _cache_key(token: str, scope: Optional[str]) -> str:
+        # tokens are secrets, they are not kept in redis in clear
+        return f'api_token:{scope}:{hashlib.sha256(token.encode("utf-8")).hexdigest()}'
+
+    @classmethod
+    def _get_memory(cls, cache_key: str) -> Optional[dict]:
+        item = cls._memory_cache.get(cache_key)
+        if item is None or item[0] < time.monotonic():
+            return None
+        return item[1]
+
+    @classmethod
+    def _set_memory(cls, cache_key: str, data: dict) -> None:
+        ttl = min(current_app.config.get('API_TOKEN_MEMORY_CACHE_TTL'), current_app.config.get('API_TOKEN_CACHE_TTL'))
+        if not ttl:
+            return
+
+        now = time.monotonic()
+        with cls._lock:
+            if len(cls._memory_cache) >= API_TOKEN_MEMORY_CACHE_SIZE:
+                for key in [key for key, (expire_at, _) in cls._memory_cache.items() if expire_at < now]:
+                    del cls._memory_cache[key]
+                if len(cls._memory_cache) >= API_TOKEN_MEMORY_CACHE_SIZE:
+                    cls._memory_cache.clear()
+            cls._memory_cache[cache_key] = (now + ttl, data)
+
+    @staticmethod
+    def _get_redis(cache_key: str) -> Optional[dict]:
+        try:
+            cached = redis_client.get(cache_key)
+        except Exception:
+            logger.warning('Failed to get API token from cache', exc_info=True)
+            return None
+
+        return json.loads(cached) if cached else None
+
+    @staticmethod
+    def _set_redis(cache_key: str, data: dict) -> None:
+        try:
+            redis_client.setex(cache_key, current_app.config.get('API_TOKEN_CACHE_TTL'), json.dumps(data))
+        except Exception:
+            logger.warning('Failed to set API token to cache', exc_info=True)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_deleted_api_tokens(session):
+    for token, scope in session.info.pop('deleted_api_tokens', ()):
+        ApiTokenService.invalidate(token, scope)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_deleted_api_tokens(session):
+    session.info.pop('deleted_api_tokens', None)
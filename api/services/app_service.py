@@ -1,3 +1,4 @@
+import copy
 import json
 import logging
 from datetime import datetime, timezone
@@ -262,7 +263,7 @@ class AppService:
         # get original app model config
         if app.mode == AppMode.AGENT_CHAT.value or app.is_agent:
             model_config: AppModelConfig = app.app_model_config
-            agent_mode = model_config.agent_mode_dict
+            agent_mode = copy.deepcopy(model_config.agent_mode_dict)
             # decrypt agent tool parameters if it's secret-input
             for tool in agent_mode.get('tools') or []:
                 if not isinstance(tool, dict) or len(tool.keys()) <= 3:
@@ -0,0 +1,513 @@
+import logging
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Optional
+
+import pytz
+from flask import current_app
+
+from extensions.ext_database import db
+from extensions.ext_redis import redis_client
+from models.model import StatisticRollupWatermark
+
+logger = logging.getLogger(__name__)
+
+# every timezone offset is a multiple of 15 minutes, so buckets of this size never cross a local day boundary
+BUCKET_MINUTES = 15
+BUCKET_SIZE = timedelta(minutes=BUCKET_MINUTES)
+
+ROLLUP_WATERMARK_NAME = 'app_statistic_buckets'
+ROLLUP_LOCK_NAME = 'app_statistic_rollup_lock'
+ROLLUP_LOCK_TIMEOUT = 3600
+ROLLUP_DIRTY_BUCKETS_KEY = 'app_statistic_rollup:dirty_buckets'
+# buckets rolled up per iteration, so that the backfill of a large history is committed in small steps
+ROLLUP_MAX_RANGE = timedelta(days=1)
+# iterations per run, the backfill of a large history goes on in the next runs
+ROLLUP_MAX_ITERATIONS = 30
+ROLLUP_TARGETS_BATCH_SIZE = 500
+
+
+def bucket_sql(column: str) -> str:
+    return (f"(DATE_TRUNC('hour', {column}) "
+            f"+ FLOOR(EXTRACT(MINUTE FROM {column}) / {BUCKET_MINUTES}) * INTERVAL '{BUCKET_MINUTES} minutes')")
+
+
+def floor_bucket(dt: datetime) -> datetime:
+    return dt.replace(minute=dt.minute - dt.minute % BUCKET_MINUTES, second=0, microsecond=0)
+
+
+def ceil_bucket(dt: datetime) -> datetime:
+    floor = floor_bucket(dt)
+    return floor if floor == dt else floor + BUCKET_SIZE
+
+
+class AppStatisticRollupService:
+    """
+    Maintains app_statistic_buckets and app_statistic_bucket_members incrementally.
+
+    Every run recomputes from the raw tables the buckets touched by messages created since the watermark,
+    including the buckets of the conversations those messages belong to. Messages are still updated while
+    they are generated, so the buckets of the last `settle period` are recomputed on every run and only
+    buckets before `watermark - settle period` are considered final.
+    """
+
+    @classmethod
+    def settle_period(cls) -> timedelta:
+        return timedelta(seconds=current_app.config.get('APP_MAX_EXECUTION_TIME')) + BUCKET_SIZE
+
+    @classmethod
+    def get_finalized_until(cls) -> Optional[datetime]:
+        """
+        Get the time before which the buckets are final, None when nothing has been rolled up yet.
+        """
+        watermark = db.session.get(StatisticRollupWatermark, ROLLUP_WATERMARK_NAME)
+        if not watermark:
+            return None
+
+        return watermark.watermark - cls.settle_period()
+
+    @classmethod
+    def mark_dirty(cls, app_id: str, message_created_at: datetime) -> None:
+        """
+        Mark the bucket of a message dirty, e.g. when its feedbacks change.
+        """
+        redis_client.sadd(ROLLUP_DIRTY_BUCKETS_KEY, f'{app_id}|{floor_bucket(message_created_at).isoformat()}')
+
+    @classmethod
+    def rollup(cls) -> None:
+        lock = redis_client.lock(ROLLUP_LOCK_NAME, timeout=ROLLUP_LOCK_TIMEOUT)
+        if not lock.acquire(blocking=False):
+            logger.info('App statistic rollup is already running, skip.')
+            return
+
+        try:
+            cls._rollup(lock)
+        finally:
+            try:
+                lock.release()
+            except Exception:
+                logger.exception('Failed to release app statistic rollup lock')
+
+    @classmethod
+    def _rollup(cls, lock) -> None:
+        start_at = time.perf_counter()
+        until = floor_bucket(datetime.utcnow())
+        settle_period = cls.settle_period()
+
+        watermark = db.session.get(StatisticRollupWatermark, ROLLUP_WATERMARK_NAME)
+        if watermark:
+            range_start = watermark.watermark - settle_period
+        else:
+            first_created_at = db.session.execute(db.text('SELECT MIN(created_at) FROM messages')).scalar()
+            if not first_created_at:
+                return
+            range_start = floor_bucket(first_created_at)
+            watermark = StatisticRollupWatermark(name=ROLLUP_WATERMARK_NAME, watermark=range_start)
+            db.session.add(watermark)
+
+        iterations = 0
+        while range_start < until and iterations < ROLLUP_MAX_ITERATIONS:
+            # keep the lock for as long as the run makes progress, so that no other run recomputes the same buckets
+            lock.extend(ROLLUP_LOCK_TIMEOUT, replace_ttl=True)
+            iterations += 1
+            range_end = min(range_start + ROLLUP_MAX_RANGE, until)
+            targets = cls._get_message_targets(range_start, range_end)
+            cls._recompute(targets)
+
+            watermark.watermark = max(watermark.watermark, range_end)
+            watermark.updated_at = datetime.utcnow()
+            db.session.commit()
+            range_start = range_end
+
+        cls._recompute(cls._pop_dirty_targets())
+        db.session.commit()
+
+        logger.info(f'Rolled up app statistics until {watermark.watermark}, '
+                    f'latency: {time.perf_counter() - start_at}')
+
+    @classmethod
+    def _get_message_targets(cls, start: datetime, end: datetime) -> set[tuple[str, datetime]]:
+        sql_query = f'''
+            SELECT DISTINCT app_id, {bucket_sql('created_at')} AS bucket_start
+                FROM messages WHERE created_at >= :start AND created_at < :end
+            UNION
+            SELECT DISTINCT c.app_id, {bucket_sql('c.created_at')} AS bucket_start
+                FROM messages m JOIN conversations c ON c.id = m.conversation_id
+                WHERE m.created_at >= :start AND m.created_at < :end AND c.created_at < :start
+        '''
+        rs = db.session.execute(db.text(sql_query), {'start': start, 'end': end})
+        return {(str(row.app_id), row.bucket_start) for row in rs}
+
+    @classmethod
+    def _pop_dirty_targets(cls) -> set[tuple[str, datetime]]:
+        targets = set()
+        while members := redis_client.spop(ROLLUP_DIRTY_BUCKETS_KEY, ROLLUP_TARGETS_BATCH_SIZE):
+            for member in members:
+                app_id, bucket_start = member.decode('utf-8').split('|')
+                targets.add((app_id, datetime.fromisoformat(bucket_start)))
+
+        return targets
+
+    @classmethod
+    def _recompute(cls, targets: set[tuple[str, datetime]]) -> None:
+        targets = sorted(targets)
+        for i in range(0, len(targets), ROLLUP_TARGETS_BATCH_SIZE):
+            batch = targets[i:i + ROLLUP_TARGETS_BATCH_SIZE]
+            cls._recompute_batch(
+                app_ids=[app_id for app_id, _ in batch],
+                bucket_starts=[bucket_start for _, bucket_start in batch]
+            )
+
+    @classmethod
+    def _recompute_batch(cls, app_ids: list[str], bucket_starts: list[datetime]) -> None:
+        targets_sql = '''
+            targets AS (
+                SELECT * FROM UNNEST(CAST(:app_ids AS uuid[]), CAST(:bucket_starts AS timestamp[]))
+                    AS t(app_id, bucket_start)
+            )
+        '''
+        bucket_end_sql = f"t.bucket_start + INTERVAL '{BUCKET_MINUTES} minutes'"
+        arg_dict = {'app_ids': app_ids, 'bucket_starts': bucket_starts}
+
+        for table in ['app_statistic_buckets', 'app_statistic_bucket_members']:
+            db.session.execute(db.text(f'''
+                WITH {targets_sql}
+                DELETE FROM {table} s USING targets t
+                    WHERE s.app_id = t.app_id AND s.bucket_start = t.bucket_start
+            '''), arg_dict)
+
+        db.session.execute(db.text(f'''
+            WITH {targets_sql},
+            message_stats AS (
+                SELECT t.app_id, t.bucket_start,
+                    COUNT(m.id) AS message_count,
+                    COALESCE(SUM((SELECT COUNT(*) FROM message_feedbacks mf WHERE mf.message_id = m.id)), 0)
+                        AS feedback_count,
+                    COALESCE(SUM(m.message_tokens), 0) AS message_tokens,
+                    COALESCE(SUM(m.answer_tokens), 0) AS answer_tokens,
+                    COALESCE(SUM(m.total_price), 0) AS total_price,
+                    COALESCE(SUM(m.provider_response_latency), 0) AS provider_response_latency
+                FROM targets t
+                JOIN messages m ON m.app_id = t.app_id
+                    AND m.created_at >= t.bucket_start AND m.created_at < {bucket_end_sql}
+                GROUP BY t.app_id, t.bucket_start
+            ),
+            session_stats AS (
+                SELECT t.app_id, t.bucket_start,
+                    COUNT(DISTINCT c.id) AS session_conversation_count,
+                    COUNT(m.id) AS session_message_count
+                FROM targets t
+                JOIN conversations c ON c.app_id = t.app_id
+                    AND c.created_at >= t.bucket_start AND c.created_at < {bucket_end_sql}
+                    AND c.override_model_configs IS NULL
+                JOIN messages m ON m.conversation_id = c.id
+                GROUP BY t.app_id, t.bucket_start
+            )
+            INSERT INTO app_statistic_buckets (app_id, bucket_start, message_count, feedback_count,
+                message_tokens, answer_tokens, total_price, provider_response_latency,
+                session_conversation_count, session_message_count, updated_at)
+            SELECT t.app_id, t.bucket_start,
+                COALESCE(ms.message_count, 0), COALESCE(ms.feedback_count, 0),
+                COALESCE(ms.message_tokens, 0), COALESCE(ms.answer_tokens, 0),
+                COALESCE(ms.total_price, 0), COALESCE(ms.provider_response_latency, 0),
+                COALESCE(ss.session_conversation_count, 0), COALESCE(ss.session_message_count, 0),
+                CURRENT_TIMESTAMP(0)
+            FROM targets t
+            LEFT JOIN message_stats ms ON ms.app_id = t.app_id AND ms.bucket_start = t.bucket_start
+            LEFT JOIN session_stats ss ON ss.app_id = t.app_id AND ss.bucket_start = t.bucket_start
+            WHERE ms.app_id IS NOT NULL OR ss.app_id IS NOT NULL
+        '''), arg_dict)
+
+        db.session.execute(db.text(f'''
+            WITH {targets_sql}
+            INSERT INTO app_statistic_bucket_members (app_id, bucket_start, member_type, member_id)
+            SELECT t.app_id, t.bucket_start, 'conversation', m.conversation_id
+                FROM targets t
+                JOIN messages m ON m.app_id = t.app_id
+                    AND m.created_at >= t.bucket_start AND m.created_at < {bucket_end_sql}
+            UNION
+            SELECT t.app_id, t.bucket_start, 'end_user', m.from_end_user_id
+                FROM targets t
+                JOIN messages m ON m.app_id = t.app_id
+                    AND m.created_at >= t.bucket_start AND m.created_at < {bucket_end_sql}
+                WHERE m.from_end_user_id IS NOT NULL
+        '''), arg_dict)
+
+
+class StatisticTimeRange:
+    """
+    Splits a statistic time range into the part served by the rollup tables and the parts computed live.
+
+    Rolled up buckets are only used when they are final and before the current local day,
+    partial buckets at the range boundaries and the current day are computed from the raw tables.
+    """
+
+    def __init__(self, timezone: str, start: Optional[str], end: Optional[str],
+                 finalized_until: Optional[datetime]):
+        """
+        :param timezone: timezone of the account
+        :param start: range start in the account timezone, format `%Y-%m-%d %H:%M`
+        :param end: range end in the account timezone, format `%Y-%m-%d %H:%M`
+        :param finalized_until: time before which the rolled up buckets are final, UTC
+        """
+        self.timezone = timezone
+        self.start = self._to_utc(start)
+        self.end = self._to_utc(end)
+
+        self.rollup_start: Optional[datetime] = None
+        self.rollup_end: Optional[datetime] = None
+        self.has_rollup = False
+
+        if finalized_until:
+            local_timezone = pytz.timezone(timezone)
+            today_start = datetime.now(local_timezone).replace(hour=0, minute=0, second=0, microsecond=0)
+            today_start = local_timezone.localize(today_start.replace(tzinfo=None))
+            rollup_end = min(floor_bucket(finalized_until),
+                             today_start.astimezone(pytz.utc).replace(tzinfo=None))
+            if self.end:
+                rollup_end = min(rollup_end, floor_bucket(self.end))
+
+            rollup_start = ceil_bucket(self.start) if self.start else None
+            if rollup_start is None or rollup_start < rollup_end:
+                self.rollup_start = rollup_start
+                self.rollup_end = rollup_end
+                self.has_rollup = True
+
+        if self.has_rollup:
+            self.live_ranges = []
+            if self.start and self.start < self.rollup_start:
+                self.live_ranges.append((self.start, self.rollup_start))
+            if not self.end or self.rollup_end < self.end:
+                self.live_ranges.append((self.rollup_end, self.end))
+        else:
+            self.live_ranges = [(self.start, self.end)]
+
+    def rollup_condition(self, column: str, arg_dict: dict) -> str:
+        condition = f' AND {column} < :rollup_end'
+        arg_dict['rollup_end'] = self.rollup_end
+        if self.rollup_start:
+            condition += f' AND {column} >= :rollup_start'
+            arg_dict['rollup_start'] = self.rollup_start
+
+        return condition
+
+    def live_condition(self, column: str, arg_dict: dict) -> str:
+        conditions = []
+        for i, (start, end) in enumerate(self.live_ranges):
+            range_conditions = []
+            if start:
+                range_conditions.append(f'{column} >= :live_start_{i}')
+                arg_dict[f'live_start_{i}'] = start
+            if end:
+                range_conditions.append(f'{column} < :live_end_{i}')
+                arg_dict[f'live_end_{i}'] = end
+            conditions.append('(' + ' AND '.join(range_conditions) + ')' if range_conditions else 'TRUE')
+
+        if not conditions:
+            # the whole range is served from the rollup tables
+            return ' AND FALSE'
+
+        return ' AND (' + ' OR '.join(conditions) + ')'
+
+    def _to_utc(self, value: Optional[str]) -> Optional[datetime]:
+        if not value:
+            return None
+
+        local_datetime = datetime.strptime(value, '%Y-%m-%d %H:%M').replace(second=0)
+        local_datetime = pytz.timezone(self.timezone).localize(local_datetime)
+        return local_datetime.astimezone(pytz.utc).replace(tzinfo=None)
+
+
+class AppStatisticService:
+    """
+    Daily app statistics in the account timezone, served from the rollup tables for the final past buckets
+    and computed live from the raw tables for the rest.
+    """
+
+    @classmethod
+    def get_daily_conversations(cls, app_id: str, timezone: str, start: Optional[str],
+                                end: Optional[str]) -> list[dict]:
+        rows = cls._query_distinct_members(app_id, timezone, start, end, 'conversation', 'conversation_id')
+        return [{'date': str(i.date), 'conversation_count': i.member_count} for i in rows]
+
+    @classmethod
+    def get_daily_terminals(cls, app_id: str, timezone: str, start: Optional[str],
+                            end: Optional[str]) -> list[dict]:
+        rows = cls._query_distinct_members(app_id, timezone, start, end, 'end_user', 'from_end_user_id')
+        return [{'date': str(i.date), 'terminal_count': i.member_count} for i in rows]
+
+    @classmethod
+    def get_daily_token_costs(cls, app_id: str, timezone: str, start: Optional[str],
+                              end: Optional[str]) -> list[dict]:
+        rows = cls._query_message_aggregates(
+            app_id, timezone, start, end,
+            columns={
+                'token_count': ('message_tokens + answer_tokens', 'message_tokens + answer_tokens'),
+                'total_price': ('total_price', 'total_price'),
+            },
+            select_sql='SUM(token_count) AS token_count, SUM(total_price) AS total_price'
+        )
+        return [{
+            'date': str(i.date),
+            'token_count': i.token_count,
+            'total_price': i.total_price,
+            'currency': 'USD'
+        } for i in rows]
+
+    @classmethod
+    def get_daily_user_satisfaction_rates(cls, app_id: str, timezone: str, start: Optional[str],
+                                          end: Optional[str]) -> list[dict]:
+        rows = cls._query_message_aggregates(
+            app_id, timezone, start, end,
+            columns={
+                'message_count': ('message_count', '1'),
+                'feedback_count': (
+                    'feedback_count',
+                    '(SELECT COUNT(*) FROM message_feedbacks mf WHERE mf.message_id = messages.id)'
+                ),
+            },
+            select_sql='SUM(message_count) AS message_count, SUM(feedback_count) AS feedback_count'
+        )
+        return [{
+            'date': str(i.date),
+            'rate': round((i.feedback_count * 1000 / i.message_count) if i.message_count > 0 else 0, 2),
+        } for i in rows]
+
+    @classmethod
+    def get_daily_average_response_times(cls, app_id: str, timezone: str, start: Optional[str],
+                                         end: Optional[str]) -> list[dict]:
+        rows = cls._query_message_aggregates(
+            app_id, timezone, start, end,
+            columns={
+                'message_count': ('message_count', '1'),
+                'latency': ('provider_response_latency', 'provider_response_latency'),
+            },
+            select_sql='SUM(latency) / SUM(message_count) AS latency'
+        )
+        return [{'date': str(i.date), 'latency': round(i.latency * 1000, 4)} for i in rows]
+
+    @classmethod
+    def get_daily_tokens_per_second(cls, app_id: str, timezone: str, start: Optional[str],
+                                    end: Optional[str]) -> list[dict]:
+        rows = cls._query_message_aggregates(
+            app_id, timezone, start, end,
+            columns={
+                'answer_tokens': ('answer_tokens', 'answer_tokens'),
+                'latency': ('provider_response_latency', 'provider_response_latency'),
+            },
+            select_sql='''CASE
+                    WHEN SUM(latency) = 0 THEN 0
+                    ELSE (SUM(answer_tokens) / SUM(latency))
+                END AS tokens_per_second'''
+        )
+        return [{'date': str(i.date), 'tps': round(i.tokens_per_second, 4)} for i in rows]
+
+    @classmethod
+    def get_daily_average_session_interactions(cls, app_id: str, timezone: str, start: Optional[str],
+                                               end: Optional[str]) -> list[dict]:
+        time_range = StatisticTimeRange(timezone, start, end, AppStatisticRollupService.get_finalized_until())
+        arg_dict = {'tz': timezone, 'app_id': app_id}
+
+        parts = []
+        if time_range.has_rollup:
+            parts.append(f'''
+                SELECT date(bucket_start AT TIME ZONE 'UTC' AT TIME ZONE :tz) AS date,
+                    session_conversation_count, session_message_count
+                    FROM app_statistic_buckets
+                    WHERE app_id = :app_id AND session_conversation_count > 0
+                    {time_range.rollup_condition('bucket_start', arg_dict)}
+            ''')
+        parts.append(f'''
+            SELECT date(DATE_TRUNC('day', c.created_at AT TIME ZONE 'UTC' AT TIME ZONE :tz)) AS date,
+                1 AS session_conversation_count, COUNT(m.id) AS session_message_count
+                FROM conversations c
+                JOIN messages m ON c.id = m.conversation_id
+                WHERE c.override_model_configs IS NULL AND c.app_id = :app_id
+                {time_range.live_condition('c.created_at', arg_dict)}
+                GROUP BY c.id, date
+        ''')
+
+        sql_query = f'''
+            SELECT date,
+                CAST(SUM(session_message_count) AS NUMERIC) / SUM(session_conversation_count) AS interactions
+                FROM ({' UNION ALL '.join(parts)}) AS t
+                GROUP BY date
+                ORDER BY date
+        '''
+
+        with db.engine.begin() as conn:
+            rows = conn.execute(db.text(sql_query), arg_dict)
+            return [{
+                'date': str(i.date),
+                'interactions': float(i.interactions.quantize(Decimal('0.01')))
+            } for i in rows]
+
+    @classmethod
+    def _query_distinct_members(cls, app_id: str, timezone: str, start: Optional[str], end: Optional[str],
+                                member_type: str, message_column: str) -> list:
+        time_range = StatisticTimeRange(timezone, start, end, AppStatisticRollupService.get_finalized_until())
+        arg_dict = {'tz': timezone, 'app_id': app_id, 'member_type': member_type}
+
+        parts = []
+        if time_range.has_rollup:
+            parts.append(f'''
+                SELECT date(bucket_start AT TIME ZONE 'UTC' AT TIME ZONE :tz) AS date, member_id
+                    FROM app_statistic_bucket_members
+                    WHERE app_id = :app_id AND member_type = :member_type
+                    {time_range.rollup_condition('bucket_start', arg_dict)}
+            ''')
+        parts.append(f'''
+            SELECT date(DATE_TRUNC('day', created_at AT TIME ZONE 'UTC' AT TIME ZONE :tz)) AS date,
+                {message_column} AS member_id
+                FROM messages
+                WHERE app_id = :app_id
+                {time_range.live_condition('created_at', arg_dict)}
+        ''')
+
+        sql_query = f'''
+            SELECT date, COUNT(DISTINCT member_id) AS member_count
+                FROM ({' UNION ALL '.join(parts)}) AS t
+                GROUP BY date
+                ORDER BY date
+        '''
+
+        with db.engine.begin() as conn:
+            return list(conn.execute(db.text(sql_query), arg_dict))
+
+    @classmethod
+    def _query_message_aggregates(cls, app_id: str, timezone: str, start: Optional[str], end: Optional[str],
+                                  columns: dict[str, tuple[str, str]], select_sql: str) -> list:
+        """
+        :param columns: name -> (expression on app_statistic_buckets, expression on messages)
+        :param select_sql: aggregates of the named columns
+        """
+        time_range = StatisticTimeRange(timezone, start, end, AppStatisticRollupService.get_finalized_until())
+        arg_dict = {'tz': timezone, 'app_id': app_id}
+
+        parts = []
+        if time_range.has_rollup:
+            rollup_columns = ', '.join(f'{expression} AS {name}' for name, (expression, _) in columns.items())
+            parts.append(f'''
+                SELECT date(bucket_start AT TIME ZONE 'UTC' AT TIME ZONE :tz) AS date, {rollup_columns}
+                    FROM app_statistic_buckets
+                    WHERE app_id = :app_id AND message_count > 0
+                    {time_range.rollup_condition('bucket_start', arg_dict)}
+            ''')
+        live_columns = ', '.join(f'{expression} AS {name}' for name, (_, expression) in columns.items())
+        parts.append(f'''
+            SELECT date(DATE_TRUNC('day', created_at AT TIME ZONE 'UTC' AT TIME ZONE :tz)) AS date, {live_columns}
+                FROM messages
+                WHERE app_id = :app_id
+                {time_range.live_condition('created_at', arg_dict)}
+        ''')
+
+        sql_query = f'''
+            SELECT date, {select_sql}
+                FROM ({' UNION ALL '.join(parts)}) AS t
+                GROUP BY date
+                ORDER BY date
+        '''
+
+        with db.engine.begin() as conn:
+            return list(conn.execute(db.text(sql_query), arg_dict))
@@ -1,6 +1,10 @@
 import os
+import threading
+from typing import Optional
 
 import requests
+from flask import current_app
+from requests.adapters import HTTPAdapter
 
 from extensions.ext_database import db
 from models.account import TenantAccountJoin, TenantAccountRole
@@ -10,6 +14,11 @@ class BillingService:
     base_url = os.environ.get('BILLING_API_URL', 'BILLING_API_URL')
     secret_key = os.environ.get('BILLING_API_SECRET_KEY', 'BILLING_API_SECRET_KEY')
 
+    # pooled session of the process, the connections of a parent process are not reused after a fork
+    _session: Optional[requests.Session] = None
+    _session_pid: Optional[int] = None
+    _session_lock = threading.Lock()
+
     @classmethod
     def get_info(cls, tenant_id: str):
         params = {'tenant_id': tenant_id}
@@ -61,10 +70,23 @@ class BillingService:
         }
 
         url = f"{cls.base_url}{endpoint}"
-        response = requests.request(method, url, json=json, params=params, headers=headers)
+        response = cls._get_session().request(method, url, json=json, params=params, headers=headers,
+                                              timeout=current_app.config.get('BILLING_API_TIMEOUT'))
 
         return response.json()
 
+    @classmethod
+    def _get_session(cls) -> requests.Session:
+        if cls._session is None or cls._session_pid != os.getpid():
+            with cls._session_lock:
+                if cls._session is None or cls._session_pid != os.getpid():
+                    session = requests.Session()
+                    session.mount('http://', HTTPAdapter(pool_maxsize=20))
+                    session.mount('https://', HTTPAdapter(pool_maxsize=20))
+                    cls._session = session
+                    cls._session_pid = os.getpid()
+        return cls._session
+
     @staticmethod
     def is_tenant_owner_or_admin(current_user):
         tenant_id = current_user.current_tenant_id
@@ -5,7 +5,7 @@ from sqlalchemy import or_
 from core.app.entities.app_invoke_entities import InvokeFrom
 from core.llm_generator.llm_generator import LLMGenerator
 from extensions.ext_database import db
-from libs.infinite_scroll_pagination import InfiniteScrollPagination
+from libs.infinite_scroll_pagination import InfiniteScrollPagination, KeysetCursor, paginate_by_keyset
 from models.account import Account
 from models.model import App, Conversation, EndUser, Message
 from services.errors.conversation import ConversationNotExistsError, LastConversationNotExistsError
@@ -37,6 +37,7 @@ class ConversationService:
         if exclude_ids is not None:
             base_query = base_query.filter(~Conversation.id.in_(exclude_ids))
 
+        cursor = None
         if last_id:
             last_conversation = base_query.filter(
                 Conversation.id == last_id,
@@ -45,23 +46,9 @@ class ConversationService:
             if not last_conversation:
                 raise LastConversationNotExistsError()
 
-            conversations = base_query.filter(
-                Conversation.created_at < last_conversation.created_at,
-                Conversation.id != last_conversation.id
-            ).order_by(Conversation.created_at.desc()).limit(limit).all()
-        else:
-            conversations = base_query.order_by(Conversation.created_at.desc()).limit(limit).all()
-
-        has_more = False
-        if len(conversations) == limit:
-            current_page_first_conversation = conversations[-1]
-            rest_count = base_query.filter(
-                Conversation.created_at < current_page_first_conversation.created_at,
-                Conversation.id != current_page_first_conversation.id
-            ).count()
-
-            if rest_count > 0:
-                has_more = True
+            cursor = KeysetCursor.of(last_conversation)
+
+        conversations, has_more = paginate_by_keyset(base_query, Conversation, limit, cursor)
 
         return InfiniteScrollPagination(
             data=conversations,
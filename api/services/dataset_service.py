@@ -452,12 +452,17 @@ class DocumentService:
 
     @staticmethod
     def delete_document(document):
-        # trigger document_was_deleted signal
-        document_was_deleted.send(document.id, dataset_id=document.dataset_id, doc_form=document.doc_form)
+        file_id = None
+        if document.data_source_type == 'upload_file':
+            file_id = document.data_source_info_dict.get('upload_file_id')
 
+        document_id, dataset_id, doc_form = document.id, document.dataset_id, document.doc_form
         db.session.delete(document)
         db.session.commit()
 
+        # trigger document_was_deleted signal, once the document is not a reference of its upload file anymore
+        document_was_deleted.send(document_id, dataset_id=dataset_id, doc_form=doc_form, file_id=file_id)
+
     @staticmethod
     def rename_document(dataset_id: str, document_id: str, name: str) -> Document:
         dataset = DatasetService.get_dataset(dataset_id)
@@ -1,9 +1,19 @@
-from flask import current_app
+import json
+import logging
+import threading
+import time
+
+from flask import current_app, g, has_app_context
 from pydantic import BaseModel, ConfigDict
 
+from extensions.ext_redis import redis_client
 from services.billing_service import BillingService
 from services.enterprise.enterprise_service import EnterpriseService
 
+logger = logging.getLogger(__name__)
+
+BILLING_INFO_REFRESH_LOCK_TIMEOUT = 60
+
 
 class SubscriptionModel(BaseModel):
     plan: str = 'sandbox'
@@ -70,8 +80,90 @@ class FeatureService:
         features.model_load_balancing_enabled = current_app.config['MODEL_LB_ENABLED']
 
     @classmethod
-    def _fulfill_params_from_billing_api(cls, features: FeatureModel, tenant_id: str):
+    def invalidate_billing_info(cls, tenant_id: str):
+        """
+        Drop the cached billing info of a tenant, e.g. when its subscription changes.
+        """
+        redis_client.delete(cls._billing_info_cache_key(tenant_id))
+        if has_app_context():
+            g.get('billing_infos', {}).pop(tenant_id, None)
+
+    @classmethod
+    def _get_billing_info(cls, tenant_id: str) -> dict:
+        """
+        Get the billing info of a tenant, once per request or task and from the cache.
+
+        The cached info is used for BILLING_INFO_CACHE_TTL seconds, then for BILLING_INFO_STALE_TTL more seconds
+        while it is refreshed in background.
+        """
+        if not current_app.config.get('BILLING_INFO_CACHE_TTL'):
+            return BillingService.get_info(tenant_id)
+
+        billing_infos = g.setdefault('billing_infos', {})
+        if tenant_id not in billing_infos:
+            billing_infos[tenant_id] = cls._get_cached_billing_info(tenant_id)
+        return billing_infos[tenant_id]
+
+    @classmethod
+    def _get_cached_billing_info(cls, tenant_id: str) -> dict:
+        try:
+            cached = redis_client.get(cls._billing_info_cache_key(tenant_id))
+        except Exception:
+            logger.warning('Failed to get billing info from cache', exc_info=True)
+            return BillingService.get_info(tenant_id)
+
+        if not cached:
+            return cls._refresh_billing_info(tenant_id)
+
+        cached = json.loads(cached)
+        if time.time() - cached['fetched_at'] >= current_app.config.get('BILLING_INFO_CACHE_TTL'):
+            # the cache expires once the stale ttl is over as well
+            cls._refresh_billing_info_in_background(tenant_id)
+        return cached['info']
+
+    @classmethod
+    def _refresh_billing_info(cls, tenant_id: str) -> dict:
         billing_info = BillingService.get_info(tenant_id)
+        # error responses of the billing API are not cached
+        if isinstance(billing_info, dict) and 'subscription' in billing_info:
+            ttl = current_app.config.get('BILLING_INFO_CACHE_TTL') + current_app.config.get('BILLING_INFO_STALE_TTL')
+            try:
+                redis_client.setex(cls._billing_info_cache_key(tenant_id), ttl, json.dumps({
+                    'fetched_at': time.time(),
+                    'info': billing_info,
+                }))
+            except Exception:
+                logger.warning('Failed to set billing info to cache', exc_info=True)
+
+        return billing_info
+
+    @classmethod
+    def _refresh_billing_info_in_background(cls, tenant_id: str):
+        lock_key = f'billing_info_refresh_lock:{tenant_id}'
+        # one refresh of a tenant at a time in all the processes
+        if not redis_client.set(lock_key, 1, nx=True, ex=BILLING_INFO_REFRESH_LOCK_TIMEOUT):
+            return
+
+        flask_app = current_app._get_current_object()
+
+        def refresh():
+            with flask_app.app_context():
+                try:
+                    cls._refresh_billing_info(tenant_id)
+                except Exception:
+                    logger.exception(f'Failed to refresh billing info of tenant {tenant_id}')
+                finally:
+                    redis_client.delete(lock_key)
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    @staticmethod
+    def _billing_info_cache_key(tenant_id: str) -> str:
+        return f'billing_info:{tenant_id}'
+
+    @classmethod
+    def _fulfill_params_from_billing_api(cls, features: FeatureModel, tenant_id: str):
+        billing_info = cls._get_billing_info(tenant_id)
 
         features.billing.enabled = billing_info['enabled']
         features.billing.subscription.plan = billing_info['subscription']['plan']
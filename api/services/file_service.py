@@ -1,11 +1,15 @@
 import datetime
 import hashlib
+import tempfile
 import uuid
 from collections.abc import Generator
-from typing import Union
+from typing import IO, Union
 
 from flask import current_app
 from flask_login import current_user
+from sqlalchemy import cast
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.exc import IntegrityError
 from werkzeug.datastructures import FileStorage
 from werkzeug.exceptions import NotFound
 
@@ -14,7 +18,8 @@ from core.rag.extractor.extract_processor import ExtractProcessor
 from extensions.ext_database import db
 from extensions.ext_storage import storage
 from models.account import Account
-from models.model import EndUser, UploadFile
+from models.dataset import Document
+from models.model import EndUser, UploadFile, UploadFileBlob
 from services.errors.file import FileTooLargeError, UnsupportedFileTypeError
 
 IMAGE_EXTENSIONS = ['jpg', 'jpeg', 'png', 'webp', 'gif', 'svg']
@@ -26,6 +31,9 @@ UNSTRUCTURED_ALLOWED_EXTENSIONS = ['txt', 'markdown', 'md', 'pdf', 'html', 'htm'
 
 PREVIEW_WORDS_LIMIT = 3000
 
+UPLOAD_CHUNK_SIZE = 64 * 1024
+UPLOAD_SPOOL_MAX_MEMORY_SIZE = 1024 * 1024
+
 
 class FileService:
 
@@ -43,34 +51,42 @@ class FileService:
         elif only_image and extension.lower() not in IMAGE_EXTENSIONS:
             raise UnsupportedFileTypeError()
 
-        # read file content
-        file_content = file.read()
-
-        # get file size
-        file_size = len(file_content)
-
         if extension.lower() in IMAGE_EXTENSIONS:
             file_size_limit = current_app.config.get("UPLOAD_IMAGE_FILE_SIZE_LIMIT") * 1024 * 1024
         else:
             file_size_limit = current_app.config.get("UPLOAD_FILE_SIZE_LIMIT") * 1024 * 1024
 
-        if file_size > file_size_limit:
-            message = f'File size exceeded. {file_size} > {file_size_limit}'
-            raise FileTooLargeError(message)
-
-        # user uuid as file name
-        file_uuid = str(uuid.uuid4())
-
         if isinstance(user, Account):
             current_tenant_id = user.current_tenant_id
         else:
             # end_user
             current_tenant_id = user.tenant_id
 
-        file_key = 'upload_files/' + current_tenant_id + '/' + file_uuid + '.' + extension
-
-        # save file to storage
-        storage.save(file_key, file_content)
+        # spool file content while hashing and checking its size chunk by chunk,
+        # so that large uploads are never held in memory as a whole
+        with tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_MAX_MEMORY_SIZE) as spooled_file:
+            file_hash = hashlib.sha3_256()
+            file_size = 0
+            while chunk := file.stream.read(UPLOAD_CHUNK_SIZE):
+                file_size += len(chunk)
+                if file_size > file_size_limit:
+                    message = f'File size exceeded. {file_size} > {file_size_limit}'
+                    raise FileTooLargeError(message)
+
+                file_hash.update(chunk)
+                spooled_file.write(chunk)
+
+            spooled_file.seek(0)
+            file_hash = file_hash.hexdigest()
+
+            # save file to storage, identical content of the tenant is stored only once
+            file_key = FileService._save_file_content(
+                tenant_id=current_tenant_id,
+                file_hash=file_hash,
+                file_size=file_size,
+                extension=extension,
+                stream=spooled_file
+            )
 
         # save file to db
         config = current_app.config
@@ -86,7 +102,7 @@ class FileService:
             created_by=user.id,
             created_at=datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None),
             used=False,
-            hash=hashlib.sha3_256(file_content).hexdigest()
+            hash=file_hash
         )
 
         db.session.add(upload_file)
@@ -94,6 +110,121 @@ class FileService:
 
         return upload_file
 
+    @staticmethod
+    def _save_file_content(tenant_id: str, file_hash: str, file_size: int, extension: str,
+                           stream: IO[bytes]) -> str:
+        """
+        Save file content to storage and return its storage key.
+        When deduplication is enabled, the key of content already stored for the tenant is reused
+        and the reference count of its blob is increased instead.
+        The blob row stays locked until the caller commits the upload file.
+        """
+        config = current_app.config
+        if not config.get('UPLOAD_FILE_DEDUPLICATION_ENABLED'):
+            file_key = FileService._generate_file_key(tenant_id, extension)
+            storage.save_stream(file_key, stream)
+            return file_key
+
+        # content is stored once per storage type, the blobs of a previous storage type keep their references
+        upload_file_blob = db.session.query(UploadFileBlob) \
+            .filter(UploadFileBlob.tenant_id == tenant_id,
+                    UploadFileBlob.hash == file_hash,
+                    UploadFileBlob.storage_type == config['STORAGE_TYPE']) \
+            .with_for_update() \
+            .first()
+
+        now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        if upload_file_blob:
+            upload_file_blob.ref_count += 1
+            upload_file_blob.updated_at = now
+            return upload_file_blob.key
+
+        file_key = FileService._generate_file_key(tenant_id, extension)
+        storage.save_stream(file_key, stream)
+
+        upload_file_blob = UploadFileBlob(
+            tenant_id=tenant_id,
+            hash=file_hash,
+            storage_type=config['STORAGE_TYPE'],
+            key=file_key,
+            size=file_size,
+            ref_count=1,
+            created_at=now,
+            updated_at=now
+        )
+        db.session.add(upload_file_blob)
+        try:
+            db.session.flush()
+        except IntegrityError:
+            # the same content was stored by a concurrent upload, reference that one instead
+            db.session.rollback()
+            storage.delete(file_key)
+            stream.seek(0)
+            return FileService._save_file_content(tenant_id, file_hash, file_size, extension, stream)
+
+        return file_key
+
+    @staticmethod
+    def _generate_file_key(tenant_id: str, extension: str) -> str:
+        # user uuid as file name
+        file_uuid = str(uuid.uuid4())
+        return 'upload_files/' + tenant_id + '/' + file_uuid + '.' + extension
+
+    @staticmethod
+    def release_file(upload_file: UploadFile) -> None:
+        """
+        Delete upload file, its content is removed from storage when no other upload file references it.
+        """
+        upload_file_blob = None
+        if upload_file.hash:
+            upload_file_blob = db.session.query(UploadFileBlob) \
+                .filter(UploadFileBlob.tenant_id == upload_file.tenant_id,
+                        UploadFileBlob.hash == upload_file.hash,
+                        UploadFileBlob.storage_type == upload_file.storage_type,
+                        UploadFileBlob.key == upload_file.key) \
+                .with_for_update() \
+                .first()
+
+        delete_content = True
+        if upload_file_blob:
+            upload_file_blob.ref_count -= 1
+            if upload_file_blob.ref_count > 0:
+                upload_file_blob.updated_at = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+                delete_content = False
+            else:
+                db.session.delete(upload_file_blob)
+
+        db.session.delete(upload_file)
+        db.session.commit()
+
+        if delete_content:
+            storage.delete(upload_file.key)
+            if upload_file.hash:
+                ExtractProcessor.delete_cached_extraction(upload_file)
+
+    @staticmethod
+    def release_unreferenced_file(file_id: str) -> None:
+        """
+        Release the upload file a deleted document was created from,
+        unless another document was created from the same upload file.
+        """
+        upload_file = db.session.query(UploadFile).filter(UploadFile.id == file_id).first()
+        if not upload_file:
+            return
+
+        # data source info of documents is a json text column, matched by the expression index of its file id
+        is_referenced = db.session.query(
+            db.session.query(Document.id).filter(
+                Document.tenant_id == upload_file.tenant_id,
+                Document.data_source_type == 'upload_file',
+                cast(Document.data_source_info, JSONB)['upload_file_id'].astext == file_id
+            ).exists()
+        ).scalar()
+        if is_referenced:
+            return
+
+        FileService.release_file(upload_file)
+
     @staticmethod
     def upload_text(text: str, text_name: str) -> UploadFile:
         if len(text_name) > 200:
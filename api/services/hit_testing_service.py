@@ -1,9 +1,13 @@
 import logging
 import time
+from typing import Optional
 
 import numpy as np
-from sklearn.manifold import TSNE
+from flask import current_app
 
+from core.embedding.cached_embedding import CacheEmbedding
+from core.model_manager import ModelManager
+from core.model_runtime.entities.model_entities import ModelType
 from core.rag.datasource.retrieval_service import RetrievalService
 from core.rag.models.document import Document
 from core.rag.retrieval.retrival_methods import RetrievalMethod
@@ -25,34 +29,12 @@ default_retrieval_model = {
 
 class HitTestingService:
     @classmethod
-    def retrieve(cls, dataset: Dataset, query: str, account: Account, retrieval_model: dict, limit: int = 10) -> dict:
-        if dataset.available_document_count == 0 or dataset.available_segment_count == 0:
-            return {
-                "query": {
-                    "content": query,
-                    "tsne_position": {'x': 0, 'y': 0},
-                },
-                "records": []
-            }
+    def retrieve(cls, dataset: Dataset, query: str, account: Account, retrieval_model: dict, limit: int = 10,
+                 with_positions: bool = False) -> dict:
+        if cls._is_empty(dataset):
+            return cls._empty_response(query)
 
-        start = time.perf_counter()
-
-        # get retrieval model , if the model is not setting , using default
-        if not retrieval_model:
-            retrieval_model = dataset.retrieval_model if dataset.retrieval_model else default_retrieval_model
-
-        all_documents = RetrievalService.retrieve(retrival_method=retrieval_model['search_method'],
-                                                  dataset_id=dataset.id,
-                                                  query=query,
-                                                  top_k=retrieval_model['top_k'],
-                                                  score_threshold=retrieval_model['score_threshold']
-                                                  if retrieval_model['score_threshold_enabled'] else None,
-                                                  reranking_model=retrieval_model['reranking_model']
-                                                  if retrieval_model['reranking_enable'] else None
-                                                  )
-
-        end = time.perf_counter()
-        logging.debug(f"Hit testing retrieve in {end - start:0.4f} seconds")
+        all_documents = cls._retrieve_documents(dataset, query, retrieval_model)
 
         dataset_query = DatasetQuery(
             dataset_id=dataset.id,
@@ -65,41 +47,90 @@ class HitTestingService:
         db.session.add(dataset_query)
         db.session.commit()
 
-        return cls.compact_retrieve_response(dataset, query, all_documents)
+        response = cls.compact_retrieve_response(dataset, query, all_documents)
+        if with_positions:
+            cls._add_positions(dataset, response)
+
+        return response
+
+    @classmethod
+    def batch_retrieve(cls, dataset: Dataset, queries: list[dict], account: Account, retrieval_model: dict) -> dict:
+        """
+        Hit test many queries, with the recall of the queries giving the ids of the segments they expect.
+
+        :param queries: the queries, each one a dict of its content `query`
+            and optionally of the ids of the segments it expects `expected_segment_ids`
+        :return: the records of each query, and the mean recall, hit rate and reciprocal rank of the queries
+        """
+        if cls._is_empty(dataset):
+            results = [cls._empty_response(query['query']) for query in queries]
+            for result, query in zip(results, queries):
+                cls._add_recall(result, query.get('expected_segment_ids'))
+            return {'results': results, 'metrics': cls._aggregate_metrics(results)}
+
+        all_documents = []
+        for query in queries:
+            all_documents.append(cls._retrieve_documents(dataset, query['query'], retrieval_model))
+
+        for query in queries:
+            db.session.add(DatasetQuery(
+                dataset_id=dataset.id,
+                content=query['query'],
+                source='hit_testing',
+                created_by_role='account',
+                created_by=account.id
+            ))
+        db.session.commit()
+
+        # the segments of all the queries are loaded at once
+        segments = cls._load_segments(dataset, [
+            document.metadata['doc_id'] for documents in all_documents for document in documents
+        ])
+
+        results = []
+        for query, documents in zip(queries, all_documents):
+            result = cls._compact_records(query['query'], documents, segments)
+            cls._add_recall(result, query.get('expected_segment_ids'))
+            results.append(result)
+
+        return {'results': results, 'metrics': cls._aggregate_metrics(results)}
 
     @classmethod
     def compact_retrieve_response(cls, dataset: Dataset, query: str, documents: list[Document]):
-        i = 0
-        records = []
-        for document in documents:
-            index_node_id = document.metadata['doc_id']
+        segments = cls._load_segments(dataset, [document.metadata['doc_id'] for document in documents])
 
-            segment = db.session.query(DocumentSegment).filter(
-                DocumentSegment.dataset_id == dataset.id,
-                DocumentSegment.enabled == True,
-                DocumentSegment.status == 'completed',
-                DocumentSegment.index_node_id == index_node_id
-            ).first()
+        return cls._compact_records(query, documents, segments)
 
-            if not segment:
-                i += 1
-                continue
+    @classmethod
+    def get_positions_from_embeddings(cls, embeddings: list) -> list[dict]:
+        if current_app.config.get('HIT_TESTING_PROJECTION_METHOD') == 'tsne':
+            return cls.get_tsne_positions_from_embeddings(embeddings)
 
-            record = {
-                "segment": segment,
-                "score": document.metadata.get('score', None),
-            }
+        return cls.get_pca_positions_from_embeddings(embeddings)
 
-            records.append(record)
+    @classmethod
+    def get_pca_positions_from_embeddings(cls, embeddings: list) -> list[dict]:
+        """
+        Project embeddings on their first two principal axes, which unlike TSNE is deterministic
+        and takes milliseconds for the few embeddings of a hit testing.
+        """
+        if len(embeddings) <= 1:
+            return [{'x': 0, 'y': 0}]
 
-            i += 1
+        data = np.array(embeddings, dtype=float).reshape(len(embeddings), -1)
+        centered = data - data.mean(axis=0)
+        _, _, axes = np.linalg.svd(centered, full_matrices=False)
+        axes = axes[:2]
 
-        return {
-            "query": {
-                "content": query,
-            },
-            "records": records
-        }
+        # the sign of an axis is arbitrary, the largest component of each axis is made positive
+        # so that the same embeddings always get the same positions
+        signs = np.sign(axes[np.arange(len(axes)), np.argmax(np.abs(axes), axis=1)])
+        signs[signs == 0] = 1
+        positions = centered @ (axes * signs[:, None]).T
+        if positions.shape[1] < 2:
+            positions = np.hstack([positions, np.zeros((len(positions), 2 - positions.shape[1]))])
+
+        return [{'x': float(x), 'y': float(y)} for x, y in positions]
 
     @classmethod
     def get_tsne_positions_from_embeddings(cls, embeddings: list):
@@ -107,6 +138,9 @@ class HitTestingService:
         if embedding_length <= 1:
             return [{'x': 0, 'y': 0}]
 
+        # imported here as it is slow to import and only used when configured
+        from sklearn.manifold import TSNE
+
         noise = np.random.normal(0, 1e-4, np.array(embeddings).shape)
         concatenate_data = np.array(embeddings) + noise
         concatenate_data = concatenate_data.reshape(embedding_length, -1)
@@ -130,3 +164,158 @@ class HitTestingService:
 
         if not query or len(query) > 250:
             raise ValueError('Query is required and cannot exceed 250 characters')
+
+    @classmethod
+    def batch_hit_testing_args_check(cls, args):
+        queries = args['queries']
+
+        max_queries = current_app.config.get('HIT_TESTING_BATCH_MAX_QUERIES')
+        if not queries or len(queries) > max_queries:
+            raise ValueError(f'Queries are required and cannot exceed {max_queries} queries')
+
+        for query in queries:
+            if not isinstance(query, dict):
+                raise ValueError('Query must be an object')
+            cls.hit_testing_args_check(query)
+
+            expected_segment_ids = query.get('expected_segment_ids')
+            if expected_segment_ids is not None and not isinstance(expected_segment_ids, list):
+                raise ValueError('Expected segment ids must be a list')
+
+    @classmethod
+    def _is_empty(cls, dataset: Dataset) -> bool:
+        return dataset.available_document_count == 0 or dataset.available_segment_count == 0
+
+    @classmethod
+    def _empty_response(cls, query: str) -> dict:
+        return {
+            "query": {
+                "content": query,
+                "tsne_position": {'x': 0, 'y': 0},
+            },
+            "records": []
+        }
+
+    @classmethod
+    def _retrieve_documents(cls, dataset: Dataset, query: str, retrieval_model: dict) -> list[Document]:
+        start = time.perf_counter()
+
+        # get retrieval model , if the model is not setting , using default
+        if not retrieval_model:
+            retrieval_model = dataset.retrieval_model if dataset.retrieval_model else default_retrieval_model
+
+        all_documents = RetrievalService.retrieve(retrival_method=retrieval_model['search_method'],
+                                                  dataset_id=dataset.id,
+                                                  query=query,
+                                                  top_k=retrieval_model['top_k'],
+                                                  score_threshold=retrieval_model['score_threshold']
+                                                  if retrieval_model['score_threshold_enabled'] else None,
+                                                  reranking_model=retrieval_model['reranking_model']
+                                                  if retrieval_model['reranking_enable'] else None
+                                                  )
+
+        end = time.perf_counter()
+        logging.debug(f"Hit testing retrieve in {end - start:0.4f} seconds")
+
+        return all_documents
+
+    @classmethod
+    def _load_segments(cls, dataset: Dataset, index_node_ids: list[str]) -> dict[str, DocumentSegment]:
+        """
+        Load the enabled and completed segments of index nodes, and their documents, with one query each.
+        """
+        if not index_node_ids:
+            return {}
+
+        segments = db.session.query(DocumentSegment).filter(
+            DocumentSegment.dataset_id == dataset.id,
+            DocumentSegment.enabled == True,
+            DocumentSegment.status == 'completed',
+            DocumentSegment.index_node_id.in_(set(index_node_ids))
+        ).all()
+        DocumentSegment.preload_documents(segments)
+
+        return {segment.index_node_id: segment for segment in segments}
+
+    @classmethod
+    def _compact_records(cls, query: str, documents: list[Document], segments: dict[str, DocumentSegment]) -> dict:
+        records = []
+        for document in documents:
+            segment = segments.get(document.metadata['doc_id'])
+            if not segment:
+                continue
+
+            records.append({
+                "segment": segment,
+                "score": document.metadata.get('score', None),
+            })
+
+        return {
+            "query": {
+                "content": query,
+            },
+            "records": records
+        }
+
+    @classmethod
+    def _add_positions(cls, dataset: Dataset, response: dict) -> None:
+        """
+        Add the 2-D positions of the query and records, from the embeddings of the segments cached
+        when they were indexed, only the segments missing from the cache are embedded again.
+        """
+        if dataset.indexing_technique != 'high_quality':
+            return
+
+        embedding_model = ModelManager().get_model_instance(
+            tenant_id=dataset.tenant_id,
+            provider=dataset.embedding_model_provider,
+            model_type=ModelType.TEXT_EMBEDDING,
+            model=dataset.embedding_model
+        )
+        embeddings = CacheEmbedding(embedding_model)
+
+        records = response['records']
+        texts = [record['segment'].content for record in records]
+        record_embeddings = embeddings.get_cached_embeddings(texts)
+        missing_indices = [i for i, embedding in enumerate(record_embeddings) if embedding is None]
+        if missing_indices:
+            missing_embeddings = embeddings.embed_documents([texts[i] for i in missing_indices])
+            for i, embedding in zip(missing_indices, missing_embeddings):
+                record_embeddings[i] = embedding
+
+        query_embedding = embeddings.embed_query(response['query']['content'])
+        positions = cls.get_positions_from_embeddings([query_embedding, *record_embeddings])
+
+        response['query']['tsne_position'] = positions[0]
+        for record, position in zip(records, positions[1:]):
+            record['tsne_position'] = position
+
+    @classmethod
+    def _add_recall(cls, result: dict, expected_segment_ids: Optional[list[str]]) -> None:
+        if not expected_segment_ids:
+            result['recall'] = None
+            result['reciprocal_rank'] = None
+            return
+
+        expected_segment_ids = set(expected_segment_ids)
+        segment_ids = [record['segment'].id for record in result['records']]
+        result['recall'] = len(expected_segment_ids.intersection(segment_ids)) / len(expected_segment_ids)
+        result['reciprocal_rank'] = next(
+            (1 / rank for rank, segment_id in enumerate(segment_ids, start=1) if segment_id in expected_segment_ids),
+            0.0
+        )
+
+    @classmethod
+    def _aggregate_metrics(cls, results: list[dict]) -> dict:
+        evaluated = [result for result in results if result['recall'] is not None]
+        if not evaluated:
+            return {'query_count': len(results), 'evaluated_query_count': 0,
+                    'recall': None, 'hit_rate': None, 'mrr': None}
+
+        return {
+            'query_count': len(results),
+            'evaluated_query_count': len(evaluated),
+            'recall': sum(result['recall'] for result in evaluated) / len(evaluated),
+            'hit_rate': sum(1 for result in evaluated if result['recall'] > 0) / len(evaluated),
+            'mrr': sum(result['reciprocal_rank'] for result in evaluated) / len(evaluated),
+        }
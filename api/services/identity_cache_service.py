@@ -0,0 +1,212 @@
+import json
+import logging
+from collections.abc import Callable
+from datetime import datetime
+from typing import Optional
+
+from flask import current_app
+from sqlalchemy import DateTime, event
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from extensions.ext_database import db
+from extensions.ext_redis import redis_client
+from models.account import Account, Tenant, TenantAccountJoin
+from models.model import App, EndUser, Site
+
+logger = logging.getLogger(__name__)
+
+# columns which are never kept in the cache, they are loaded from the database when they are accessed
+EXCLUDED_COLUMNS = {
+    Account: {'password', 'password_salt'},
+}
+
+
+class IdentityCacheService:
+    """
+    Short-lived cache of the rows resolving the identity of a request: the account of a console request
+    with its current tenant and role, and the app, site and end user of a web app request.
+
+    Cached rows carry the version of the account, tenant or app they were loaded with, versions are
+    bumped when these rows or the memberships of the account change, see `_invalidate_changed_identities`.
+    Rows from the cache are attached to the session without a query, so that they can still be updated.
+    """
+
+    @classmethod
+    def load_account(cls, account_id: str, loader: Callable[[str], Optional[Account]]) -> Optional[Account]:
+        """
+        Get an account with its current tenant.
+
+        :param loader: loads the account with its current tenant from the database when it is not cached
+        """
+        ttl = current_app.config.get('IDENTITY_CACHE_TTL')
+        if not ttl:
+            return loader(account_id)
+
+        cache_key = f'identity:account:{account_id}'
+        account_version_key = cls._version_key('account', account_id)
+        try:
+            cached, account_version = redis_client.mget([cache_key, account_version_key])
+            if cached:
+                data = json.loads(cached)
+                tenant_id = data['tenant']['id'] if data['tenant'] else None
+                tenant_version = redis_client.get(cls._version_key('tenant', tenant_id)) if tenant_id else None
+                if data['versions'] == [cls._decode(account_version), cls._decode(tenant_version)]:
+                    return cls._load_account(data)
+        except Exception:
+            logger.warning('Failed to get account identity from cache', exc_info=True)
+            return loader(account_id)
+
+        account = loader(account_id)
+        if not account:
+            return None
+
+        tenant = account.current_tenant
+        try:
+            # the account version is read before the rows are loaded, so that a change in between is seen by
+            # the next request, the tenant is only known once loaded and a change of the tenant row in between
+            # is seen once the cache expires
+            tenant_version = redis_client.get(cls._version_key('tenant', tenant.id)) if tenant else None
+            redis_client.setex(cache_key, ttl, json.dumps({
+                'versions': [cls._decode(account_version), cls._decode(tenant_version)],
+                'account': cls._dump(account),
+                'tenant': cls._dump(tenant) if tenant else None,
+                'role': tenant.current_role if tenant else None,
+            }))
+        except Exception:
+            logger.warning('Failed to set account identity to cache', exc_info=True)
+
+        return account
+
+    @classmethod
+    def load_web_identity(
+        cls, app_id: str, app_code: Optional[str], end_user_id: str,
+        loader: Callable[[str, Optional[str], str], tuple[Optional[App], Optional[Site], Optional[EndUser]]]
+    ) -> tuple[Optional[App], Optional[Site], Optional[EndUser]]:
+        """
+        Get the app, the site and the end user of a web app request.
+
+        :param loader: loads them from the database when they are not cached
+        """
+        ttl = current_app.config.get('IDENTITY_CACHE_TTL')
+        if not ttl:
+            return loader(app_id, app_code, end_user_id)
+
+        cache_key = f'identity:web:{app_id}:{app_code}:{end_user_id}'
+        try:
+            cached, app_version = redis_client.mget([cache_key, cls._version_key('app', app_id)])
+            if cached:
+                data = json.loads(cached)
+                if data['versions'] == [cls._decode(app_version)]:
+                    return cls._attach(App, data['app']), cls._attach(Site, data['site']), \
+                        cls._attach(EndUser, data['end_user'])
+        except Exception:
+            logger.warning('Failed to get web app identity from cache', exc_info=True)
+            return loader(app_id, app_code, end_user_id)
+
+        app_model, site, end_user = loader(app_id, app_code, end_user_id)
+        if app_model and site and end_user:
+            try:
+                redis_client.setex(cache_key, ttl, json.dumps({
+                    'versions': [cls._decode(app_version)],
+                    'app': cls._dump(app_model),
+                    'site': cls._dump(site),
+                    'end_user': cls._dump(end_user),
+                }))
+            except Exception:
+                logger.warning('Failed to set web app identity to cache', exc_info=True)
+
+        return app_model, site, end_user
+
+    @classmethod
+    def invalidate(cls, kind: str, identity_id: str) -> None:
+        """
+        Invalidate the cached identities of an account, a tenant or an app.
+
+        :param kind: account, tenant or app
+        """
+        try:
+            redis_client.incr(cls._version_key(kind, identity_id))
+        except Exception:
+            logger.exception(f'Failed to invalidate the cached identities of {kind} {identity_id}')
+
+    @staticmethod
+    def _version_key(kind: str, identity_id: str) -> str:
+        return f'identity:{kind}_version:{identity_id}'
+
+    @staticmethod
+    def _decode(version: Optional[bytes]) -> Optional[str]:
+        return version.decode('utf-8') if version else None
+
+    @classmethod
+    def _load_account(cls, data: dict) -> Account:
+        account = cls._attach(Account, data['account'])
+        tenant = None
+        if data['tenant']:
+            tenant = cls._attach(Tenant, data['tenant'])
+            tenant.current_role = data['role']
+        account._current_tenant = tenant
+        return account
+
+    @staticmethod
+    def _dump(instance) -> dict:
+        model = type(instance)
+        data = {}
+        for column_attr in model.__mapper__.column_attrs:
+            if column_attr.key in EXCLUDED_COLUMNS.get(model, ()):
+                continue
+            value = getattr(instance, column_attr.key)
+            data[column_attr.key] = value.isoformat() if isinstance(value, datetime) else value
+        return data
+
+    @staticmethod
+    def _attach(model, data: dict):
+        values = {}
+        for column_attr in model.__mapper__.column_attrs:
+            if column_attr.key not in data:
+                continue
+            value = data[column_attr.key]
+            if value is not None and isinstance(column_attr.columns[0].type, DateTime):
+                value = datetime.fromisoformat(value)
+            values[column_attr.key] = value
+
+        instance = model(**values)
+        # a persistent row without a query, the excluded columns are loaded when they are accessed
+        make_transient_to_detached(instance)
+        return db.session.merge(instance, load=False)
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_changed_identities(session, flush_context):
+    changed = session.info.setdefault('changed_identities', set())
+    # new rows are in no cached identity, except the memberships of an account
+    for instance in session.new:
+        if isinstance(instance, TenantAccountJoin):
+            changed.add(('account', instance.account_id))
+
+    for instance in list(session.dirty) + list(session.deleted):
+        if isinstance(instance, Account):
+            changed.add(('account', instance.id))
+        elif isinstance(instance, TenantAccountJoin):
+            changed.add(('account', instance.account_id))
+        elif isinstance(instance, Tenant):
+            changed.add(('tenant', instance.id))
+        elif isinstance(instance, App):
+            changed.add(('app', instance.id))
+        elif isinstance(instance, Site | EndUser):
+            changed.add(('app', instance.app_id))
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_changed_identities(session):
+    """
+    Bump the versions of the identities changed by a transaction once it is committed,
+    so that a request can not cache them again from the rows before the change.
+    """
+    for kind, identity_id in session.info.pop('changed_identities', ()):
+        if identity_id:
+            IdentityCacheService.invalidate(kind, identity_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changed_identities(session):
+    session.info.pop('changed_identities', None)
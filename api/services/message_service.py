@@ -10,9 +10,10 @@ from core.model_runtime.entities.model_entities import ModelType
 from core.ops.ops_trace_manager import TraceQueueManager, TraceTask, TraceTaskName
 from core.ops.utils import measure_time
 from extensions.ext_database import db
-from libs.infinite_scroll_pagination import InfiniteScrollPagination
+from libs.infinite_scroll_pagination import InfiniteScrollPagination, KeysetCursor, paginate_by_keyset
 from models.account import Account
 from models.model import App, AppMode, AppModelConfig, EndUser, Message, MessageFeedback
+from services.app_statistic_service import AppStatisticRollupService
 from services.conversation_service import ConversationService
 from services.errors.conversation import ConversationCompletedError, ConversationNotExistsError
 from services.errors.message import (
@@ -40,34 +41,19 @@ class MessageService:
             conversation_id=conversation_id
         )
 
+        base_query = db.session.query(Message).filter(Message.conversation_id == conversation.id)
+
+        cursor = None
         if first_id:
-            first_message = db.session.query(Message) \
-                .filter(Message.conversation_id == conversation.id, Message.id == first_id).first()
+            first_message = base_query.filter(Message.id == first_id).first()
 
             if not first_message:
                 raise FirstMessageNotExistsError()
 
-            history_messages = db.session.query(Message).filter(
-                Message.conversation_id == conversation.id,
-                Message.created_at < first_message.created_at,
-                Message.id != first_message.id
-            ) \
-                .order_by(Message.created_at.desc()).limit(limit).all()
-        else:
-            history_messages = db.session.query(Message).filter(Message.conversation_id == conversation.id) \
-                .order_by(Message.created_at.desc()).limit(limit).all()
-
-        has_more = False
-        if len(history_messages) == limit:
-            current_page_first_message = history_messages[-1]
-            rest_count = db.session.query(Message).filter(
-                Message.conversation_id == conversation.id,
-                Message.created_at < current_page_first_message.created_at,
-                Message.id != current_page_first_message.id
-            ).count()
+            cursor = KeysetCursor.of(first_message)
 
-            if rest_count > 0:
-                has_more = True
+        history_messages, has_more = paginate_by_keyset(base_query, Message, limit, cursor)
+        Message.preload_relations(history_messages)
 
         history_messages = list(reversed(history_messages))
 
@@ -98,29 +84,17 @@ class MessageService:
         if include_ids is not None:
             base_query = base_query.filter(Message.id.in_(include_ids))
 
+        cursor = None
         if last_id:
             last_message = base_query.filter(Message.id == last_id).first()
 
             if not last_message:
                 raise LastMessageNotExistsError()
 
-            history_messages = base_query.filter(
-                Message.created_at < last_message.created_at,
-                Message.id != last_message.id
-            ).order_by(Message.created_at.desc()).limit(limit).all()
-        else:
-            history_messages = base_query.order_by(Message.created_at.desc()).limit(limit).all()
-
-        has_more = False
-        if len(history_messages) == limit:
-            current_page_first_message = history_messages[-1]
-            rest_count = base_query.filter(
-                Message.created_at < current_page_first_message.created_at,
-                Message.id != current_page_first_message.id
-            ).count()
+            cursor = KeysetCursor.of(last_message)
 
-            if rest_count > 0:
-                has_more = True
+        history_messages, has_more = paginate_by_keyset(base_query, Message, limit, cursor)
+        Message.preload_relations(history_messages)
 
         return InfiniteScrollPagination(
             data=history_messages,
@@ -162,6 +136,9 @@ class MessageService:
 
         db.session.commit()
 
+        # feedback counts are rolled up by the creation time of the message
+        AppStatisticRollupService.mark_dirty(app_model.id, message.created_at)
+
         return feedback
 
     @classmethod
@@ -69,6 +69,7 @@ class OpsService:
         )
         db.session.add(trace_config_data)
         db.session.commit()
+        OpsTraceManager.invalidate_ops_trace_instance(app_id)
 
         return {"result": "success"}
 
@@ -106,6 +107,7 @@ class OpsService:
 
         current_trace_config.tracing_config = tracing_config
         db.session.commit()
+        OpsTraceManager.invalidate_ops_trace_instance(app_id)
 
         return current_trace_config.to_dict()
 
@@ -126,5 +128,6 @@ class OpsService:
 
         db.session.delete(trace_config)
         db.session.commit()
+        OpsTraceManager.invalidate_ops_trace_instance(app_id)
 
         return True
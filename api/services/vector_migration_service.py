@@ -0,0 +1,284 @@
+import json
+import logging
+import threading
+import time
+from collections.abc import Callable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Optional
+
+from flask import Flask, current_app
+from sqlalchemy import func
+
+from core.rag.datasource.vdb.vector_factory import Vector
+from core.rag.datasource.vdb.vector_type import VectorType
+from core.rag.models.document import Document
+from extensions.ext_database import db
+from models.dataset import Dataset, DatasetCollectionBinding, DocumentSegment, VectorMigrationCheckpoint
+from models.dataset import Document as DatasetDocument
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class VectorMigrationStats:
+    migrated_datasets: int = 0
+    skipped_datasets: int = 0
+    failed_datasets: int = 0
+    segments: int = 0
+    # dry runs, segments whose embeddings are cached and are not embedded again
+    cached_segments: int = 0
+    # verifications, sampled segments found in the vector store and returned by a search of their embedding
+    sampled_segments: int = 0
+    found_segments: int = 0
+    recalled_segments: int = 0
+    started_at: float = field(default_factory=time.perf_counter)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def add(self, **counts: int) -> None:
+        with self._lock:
+            for name, count in counts.items():
+                setattr(self, name, getattr(self, name) + count)
+
+    @property
+    def segments_per_second(self) -> float:
+        return self.segments / max(time.perf_counter() - self.started_at, 1e-9)
+
+    def summary(self) -> str:
+        summary = (f'{self.migrated_datasets} datasets, {self.skipped_datasets} skipped, '
+                   f'{self.failed_datasets} failed, {self.segments} segments, '
+                   f'{self.segments_per_second:.1f} segments/s')
+        if self.cached_segments:
+            summary += f', {self.cached_segments} segments with cached embeddings'
+        if self.sampled_segments:
+            summary += (f', {self.found_segments}/{self.sampled_segments} sampled segments found, '
+                        f'{self.recalled_segments}/{self.sampled_segments} recalled')
+        return summary
+
+
+class VectorMigrationService:
+    """
+    Migrate the vectors of the high quality datasets to a vector store.
+
+    Datasets are migrated by parallel workers, and the segments of a dataset are written to the vector store
+    in batches, from the embeddings cached when they were indexed, only the segments missing from the cache
+    are embedded again. The progress of each dataset is checkpointed after each batch, so that a migration
+    which was interrupted resumes from the last batch, and datasets which failed are retried on the next run.
+
+    A dataset keeps using its previous vector store until all its segments are migrated.
+    """
+
+    DATASET_PAGE_SIZE = 100
+
+    def __init__(self, vector_type: str, batch_size: int = 500, workers: int = 4,
+                 dry_run: bool = False, verify: bool = False, sample_size: int = 20,
+                 on_progress: Optional[Callable[[VectorMigrationStats], None]] = None):
+        """
+        :param dry_run: only count the segments to migrate and their cached embeddings
+        :param verify: instead of migrating, check a sample of the segments of the migrated datasets
+        :param sample_size: the number of segments sampled per dataset by a verification
+        :param on_progress: called with the stats after each dataset
+        """
+        self._vector_type = vector_type
+        self._batch_size = batch_size
+        self._workers = workers
+        self._dry_run = dry_run
+        self._verify = verify
+        self._sample_size = sample_size
+        self._on_progress = on_progress
+        self.stats = VectorMigrationStats()
+
+    def run(self) -> VectorMigrationStats:
+        app = current_app._get_current_object()
+        with ThreadPoolExecutor(max_workers=self._workers) as executor:
+            futures: set[Future] = set()
+            for dataset_id in self._iter_dataset_ids():
+                # the datasets are queued as the workers take them
+                if len(futures) >= self._workers * 2:
+                    done, futures = wait(futures, return_when=FIRST_COMPLETED)
+                    self._report(done)
+                futures.add(executor.submit(self._run_dataset, app, dataset_id))
+            self._report(futures)
+
+        return self.stats
+
+    def _report(self, futures: set[Future]) -> None:
+        for future in futures:
+            future.result()
+            if self._on_progress:
+                self._on_progress(self.stats)
+
+    def _iter_dataset_ids(self) -> Iterator[str]:
+        last_id = None
+        while True:
+            query = db.session.query(Dataset.id).filter(Dataset.indexing_technique == 'high_quality')
+            if last_id:
+                query = query.filter(Dataset.id > last_id)
+            dataset_ids = [dataset_id for dataset_id, in query.order_by(Dataset.id).limit(self.DATASET_PAGE_SIZE)]
+            db.session.close()
+            if not dataset_ids:
+                return
+            yield from dataset_ids
+            last_id = dataset_ids[-1]
+
+    def _run_dataset(self, app: Flask, dataset_id: str) -> None:
+        with app.app_context():
+            dataset = db.session.query(Dataset).filter(Dataset.id == dataset_id).first()
+            if not dataset:
+                return
+
+            try:
+                if self._verify:
+                    self._verify_dataset(dataset)
+                elif self._dry_run:
+                    self._count_dataset(dataset)
+                else:
+                    self._migrate_dataset(dataset)
+            except Exception as e:
+                logger.exception(f'Failed to migrate the vectors of dataset {dataset_id}')
+                db.session.rollback()
+                self.stats.add(failed_datasets=1)
+                if not self._verify and not self._dry_run:
+                    self._save_checkpoint(dataset_id, status='failed', error=f'{e.__class__.__name__}: {e}')
+
+    def _is_migrated(self, dataset: Dataset) -> bool:
+        return bool(dataset.index_struct_dict) and dataset.index_struct_dict['type'] == self._vector_type
+
+    def _migrate_dataset(self, dataset: Dataset) -> None:
+        if self._is_migrated(dataset):
+            self.stats.add(skipped_datasets=1)
+            return
+
+        checkpoint = self._get_checkpoint(dataset.id)
+        target_dataset = self._get_target_dataset(dataset)
+        vector = Vector(target_dataset)
+        last_segment_id = checkpoint.last_segment_id if checkpoint and checkpoint.status != 'completed' else None
+        if not last_segment_id:
+            # drop what a previous migration left in the target
+            vector.delete()
+            self._save_checkpoint(dataset.id, status='migrating', last_segment_id=None, migrated_count=0)
+
+        for segments in self._iter_segments(dataset.id, last_segment_id):
+            vector.create([
+                Document(
+                    page_content=segment.content,
+                    metadata={
+                        "doc_id": segment.index_node_id,
+                        "doc_hash": segment.index_node_hash,
+                        "document_id": segment.document_id,
+                        "dataset_id": segment.dataset_id,
+                    }
+                ) for segment in segments
+            ])
+            self._save_checkpoint(dataset.id, status='migrating', last_segment_id=segments[-1].id,
+                                  migrated_count=VectorMigrationCheckpoint.migrated_count + len(segments))
+            self.stats.add(segments=len(segments))
+
+        # the dataset is switched to the target once all its segments are migrated
+        dataset.index_struct = target_dataset.index_struct
+        self._save_checkpoint(dataset.id, status='completed', error=None)
+        self.stats.add(migrated_datasets=1)
+
+    def _count_dataset(self, dataset: Dataset) -> None:
+        if self._is_migrated(dataset):
+            self.stats.add(skipped_datasets=1)
+            return
+
+        vector = Vector(self._get_target_dataset(dataset))
+        checkpoint = self._get_checkpoint(dataset.id)
+        last_segment_id = checkpoint.last_segment_id if checkpoint and checkpoint.status != 'completed' else None
+        for segments in self._iter_segments(dataset.id, last_segment_id):
+            embeddings = vector.get_cached_embeddings([segment.content for segment in segments])
+            self.stats.add(segments=len(segments),
+                           cached_segments=sum(1 for embedding in embeddings if embedding is not None))
+        self.stats.add(migrated_datasets=1)
+
+    def _verify_dataset(self, dataset: Dataset) -> None:
+        if not self._is_migrated(dataset):
+            self.stats.add(skipped_datasets=1)
+            return
+
+        segments = self._segments_query(dataset.id).order_by(func.random()).limit(self._sample_size).all()
+        vector = Vector(dataset)
+        embeddings = vector.get_cached_embeddings([segment.content for segment in segments])
+        found = recalled = 0
+        for segment, embedding in zip(segments, embeddings):
+            if vector.text_exists(segment.index_node_id):
+                found += 1
+            if embedding is not None:
+                documents = vector.search_by_embedding(embedding, top_k=4, filter={'group_id': [dataset.id]})
+                if any(document.metadata.get('doc_id') == segment.index_node_id for document in documents):
+                    recalled += 1
+
+        self.stats.add(migrated_datasets=1, sampled_segments=len(segments), found_segments=found,
+                       recalled_segments=recalled)
+        if found < len(segments):
+            logger.warning(f'{len(segments) - found} of {len(segments)} sampled segments of dataset {dataset.id} '
+                           f'are missing from the vector store')
+
+    def _get_target_dataset(self, dataset: Dataset) -> Dataset:
+        """
+        Get a copy of a dataset using the target vector store, which is not saved.
+        """
+        collection_name = Dataset.gen_collection_name_by_id(dataset.id)
+        if dataset.collection_binding_id and self._vector_type in (VectorType.QDRANT, VectorType.LOCAL):
+            dataset_collection_binding = db.session.query(DatasetCollectionBinding). \
+                filter(DatasetCollectionBinding.id == dataset.collection_binding_id). \
+                one_or_none()
+            if not dataset_collection_binding:
+                raise ValueError('Dataset Collection Bindings is not exist!')
+            collection_name = dataset_collection_binding.collection_name
+
+        return Dataset(
+            id=dataset.id,
+            tenant_id=dataset.tenant_id,
+            indexing_technique=dataset.indexing_technique,
+            embedding_model_provider=dataset.embedding_model_provider,
+            embedding_model=dataset.embedding_model,
+            collection_binding_id=dataset.collection_binding_id,
+            index_struct=json.dumps({
+                "type": self._vector_type,
+                "vector_store": {"class_prefix": collection_name}
+            }),
+        )
+
+    def _segments_query(self, dataset_id: str):
+        return db.session.query(DocumentSegment).join(
+            DatasetDocument, DatasetDocument.id == DocumentSegment.document_id
+        ).filter(
+            DocumentSegment.dataset_id == dataset_id,
+            DocumentSegment.status == 'completed',
+            DocumentSegment.enabled == True,
+            DatasetDocument.indexing_status == 'completed',
+            DatasetDocument.enabled == True,
+            DatasetDocument.archived == False,
+        )
+
+    def _iter_segments(self, dataset_id: str, last_segment_id: Optional[str]) -> Iterator[list[DocumentSegment]]:
+        while True:
+            query = self._segments_query(dataset_id)
+            if last_segment_id:
+                query = query.filter(DocumentSegment.id > last_segment_id)
+            segments = query.order_by(DocumentSegment.id).limit(self._batch_size).all()
+            if not segments:
+                return
+            yield segments
+            last_segment_id = segments[-1].id
+
+    def _get_checkpoint(self, dataset_id: str) -> Optional[VectorMigrationCheckpoint]:
+        return db.session.query(VectorMigrationCheckpoint).filter(
+            VectorMigrationCheckpoint.vector_type == self._vector_type,
+            VectorMigrationCheckpoint.dataset_id == dataset_id
+        ).first()
+
+    def _save_checkpoint(self, dataset_id: str, **values) -> None:
+        checkpoint = self._get_checkpoint(dataset_id)
+        if not checkpoint:
+            checkpoint = VectorMigrationCheckpoint(vector_type=self._vector_type, dataset_id=dataset_id,
+                                                   migrated_count=0)
+            db.session.add(checkpoint)
+        for name, value in values.items():
+            setattr(checkpoint, name, value)
+        checkpoint.updated_at = datetime.now(timezone.utc).replace(tzinfo=None)
+        db.session.commit()
@@ -1,34 +1,95 @@
 import logging
+import os
+import tempfile
 import time
+import uuid
+from collections.abc import Iterator
+from typing import IO, Optional, Union
 
 import click
+import pandas as pd
 from celery import shared_task
+from sqlalchemy import insert
 from werkzeug.exceptions import NotFound
 
+from core.app.features.annotation_reply.annotation_reply_cache import AnnotationReplyCache
 from core.rag.datasource.vdb.vector_factory import Vector
 from core.rag.models.document import Document
 from extensions.ext_database import db
 from extensions.ext_redis import redis_client
+from extensions.ext_storage import storage
 from models.dataset import Dataset
 from models.model import App, AppAnnotationSetting, MessageAnnotation
 from services.dataset_service import DatasetCollectionBindingService
 
+# the number of annotations read from the CSV file, inserted and indexed at once
+BATCH_SIZE = 1000
+
+
+def iter_annotation_csv_chunks(file: Union[str, IO], chunk_size: int = BATCH_SIZE) -> Iterator[list[dict]]:
+    """
+    Read the questions and answers of an annotation CSV file in chunks, skipping its header row
+    and the rows without a question or an answer.
+    """
+    for chunk in pd.read_csv(file, chunksize=chunk_size, dtype=str, keep_default_na=False):
+        contents = [
+            {'question': question, 'answer': answer}
+            for question, answer in zip(chunk.iloc[:, 0], chunk.iloc[:, 1])
+            if question and answer
+        ]
+        if contents:
+            yield contents
+
+
+def _iter_content_chunks(content_list: list[dict]) -> Iterator[list[dict]]:
+    for i in range(0, len(content_list), BATCH_SIZE):
+        yield content_list[i:i + BATCH_SIZE]
+
+
+def _get_annotation_vector(app_id: str, tenant_id: str) -> Optional[Vector]:
+    # the annotations are only indexed when annotation reply is enabled
+    app_annotation_setting = db.session.query(AppAnnotationSetting).filter(
+        AppAnnotationSetting.app_id == app_id
+    ).first()
+    if not app_annotation_setting:
+        return None
+
+    dataset_collection_binding = DatasetCollectionBindingService.get_dataset_collection_binding_by_id_and_type(
+        app_annotation_setting.collection_binding_id,
+        'annotation'
+    )
+    if not dataset_collection_binding:
+        raise NotFound("App annotation setting not found")
+    dataset = Dataset(
+        id=app_id,
+        tenant_id=tenant_id,
+        indexing_technique='high_quality',
+        embedding_model_provider=dataset_collection_binding.provider_name,
+        embedding_model=dataset_collection_binding.model_name,
+        collection_binding_id=dataset_collection_binding.id
+    )
+    return Vector(dataset, attributes=['doc_id', 'annotation_id', 'app_id'])
+
 
 @shared_task(queue='dataset')
 def batch_import_annotations_task(job_id: str, content_list: list[dict], app_id: str, tenant_id: str,
-                                  user_id: str):
+                                  user_id: str, file_key: Optional[str] = None):
     """
     Add annotation to index.
     :param job_id: job_id
-    :param content_list: content list
+    :param content_list: content list, when the annotations are not read from a file
     :param tenant_id: tenant id
     :param app_id: app id
     :param user_id: user_id
+    :param file_key: the storage key of the uploaded CSV file, which is read in chunks and deleted
 
+    The annotations are inserted and indexed in chunks, in a single transaction,
+    and the number of annotations imported is reported after each chunk.
     """
     logging.info(click.style('Start batch import annotation: {}'.format(job_id), fg='green'))
     start_at = time.perf_counter()
     indexing_cache_key = 'app_annotation_batch_import_{}'.format(str(job_id))
+    progress_cache_key = 'app_annotation_batch_import_progress_{}'.format(str(job_id))
     # get app info
     app = db.session.query(App).filter(
         App.id == app_id,
@@ -37,61 +98,77 @@ def batch_import_annotations_task(job_id: str, content_list: list[dict], app_id:
     ).first()
 
     if app:
+        annotation_ids = []
+        vector = None
         try:
-            documents = []
-            for content in content_list:
-                annotation = MessageAnnotation(
-                    app_id=app.id,
-                    content=content['answer'],
-                    question=content['question'],
-                    account_id=user_id
-                )
-                db.session.add(annotation)
-                db.session.flush()
-
-                document = Document(
-                    page_content=content['question'],
-                    metadata={
-                        "annotation_id": annotation.id,
-                        "app_id": app_id,
-                        "doc_id": annotation.id
-                    }
-                )
-                documents.append(document)
-            # if annotation reply is enabled , batch add annotations' index
-            app_annotation_setting = db.session.query(AppAnnotationSetting).filter(
-                AppAnnotationSetting.app_id == app_id
-            ).first()
-
-            if app_annotation_setting:
-                dataset_collection_binding = DatasetCollectionBindingService.get_dataset_collection_binding_by_id_and_type(
-                    app_annotation_setting.collection_binding_id,
-                    'annotation'
-                )
-                if not dataset_collection_binding:
-                    raise NotFound("App annotation setting not found")
-                dataset = Dataset(
-                    id=app_id,
-                    tenant_id=tenant_id,
-                    indexing_technique='high_quality',
-                    embedding_model_provider=dataset_collection_binding.provider_name,
-                    embedding_model=dataset_collection_binding.model_name,
-                    collection_binding_id=dataset_collection_binding.id
-                )
-
-                vector = Vector(dataset, attributes=['doc_id', 'annotation_id', 'app_id'])
-                vector.create(documents, duplicate_check=True)
+            with tempfile.TemporaryDirectory() as temp_dir:
+                if file_key:
+                    file_path = os.path.join(temp_dir, 'annotations.csv')
+                    storage.download(file_key, file_path)
+                    chunks = iter_annotation_csv_chunks(file_path, BATCH_SIZE)
+                else:
+                    redis_client.hset(progress_cache_key, 'total', len(content_list))
+                    chunks = _iter_content_chunks(content_list)
+
+                vector = _get_annotation_vector(app_id, tenant_id)
+                for contents in chunks:
+                    # the ids are generated here to insert the annotations at once
+                    rows = [
+                        {
+                            'id': str(uuid.uuid4()),
+                            'app_id': app.id,
+                            'question': content['question'],
+                            'content': content['answer'],
+                            'account_id': user_id,
+                        } for content in contents
+                    ]
+                    db.session.execute(insert(MessageAnnotation), rows)
+                    is_first_chunk = not annotation_ids
+                    annotation_ids.extend(row['id'] for row in rows)
+
+                    if vector:
+                        documents = [
+                            Document(
+                                page_content=row['question'],
+                                metadata={
+                                    "annotation_id": row['id'],
+                                    "app_id": app_id,
+                                    "doc_id": row['id']
+                                }
+                            ) for row in rows
+                        ]
+                        # the questions are embedded in batches of the embedding model, from the embedding cache
+                        if is_first_chunk:
+                            vector.create(documents)
+                        else:
+                            vector.add_texts(documents)
+
+                    redis_client.hincrby(progress_cache_key, 'processed', len(rows))
+                    redis_client.expire(progress_cache_key, 600)
 
             db.session.commit()
+            AnnotationReplyCache.invalidate(app_id)
             redis_client.setex(indexing_cache_key, 600, 'completed')
             end_at = time.perf_counter()
             logging.info(
                 click.style(
-                    'Build index successful for batch import annotation: {} latency: {}'.format(job_id, end_at - start_at),
+                    'Build index successful for batch import annotation: {} annotations: {} latency: {}'.format(
+                        job_id, len(annotation_ids), end_at - start_at),
                     fg='green'))
         except Exception as e:
             db.session.rollback()
+            if vector and annotation_ids:
+                try:
+                    vector.delete_by_ids(annotation_ids)
+                except Exception:
+                    logging.exception("Delete the index of the batch import annotations failed")
             redis_client.setex(indexing_cache_key, 600, 'error')
             indexing_error_msg_key = 'app_annotation_batch_import_error_msg_{}'.format(str(job_id))
             redis_client.setex(indexing_error_msg_key, 600, str(e))
             logging.exception("Build index for batch import annotations failed")
+
+    if file_key:
+        try:
+            storage.delete(file_key)
+        except Exception:
+            logging.exception("Delete the batch import annotations file failed")
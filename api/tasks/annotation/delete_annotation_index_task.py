@@ -4,6 +4,7 @@ import time
 import click
 from celery import shared_task
 
+from core.app.features.annotation_reply.annotation_reply_cache import AnnotationReplyCache
 from core.rag.datasource.vdb.vector_factory import Vector
 from models.dataset import Dataset
 from services.dataset_service import DatasetCollectionBindingService
@@ -33,6 +34,7 @@ def delete_annotation_index_task(annotation_id: str, app_id: str, tenant_id: str
         try:
             vector = Vector(dataset, attributes=['doc_id', 'annotation_id', 'app_id'])
             vector.delete_by_metadata_field('annotation_id', annotation_id)
+            AnnotationReplyCache.invalidate(app_id)
         except Exception:
             logging.exception("Delete annotation index failed when annotation deleted.")
         end_at = time.perf_counter()
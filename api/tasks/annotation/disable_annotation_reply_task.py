@@ -5,6 +5,7 @@ import click
 from celery import shared_task
 from werkzeug.exceptions import NotFound
 
+from core.app.features.annotation_reply.annotation_reply_cache import AnnotationReplyCache
 from core.rag.datasource.vdb.vector_factory import Vector
 from extensions.ext_database import db
 from extensions.ext_redis import redis_client
@@ -59,6 +60,7 @@ def disable_annotation_reply_task(job_id: str, app_id: str, tenant_id: str):
         # delete annotation setting
         db.session.delete(app_annotation_setting)
         db.session.commit()
+        AnnotationReplyCache.invalidate(app_id)
 
         end_at = time.perf_counter()
         logging.info(
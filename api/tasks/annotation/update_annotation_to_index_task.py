@@ -4,6 +4,7 @@ import time
 import click
 from celery import shared_task
 
+from core.app.features.annotation_reply.annotation_reply_cache import AnnotationReplyCache
 from core.rag.datasource.vdb.vector_factory import Vector
 from core.rag.models.document import Document
 from models.dataset import Dataset
@@ -52,6 +53,7 @@ def update_annotation_to_index_task(annotation_id: str, question: str, tenant_id
         vector = Vector(dataset, attributes=['doc_id', 'annotation_id', 'app_id'])
         vector.delete_by_metadata_field('annotation_id', annotation_id)
         vector.add_texts([document])
+        AnnotationReplyCache.invalidate(app_id)
         end_at = time.perf_counter()
         logging.info(
             click.style(
@@ -1,3 +1,4 @@
+import json
 import logging
 import time
 
@@ -6,6 +7,7 @@ from celery import shared_task
 
 from core.rag.index_processor.index_processor_factory import IndexProcessorFactory
 from extensions.ext_database import db
+from libs.batch_purge import BatchPurger
 from models.dataset import (
     AppDatasetJoin,
     Dataset,
@@ -14,6 +16,7 @@ from models.dataset import (
     Document,
     DocumentSegment,
 )
+from services.file_service import FileService
 
 
 # Add import statement for ValueError
@@ -42,10 +45,11 @@ def clean_dataset_task(dataset_id: str, tenant_id: str, indexing_technique: str,
             index_struct=index_struct,
             collection_binding_id=collection_binding_id,
         )
-        documents = db.session.query(Document).filter(Document.dataset_id == dataset_id).all()
-        segments = db.session.query(DocumentSegment).filter(DocumentSegment.dataset_id == dataset_id).all()
+        has_documents = db.session.query(
+            db.session.query(Document.id).filter(Document.dataset_id == dataset_id).exists()
+        ).scalar()
 
-        if documents is None or len(documents) == 0:
+        if not has_documents:
             logging.info(click.style('No documents found for dataset: {}'.format(dataset_id), fg='green'))
         else:
             logging.info(click.style('Cleaning documents for dataset: {}'.format(dataset_id), fg='green'))
@@ -55,11 +59,32 @@ def clean_dataset_task(dataset_id: str, tenant_id: str, indexing_technique: str,
             index_processor = IndexProcessorFactory(doc_form).init_index_processor()
             index_processor.clean(dataset, None)
 
-            for document in documents:
-                db.session.delete(document)
+            # upload files of the documents are released once the documents are deleted
+            file_ids = set()
+            upload_file_documents = db.session.query(Document.data_source_info).filter(
+                Document.dataset_id == dataset_id,
+                Document.data_source_type == 'upload_file'
+            ).all()
+            for upload_file_document in upload_file_documents:
+                try:
+                    file_ids.add(json.loads(upload_file_document.data_source_info)['upload_file_id'])
+                except (TypeError, ValueError, KeyError):
+                    continue
 
-            for segment in segments:
-                db.session.delete(segment)
+            # delete rows in chunks instead of loading them all into memory
+            BatchPurger(
+                model=DocumentSegment,
+                filters=[DocumentSegment.dataset_id == dataset_id],
+                checkpoint_key=f'purge_checkpoint:clean_dataset_task:{dataset_id}:segments'
+            ).run()
+            BatchPurger(
+                model=Document,
+                filters=[Document.dataset_id == dataset_id],
+                checkpoint_key=f'purge_checkpoint:clean_dataset_task:{dataset_id}:documents'
+            ).run()
+
+            for file_id in file_ids:
+                FileService.release_unreferenced_file(file_id)
 
         db.session.query(DatasetProcessRule).filter(DatasetProcessRule.dataset_id == dataset_id).delete()
         db.session.query(DatasetQuery).filter(DatasetQuery.dataset_id == dataset_id).delete()
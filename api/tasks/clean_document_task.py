@@ -1,5 +1,6 @@
 import logging
 import time
+from typing import Optional
 
 import click
 from celery import shared_task
@@ -7,15 +8,17 @@ from celery import shared_task
 from core.rag.index_processor.index_processor_factory import IndexProcessorFactory
 from extensions.ext_database import db
 from models.dataset import Dataset, DocumentSegment
+from services.file_service import FileService
 
 
 @shared_task(queue='dataset')
-def clean_document_task(document_id: str, dataset_id: str, doc_form: str):
+def clean_document_task(document_id: str, dataset_id: str, doc_form: str, file_id: Optional[str] = None):
     """
     Clean document when document deleted.
     :param document_id: document id
     :param dataset_id: dataset id
     :param doc_form: doc_form
+    :param file_id: id of the upload file the document was created from
 
     Usage: clean_document_task.delay(document_id, dataset_id)
     """
@@ -39,8 +42,12 @@ def clean_document_task(document_id: str, dataset_id: str, doc_form: str):
                 db.session.delete(segment)
 
             db.session.commit()
-            end_at = time.perf_counter()
-            logging.info(
-                click.style('Cleaned document when document deleted: {} latency: {}'.format(document_id, end_at - start_at), fg='green'))
+
+        if file_id:
+            FileService.release_unreferenced_file(file_id)
+
+        end_at = time.perf_counter()
+        logging.info(
+            click.style('Cleaned document when document deleted: {} latency: {}'.format(document_id, end_at - start_at), fg='green'))
     except Exception:
         logging.exception("Cleaned document when document deleted failed")
@@ -1,5 +1,4 @@
 import logging
-import time
 
 from celery import shared_task
 from flask import current_app
@@ -14,19 +13,44 @@ from models.workflow import WorkflowRun
 def process_trace_tasks(tasks_data):
     """
     Async process trace tasks
-    :param tasks_data: List of dictionaries containing task data
+    :param tasks_data: dictionary containing the source and the list of traces of the task
 
     Usage: process_trace_tasks.delay(tasks_data)
     """
     from core.ops.ops_trace_manager import OpsTraceManager
 
-    trace_info = tasks_data.get('trace_info')
     app_id = tasks_data.get('app_id')
     conversation_id = tasks_data.get('conversation_id')
     message_id = tasks_data.get('message_id')
-    trace_info_type = tasks_data.get('trace_info_type')
-    trace_instance = OpsTraceManager.get_ops_trace_instance(app_id, conversation_id, message_id)
+    traces = tasks_data.get('traces')
+    if traces is None:
+        # task data sent before traces were batched carry a single trace
+        traces = [{
+            'trace_info_type': tasks_data.get('trace_info_type'),
+            'trace_info': tasks_data.get('trace_info'),
+        }]
 
+    # the trace instance and the client of its exporter are cached by the worker process
+    trace_instance = OpsTraceManager.get_ops_trace_instance(
+        app_id=app_id, message_id=message_id, conversation_id=conversation_id
+    )
+    if not trace_instance:
+        return
+
+    with current_app.app_context():
+        for trace in traces:
+            try:
+                trace_instance.trace(_load_trace_info(trace.get('trace_info_type'), trace.get('trace_info') or {}))
+            except Exception:
+                logging.exception("Processing trace tasks failed")
+
+        try:
+            trace_instance.flush()
+        except Exception:
+            logging.exception("Flushing traces failed")
+
+
+def _load_trace_info(trace_info_type: str, trace_info: dict):
     if trace_info.get('message_data'):
         trace_info['message_data'] = Message.from_dict(data=trace_info['message_data'])
     if trace_info.get('workflow_data'):
@@ -34,13 +58,7 @@ def process_trace_tasks(tasks_data):
     if trace_info.get('documents'):
         trace_info['documents'] = [Document(**doc) for doc in trace_info['documents']]
 
-    try:
-        if trace_instance:
-            with current_app.app_context():
-                trace_type = trace_info_info_map.get(trace_info_type)
-                if trace_type:
-                    trace_info = trace_type(**trace_info)
-                trace_instance.trace(trace_info)
-            end_at = time.perf_counter()
-    except Exception:
-        logging.exception("Processing trace tasks failed")
+    trace_type = trace_info_info_map.get(trace_info_type)
+    if trace_type:
+        trace_info = trace_type(**trace_info)
+    return trace_info
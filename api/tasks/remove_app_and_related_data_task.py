@@ -7,12 +7,15 @@ from sqlalchemy import select
 from sqlalchemy.exc import SQLAlchemyError
 
 from extensions.ext_database import db
+from libs.batch_purge import BatchPurger
 from models.dataset import AppDatasetJoin
 from models.model import (
     ApiToken,
     AppAnnotationHitHistory,
     AppAnnotationSetting,
     AppModelConfig,
+    AppStatisticBucket,
+    AppStatisticBucketMember,
     Conversation,
     EndUser,
     InstalledApp,
@@ -29,6 +32,9 @@ from models.model import (
 from models.tools import WorkflowToolProvider
 from models.web import PinnedConversation, SavedMessage
 from models.workflow import Workflow, WorkflowAppLog, WorkflowNodeExecution, WorkflowRun
+from services.api_token_service import ApiTokenService
+
+PURGE_BATCH_SIZE = 1000
 
 
 @shared_task(queue='app_deletion', bind=True, max_retries=3)
@@ -36,24 +42,23 @@ def remove_app_and_related_data_task(self, app_id: str):
     logging.info(click.style(f'Start deleting app and related data: {app_id}', fg='green'))
     start_at = time.perf_counter()
     try:
-        # Use a transaction to ensure all deletions succeed or none do
-        with db.session.begin_nested():
-            # Delete related data
-            _delete_app_model_configs(app_id)
-            _delete_app_site(app_id)
-            _delete_app_api_tokens(app_id)
-            _delete_installed_apps(app_id)
-            _delete_recommended_apps(app_id)
-            _delete_app_annotation_data(app_id)
-            _delete_app_dataset_joins(app_id)
-            _delete_app_workflows(app_id)
-            _delete_app_conversations(app_id)
-            _delete_app_messages(app_id)
-            _delete_workflow_tool_providers(app_id)
-            _delete_app_tag_bindings(app_id)
-            _delete_end_users(app_id)
-
-        # If we reach here, the transaction was successful
+        # Related data is deleted in short chunked transactions instead of one giant transaction,
+        # every step is idempotent so a retry resumes the deletion
+        _delete_app_model_configs(app_id)
+        _delete_app_site(app_id)
+        _delete_app_api_tokens(app_id)
+        _delete_installed_apps(app_id)
+        _delete_recommended_apps(app_id)
+        _delete_app_annotation_data(app_id)
+        _delete_app_dataset_joins(app_id)
+        _delete_app_workflows(app_id)
+        _delete_app_conversations(app_id)
+        _delete_app_messages(app_id)
+        _delete_workflow_tool_providers(app_id)
+        _delete_app_tag_bindings(app_id)
+        _delete_end_users(app_id)
+        _delete_app_statistics(app_id)
+
         db.session.commit()
 
         end_at = time.perf_counter()
@@ -70,8 +75,18 @@ def remove_app_and_related_data_task(self, app_id: str):
         raise self.retry(exc=e, countdown=60)  # Retry after 60 seconds
 
 
+def _purge(model, filters: list, app_id: str, before_delete=None):
+    BatchPurger(
+        model=model,
+        filters=filters,
+        batch_size=PURGE_BATCH_SIZE,
+        checkpoint_key=f'purge_checkpoint:remove_app_and_related_data_task:{app_id}:{model.__tablename__}',
+        before_delete=before_delete
+    ).run()
+
+
 def _delete_app_model_configs(app_id: str):
-    db.session.query(AppModelConfig).filter(AppModelConfig.app_id == app_id).delete()
+    _purge(AppModelConfig, [AppModelConfig.app_id == app_id], app_id)
 
 
 def _delete_app_site(app_id: str):
@@ -79,7 +94,10 @@ def _delete_app_site(app_id: str):
 
 
 def _delete_app_api_tokens(app_id: str):
+    api_tokens = db.session.query(ApiToken).filter(ApiToken.app_id == app_id).all()
     db.session.query(ApiToken).filter(ApiToken.app_id == app_id).delete()
+    for api_token in api_tokens:
+        ApiTokenService.invalidate_on_commit(api_token.token, api_token.type)
 
 
 def _delete_installed_apps(app_id: str):
@@ -91,7 +109,7 @@ def _delete_recommended_apps(app_id: str):
 
 
 def _delete_app_annotation_data(app_id: str):
-    db.session.query(AppAnnotationHitHistory).filter(AppAnnotationHitHistory.app_id == app_id).delete()
+    _purge(AppAnnotationHitHistory, [AppAnnotationHitHistory.app_id == app_id], app_id)
     db.session.query(AppAnnotationSetting).filter(AppAnnotationSetting.app_id == app_id).delete()
 
 
@@ -100,41 +118,30 @@ def _delete_app_dataset_joins(app_id: str):
 
 
 def _delete_app_workflows(app_id: str):
-    db.session.query(WorkflowRun).filter(
-        WorkflowRun.workflow_id.in_(
-            db.session.query(Workflow.id).filter(Workflow.app_id == app_id)
-        )
-    ).delete(synchronize_session=False)
-    db.session.query(WorkflowNodeExecution).filter(
-        WorkflowNodeExecution.workflow_id.in_(
-            db.session.query(Workflow.id).filter(Workflow.app_id == app_id)
-        )
-    ).delete(synchronize_session=False)
-    db.session.query(WorkflowAppLog).filter(WorkflowAppLog.app_id == app_id).delete(synchronize_session=False)
+    workflow_ids = select(Workflow.id).filter(Workflow.app_id == app_id).scalar_subquery()
+    _purge(WorkflowRun, [WorkflowRun.workflow_id.in_(workflow_ids)], app_id)
+    _purge(WorkflowNodeExecution, [WorkflowNodeExecution.workflow_id.in_(workflow_ids)], app_id)
+    _purge(WorkflowAppLog, [WorkflowAppLog.app_id == app_id], app_id)
     db.session.query(Workflow).filter(Workflow.app_id == app_id).delete(synchronize_session=False)
 
 
-def _delete_app_conversations(app_id: str):
+def _delete_conversation_dependents(conversation_ids: list[str]):
     db.session.query(PinnedConversation).filter(
-        PinnedConversation.conversation_id.in_(
-            db.session.query(Conversation.id).filter(Conversation.app_id == app_id)
-        )
+        PinnedConversation.conversation_id.in_(conversation_ids)
     ).delete(synchronize_session=False)
-    db.session.query(Conversation).filter(Conversation.app_id == app_id).delete()
+
+
+def _delete_app_conversations(app_id: str):
+    _purge(Conversation, [Conversation.app_id == app_id], app_id, before_delete=_delete_conversation_dependents)
+
+
+def _delete_message_dependents(message_ids: list[str]):
+    for model in [MessageFeedback, MessageAnnotation, MessageChain, MessageAgentThought, MessageFile, SavedMessage]:
+        db.session.query(model).filter(model.message_id.in_(message_ids)).delete(synchronize_session=False)
 
 
 def _delete_app_messages(app_id: str):
-    message_ids = select(Message.id).filter(Message.app_id == app_id).scalar_subquery()
-    db.session.query(MessageFeedback).filter(MessageFeedback.message_id.in_(message_ids)).delete(
-        synchronize_session=False)
-    db.session.query(MessageAnnotation).filter(MessageAnnotation.message_id.in_(message_ids)).delete(
-        synchronize_session=False)
-    db.session.query(MessageChain).filter(MessageChain.message_id.in_(message_ids)).delete(synchronize_session=False)
-    db.session.query(MessageAgentThought).filter(MessageAgentThought.message_id.in_(message_ids)).delete(
-        synchronize_session=False)
-    db.session.query(MessageFile).filter(MessageFile.message_id.in_(message_ids)).delete(synchronize_session=False)
-    db.session.query(SavedMessage).filter(SavedMessage.message_id.in_(message_ids)).delete(synchronize_session=False)
-    db.session.query(Message).filter(Message.app_id == app_id).delete(synchronize_session=False)
+    _purge(Message, [Message.app_id == app_id], app_id, before_delete=_delete_message_dependents)
 
 
 def _delete_workflow_tool_providers(app_id: str):
@@ -150,4 +157,9 @@ def _delete_app_tag_bindings(app_id: str):
 
 
 def _delete_end_users(app_id: str):
-    db.session.query(EndUser).filter(EndUser.app_id == app_id).delete()
+    _purge(EndUser, [EndUser.app_id == app_id], app_id)
+
+
+def _delete_app_statistics(app_id: str):
+    db.session.query(AppStatisticBucket).filter(AppStatisticBucket.app_id == app_id).delete()
+    db.session.query(AppStatisticBucketMember).filter(AppStatisticBucketMember.app_id == app_id).delete()
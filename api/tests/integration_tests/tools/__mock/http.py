@@ -5,6 +5,8 @@ import httpx
 import pytest
 from _pytest.monkeypatch import MonkeyPatch
 
+from core.helper import ssrf_proxy
+
 
 class MockedHttp:
     def httpx_request(method: Literal['GET', 'POST', 'PUT', 'DELETE', 'PATCH', 'HEAD'],
@@ -31,6 +33,6 @@ class MockedHttp:
 
 @pytest.fixture
 def setup_http_mock(request, monkeypatch: MonkeyPatch):
-    monkeypatch.setattr(httpx, "request", MockedHttp.httpx_request)
+    monkeypatch.setattr(ssrf_proxy, "make_request", MockedHttp.httpx_request)
     yield
     monkeypatch.undo()
@@ -0,0 +1,34 @@
+import pytest
+from flask import Flask
+
+from core.rag.datasource.vdb.local.local_vector import LocalVector, LocalVectorConfig
+from tests.integration_tests.vdb.test_vector_store import (
+    AbstractVectorTest,
+    setup_mock_redis,
+)
+
+
+class LocalVectorTest(AbstractVectorTest):
+    def __init__(self, path: str):
+        super().__init__()
+        self.vector = LocalVector(
+            collection_name=self.collection_name,
+            group_id=self.dataset_id,
+            config=LocalVectorConfig(path=path),
+        )
+
+    def get_ids_by_metadata_field(self):
+        ids = self.vector.get_ids_by_metadata_field(key='document_id', value=self.example_doc_id)
+        assert ids == [self.example_doc_id]
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config.update(VECTOR_STORE_CLIENT_IDLE_TIMEOUT=600, VECTOR_STORE_CLIENT_HEALTH_CHECK_INTERVAL=60)
+    with app.app_context():
+        yield app
+
+
+def test_local_vector(setup_mock_redis, app, tmp_path):
+    LocalVectorTest(str(tmp_path)).run_all_tests()
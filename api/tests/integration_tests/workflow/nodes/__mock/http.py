@@ -1,4 +1,6 @@
 import os
+from collections.abc import Iterator
+from contextlib import contextmanager
 from json import dumps
 from typing import Literal
 
@@ -6,6 +8,8 @@ import httpx
 import pytest
 from _pytest.monkeypatch import MonkeyPatch
 
+from core.helper import ssrf_proxy
+
 MOCK = os.getenv('MOCK_SWITCH', 'false') == 'true'
 
 
@@ -41,6 +45,14 @@ class MockedHttp:
         )
         return response
 
+    @contextmanager
+    def httpx_stream(method: Literal['GET', 'POST', 'PUT', 'DELETE', 'PATCH', 'HEAD'],
+                     url: str, **kwargs) -> Iterator[httpx.Response]:
+        """
+        Mocked ssrf_proxy.stream
+        """
+        yield MockedHttp.httpx_request(method, url, **kwargs)
+
 
 @pytest.fixture
 def setup_http_mock(request, monkeypatch: MonkeyPatch):
@@ -48,6 +60,7 @@ def setup_http_mock(request, monkeypatch: MonkeyPatch):
         yield
         return
 
-    monkeypatch.setattr(httpx, "request", MockedHttp.httpx_request)
+    monkeypatch.setattr(ssrf_proxy, "make_request", MockedHttp.httpx_request)
+    monkeypatch.setattr(ssrf_proxy, "stream", MockedHttp.httpx_stream)
     yield
     monkeypatch.undo()
@@ -0,0 +1,146 @@
+import time
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+from flask import Flask
+
+from core.agent.fc_agent_runner import FunctionCallAgentRunner
+from core.app.entities.queue_entities import QueueMessageFileEvent
+from core.model_runtime.entities.llm_entities import LLMResult, LLMUsage
+from core.model_runtime.entities.message_entities import AssistantPromptMessage, ToolPromptMessage
+from core.tools.entities.tool_entities import ToolInvokeMeta
+from core.tools.tool.tool import Tool
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config.update({
+        'AGENT_TOOL_CALL_MAX_WORKERS': 5,
+        'AGENT_TOOL_CALL_TIMEOUT': 1,
+    })
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture
+def db(monkeypatch):
+    db = MagicMock()
+    db.session.query.return_value.filter.return_value.first.return_value = SimpleNamespace(
+        id='message-id', conversation_id='conversation-id')
+    monkeypatch.setattr('core.agent.fc_agent_runner.db', db)
+    return db
+
+
+def _tool(name: str) -> Tool:
+    tool = MagicMock(spec=Tool)
+    tool.runtime = Tool.Runtime(tenant_id='tenant-id')
+    tool.variables = None
+    tool.fork_tool_runtime.side_effect = lambda runtime: SimpleNamespace(
+        name=name, runtime=Tool.Runtime(**runtime), load_variables=lambda variables: None)
+    return tool
+
+
+def _runner() -> FunctionCallAgentRunner:
+    runner = FunctionCallAgentRunner.__new__(FunctionCallAgentRunner)
+    runner.message = SimpleNamespace(id='message-id')
+    runner.user_id = 'user-id'
+    runner.tenant_id = 'tenant-id'
+    runner.application_generate_entity = MagicMock(trace_manager=None)
+    runner.agent_callback = None
+    return runner
+
+
+def _agent_invoke(delays: dict[str, float], message_files: dict[str, list] = None):
+    def agent_invoke(tool, tool_parameters, message, **kwargs):
+        time.sleep(delays.get(tool.name, 0))
+        assert message.id == 'message-id'
+        files = (message_files or {}).get(tool.name, [])
+        return f'{tool.name}: {tool_parameters["query"]}', files, ToolInvokeMeta.empty()
+
+    return agent_invoke
+
+
+def test_invoke_tools_keeps_tool_call_order(app, db, monkeypatch):
+    monkeypatch.setattr('core.agent.fc_agent_runner.ToolEngine.agent_invoke',
+                        _agent_invoke({'slow': 0.3, 'fast': 0}))
+    tool_calls = [('call-1', 'slow', {'query': 'a'}), ('call-2', 'fast', {'query': 'b'}),
+                  ('call-3', 'missing', {'query': 'c'}), ('call-4', 'slow', {'query': 'd'})]
+    tool_instances = {'slow': _tool('slow'), 'fast': _tool('fast')}
+
+    started_at = time.perf_counter()
+    results = _runner()._invoke_tools(tool_calls, tool_instances)
+
+    # both calls of the slow tool ran concurrently, each on its own instance
+    assert time.perf_counter() - started_at < 0.6
+    assert tool_instances['slow'].fork_tool_runtime.call_count == 2
+    assert [response['tool_call_id'] for response, _ in results] == ['call-1', 'call-2', 'call-3', 'call-4']
+    assert [response['tool_response'] for response, _ in results] == [
+        'slow: a', 'fast: b', 'there is not a tool named missing', 'slow: d']
+
+
+def test_invoke_tools_times_out_and_discards_late_files(app, db, monkeypatch):
+    monkeypatch.setattr('core.agent.fc_agent_runner.ToolEngine.agent_invoke',
+                        _agent_invoke({'hanging': 2.5}, {'hanging': [('file-id', None)]}))
+    tool_calls = [('call-1', 'hanging', {'query': 'a'}), ('call-2', 'fast', {'query': 'b'})]
+
+    results = _runner()._invoke_tools(tool_calls, {'hanging': _tool('hanging'), 'fast': _tool('fast')})
+
+    (timed_out, timed_out_files), (response, _) = results
+    assert timed_out['tool_response'] == 'tool invoke timeout, hanging did not respond in 1 seconds'
+    assert timed_out['meta']['error'] == timed_out['tool_response']
+    assert timed_out_files == []
+    assert response['tool_response'] == 'fast: b'
+
+    # the late call deletes the message files it created
+    time.sleep(2)
+    db.session.query.return_value.filter.return_value.delete.assert_called_once_with(synchronize_session=False)
+    db.session.commit.assert_called_once()
+
+
+def test_run_saves_tool_responses_in_agent_thought(app, db, monkeypatch):
+    monkeypatch.setattr('core.agent.fc_agent_runner.ToolEngine.agent_invoke',
+                        _agent_invoke({'search': 0.2}, {'draw': [('file-id', 'image')]}))
+
+    runner = _runner()
+    runner.app_config = MagicMock()
+    runner.app_config.agent.max_iteration = 5
+    runner.stream_tool_call = False
+    runner.model_config = MagicMock()
+    runner.queue_manager = MagicMock()
+    runner.variables_pool = MagicMock()
+    runner.db_variables_pool = MagicMock()
+    runner._current_thoughts = []
+    tool_instances = {'search': _tool('search'), 'draw': _tool('draw')}
+    runner._init_prompt_tools = MagicMock(return_value=(tool_instances, []))
+    runner._organize_prompt_messages = MagicMock(return_value=[])
+    runner.recalc_llm_max_tokens = MagicMock()
+    runner.update_db_variables = MagicMock()
+    runner.create_agent_thought = MagicMock(side_effect=lambda **kwargs: SimpleNamespace(id='thought-id'))
+    runner.save_agent_thought = MagicMock()
+
+    tool_call_message = AssistantPromptMessage(content='', tool_calls=[
+        AssistantPromptMessage.ToolCall(id=f'call-{name}', type='function',
+                                        function=AssistantPromptMessage.ToolCall.ToolCallFunction(
+                                            name=name, arguments='{"query": "q"}'))
+        for name in ('search', 'draw')
+    ])
+    runner.model_instance = MagicMock(model='model')
+    runner.model_instance.invoke_llm.side_effect = [
+        LLMResult(model='model', prompt_messages=[], message=tool_call_message, usage=LLMUsage.empty_usage()),
+        LLMResult(model='model', prompt_messages=[], message=AssistantPromptMessage(content='done'),
+                  usage=LLMUsage.empty_usage()),
+    ]
+
+    list(runner.run(SimpleNamespace(id='message-id'), 'query'))
+
+    tool_thought = runner.save_agent_thought.call_args_list[1].kwargs
+    assert tool_thought['observation'] == {'search': 'search: q', 'draw': 'draw: q'}
+    assert list(tool_thought['tool_invoke_meta']) == ['search', 'draw']
+    assert tool_thought['messages_ids'] == ['file-id']
+    runner.variables_pool.set_file.assert_called_once_with(tool_name='draw', value='file-id', name='image')
+    published = [call.args[0] for call in runner.queue_manager.publish.call_args_list]
+    assert any(isinstance(event, QueueMessageFileEvent) and event.message_file_id == 'file-id' for event in published)
+    tool_messages = [thought for thought in runner._current_thoughts if isinstance(thought, ToolPromptMessage)]
+    assert [thought.tool_call_id for thought in tool_messages] == ['call-search', 'call-draw']
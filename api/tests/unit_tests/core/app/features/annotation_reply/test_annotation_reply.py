@@ -0,0 +1,129 @@
+from types import SimpleNamespace
+
+import pytest
+from flask import Flask
+from sqlalchemy import Column, DateTime, DefaultClause, MetaData, String, Table, create_engine, text
+from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from core.app.entities.app_invoke_entities import InvokeFrom
+from core.app.features.annotation_reply import annotation_reply as annotation_reply_module
+from core.app.features.annotation_reply import annotation_reply_cache as cache_module
+from core.app.features.annotation_reply.annotation_reply import AnnotationReplyFeature
+from core.app.features.annotation_reply.annotation_reply_cache import AnnotationReplyCache
+from models import StringUUID
+from models.model import AppAnnotationSetting, MessageAnnotation
+from services import annotation_service as annotation_service_module
+from services.annotation_service import AppAnnotationService
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def setex(self, key, expire, value):
+        self.data[key] = value.encode('utf-8')
+
+    def incr(self, key):
+        self.data[key] = str(int(self.data.get(key, 0)) + 1).encode('utf-8')
+
+
+@pytest.fixture
+def session(monkeypatch):
+    metadata = MetaData()
+    # the table referenced by the annotations
+    Table('conversations', metadata, Column('id', String, primary_key=True))
+    for model in (AppAnnotationSetting, MessageAnnotation):
+        table = model.__table__.to_metadata(metadata)
+        for column in table.columns:
+            # the defaults generated by postgresql are generated by sqlite
+            if column.name == 'id':
+                column.server_default = DefaultClause(text('(lower(hex(randomblob(16))))'))
+            elif isinstance(column.type, DateTime) and column.server_default is not None:
+                column.server_default = DefaultClause(text('CURRENT_TIMESTAMP'))
+
+    monkeypatch.setattr(StringUUID, 'process_bind_param', lambda self, value, dialect: value)
+    engine = create_engine('sqlite://', poolclass=StaticPool)
+    metadata.create_all(engine)
+    session = scoped_session(sessionmaker(bind=engine))
+    for module in (annotation_reply_module, cache_module, annotation_service_module):
+        monkeypatch.setattr(module, 'db', SimpleNamespace(session=session))
+    session.add(AppAnnotationSetting(id='setting', app_id='app', score_threshold=0.9, collection_binding_id='binding',
+                                     created_user_id='account', updated_user_id='account'))
+    session.add(MessageAnnotation(id='annotation', app_id='app', question='How do I reset my password?',
+                                  content='Click on "Forgot password".', account_id='account'))
+    session.add(MessageAnnotation(id='other', app_id='other-app', question='How do I delete my account?',
+                                  content='Contact us.', account_id='account'))
+    session.commit()
+    yield session
+    session.remove()
+
+
+@pytest.fixture
+def feature(monkeypatch, session):
+    app = Flask(__name__)
+    app.config.update({'ANNOTATION_REPLY_CACHE_TTL': 600, 'ANNOTATION_REPLY_EXACT_MATCH_MAX_APPS': 10})
+    monkeypatch.setattr(cache_module, 'redis_client', FakeRedis())
+    monkeypatch.setattr(AnnotationReplyCache, '_question_indexes', None)
+
+    feature = AnnotationReplyFeature()
+    feature.searches = []
+    feature.histories = []
+    feature.search_result = (None, None)
+
+    def search(app_record, annotation_setting, query, score_threshold):
+        feature.searches.append(query)
+        return feature.search_result
+
+    monkeypatch.setattr(AnnotationReplyFeature, '_search', staticmethod(search))
+    monkeypatch.setattr(AppAnnotationService, 'record_annotation_history',
+                        lambda *args: feature.histories.append(args))
+    with app.app_context():
+        yield feature
+
+
+def _query(feature: AnnotationReplyFeature, query: str):
+    return feature.query(SimpleNamespace(id='app', tenant_id='tenant'), SimpleNamespace(id='message'), query,
+                         'user', InvokeFrom.WEB_APP)
+
+
+def test_queries_matching_a_question_are_replied_without_search(feature, session):
+    annotation = _query(feature, '  how do I reset my  PASSWORD?')
+
+    assert annotation.id == 'annotation'
+    assert feature.searches == []
+    assert [(history[0], history[7], history[8]) for history in feature.histories] == [('annotation', 'api', 1.0)]
+
+    # the question changed, the index is reloaded once the annotations are invalidated
+    session.query(MessageAnnotation).filter(MessageAnnotation.id == 'annotation').update(
+        {MessageAnnotation.question: 'How can I reset my password?'}
+    )
+    session.commit()
+    assert _query(feature, 'How can I reset my password?') is None
+    AnnotationReplyCache.invalidate('app')
+
+    assert _query(feature, 'How can I reset my password?').id == 'annotation'
+    # annotations of other apps are not matched
+    assert _query(feature, 'How do I delete my account?') is None
+
+
+def test_searches_are_cached_until_invalidated(feature):
+    feature.search_result = ('annotation', 0.95)
+
+    assert _query(feature, 'I forgot my password').id == 'annotation'
+    assert _query(feature, 'i forgot my  password ').id == 'annotation'
+    assert feature.searches == ['I forgot my password']
+    assert [history[8] for history in feature.histories] == [0.95, 0.95]
+
+    # queries without annotation are cached as well
+    feature.search_result = (None, None)
+    assert _query(feature, 'What is the weather?') is None
+    assert _query(feature, 'What is the weather?') is None
+    assert feature.searches == ['I forgot my password', 'What is the weather?']
+
+    AnnotationReplyCache.invalidate('app')
+    assert _query(feature, 'I forgot my password') is None
+    assert feature.searches == ['I forgot my password', 'What is the weather?', 'I forgot my password']
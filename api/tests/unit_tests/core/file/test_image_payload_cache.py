@@ -0,0 +1,76 @@
+import base64
+import io
+
+from PIL import Image
+
+from core.file.image_payload_cache import ImagePayloadCache, encode_image_payload
+
+
+def test_memory_tier_eviction(tmp_path):
+    cache = ImagePayloadCache(memory_limit=10, disk_limit=0, cache_dir=str(tmp_path))
+    cache.set('a', '12345')
+    cache.set('b', '12345')
+    assert cache.get('a') == '12345'
+
+    # 'b' is the least recently used one
+    cache.set('c', '12345')
+    assert cache.get('b') is None
+    assert cache.get('a') == '12345'
+    assert cache.get('c') == '12345'
+
+    stats = cache.get_stats()
+    assert stats.memory_hits == 3
+    assert stats.misses == 1
+    assert stats.evictions == 1
+    assert stats.memory_bytes == 10
+
+
+def test_disk_tier(tmp_path):
+    cache = ImagePayloadCache(memory_limit=5, disk_limit=100, cache_dir=str(tmp_path))
+    cache.set('a', '12345')
+    cache.set('b', '67890')
+
+    # 'a' was evicted from memory but is still on disk
+    assert cache.get('a') == '12345'
+    stats = cache.get_stats()
+    assert stats.disk_hits == 1
+    assert stats.disk_items == 2
+
+    cache.clear()
+    assert cache.get('a') is None
+    assert not list(tmp_path.iterdir())
+
+
+def test_encode_image_payload_downscale():
+    output = io.BytesIO()
+    Image.new('RGB', (2048, 1024), color='red').save(output, format='PNG')
+    data = output.getvalue()
+
+    payload = encode_image_payload(data, 'image/png')
+    assert payload == 'data:image/png;base64,' + base64.b64encode(data).decode('utf-8')
+
+    payload = encode_image_payload(data, 'image/png', max_resolution=512)
+    resized = base64.b64decode(payload.removeprefix('data:image/png;base64,'))
+    with Image.open(io.BytesIO(resized)) as image:
+        assert image.size == (512, 256)
+
+
+def test_disk_tier_is_private_to_the_process(tmp_path):
+    # left by a process which does not exist anymore
+    stale_dir = tmp_path / '999999999-stale'
+    stale_dir.mkdir()
+    (stale_dir / 'payload').write_text('12345')
+
+    cache = ImagePayloadCache(memory_limit=5, disk_limit=100, cache_dir=str(tmp_path))
+    assert not stale_dir.exists()
+
+    cache.set('a', '12345')
+    process_dirs = list(tmp_path.iterdir())
+    assert len(process_dirs) == 1
+    assert process_dirs[0].name.startswith(f'{cache.pid}-')
+    assert process_dirs[0].stat().st_mode & 0o777 == 0o700
+
+    # another cache of the same directory does not touch the files of this one
+    ImagePayloadCache(memory_limit=5, disk_limit=100, cache_dir=str(tmp_path)).clear()
+    cache.set('b', '67890')
+    assert cache.get('a') == '12345'
@@ -0,0 +1,79 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+from core.helper import ssrf_proxy
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = self.headers.get('Cookie', '').encode() if self.path == '/cookie' else b'a' * 1024
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Set-Cookie', 'session=secret')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+
+
+@pytest.fixture(autouse=True)
+def client(monkeypatch):
+    monkeypatch.setattr(ssrf_proxy, '_client', None)
+    monkeypatch.setattr(ssrf_proxy, '_metrics', ssrf_proxy._Metrics())
+    monkeypatch.setattr(ssrf_proxy, '_host_slots', {})
+    monkeypatch.setattr(ssrf_proxy, '_host_slots_pid', None)
+    monkeypatch.setenv('NO_PROXY', '*')
+    yield
+    if ssrf_proxy._client:
+        ssrf_proxy._client.close()
+
+
+def test_connections_are_reused(server):
+    for _ in range(3):
+        assert ssrf_proxy.get(f'{server}/').status_code == 200
+
+    metrics = ssrf_proxy.get_metrics()
+    assert metrics['requests'] == 3
+    assert metrics['connections'] == 1
+    assert metrics['reused_connections'] == 2
+
+
+def test_cookies_are_not_shared_between_requests(server):
+    ssrf_proxy.get(f'{server}/')
+
+    assert ssrf_proxy.get(f'{server}/cookie').text == ''
+    assert ssrf_proxy.get(f'{server}/cookie', cookies={'name': 'value'}).text == 'name=value'
+
+
+def test_read_limited(server):
+    with ssrf_proxy.stream('GET', f'{server}/') as response:
+        assert ssrf_proxy.read_limited(response, 1024) == b'a' * 1024
+
+    with ssrf_proxy.stream('GET', f'{server}/') as response:
+        with pytest.raises(ssrf_proxy.ResponseTooLargeError):
+            ssrf_proxy.read_limited(response, 1023)
+
+
+def test_connections_per_host_are_limited(server, monkeypatch):
+    monkeypatch.setattr(ssrf_proxy, 'SSRF_MAX_CONNECTIONS_PER_HOST', 1)
+
+    with ssrf_proxy.stream('GET', f'{server}/'):
+        with pytest.raises(httpx.PoolTimeout):
+            ssrf_proxy.get(f'{server}/', timeout=0.1)
+
+    assert ssrf_proxy.get(f'{server}/', timeout=0.1).status_code == 200
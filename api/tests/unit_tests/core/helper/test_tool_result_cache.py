@@ -0,0 +1,122 @@
+from typing import Any
+from unittest.mock import MagicMock
+
+import pytest
+from flask import Flask
+
+from core.helper import tool_result_cache
+from core.helper.tool_result_cache import ToolResultCache
+from core.tools.entities.common_entities import I18nObject
+from core.tools.entities.tool_entities import ToolIdentity, ToolInvokeMessage, ToolProviderType
+from core.tools.tool.tool import Tool
+from core.tools.tool_engine import ToolEngine
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def setex(self, key, expire, value):
+        self.data[key] = value.encode('utf-8')
+
+
+class SearchTool(Tool):
+    calls: int = 0
+
+    def tool_provider_type(self) -> ToolProviderType:
+        return ToolProviderType.BUILT_IN
+
+    def _invoke(self, user_id: str, tool_parameters: dict[str, Any]) -> list[ToolInvokeMessage]:
+        self.calls += 1
+        return [self.create_text_message(f'result of {tool_parameters["query"]}'),
+                self.create_blob_message(b'\x00' * tool_parameters.get('size', 1), meta={'mime_type': 'image/png'})]
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config.update({
+        'TOOL_RESULT_CACHE_ENABLED': True,
+        'TOOL_RESULT_CACHE_MEMORY_SIZE': 2,
+        'TOOL_RESULT_CACHE_MAX_BINARY_SIZE': 10,
+    })
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    redis = FakeRedis()
+    monkeypatch.setattr('core.helper.tool_result_cache.redis_client', redis)
+    tool_result_cache._memory_tier.clear()
+    return redis
+
+
+def _tool(cache_ttl=60, credentials=None) -> SearchTool:
+    return SearchTool(
+        identity=ToolIdentity(author='', name='search', label=I18nObject(en_US='search'), provider='web',
+                              cache_ttl=cache_ttl),
+        runtime=Tool.Runtime(tenant_id='tenant-id', credentials=credentials or {'api_key': 'a'}),
+    )
+
+
+def test_invoke_hits_the_cache(app, redis):
+    tool = _tool()
+
+    meta, response = ToolEngine._invoke(tool, {'query': 'dify'}, 'user-id')
+    assert meta.cache_hit is False
+    meta, cached = ToolEngine._invoke(tool, {'query': 'dify'}, 'user-id')
+    assert meta.cache_hit is True
+    assert meta.to_dict()['cache_hit'] is True
+
+    assert tool.calls == 1
+    assert [message.message for message in cached] == ['result of dify', b'\x00']
+    assert cached[1].type == ToolInvokeMessage.MessageType.BLOB
+    assert cached[1].meta == {'mime_type': 'image/png'}
+
+
+def test_redis_tier_is_shared_by_processes(app, redis):
+    ToolEngine._invoke(_tool(), {'query': 'dify'}, 'user-id')
+    # another process only sees the redis tier
+    tool_result_cache._memory_tier.clear()
+
+    tool = _tool()
+    meta, _ = ToolEngine._invoke(tool, {'query': 'dify'}, 'user-id')
+    assert meta.cache_hit is True
+    assert tool.calls == 0
+
+
+def test_cache_is_scoped_by_parameters_and_credentials(app, redis):
+    ToolEngine._invoke(_tool(), {'query': 'dify'}, 'user-id')
+
+    assert ToolResultCache.for_tool(_tool(), {'query': 'other'}).get() is None
+    assert ToolResultCache.for_tool(_tool(credentials={'api_key': 'b'}), {'query': 'dify'}).get() is None
+    assert ToolResultCache.for_tool(_tool(), {'query': 'dify'}).get() is not None
+
+
+def test_uncached_tools_and_large_binaries(app, redis):
+    meta, _ = ToolEngine._invoke(_tool(cache_ttl=None), {'query': 'dify'}, 'user-id')
+    assert meta.cache_hit is None
+
+    ToolEngine._invoke(_tool(), {'query': 'dify', 'size': 11}, 'user-id')
+    assert not redis.data
+
+    app.config['TOOL_RESULT_CACHE_ENABLED'] = False
+    assert ToolResultCache.for_tool(_tool(), {'query': 'dify'}) is None
+
+
+def test_workflow_invoke_returns_the_cache_hit(app, redis):
+    tool = _tool()
+
+    for cache_hit in (False, True):
+        response, hit = ToolEngine.workflow_invoke(tool, {'query': 'dify'}, 'user-id', 'workflow-id',
+                                                   MagicMock(), workflow_call_depth=0)
+        assert hit is cache_hit
+        assert response[0].message == 'result of dify'
+
+    _, hit = ToolEngine.workflow_invoke(_tool(cache_ttl=None), {'query': 'dify'}, 'user-id', 'workflow-id',
+                                        MagicMock(), workflow_call_depth=0)
+    assert hit is None
@@ -0,0 +1,73 @@
+import random
+import string
+
+import pytest
+
+from core.moderation.keywords.keyword_matcher import KeywordMatcher, get_keyword_matcher
+from core.moderation.keywords.keywords import KeywordsModeration
+
+
+def _moderation(keywords: str) -> KeywordsModeration:
+    return KeywordsModeration('app-id', 'tenant-id', {
+        'keywords': keywords,
+        'inputs_config': {'enabled': True, 'preset_response': 'inputs blocked'},
+        'outputs_config': {'enabled': True, 'preset_response': 'outputs blocked'},
+    })
+
+
+@pytest.mark.parametrize(('text', 'expected'), [
+    ('ushers', True),
+    ('a HIS b', True),
+    ('sh e', False),
+    ('', False),
+])
+def test_matcher_finds_overlapping_keywords(text, expected):
+    matcher = KeywordMatcher(['he', 'She', 'his', 'hers', ''])
+    assert matcher.search(text) is expected
+
+
+def test_matcher_without_keywords():
+    assert KeywordMatcher(['']).search('anything') is False
+
+
+def test_matcher_scans_only_new_text():
+    matcher = KeywordMatcher(['secret'])
+    text = 'x' * 100 + 'sec' + 'ret'
+
+    # the keyword spans the checked text and the new text
+    assert matcher.search_new_text(text, 103) is True
+    assert matcher.search_new_text('secret' + 'x' * 100, 100) is False
+
+
+def test_matchers_are_cached_per_config():
+    assert get_keyword_matcher('a\nb') is get_keyword_matcher('a\nb')
+    assert get_keyword_matcher('a\nb') is not get_keyword_matcher('a\nc')
+
+
+def test_keywords_moderation():
+    moderation = _moderation('Bad\n\nworse')
+
+    result = moderation.moderation_for_inputs({'name': 'a bad name'}, 'query')
+    assert result.flagged is True
+    assert result.preset_response == 'inputs blocked'
+    assert moderation.moderation_for_inputs({'name': 'fine'}, 'worse query').flagged is True
+    assert moderation.moderation_for_inputs({'name': 'fine'}, 'fine').flagged is False
+
+    result = moderation.moderation_for_outputs('this is WORSE')
+    assert result.flagged is True
+    assert result.preset_response == 'outputs blocked'
+    # the checked text is not scanned again, beyond the overlap of the longest keyword
+    assert moderation.moderation_for_new_outputs('bad' + 'x' * 20, 20).flagged is False
+
+
+def test_benchmark_1000_keywords_10kb_output(benchmark):
+    rand = random.Random(0)
+    keywords = [''.join(rand.choices(string.ascii_lowercase, k=rand.randint(5, 12))) for _ in range(1000)]
+    # words which are not keywords
+    text = ' '.join(''.join(rand.choices(string.ascii_lowercase, k=4)) for _ in range(2048))[:10 * 1024]
+    moderation = _moderation('\n'.join(keywords))
+
+    result = benchmark(moderation.moderation_for_outputs, text)
+
+    assert result.flagged is False
+    assert moderation.moderation_for_outputs(text + keywords[-1]).flagged is True
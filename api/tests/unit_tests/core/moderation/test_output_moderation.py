@@ -0,0 +1,98 @@
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+from flask import Flask
+
+from core.app.apps.base_app_queue_manager import AppQueueManager
+from core.moderation import output_moderation
+from core.moderation.base import ModerationAction, ModerationOutputsResult
+from core.moderation.output_moderation import ModerationRule, OutputModeration
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config.update({
+        'OUTPUT_MODERATION_BUFFER_SIZE': 10,
+        'OUTPUT_MODERATION_MAX_WORKERS': 2,
+    })
+    with app.app_context():
+        yield app
+
+
+def _output_moderation() -> OutputModeration:
+    return OutputModeration(tenant_id='tenant-id', app_id='app-id', queue_manager=MagicMock(spec=AppQueueManager),
+                            rule=ModerationRule(type='keywords', config={}))
+
+
+def _result(flagged: bool) -> ModerationOutputsResult:
+    return ModerationOutputsResult(flagged=flagged, action=ModerationAction.DIRECT_OUTPUT, preset_response='blocked')
+
+
+def _wait_for_check(moderation: OutputModeration):
+    future = moderation._future
+    if future:
+        future.result(timeout=5)
+
+
+def test_check_is_submitted_when_the_buffer_grows_by_the_buffer_size(app, monkeypatch):
+    calls = []
+    monkeypatch.setattr(OutputModeration, 'moderation',
+                        lambda self, **kwargs: calls.append(kwargs) or _result(False))
+    moderation = _output_moderation()
+
+    moderation.append_new_token('a' * 9)
+    assert moderation._future is None
+    moderation.append_new_token('a')
+    _wait_for_check(moderation)
+    moderation.append_new_token('b' * 10)
+    _wait_for_check(moderation)
+
+    assert [(len(call['moderation_buffer']), call['checked_length']) for call in calls] == [(10, 0), (20, 10)]
+
+
+def test_flagged_output_is_replaced(app, monkeypatch):
+    monkeypatch.setattr(OutputModeration, 'moderation', lambda self, **kwargs: _result(True))
+    moderation = _output_moderation()
+
+    moderation.append_new_token('a' * 10)
+    _wait_for_check(moderation)
+
+    assert moderation.should_direct_output()
+    assert moderation.get_final_output() == 'blocked'
+    event = moderation.queue_manager.publish.call_args.args[0]
+    assert event.text == 'blocked'
+
+    # no more checks once the answer is replaced
+    moderation.append_new_token('a' * 10)
+    assert moderation._future is None
+
+
+def test_stop_discards_the_running_check(app, monkeypatch):
+    started = threading.Event()
+    release = threading.Event()
+
+    def moderation_(self, **kwargs):
+        started.set()
+        release.wait(5)
+        return _result(True)
+
+    monkeypatch.setattr(OutputModeration, 'moderation', moderation_)
+    moderation = _output_moderation()
+
+    moderation.append_new_token('a' * 10)
+    future = moderation._future
+    started.wait(5)
+    moderation.stop()
+    release.set()
+    future.result(timeout=5)
+
+    assert not moderation.should_direct_output()
+    moderation.queue_manager.publish.assert_not_called()
+    moderation.append_new_token('a' * 10)
+    assert moderation._future is None
+
+
+def test_checks_share_the_executor(app):
+    assert output_moderation._get_executor(app) is output_moderation._get_executor(app)
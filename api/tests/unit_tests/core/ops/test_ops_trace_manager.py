@@ -0,0 +1,107 @@
+from unittest.mock import MagicMock
+
+import pytest
+from flask import Flask
+
+from core.ops import ops_trace_manager
+from core.ops.entities.trace_entity import GenerateNameTraceInfo
+from core.ops.ops_trace_manager import OpsTraceManager, TraceQueueManager, TraceTask, TraceTaskName
+from tasks.ops_trace_task import process_trace_tasks
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value):
+        self.data[key] = value.encode('utf-8')
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    redis = FakeRedis()
+    monkeypatch.setattr('core.ops.ops_trace_manager.redis_client', redis)
+    return redis
+
+
+@pytest.fixture
+def create_instance(monkeypatch):
+    create_instance = MagicMock(side_effect=lambda app_id: MagicMock(name=f'trace_instance_{app_id}'))
+    monkeypatch.setattr(OpsTraceManager, '_create_ops_trace_instance', create_instance)
+    monkeypatch.setattr(ops_trace_manager, 'ops_trace_instances', {})
+    return create_instance
+
+
+def test_trace_instance_is_cached_until_config_changes(redis, create_instance):
+    instance = OpsTraceManager.get_ops_trace_instance(app_id='app-1')
+    assert OpsTraceManager.get_ops_trace_instance(app_id='app-1') is instance
+    assert create_instance.call_count == 1
+
+    OpsTraceManager.invalidate_ops_trace_instance('app-1')
+    new_instance = OpsTraceManager.get_ops_trace_instance(app_id='app-1')
+    assert new_instance is not instance
+    assert create_instance.call_count == 2
+
+
+def test_trace_instance_is_rebuilt_when_config_changes_in_another_process(redis, create_instance):
+    instance = OpsTraceManager.get_ops_trace_instance(app_id='app-1')
+
+    # the version set by another process
+    redis.set('ops_trace_config_version:app-1', 'another-version')
+
+    assert OpsTraceManager.get_ops_trace_instance(app_id='app-1') is not instance
+    assert create_instance.call_count == 2
+
+
+def _trace_task(trace_info):
+    task = TraceTask(TraceTaskName.GENERATE_NAME_TRACE)
+    task.execute = MagicMock(return_value=trace_info)
+    return task
+
+
+def test_send_to_celery_batches_traces_of_a_source(monkeypatch):
+    delay = MagicMock()
+    monkeypatch.setattr('core.ops.ops_trace_manager.process_trace_tasks', MagicMock(delay=delay))
+    manager = TraceQueueManager.__new__(TraceQueueManager)
+    manager.flask_app = Flask(__name__)
+    trace_info = GenerateNameTraceInfo(inputs={}, metadata={}, tenant_id='tenant-id')
+
+    manager.send_to_celery([
+        (('app-1', None, None), _trace_task(trace_info)),
+        (('app-2', None, None), _trace_task(trace_info)),
+        (('app-1', None, None), _trace_task(trace_info)),
+    ])
+
+    assert delay.call_count == 2
+    task_data = delay.call_args_list[0].args[0]
+    assert task_data['app_id'] == 'app-1'
+    assert [trace['trace_info_type'] for trace in task_data['traces']] == ['GenerateNameTraceInfo'] * 2
+    assert delay.call_args_list[1].args[0]['app_id'] == 'app-2'
+
+
+def test_process_trace_tasks_traces_batch_and_flushes_once(monkeypatch):
+    trace_instance = MagicMock()
+    monkeypatch.setattr(OpsTraceManager, 'get_ops_trace_instance', MagicMock(return_value=trace_instance))
+    trace_info = GenerateNameTraceInfo(inputs={}, metadata={}, tenant_id='tenant-id').model_dump()
+
+    with Flask(__name__).app_context():
+        process_trace_tasks({
+            'app_id': 'app-1',
+            'traces': [
+                {'trace_info_type': 'GenerateNameTraceInfo', 'trace_info': dict(trace_info)},
+                {'trace_info_type': 'GenerateNameTraceInfo', 'trace_info': dict(trace_info)},
+            ],
+        })
+        # task data of a single trace
+        process_trace_tasks({
+            'app_id': 'app-1',
+            'trace_info_type': 'GenerateNameTraceInfo',
+            'trace_info': dict(trace_info),
+        })
+
+    assert trace_instance.trace.call_count == 3
+    assert isinstance(trace_instance.trace.call_args.args[0], GenerateNameTraceInfo)
+    assert trace_instance.flush.call_count == 2
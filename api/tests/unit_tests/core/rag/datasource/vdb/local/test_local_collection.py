@@ -0,0 +1,166 @@
+import os
+
+import numpy as np
+import pytest
+
+from core.rag.datasource.vdb.local.local_collection import LocalCollection
+
+
+def _collection(path, ivf_min_rows=4096, compaction_ratio=0.2) -> LocalCollection:
+    return LocalCollection(str(path / 'collection'), ivf_min_rows=ivf_min_rows, ivf_probe_count=8,
+                           compaction_ratio=compaction_ratio)
+
+
+def _add(collection: LocalCollection, ids: list[str], vectors: list, group_id='dataset', texts=None):
+    collection.add(
+        ids=ids,
+        texts=texts or [f'text of {id}' for id in ids],
+        metadatas=[{'doc_id': id, 'document_id': f'document-{id}', 'group_id': group_id} for id in ids],
+        embeddings=vectors,
+    )
+
+
+def test_rows_are_shared_by_processes(tmp_path):
+    writer = _collection(tmp_path)
+    reader = _collection(tmp_path)
+    _add(writer, ['a', 'b'], [[1.0, 0.0], [0.0, 1.0]])
+
+    assert [result[0] for result in reader.search_by_vector([1.0, 0.1], top_k=2)] == ['a', 'b']
+
+    # replaced by id, and deleted
+    _add(writer, ['a'], [[0.0, 2.0]], texts=['replaced'])
+    writer.delete_ids(['b'])
+
+    results = reader.search_by_vector([0.0, 1.0], top_k=4)
+    assert [(result[0], result[1]) for result in results] == [('a', 'replaced')]
+    assert results[0][3] == pytest.approx(1.0)
+    assert not reader.contains('b')
+
+
+def test_search_filters(tmp_path):
+    collection = _collection(tmp_path)
+    _add(collection, ['a', 'b'], [[1.0, 0.0], [1.0, 0.1]], group_id='dataset-1')
+    _add(collection, ['c'], [[1.0, 0.0]], group_id='dataset-2')
+
+    results = collection.search_by_vector([1.0, 0.0], top_k=4, filters={'group_id': ['dataset-1']})
+    assert [result[0] for result in results] == ['a', 'b']
+    results = collection.search_by_vector([1.0, 0.0], top_k=4, score_threshold=0.999,
+                                          filters={'group_id': ['dataset-1'], 'document_id': ['document-b']})
+    assert results == []
+    assert collection.get_ids_where('group_id', 'dataset-2') == ['c']
+
+    collection.delete_where('group_id', 'dataset-1')
+    assert [result[0] for result in collection.search_by_vector([1.0, 0.0], top_k=4)] == ['c']
+
+
+def test_full_text_search(tmp_path):
+    collection = _collection(tmp_path)
+    _add(collection, ['a', 'b', 'c'], [[1.0, 0.0]] * 3, texts=[
+        'The vector store keeps vectors in files',
+        'Hybrid search combines full text and vector search',
+        '向量数据库的全文检索',
+    ])
+
+    assert [result[0] for result in collection.search_by_full_text('vector search', top_k=2)] == ['b', 'a']
+    assert [result[0] for result in collection.search_by_full_text('全文', top_k=2)] == ['c']
+    collection.delete_ids(['b'])
+    assert [result[0] for result in collection.search_by_full_text('hybrid', top_k=2)] == []
+
+
+def test_deleted_rows_are_compacted(tmp_path):
+    collection = _collection(tmp_path, compaction_ratio=0.5)
+    reader = _collection(tmp_path)
+    _add(collection, [str(i) for i in range(10)], np.eye(10).tolist())
+    generation = open(tmp_path / 'collection' / 'CURRENT').read()
+
+    collection.delete_ids([str(i) for i in range(5)])
+    assert open(tmp_path / 'collection' / 'CURRENT').read() == generation
+
+    collection.delete_ids(['5'])
+    assert open(tmp_path / 'collection' / 'CURRENT').read() != generation
+    assert not os.path.exists(tmp_path / 'collection' / generation)
+    assert os.path.getsize(tmp_path / 'collection' / collection._generation / 'vectors.f32') == 4 * 10 * 4
+    assert [result[0] for result in reader.search_by_vector(np.eye(10)[7], top_k=1)] == ['7']
+    assert sorted(result[0] for result in reader.search_by_vector(np.ones(10), top_k=10)) == ['6', '7', '8', '9']
+
+
+def test_generation_deleted_while_read_is_reloaded(tmp_path, monkeypatch):
+    writer = _collection(tmp_path)
+    reader = _collection(tmp_path)
+    _add(writer, ['a', 'b', 'c'], [[1.0, 0.0], [0.0, 1.0], [1.0, 1.0]])
+    old_generation = reader._current_generation()
+
+    writer.delete_ids(['b'])
+    assert writer._generation != old_generation
+    # the reader read the generation before the writer replaced it
+    current_generation = reader._current_generation
+    generations = iter([old_generation])
+    monkeypatch.setattr(reader, '_current_generation', lambda: next(generations, None) or current_generation())
+
+    assert [result[0] for result in reader.search_by_vector([1.0, 0.0], top_k=4)] == ['a', 'c']
+    assert reader._generation == writer._generation
+
+
+def test_partially_written_rows_are_ignored(tmp_path):
+    collection = _collection(tmp_path)
+    _add(collection, ['a'], [[1.0, 0.0]])
+    generation_path = tmp_path / 'collection' / collection._generation
+    # a writer which crashed after writing a vector and part of its record
+    with open(generation_path / 'vectors.f32', 'ab') as f:
+        f.write(np.array([0.0, 1.0], dtype=np.float32).tobytes())
+    with open(generation_path / 'records.jsonl', 'a') as f:
+        f.write('{"id": "b", "te')
+
+    reader = _collection(tmp_path)
+    assert [result[0] for result in reader.search_by_vector([0.0, 1.0], top_k=4)] == ['a']
+
+    _add(reader, ['c'], [[0.0, 1.0]])
+    assert [result[0] for result in collection.search_by_vector([0.0, 1.0], top_k=4)] == ['c', 'a']
+
+
+def test_dimension_must_match(tmp_path):
+    collection = _collection(tmp_path)
+    _add(collection, ['a'], [[1.0, 0.0]])
+
+    with pytest.raises(ValueError):
+        _add(collection, ['b'], [[1.0, 0.0, 0.0]])
+
+
+def _clustered_vectors(count: int, dimension: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(64, dimension))
+    return centers[rng.integers(0, len(centers), count)] + rng.normal(scale=0.5, size=(count, dimension))
+
+
+def test_benchmark_ivf_search_against_brute_force(tmp_path, benchmark):
+    vectors = _clustered_vectors(20000, 128, seed=0)
+    queries = _clustered_vectors(50, 128, seed=1)
+    collection = _collection(tmp_path, ivf_min_rows=4096)
+    for start in range(0, len(vectors), 5000):
+        _add(collection, [str(i) for i in range(start, start + 5000)], vectors[start:start + 5000].tolist())
+    assert collection._ivf is not None
+
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    exact = [set(np.argsort(-(normalized @ query))[:10].astype(str)) for query in queries]
+
+    def search():
+        return [collection.search_by_vector(query.tolist(), top_k=10) for query in queries]
+
+    results = benchmark(search)
+
+    recall = np.mean([
+        len(expected & {result[0] for result in query_results}) / 10
+        for expected, query_results in zip(exact, results)
+    ])
+    assert recall >= 0.9
+
+
+def test_benchmark_brute_force_search(tmp_path, benchmark):
+    vectors = _clustered_vectors(20000, 128, seed=0)
+    queries = _clustered_vectors(50, 128, seed=1)
+    collection = _collection(tmp_path, ivf_min_rows=100000)
+    _add(collection, [str(i) for i in range(len(vectors))], vectors.tolist())
+
+    results = benchmark(lambda: [collection.search_by_vector(query.tolist(), top_k=10) for query in queries])
+
+    assert all(len(query_results) == 10 for query_results in results)
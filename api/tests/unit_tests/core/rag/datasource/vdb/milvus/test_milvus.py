@@ -1,7 +1,11 @@
+import contextlib
+from unittest.mock import MagicMock
+
 import pytest
 from pydantic.error_wrappers import ValidationError
 
-from core.rag.datasource.vdb.milvus.milvus_vector import MilvusConfig
+from core.rag.datasource.vdb.milvus import milvus_vector
+from core.rag.datasource.vdb.milvus.milvus_vector import MilvusConfig, MilvusVector
 
 
 def test_default_value():
@@ -22,3 +26,48 @@ def test_default_value():
     config = MilvusConfig(**valid_config)
     assert config.secure is False
     assert config.database == 'default'
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    def lock(self, name, timeout=None):
+        return contextlib.nullcontext()
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+
+
+def _milvus_vector() -> MilvusVector:
+    # a vector of a client which is not connected
+    vector = MilvusVector.__new__(MilvusVector)
+    vector._collection_name = 'collection'
+    vector._client = MagicMock()
+    vector._client_alias = 'alias'
+    vector._consistency_level = 'Session'
+    vector._fields = []
+    return vector
+
+
+def test_create_collection(monkeypatch):
+    redis = FakeRedis()
+    utility = MagicMock()
+    utility.has_collection.return_value = False
+    monkeypatch.setattr(milvus_vector, 'redis_client', redis)
+    monkeypatch.setattr(milvus_vector, 'utility', utility)
+    vector = _milvus_vector()
+
+    vector.create_collection([[0.1, 0.2]], metadatas=[{'doc_id': 'a'}])
+
+    utility.has_collection.assert_called_once_with('collection', using='alias')
+    vector._client.create_collection_with_schema.assert_called_once()
+    assert vector._fields == ['metadata', 'page_content', 'vector']
+    assert redis.data == {'vector_indexing_collection': 1}
+
+    # the collection is known to exist
+    vector.create_collection([[0.1, 0.2]], metadatas=[{'doc_id': 'a'}])
+    utility.has_collection.assert_called_once()
@@ -0,0 +1,107 @@
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+from flask import Flask
+from pydantic import BaseModel
+
+from core.rag.datasource.vdb import vector_client_registry as registry_module
+from core.rag.datasource.vdb.vector_client_registry import VectorClientRegistry
+
+
+class FakeConfig(BaseModel):
+    host: str
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config.update(VECTOR_STORE_CLIENT_IDLE_TIMEOUT=600, VECTOR_STORE_CLIENT_HEALTH_CHECK_INTERVAL=60)
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(registry_module.time, 'monotonic', clock)
+    return clock
+
+
+def test_client_is_shared_by_threads(app):
+    registry = VectorClientRegistry()
+    create = MagicMock(side_effect=lambda: object())
+    clients = []
+
+    def get_client():
+        with app.app_context():
+            clients.append(registry.get_client('qdrant', FakeConfig(host='a'), create))
+
+    threads = [threading.Thread(target=get_client) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert create.call_count == 1
+    assert all(client is clients[0] for client in clients)
+    other = registry.get_client('qdrant', FakeConfig(host='b'), create)
+    assert other is not clients[0]
+    assert registry.get_metrics()['qdrant'] == {
+        'clients': 2, 'created': 2, 'reused': 7, 'evicted': 0, 'unhealthy': 0
+    }
+
+
+def test_idle_client_is_evicted(app, clock):
+    registry = VectorClientRegistry()
+    client = registry.get_client('pgvector', FakeConfig(host='a'), object)
+
+    clock.now += 300
+    assert registry.get_client('pgvector', FakeConfig(host='a'), object) is client
+
+    clock.now += 601
+    assert registry.get_client('pgvector', FakeConfig(host='a'), object) is not client
+    assert registry.get_metrics()['pgvector']['evicted'] == 1
+    assert registry.get_metrics()['pgvector']['clients'] == 1
+
+
+def test_unhealthy_client_is_replaced(app, clock):
+    registry = VectorClientRegistry()
+    check_health = MagicMock(return_value=True)
+    client = registry.get_client('chroma', FakeConfig(host='a'), object, check_health=check_health)
+
+    # not checked again before the interval
+    clock.now += 30
+    assert registry.get_client('chroma', FakeConfig(host='a'), object, check_health=check_health) is client
+    check_health.assert_not_called()
+
+    clock.now += 31
+    assert registry.get_client('chroma', FakeConfig(host='a'), object, check_health=check_health) is client
+    check_health.assert_called_once_with(client)
+
+    clock.now += 61
+    check_health.side_effect = ConnectionError()
+    replaced = registry.get_client('chroma', FakeConfig(host='a'), object, check_health=check_health)
+    assert replaced is not client
+    assert registry.get_metrics()['chroma']['unhealthy'] == 1
+    assert registry.get_metrics()['chroma']['clients'] == 1
+
+
+def test_clients_are_not_reused_after_fork(app, monkeypatch):
+    registry = VectorClientRegistry()
+    client = registry.get_client('milvus', FakeConfig(host='a'), object)
+
+    child_pid = registry._pid + 1
+    monkeypatch.setattr(registry_module.os, 'getpid', lambda: child_pid)
+    assert registry.get_client('milvus', FakeConfig(host='a'), object) is not client
+    # kept referenced so that the connections shared with the parent are not closed
+    assert registry._inherited_clients == [client]
+    assert registry.get_metrics()['milvus']['created'] == 1
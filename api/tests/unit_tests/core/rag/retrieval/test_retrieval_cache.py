@@ -0,0 +1,151 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from flask import Flask
+from sqlalchemy import MetaData, create_engine
+from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from core.rag.models.document import Document
+from core.rag.retrieval import retrieval_cache as cache_module
+from core.rag.retrieval.retrieval_cache import RetrievalCache
+from models import StringUUID
+from models.dataset import DocumentSegment
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def mget(self, keys):
+        return [self.data.get(key) for key in keys]
+
+    def setex(self, key, expire, value):
+        self.data[key] = value.encode('utf-8')
+
+    def incr(self, key):
+        self.data[key] = str(int(self.data.get(key, 0)) + 1).encode('utf-8')
+
+
+@pytest.fixture
+def session(monkeypatch):
+    metadata = MetaData()
+    table = DocumentSegment.__table__.to_metadata(metadata)
+    for column in table.columns:
+        column.server_default = None
+    monkeypatch.setattr(StringUUID, 'process_bind_param', lambda self, value, dialect: value)
+    engine = create_engine('sqlite://', poolclass=StaticPool)
+    metadata.create_all(engine)
+    session = scoped_session(sessionmaker(bind=engine))
+    monkeypatch.setattr(cache_module, 'db', SimpleNamespace(session=session))
+    now = datetime(2024, 7, 1)
+    for dataset_id, index_node_id in [('dataset-1', 'node-1'), ('dataset-1', 'node-2'), ('dataset-2', 'node-3')]:
+        session.add(DocumentSegment(
+            id=f'segment-{index_node_id}', tenant_id='tenant', dataset_id=dataset_id, document_id='document',
+            position=1, content=f'content of {index_node_id}', word_count=3, tokens=3, index_node_id=index_node_id,
+            index_node_hash=f'hash-{index_node_id}', hit_count=0, enabled=True, status='completed',
+            created_by='account', created_at=now, updated_at=now,
+        ))
+    session.commit()
+    yield session
+    session.remove()
+
+
+@pytest.fixture
+def app(monkeypatch, session):
+    app = Flask(__name__)
+    app.config.update({
+        'RETRIEVAL_CACHE_TTL': 300,
+        'RETRIEVAL_CACHE_MEMORY_SIZE': 16,
+        'RETRIEVAL_CACHE_MAX_DOCUMENTS': 2,
+    })
+    monkeypatch.setattr(cache_module, 'redis_client', FakeRedis())
+    monkeypatch.setattr(cache_module, '_memory_tier', cache_module._MemoryTier())
+    monkeypatch.setattr(cache_module, '_stats', cache_module._Stats())
+    with app.app_context():
+        yield app
+
+
+class FakeRetriever:
+    def __init__(self, documents: list[Document]):
+        self.documents = documents
+        self.calls = 0
+
+    def __call__(self) -> list[Document]:
+        self.calls += 1
+        return self.documents
+
+
+def _document(dataset_id: str, index_node_id: str, score: float) -> Document:
+    return Document(page_content=f'content of {index_node_id}', metadata={
+        'doc_id': index_node_id, 'dataset_id': dataset_id, 'document_id': 'document', 'score': score
+    })
+
+
+CONFIG = {'top_k': 2, 'score_threshold': 0.5}
+
+
+def test_retrievals_are_cached_by_query(app, session):
+    retriever = FakeRetriever([_document('dataset-2', 'node-3', 0.9), _document('dataset-1', 'node-1', 0.8)])
+
+    documents, trace = RetrievalCache.retrieve(['dataset-1', 'dataset-2'], CONFIG, 'reset password', retriever)
+    assert trace['hit'] is False
+    assert retriever.calls == 1
+
+    documents, trace = RetrievalCache.retrieve(['dataset-2', 'dataset-1'], CONFIG, '  reset   password', retriever)
+    assert retriever.calls == 1
+    assert (trace['hit'], trace['hit_rate']) == (True, 0.5)
+    assert trace['saved_latency'] >= 0
+    # the segments are loaded again, in the order of the retrieval
+    assert [(document.page_content, document.metadata) for document in documents] == [
+        ('content of node-3', {'doc_id': 'node-3', 'doc_hash': 'hash-node-3', 'document_id': 'document',
+                               'dataset_id': 'dataset-2', 'score': 0.9}),
+        ('content of node-1', {'doc_id': 'node-1', 'doc_hash': 'hash-node-1', 'document_id': 'document',
+                               'dataset_id': 'dataset-1', 'score': 0.8}),
+    ]
+
+    # another retrieval config or dataset is another retrieval
+    RetrievalCache.retrieve(['dataset-1', 'dataset-2'], {**CONFIG, 'top_k': 3}, 'reset password', retriever)
+    RetrievalCache.retrieve(['dataset-1'], CONFIG, 'reset password', retriever)
+    assert retriever.calls == 3
+
+    # disabled segments are skipped
+    session.query(DocumentSegment).filter(DocumentSegment.index_node_id == 'node-3').update({'enabled': False})
+    session.commit()
+    documents, _ = RetrievalCache.retrieve(['dataset-1', 'dataset-2'], CONFIG, 'reset password', retriever)
+    assert [document.metadata['doc_id'] for document in documents] == ['node-1']
+
+
+def test_retrievals_are_invalidated_by_index_changes(app):
+    retriever = FakeRetriever([_document('dataset-1', 'node-1', 0.8)])
+    RetrievalCache.retrieve(['dataset-1', 'dataset-2'], CONFIG, 'query', retriever)
+
+    RetrievalCache.bump_dataset_version('dataset-2')
+
+    _, trace = RetrievalCache.retrieve(['dataset-1', 'dataset-2'], CONFIG, 'query', retriever)
+    assert trace['hit'] is False
+    assert retriever.calls == 2
+
+
+def test_large_retrievals_are_not_cached(app):
+    retriever = FakeRetriever([_document('dataset-1', f'node-{i}', 0.8) for i in range(3)])
+
+    RetrievalCache.retrieve(['dataset-1'], CONFIG, 'query', retriever)
+    RetrievalCache.retrieve(['dataset-1'], CONFIG, 'query', retriever)
+
+    assert retriever.calls == 2
+
+
+def test_cache_can_be_disabled(app):
+    app.config['RETRIEVAL_CACHE_TTL'] = 0
+    retriever = FakeRetriever([_document('dataset-1', 'node-1', 0.8)])
+
+    for _ in range(2):
+        documents, trace = RetrievalCache.retrieve(['dataset-1'], CONFIG, 'query', retriever)
+
+    assert trace is None
+    assert retriever.calls == 2
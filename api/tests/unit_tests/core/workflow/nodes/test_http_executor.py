@@ -0,0 +1,78 @@
+from contextlib import contextmanager
+
+import httpx
+import pytest
+
+from core.workflow.nodes.http_request import http_executor
+from core.workflow.nodes.http_request.entities import HttpRequestNodeData
+from core.workflow.nodes.http_request.http_executor import HttpExecutor
+
+
+class Body:
+    """
+    Body streamed in chunks, records how many of them were read.
+    """
+
+    def __init__(self, chunks: list[bytes]):
+        self.chunks = chunks
+        self.consumed = 0
+
+    def __iter__(self):
+        for chunk in self.chunks:
+            self.consumed += 1
+            yield chunk
+
+
+def _executor(monkeypatch, headers: dict, body: Body) -> HttpExecutor:
+    @contextmanager
+    def stream(method, url, **kwargs):
+        yield httpx.Response(200, headers=headers, content=body, request=httpx.Request(method, url))
+
+    monkeypatch.setattr('core.helper.ssrf_proxy.stream', stream)
+    node_data = HttpRequestNodeData(title='http', method='get', url='http://example.com/file',
+                                    authorization={'type': 'no-auth'}, headers='', params='')
+    return HttpExecutor(node_data=node_data, timeout=HttpRequestNodeData.Timeout())
+
+
+def test_text_is_decoded_while_streamed(monkeypatch):
+    # a multi-byte character split between two chunks
+    encoded = 'héllo'.encode()
+    body = Body([encoded[:2], encoded[2:]])
+
+    response = _executor(monkeypatch, {'content-type': 'text/plain; charset=utf-8'}, body).invoke()
+
+    assert response.content == 'héllo'
+    assert response.size == len(encoded)
+
+
+def test_text_too_large_stops_reading(monkeypatch):
+    monkeypatch.setattr(http_executor, 'MAX_TEXT_SIZE', 10)
+    body = Body([b'a' * 6, b'a' * 6, b'a' * 6])
+
+    with pytest.raises(ValueError, match='Text size is too large'):
+        _executor(monkeypatch, {'content-type': 'text/plain'}, body).invoke()
+
+    assert body.consumed == 2
+
+
+def test_content_length_too_large_is_rejected_before_reading(monkeypatch):
+    monkeypatch.setattr(http_executor, 'MAX_BINARY_SIZE', 10)
+    body = Body([b'a' * 20])
+
+    with pytest.raises(ValueError, match='current size is 20 bytes'):
+        _executor(monkeypatch, {'content-type': 'image/png', 'content-length': '20'}, body).invoke()
+
+    assert body.consumed == 0
+
+
+def test_file_is_spooled(monkeypatch):
+    monkeypatch.setattr(http_executor, 'FILE_SPOOL_MEMORY_SIZE', 4)
+    body = Body([b'\x89PNG', b'\x00' * 8])
+
+    response = _executor(monkeypatch, {'content-type': 'image/png'}, body).invoke()
+
+    assert response.file is not None
+    assert response.size == 12
+    assert response.extract_file() == ('image/png', b'\x89PNG' + b'\x00' * 8)
+    response.close()
+    assert response.file.closed
@@ -0,0 +1,111 @@
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import Column, Integer, String, create_engine, select
+from sqlalchemy.orm import Session, declarative_base
+
+from libs.batch_purge import BatchPurger, iter_id_batches
+
+Base = declarative_base()
+
+
+class Row(Base):
+    __tablename__ = 'rows'
+
+    id = Column(String, primary_key=True)
+    group = Column(Integer, nullable=False)
+
+
+class Child(Base):
+    __tablename__ = 'children'
+
+    id = Column(String, primary_key=True)
+    row_id = Column(String, nullable=False)
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def setex(self, key, expire, value):
+        self.data[key] = value.encode('utf-8')
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+
+@pytest.fixture
+def session(monkeypatch):
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    session = Session(engine)
+    # rows 00 to 24, the even ones in group 0 and the odd ones in group 1
+    session.add_all([Row(id=f'{i:02d}', group=i % 2) for i in range(25)])
+    session.add_all([Child(id=f'child-{i:02d}', row_id=f'{i:02d}') for i in range(25)])
+    session.commit()
+    monkeypatch.setattr('libs.batch_purge.db', SimpleNamespace(session=session))
+    return session
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    redis = FakeRedis()
+    monkeypatch.setattr('libs.batch_purge.redis_client', redis)
+    return redis
+
+
+def _remaining_ids(session, model=Row):
+    return session.scalars(select(model.id).order_by(model.id)).all()
+
+
+def test_purge_in_chunks_with_short_last_batch(session, redis):
+    progress = []
+    deleted = BatchPurger(Row, [Row.group == 0], batch_size=5, sleep_seconds=0,
+                          progress_callback=lambda chunk, total: progress.append((chunk, total))).run()
+
+    # 13 even rows, the last chunk is short and ends the purge without an empty query
+    assert deleted == 13
+    assert progress == [(5, 5), (5, 10), (3, 13)]
+    assert _remaining_ids(session) == [f'{i:02d}' for i in range(1, 25, 2)]
+
+
+def test_purge_before_delete(session, redis):
+    chunks = []
+
+    def before_delete(ids):
+        chunks.append(ids)
+        session.query(Child).filter(Child.row_id.in_(ids)).delete(synchronize_session=False)
+
+    deleted = BatchPurger(Row, [Row.group == 1], batch_size=10, sleep_seconds=0, before_delete=before_delete).run()
+
+    assert deleted == 12
+    # the cursor advances in primary key order
+    assert chunks == [[f'{i:02d}' for i in range(1, 21, 2)], ['21', '23']]
+    assert _remaining_ids(session, Child) == [f'child-{i:02d}' for i in range(0, 25, 2)]
+
+
+def test_purge_resumes_from_checkpoint(session, redis):
+    redis.data['checkpoint'] = b'09'
+
+    deleted = BatchPurger(Row, batch_size=10, sleep_seconds=0, checkpoint_key='checkpoint').run()
+
+    # rows up to the checkpoint were purged by a previous run
+    assert deleted == 15
+    assert _remaining_ids(session) == [f'{i:02d}' for i in range(10)]
+    assert 'checkpoint' not in redis.data
+
+
+def test_purge_saves_checkpoint_after_every_chunk(session, redis):
+    checkpoints = []
+    BatchPurger(Row, batch_size=10, sleep_seconds=0, checkpoint_key='checkpoint',
+                progress_callback=lambda chunk, total: checkpoints.append(redis.data['checkpoint'])).run()
+
+    assert checkpoints == [b'09', b'19', b'24']
+
+
+def test_iter_id_batches(session):
+    batches = list(iter_id_batches(Row, [Row.group == 0], batch_size=5))
+    assert batches == [['00', '02', '04', '06', '08'], ['10', '12', '14', '16', '18'], ['20', '22', '24']]
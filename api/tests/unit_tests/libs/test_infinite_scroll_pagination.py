@@ -0,0 +1,60 @@
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, String, create_engine
+from sqlalchemy.orm import Session, declarative_base
+
+from libs.infinite_scroll_pagination import KeysetCursor, paginate_by_keyset
+
+Base = declarative_base()
+
+
+class Item(Base):
+    __tablename__ = 'items'
+
+    id = Column(String, primary_key=True)
+    created_at = Column(DateTime, nullable=False)
+
+
+def _make_session() -> Session:
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    session = Session(engine)
+    # items 0 to 5, two of them created in each second
+    session.add_all([Item(id=f'item-{i}', created_at=datetime(2024, 1, 1, 0, 0, i // 2)) for i in range(6)])
+    session.commit()
+    return session
+
+
+def test_paginate_by_keyset_walks_all_rows_once():
+    session = _make_session()
+
+    ids = []
+    cursor = None
+    has_more = True
+    while has_more:
+        rows, has_more = paginate_by_keyset(session.query(Item), Item, 4, cursor)
+        ids.extend(row.id for row in rows)
+        cursor = KeysetCursor.of(rows[-1])
+
+    assert ids == [f'item-{i}' for i in reversed(range(6))]
+
+
+def test_paginate_by_keyset_has_more_on_exact_page():
+    session = _make_session()
+
+    rows, has_more = paginate_by_keyset(session.query(Item), Item, 3)
+    assert [row.id for row in rows] == ['item-5', 'item-4', 'item-3']
+    assert has_more
+
+    rows, has_more = paginate_by_keyset(session.query(Item), Item, 3, KeysetCursor.of(rows[-1]))
+    assert [row.id for row in rows] == ['item-2', 'item-1', 'item-0']
+    assert not has_more
+
+
+def test_paginate_by_keyset_ascending():
+    session = _make_session()
+
+    rows, has_more = paginate_by_keyset(session.query(Item), Item, 10,
+                                        KeysetCursor.of(session.get(Item, 'item-2')), descending=False)
+    assert [row.id for row in rows] == ['item-3', 'item-4', 'item-5']
+    assert not has_more
@@ -0,0 +1,127 @@
+import json
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import JSON, Boolean, DateTime, Float, Integer, MetaData, create_engine, event
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Session
+
+from models import StringUUID
+from models import dataset as dataset_module
+from models.dataset import AppDatasetJoin, Dataset, Document, DocumentSegment
+from models.model import App, Tag, TagBinding, UploadFile
+
+MODELS = (Dataset, Document, DocumentSegment, AppDatasetJoin, App, Tag, TagBinding, UploadFile)
+
+
+@pytest.fixture
+def session(monkeypatch):
+    # the tables without the defaults and types only supported by postgresql
+    metadata = MetaData()
+    for model in MODELS:
+        table = model.__table__.to_metadata(metadata)
+        for column in table.columns:
+            column.server_default = None
+            if isinstance(column.type, JSONB):
+                column.type = JSON()
+        for index in list(table.indexes):
+            postgresql_options = index.dialect_options['postgresql']
+            if postgresql_options.get('using') or postgresql_options.get('where') is not None:
+                table.indexes.discard(index)
+
+    # ids are bound as they are, instead of as the hex of uuids
+    monkeypatch.setattr(StringUUID, 'process_bind_param', lambda self, value, dialect: value)
+    engine = create_engine('sqlite://')
+    metadata.create_all(engine)
+    session = Session(engine)
+    monkeypatch.setattr(dataset_module, 'db', SimpleNamespace(session=session))
+    yield session
+    session.close()
+
+
+def _insert(session: Session, model, **values):
+    # the required columns which are not given are filled with placeholder values
+    for column in model.__table__.columns:
+        if column.name in values or column.nullable:
+            continue
+        if isinstance(column.type, DateTime):
+            values[column.name] = datetime(2024, 7, 1)
+        elif isinstance(column.type, Boolean):
+            values[column.name] = False
+        elif isinstance(column.type, Integer | Float):
+            values[column.name] = 0
+        else:
+            values[column.name] = column.name
+    session.execute(model.__table__.insert().values(**values))
+
+
+def _count_queries(session: Session) -> list:
+    statements = []
+    event.listen(session.get_bind(), 'before_cursor_execute', lambda *args: statements.append(args[2]))
+    return statements
+
+
+def test_document_aggregates_are_loaded_per_page(session):
+    _insert(session, UploadFile, id='file-1', name='a.pdf', size=1024, extension='pdf', mime_type='application/pdf')
+    for i in range(3):
+        _insert(session, Document, id=f'document-{i}', dataset_id='dataset-1', data_source_type='upload_file',
+                data_source_info=json.dumps({'upload_file_id': 'file-1'}) if i == 0 else None)
+    _insert(session, DocumentSegment, id='segment-1', document_id='document-0', status='completed',
+            completed_at=datetime(2024, 7, 1), hit_count=2)
+    _insert(session, DocumentSegment, id='segment-2', document_id='document-0', status='indexing', hit_count=3)
+    _insert(session, DocumentSegment, id='segment-3', document_id='document-0', status='re_segment', hit_count=0)
+    _insert(session, DocumentSegment, id='segment-4', document_id='document-1', status='completed',
+            completed_at=datetime(2024, 7, 1), hit_count=1)
+    session.commit()
+    documents = session.query(Document).order_by(Document.id).all()
+
+    statements = _count_queries(session)
+    Document.preload_aggregates(documents)
+
+    assert len(statements) == 2
+    assert [document.segment_count for document in documents] == [3, 1, 0]
+    assert [document.total_segments for document in documents] == [2, 1, 0]
+    assert [document.completed_segments for document in documents] == [1, 1, 0]
+    assert [document.hit_count for document in documents] == [5, 1, None]
+    assert documents[0].data_source_detail_dict['upload_file']['name'] == 'a.pdf'
+    assert len(statements) == 2
+
+
+def test_dataset_aggregates_are_loaded_per_page(session):
+    for i in range(2):
+        _insert(session, Dataset, id=f'dataset-{i}', tenant_id='tenant-1')
+    _insert(session, App, id='app-1')
+    _insert(session, AppDatasetJoin, id='join-1', app_id='app-1', dataset_id='dataset-0')
+    # the app of this join is deleted
+    _insert(session, AppDatasetJoin, id='join-2', app_id='app-2', dataset_id='dataset-0')
+    _insert(session, Document, id='document-1', dataset_id='dataset-0', word_count=100)
+    _insert(session, Document, id='document-2', dataset_id='dataset-0', word_count=50)
+    _insert(session, Tag, id='tag-1', tenant_id='tenant-1', type='knowledge', name='tag')
+    _insert(session, TagBinding, id='binding-1', tenant_id='tenant-1', tag_id='tag-1', target_id='dataset-1')
+    session.commit()
+    datasets = session.query(Dataset).order_by(Dataset.id).all()
+
+    statements = _count_queries(session)
+    Dataset.preload_aggregates(datasets)
+
+    assert [dataset.app_count for dataset in datasets] == [1, 0]
+    assert [dataset.document_count for dataset in datasets] == [2, 0]
+    assert [dataset.word_count for dataset in datasets] == [150, None]
+    assert [[tag.id for tag in dataset.tags] for dataset in datasets] == [[], ['tag-1']]
+    assert len(statements) == 3
+
+
+def test_preloaded_aggregates_are_dropped_when_session_writes(session):
+    _insert(session, Document, id='document-1', dataset_id='dataset-1')
+    session.commit()
+    document = session.query(Document).one()
+    Document.preload_aggregates([document])
+
+    session.add(DocumentSegment(id='segment-1', tenant_id='tenant-1', dataset_id='dataset-1',
+                                document_id='document-1', position=1, content='content', word_count=7, tokens=2,
+                                status='completed', enabled=True, created_by='account-1', created_at=datetime(2024, 7, 1),
+                                updated_at=datetime(2024, 7, 1)))
+    session.flush()
+
+    assert document._preloaded is None
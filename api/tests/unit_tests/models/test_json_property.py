@@ -0,0 +1,95 @@
+import json
+from unittest.mock import MagicMock
+
+from core.app.apps.chat.app_config_manager import ChatAppConfigManager
+from models import model as model_module
+from models.model import App, AppModelConfig
+from models.workflow import Workflow
+
+
+def _app_model_config() -> AppModelConfig:
+    return AppModelConfig(
+        id='app-model-config-id',
+        app_id='app-id',
+        model=json.dumps({
+            'provider': 'openai',
+            'name': 'gpt-4o',
+            'mode': 'chat',
+            'completion_params': {'temperature': 0.7, 'stop': []},
+        }),
+        user_input_form=json.dumps([
+            {'text-input': {'label': f'input {i}', 'variable': f'input_{i}', 'required': False, 'max_length': 48}}
+            for i in range(10)
+        ]),
+        pre_prompt='You are a helpful assistant. ' * 20,
+        prompt_type='simple',
+        agent_mode=json.dumps({'enabled': False, 'strategy': None, 'tools': [], 'prompt': None}),
+        dataset_configs=json.dumps({'retrieval_model': 'multiple', 'datasets': {'datasets': []}}),
+        suggested_questions=json.dumps([f'question {i}' for i in range(5)]),
+        more_like_this=json.dumps({'enabled': False}),
+        sensitive_word_avoidance=json.dumps({'enabled': False, 'type': '', 'configs': []}),
+        file_upload=json.dumps({'image': {'enabled': True, 'number_limits': 3, 'detail': 'high',
+                                          'transfer_methods': ['remote_url', 'local_file']}}),
+    )
+
+
+def test_json_is_parsed_once_per_value():
+    workflow = Workflow(graph=json.dumps({'nodes': [], 'edges': []}))
+
+    graph = workflow.graph_dict
+    assert graph == {'nodes': [], 'edges': []}
+    assert workflow.graph_dict is graph
+
+    workflow.graph = json.dumps({'nodes': [{'id': 'start'}], 'edges': []})
+    assert workflow.graph_dict == {'nodes': [{'id': 'start'}], 'edges': []}
+
+    workflow.graph = None
+    assert workflow.graph_dict is None
+
+
+def test_defaults_of_empty_columns():
+    app_model_config = AppModelConfig()
+
+    assert app_model_config.model_dict is None
+    assert app_model_config.suggested_questions_list == []
+    assert app_model_config.agent_mode_dict == {'enabled': False, 'strategy': None, 'tools': [], 'prompt': None}
+    assert app_model_config.dataset_configs_dict == {'retrieval_model': 'single'}
+    # defaults are not shared
+    assert app_model_config.suggested_questions_list is not app_model_config.suggested_questions_list
+
+    app_model_config.dataset_configs = json.dumps({'datasets': {}})
+    assert app_model_config.dataset_configs_dict == {'retrieval_model': 'single'}
+
+
+def test_values_orjson_rejects_are_parsed():
+    workflow = Workflow(features='{"value": NaN}')
+
+    assert workflow.features_dict['value'] != workflow.features_dict['value']
+
+
+def test_benchmark_model_config_to_app_config(monkeypatch, benchmark):
+    db = MagicMock()
+    db.session.query.return_value.filter.return_value.first.return_value = None
+    monkeypatch.setattr(model_module, 'db', db)
+    app_model = App(id='app-id', tenant_id='tenant-id', mode='chat')
+    app_model_config = _app_model_config()
+
+    app_config = benchmark(ChatAppConfigManager.get_app_config, app_model, app_model_config)
+
+    assert app_config.model.model == 'gpt-4o'
+    assert len(app_config.variables) == 10
+
+
+def test_model_config_is_not_modified_by_app_config(monkeypatch):
+    db = MagicMock()
+    db.session.query.return_value.filter.return_value.first.return_value = None
+    monkeypatch.setattr(model_module, 'db', db)
+    app_model = App(id='app-id', tenant_id='tenant-id', mode='chat')
+    app_model_config = _app_model_config()
+
+    for _ in range(2):
+        app_config = ChatAppConfigManager.get_app_config(app_model, app_model_config)
+
+        assert app_config.model.stop == []
+        assert 'stop' not in app_config.model.parameters
+        assert app_model_config.model_dict['completion_params'] == {'temperature': 0.7, 'stop': []}
@@ -0,0 +1,55 @@
+from sqlalchemy import Column, String, create_engine
+from sqlalchemy.orm import Session, declarative_base
+
+from models.model import Message, MessageFeedback
+
+Base = declarative_base()
+
+
+class Item(Base):
+    __tablename__ = 'items'
+
+    id = Column(String, primary_key=True)
+
+
+def _preloaded_message(session: Session) -> Message:
+    message = Message(id='message-id')
+    message._preloaded = {
+        'feedbacks': [MessageFeedback(message_id='message-id', from_source='admin', rating='like')],
+    }
+    session.info.setdefault('preloaded_messages', []).append(message)
+    return message
+
+
+def test_preloaded_relations_are_used():
+    message = Message(id='message-id')
+    message._preloaded = {
+        'feedbacks': [
+            MessageFeedback(message_id='message-id', from_source='user', rating='dislike'),
+            MessageFeedback(message_id='message-id', from_source='admin', rating='like'),
+        ],
+    }
+
+    assert message.user_feedback.rating == 'dislike'
+    assert message.admin_feedback.rating == 'like'
+    assert len(message.feedbacks) == 2
+
+
+def test_preloaded_relations_are_dropped_when_session_writes():
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    session = Session(engine)
+
+    message = _preloaded_message(session)
+    # nothing to flush, the preloaded relations are kept
+    session.flush()
+    assert message._preloaded is not None
+
+    session.add(Item(id='item-id'))
+    session.flush()
+    assert message._preloaded is None
+
+    message = _preloaded_message(session)
+    session.commit()
+    assert message._preloaded is None
+    assert 'preloaded_messages' not in session.info
@@ -0,0 +1,57 @@
+import hashlib
+import json
+from unittest.mock import MagicMock
+
+import pytest
+
+from models import workflow as workflow_module
+from models.workflow import WorkflowGraphBlob, WorkflowRun
+
+GRAPH = json.dumps({'nodes': [{'id': 'start', 'data': {'type': 'start'}}], 'edges': []})
+
+
+@pytest.fixture
+def db(monkeypatch):
+    db = MagicMock()
+    monkeypatch.setattr(workflow_module, 'db', db)
+    workflow_module._load_graph_dict.cache_clear()
+    workflow_module._stored_graph_hashes.clear()
+    yield db
+    workflow_module._load_graph_dict.cache_clear()
+    workflow_module._stored_graph_hashes.clear()
+
+
+def test_graph_is_stored_once(db):
+    graph_hash = WorkflowGraphBlob.store(GRAPH)
+
+    assert graph_hash == hashlib.sha256(GRAPH.encode('utf-8')).hexdigest()
+    assert WorkflowGraphBlob.store(GRAPH) == graph_hash
+    db.session.execute.assert_called_once()
+    db.session.commit.assert_called_once()
+
+
+def test_runs_share_the_parsed_graph_of_a_hash(db):
+    db.session.query.return_value.filter.return_value.scalar.return_value = GRAPH
+    graph_hash = hashlib.sha256(GRAPH.encode('utf-8')).hexdigest()
+    first_run = WorkflowRun(graph_hash=graph_hash)
+    second_run = WorkflowRun(graph_hash=graph_hash)
+
+    assert first_run.graph_dict == json.loads(GRAPH)
+    assert second_run.graph_dict is first_run.graph_dict
+    db.session.query.assert_called_once()
+
+
+def test_missing_graph_is_not_cached(db):
+    db.session.query.return_value.filter.return_value.scalar.return_value = None
+    workflow_run = WorkflowRun(graph_hash='missing')
+
+    assert workflow_run.graph_dict is None
+    assert workflow_run.graph_dict is None
+    assert db.session.query.call_count == 2
+
+
+def test_graph_of_runs_created_before_the_blobs(db):
+    workflow_run = WorkflowRun(graph=GRAPH)
+
+    assert workflow_run.graph_dict == json.loads(GRAPH)
+    db.session.query.assert_not_called()
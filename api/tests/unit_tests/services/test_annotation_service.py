@@ -0,0 +1,263 @@
+import csv
+import io
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import Column, DateTime, DefaultClause, MetaData, String, Table, create_engine, event, text
+from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy.pool import StaticPool
+from werkzeug.datastructures import FileStorage
+
+from models import StringUUID
+from models.model import App, AppAnnotationHitHistory, AppAnnotationSetting, MessageAnnotation
+from services import annotation_service as annotation_service_module
+from services.annotation_service import AppAnnotationService
+from tasks.annotation import batch_import_annotations_task as task_module
+
+MODELS = (App, AppAnnotationHitHistory, AppAnnotationSetting, MessageAnnotation)
+
+
+class FakeLock:
+    def acquire(self, blocking=True):
+        return True
+
+    def release(self):
+        pass
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def setex(self, key, expire, value):
+        self.data[key] = value.encode('utf-8')
+
+    def setnx(self, key, value):
+        self.data.setdefault(key, value.encode('utf-8'))
+
+    def expire(self, key, expire):
+        pass
+
+    def hset(self, key, field=None, value=None, mapping=None):
+        for name, item in (mapping or {field: value}).items():
+            self.data.setdefault(key, {})[name.encode('utf-8')] = str(item).encode('utf-8')
+
+    def hincrby(self, key, field, amount):
+        values = self.data.setdefault(key, {})
+        values[field.encode('utf-8')] = str(int(values.get(field.encode('utf-8'), 0)) + amount).encode('utf-8')
+
+    def hgetall(self, key):
+        return self.data.get(key, {})
+
+    def rpush(self, key, value):
+        self.data.setdefault(key, []).append(value.encode('utf-8'))
+
+    def lrange(self, key, start, end):
+        return self.data.get(key, [])[start:end + 1]
+
+    def ltrim(self, key, start, end):
+        self.data[key] = self.data.get(key, [])[start:]
+
+    def lock(self, name, timeout=None):
+        return FakeLock()
+
+
+class FakeStorage:
+    def __init__(self):
+        self.files = {}
+
+    def save_stream(self, filename, stream):
+        self.files[filename] = stream.read()
+
+    def download(self, filename, target_filepath):
+        with open(target_filepath, 'wb') as f:
+            f.write(self.files[filename])
+
+    def delete(self, filename):
+        del self.files[filename]
+
+
+class FakeVector:
+    calls: list[tuple[str, list[str]]] = []
+    fail_on_call = None
+
+    def __init__(self, dataset, attributes=None):
+        pass
+
+    def _record(self, method, documents):
+        FakeVector.calls.append((method, [document.metadata['doc_id'] for document in documents]))
+        if len(FakeVector.calls) == self.fail_on_call:
+            raise ConnectionError('embedding provider unavailable')
+
+    def create(self, documents, **kwargs):
+        self._record('create', documents)
+
+    def add_texts(self, documents, **kwargs):
+        self._record('add_texts', documents)
+
+    def delete_by_ids(self, ids):
+        FakeVector.calls.append(('delete_by_ids', ids))
+
+
+@pytest.fixture
+def session(monkeypatch):
+    metadata = MetaData()
+    # the table referenced by the annotations
+    Table('conversations', metadata, Column('id', String, primary_key=True))
+    for model in MODELS:
+        table = model.__table__.to_metadata(metadata)
+        for column in table.columns:
+            # the defaults generated by postgresql are generated by sqlite
+            if column.name == 'id':
+                column.server_default = DefaultClause(text('(lower(hex(randomblob(16))))'))
+            elif isinstance(column.type, DateTime) and column.server_default is not None:
+                column.server_default = DefaultClause(text('CURRENT_TIMESTAMP'))
+            elif column.server_default is not None:
+                default = str(column.server_default.arg.text).replace('::character varying', '')
+                default = {'false': '0', 'true': '1'}.get(default, default)
+                column.server_default = DefaultClause(text(default))
+
+    monkeypatch.setattr(StringUUID, 'process_bind_param', lambda self, value, dialect: value)
+    engine = create_engine('sqlite://', connect_args={'check_same_thread': False}, poolclass=StaticPool)
+    metadata.create_all(engine)
+    session = scoped_session(sessionmaker(bind=engine))
+    for module in (annotation_service_module, task_module):
+        monkeypatch.setattr(module, 'db', SimpleNamespace(session=session))
+    session.add(App(id='app', tenant_id='tenant', name='app', mode='chat', status='normal',
+                    enable_site=True, enable_api=True))
+    session.commit()
+    yield session
+    session.remove()
+
+
+@pytest.fixture
+def importer(monkeypatch, session):
+    redis = FakeRedis()
+    storage = FakeStorage()
+    for module in (annotation_service_module, task_module):
+        monkeypatch.setattr(module, 'redis_client', redis)
+        monkeypatch.setattr(module, 'storage', storage)
+    monkeypatch.setattr(annotation_service_module, 'current_user',
+                        SimpleNamespace(id='account', current_tenant_id='tenant'))
+    monkeypatch.setattr(annotation_service_module.FeatureService, 'get_features',
+                        lambda tenant_id: SimpleNamespace(billing=SimpleNamespace(enabled=False)))
+    # the task runs when it is sent
+    monkeypatch.setattr(annotation_service_module.batch_import_annotations_task, 'delay',
+                        lambda *args, **kwargs: task_module.batch_import_annotations_task(*args, **kwargs))
+    monkeypatch.setattr(task_module, 'BATCH_SIZE', 2)
+    monkeypatch.setattr(task_module, 'Vector', FakeVector)
+    monkeypatch.setattr(task_module.DatasetCollectionBindingService,
+                        'get_dataset_collection_binding_by_id_and_type',
+                        lambda binding_id, type: SimpleNamespace(id=binding_id, provider_name='openai',
+                                                                 model_name='text-embedding-3-small'))
+    FakeVector.calls = []
+    FakeVector.fail_on_call = None
+    session.add(AppAnnotationSetting(id='setting', app_id='app', score_threshold=0.9, collection_binding_id='binding',
+                                     created_user_id='account', updated_user_id='account'))
+    session.commit()
+    return SimpleNamespace(redis=redis, storage=storage)
+
+
+def _csv_file(rows: list[tuple[str, str]]) -> FileStorage:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows([('question', 'answer'), *rows])
+    return FileStorage(stream=io.BytesIO(buffer.getvalue().encode('utf-8')), filename='annotations.csv')
+
+
+def _statements(session) -> list[str]:
+    statements = []
+    event.listen(session.get_bind(), 'before_cursor_execute',
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+    return statements
+
+
+def test_annotations_are_imported_in_chunks(importer, session):
+    rows = [(f'question {i}', f'answer {i}') for i in range(5)] + [('question without answer', '')]
+    statements = _statements(session)
+
+    result = AppAnnotationService.batch_import_app_annotations('app', _csv_file(rows))
+
+    annotations = session.query(MessageAnnotation).order_by(MessageAnnotation.question).all()
+    assert [(annotation.question, annotation.content) for annotation in annotations] == rows[:5]
+    assert {annotation.hit_count for annotation in annotations} == {0}
+    # an insert of many rows per chunk
+    assert len([statement for statement in statements if statement.startswith('INSERT')]) == 3
+    assert [(method, len(ids)) for method, ids in FakeVector.calls] == [('create', 2), ('add_texts', 2),
+                                                                         ('add_texts', 1)]
+    assert sorted(id for _, ids in FakeVector.calls for id in ids) == sorted(annotation.id for annotation in annotations)
+
+    job_id = result['job_id']
+    assert importer.redis.get(f'app_annotation_batch_import_{job_id}') == b'completed'
+    assert AppAnnotationService.get_batch_import_progress(job_id) == {'total_count': 5, 'processed_count': 5}
+    # the uploaded file is deleted once imported
+    assert importer.storage.files == {}
+
+
+def test_failed_import_is_rolled_back(importer, session):
+    FakeVector.fail_on_call = 2
+
+    result = AppAnnotationService.batch_import_app_annotations(
+        'app', _csv_file([(f'question {i}', f'answer {i}') for i in range(3)])
+    )
+
+    assert session.query(MessageAnnotation).count() == 0
+    # the vectors written before the failure are deleted
+    assert FakeVector.calls[-1] == ('delete_by_ids', FakeVector.calls[0][1] + FakeVector.calls[1][1])
+    job_id = result['job_id']
+    assert importer.redis.get(f'app_annotation_batch_import_{job_id}') == b'error'
+    assert importer.redis.get(f'app_annotation_batch_import_error_msg_{job_id}') == b'embedding provider unavailable'
+    assert importer.storage.files == {}
+
+
+def test_empty_file_is_rejected(importer):
+    result = AppAnnotationService.batch_import_app_annotations('app', _csv_file([('question', '')]))
+
+    assert result == {'error_msg': 'The CSV file is empty.'}
+
+
+def test_annotations_are_exported_as_csv_in_batches(monkeypatch, session):
+    monkeypatch.setattr(annotation_service_module, 'current_user', SimpleNamespace(current_tenant_id='tenant'))
+    for i, created_at in enumerate([datetime(2024, 7, 1), datetime(2024, 7, 2), datetime(2024, 7, 2),
+                                    datetime(2024, 7, 3), datetime(2024, 7, 1)]):
+        session.add(MessageAnnotation(id=f'annotation-{i}', app_id='app', question=f'question {i}',
+                                      content=f'answer, with "quotes" {i}', account_id='account',
+                                      created_at=created_at, updated_at=created_at))
+    session.add(MessageAnnotation(id='other', app_id='other-app', question='question', content='answer',
+                                  account_id='account'))
+    session.commit()
+
+    chunks = list(AppAnnotationService.export_annotation_csv_by_app_id('app', batch_size=2))
+
+    assert len(chunks) == 3
+    rows = list(csv.reader(io.StringIO(''.join(chunks))))
+    assert rows == [['question', 'answer']] + [
+        [f'question {i}', f'answer, with "quotes" {i}'] for i in (3, 2, 1, 4, 0)
+    ]
+
+
+def test_annotation_histories_are_flushed_in_batches(monkeypatch, session):
+    redis = FakeRedis()
+    monkeypatch.setattr(annotation_service_module, 'redis_client', redis)
+    monkeypatch.setattr(annotation_service_module, 'ANNOTATION_HIT_HISTORIES_FLUSH_BATCH_SIZE', 2)
+    session.add(MessageAnnotation(id='annotation', app_id='app', question='question', content='answer',
+                                  account_id='account'))
+    session.commit()
+    for i in range(3):
+        AppAnnotationService.record_annotation_history('annotation', 'app', 'question', 'answer', f'query {i}',
+                                                       'user', f'message-{i}', 'api', 0.9)
+    # a hit written by a flush which failed before it was taken from redis
+    redis.rpush('annotation_hit_histories', redis.data['annotation_hit_histories'][0].decode('utf-8'))
+
+    assert AppAnnotationService.flush_annotation_histories() == 3
+
+    histories = session.query(AppAnnotationHitHistory).order_by(AppAnnotationHitHistory.message_id).all()
+    assert [(history.question, history.score, history.source) for history in histories] == [
+        (f'query {i}', 0.9, 'api') for i in range(3)
+    ]
+    assert session.query(MessageAnnotation.hit_count).filter(MessageAnnotation.id == 'annotation').scalar() == 3
+    assert redis.data['annotation_hit_histories'] == []
+    assert AppAnnotationService.flush_annotation_histories() == 0
@@ -0,0 +1,172 @@
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+from flask import Flask
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+from werkzeug.exceptions import Unauthorized
+
+from controllers.service_api.wraps import validate_and_get_api_token
+from libs.deferred_timestamp_update import DeferredTimestampUpdate
+from models.model import ApiToken
+from services.api_token_service import API_TOKEN_LAST_USED_AT_KEY, ApiTokenService
+
+
+class FakeLock:
+    def acquire(self, blocking=True):
+        return True
+
+    def release(self):
+        pass
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def setex(self, key, expire, value):
+        self.data[key] = value.encode('utf-8')
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+    def exists(self, key):
+        return int(key in self.data)
+
+    def rename(self, key, new_key):
+        self.data[new_key] = self.data.pop(key)
+
+    def hset(self, key, field, value):
+        self.data.setdefault(key, {})[field.encode('utf-8')] = value.encode('utf-8')
+
+    def hgetall(self, key):
+        return self.data.get(key, {})
+
+    def lock(self, name, timeout=None):
+        return FakeLock()
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config.update({
+        'API_TOKEN_CACHE_TTL': 600,
+        'API_TOKEN_MEMORY_CACHE_TTL': 10,
+        'API_TOKEN_LAST_USED_UPDATE_INTERVAL': 60,
+    })
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    redis = FakeRedis()
+    monkeypatch.setattr('services.api_token_service.redis_client', redis)
+    monkeypatch.setattr('libs.deferred_timestamp_update.redis_client', redis)
+    monkeypatch.setattr(ApiTokenService, '_memory_cache', {})
+    monkeypatch.setattr('services.api_token_service.api_token_last_used_at',
+                        DeferredTimestampUpdate(ApiToken.__table__.c.last_used_at, API_TOKEN_LAST_USED_AT_KEY))
+    return redis
+
+
+@pytest.fixture
+def db(monkeypatch):
+    db = MagicMock()
+    db.session.query.return_value.filter.return_value.first.return_value = ApiToken(
+        id='token-id', app_id='app-id', tenant_id='tenant-id', type='app', token='app-secret'
+    )
+    monkeypatch.setattr('services.api_token_service.db', db)
+    monkeypatch.setattr('libs.deferred_timestamp_update.db', db)
+    return db
+
+
+def _token_query(db: MagicMock) -> MagicMock:
+    return db.session.query.return_value.filter.return_value.first
+
+
+def test_api_token_is_cached_in_memory_and_redis(app, redis, db):
+    assert ApiTokenService.get_api_token('app-secret', 'app').id == 'token-id'
+    api_token = ApiTokenService.get_api_token('app-secret', 'app')
+    assert (api_token.id, api_token.app_id, api_token.tenant_id) == ('token-id', 'app-id', 'tenant-id')
+    assert _token_query(db).call_count == 1
+    # the token is not kept in clear
+    assert not any('app-secret' in key for key in redis.data)
+
+    # another process
+    ApiTokenService._memory_cache.clear()
+    assert ApiTokenService.get_api_token('app-secret', 'app').id == 'token-id'
+    assert _token_query(db).call_count == 1
+
+    # tokens of another scope are not shared
+    ApiTokenService.get_api_token('app-secret', 'dataset')
+    assert _token_query(db).call_count == 2
+
+
+def test_deleted_api_token_is_invalidated(app, redis, db):
+    ApiTokenService.get_api_token('app-secret', 'app')
+    ApiTokenService.invalidate('app-secret', 'app')
+    _token_query(db).return_value = None
+
+    assert ApiTokenService.get_api_token('app-secret', 'app') is None
+    assert _token_query(db).call_count == 2
+
+
+def test_api_token_deleted_by_a_transaction_is_invalidated_once_committed(app, redis, db, monkeypatch):
+    ApiTokenService.get_api_token('app-secret', 'app')
+    session = Session(create_engine('sqlite://'))
+    monkeypatch.setattr('services.api_token_service.db', SimpleNamespace(session=session))
+
+    # the deletion is rolled back
+    session.execute(text('SELECT 1'))
+    ApiTokenService.invalidate_on_commit('app-secret', 'app')
+    session.rollback()
+    session.commit()
+    assert ApiTokenService._memory_cache and redis.data
+
+    ApiTokenService.invalidate_on_commit('app-secret', 'app')
+    assert ApiTokenService._memory_cache and redis.data
+    session.commit()
+    assert not ApiTokenService._memory_cache and not redis.data
+
+
+def test_last_used_at_is_coalesced_and_flushed(app, redis, db):
+    ApiTokenService.record_last_used('token-id')
+    recorded = redis.data[API_TOKEN_LAST_USED_AT_KEY][b'token-id']
+    ApiTokenService.record_last_used('token-id')
+    ApiTokenService.record_last_used('another-token-id')
+    # the second use is within the update interval
+    assert redis.data[API_TOKEN_LAST_USED_AT_KEY][b'token-id'] == recorded
+
+    assert ApiTokenService.flush_last_used_at() == 2
+
+    values = db.session.execute.call_args.args[1]
+    assert {value['row_id'] for value in values} == {'token-id', 'another-token-id'}
+    assert all(isinstance(value['row_value'], datetime) for value in values)
+    db.session.commit.assert_called_once()
+    assert redis.data == {}
+    assert ApiTokenService.flush_last_used_at() == 0
+
+
+def test_benchmark_service_api_auth(app, redis, db, benchmark):
+    headers = {'Authorization': 'Bearer app-secret'}
+
+    def authenticate_requests():
+        for _ in range(1000):
+            with app.test_request_context(headers=headers):
+                validate_and_get_api_token('app')
+
+    benchmark(authenticate_requests)
+
+    # 1 lookup and no write transaction for all the requests
+    assert _token_query(db).call_count == 1
+    db.session.commit.assert_not_called()
+
+    with app.test_request_context(headers={'Authorization': 'Bearer invalid'}):
+        _token_query(db).return_value = None
+        with pytest.raises(Unauthorized):
+            validate_and_get_api_token('app')
@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+
+from flask import Flask
+
+from models.model import StatisticRollupWatermark
+from services.app_statistic_service import (
+    ROLLUP_MAX_ITERATIONS,
+    AppStatisticRollupService,
+    StatisticTimeRange,
+    ceil_bucket,
+    floor_bucket,
+)
+
+
+def test_bucket_rounding():
+    assert floor_bucket(datetime(2024, 7, 1, 10, 44, 59)) == datetime(2024, 7, 1, 10, 30)
+    assert ceil_bucket(datetime(2024, 7, 1, 10, 44, 59)) == datetime(2024, 7, 1, 10, 45)
+    assert ceil_bucket(datetime(2024, 7, 1, 10, 45)) == datetime(2024, 7, 1, 10, 45)
+
+
+def test_time_range_without_rollup():
+    time_range = StatisticTimeRange('Asia/Kolkata', '2024-06-01 00:00', '2024-06-08 00:00', None)
+    assert not time_range.has_rollup
+    # Asia/Kolkata is UTC+05:30
+    assert time_range.live_ranges == [(datetime(2024, 5, 31, 18, 30), datetime(2024, 6, 7, 18, 30))]
+
+
+def test_time_range_with_rollup():
+    time_range = StatisticTimeRange('Asia/Kolkata', '2024-06-01 00:07', '2024-06-08 00:00',
+                                    datetime(2024, 6, 5, 12, 10))
+    assert time_range.has_rollup
+    assert time_range.rollup_start == datetime(2024, 5, 31, 18, 45)
+    assert time_range.rollup_end == datetime(2024, 6, 5, 12, 0)
+    assert time_range.live_ranges == [
+        (datetime(2024, 5, 31, 18, 37), datetime(2024, 5, 31, 18, 45)),
+        (datetime(2024, 6, 5, 12, 0), datetime(2024, 6, 7, 18, 30)),
+    ]
+
+    arg_dict = {}
+    condition = time_range.live_condition('created_at', arg_dict)
+    assert condition == (' AND ((created_at >= :live_start_0 AND created_at < :live_end_0)'
+                         ' OR (created_at >= :live_start_1 AND created_at < :live_end_1))')
+    assert arg_dict['live_end_1'] == datetime(2024, 6, 7, 18, 30)
+
+
+def test_time_range_unbounded():
+    time_range = StatisticTimeRange('UTC', None, None, datetime(2024, 6, 5, 12, 10))
+    assert time_range.has_rollup
+    assert time_range.rollup_start is None
+    assert time_range.live_ranges == [(datetime(2024, 6, 5, 12, 0), None)]
+
+    arg_dict = {}
+    assert time_range.rollup_condition('bucket_start', arg_dict) == ' AND bucket_start < :rollup_end'
+    assert time_range.live_condition('created_at', arg_dict) == ' AND ((created_at >= :live_start_0))'
+
+
+def test_time_range_without_live_ranges():
+    time_range = StatisticTimeRange('UTC', '2024-06-01 00:00', '2024-06-03 00:00', datetime(2024, 6, 5))
+    assert time_range.has_rollup
+    assert time_range.live_ranges == []
+
+    arg_dict = {}
+    assert time_range.live_condition('created_at', arg_dict) == ' AND FALSE'
+    assert arg_dict == {}
+
+
+def test_rollup_extends_lock_and_caps_backfill(monkeypatch):
+    app = Flask(__name__)
+    app.config['APP_MAX_EXECUTION_TIME'] = 1200
+    watermark = StatisticRollupWatermark(name='app_statistic_buckets', watermark=datetime(2020, 1, 1))
+    db = MagicMock()
+    db.session.get.return_value = watermark
+    monkeypatch.setattr('services.app_statistic_service.db', db)
+    monkeypatch.setattr(AppStatisticRollupService, '_get_message_targets', MagicMock(return_value=set()))
+    monkeypatch.setattr(AppStatisticRollupService, '_recompute', MagicMock())
+    monkeypatch.setattr(AppStatisticRollupService, '_pop_dirty_targets', MagicMock(return_value=set()))
+    lock = MagicMock()
+
+    with app.app_context():
+        AppStatisticRollupService._rollup(lock)
+
+    # a long history is backfilled a bounded number of days per run, under a lock extended as it goes
+    assert lock.extend.call_count == ROLLUP_MAX_ITERATIONS
+    settle_period = timedelta(seconds=1200, minutes=15)
+    assert watermark.watermark == datetime(2020, 1, 1) - settle_period + timedelta(days=ROLLUP_MAX_ITERATIONS)
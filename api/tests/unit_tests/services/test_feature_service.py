@@ -0,0 +1,127 @@
+import json
+import time
+from unittest.mock import MagicMock
+
+import pytest
+from flask import Flask
+
+from services.billing_service import BillingService
+from services.feature_service import FeatureService
+
+BILLING_INFO = {
+    'enabled': True,
+    'subscription': {'plan': 'professional', 'interval': 'month'},
+    'members': {'size': 2, 'limit': 3},
+}
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = str(value).encode('utf-8')
+        return True
+
+    def setex(self, key, expire, value):
+        self.data[key] = value.encode('utf-8')
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+
+class SyncThread:
+    def __init__(self, target, daemon=None):
+        self.target = target
+
+    def start(self):
+        self.target()
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config.update({
+        'BILLING_ENABLED': True,
+        'BILLING_API_TIMEOUT': 10,
+        'BILLING_INFO_CACHE_TTL': 60,
+        'BILLING_INFO_STALE_TTL': 600,
+        'CAN_REPLACE_LOGO': False,
+        'MODEL_LB_ENABLED': False,
+    })
+    return app
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    redis = FakeRedis()
+    monkeypatch.setattr('services.feature_service.redis_client', redis)
+    monkeypatch.setattr('services.feature_service.threading.Thread', SyncThread)
+    return redis
+
+
+@pytest.fixture
+def get_info(monkeypatch):
+    get_info = MagicMock(return_value=BILLING_INFO)
+    monkeypatch.setattr(BillingService, 'get_info', get_info)
+    return get_info
+
+
+def test_billing_info_is_cached_across_requests(app, redis, get_info):
+    with app.app_context():
+        assert FeatureService.get_features('tenant-id').billing.subscription.plan == 'professional'
+        assert FeatureService.get_features('tenant-id').members.limit == 3
+
+    with app.app_context():
+        assert FeatureService.get_features('tenant-id').billing.enabled is True
+
+    get_info.assert_called_once_with('tenant-id')
+
+
+def test_stale_billing_info_is_served_while_refreshed(app, redis, get_info):
+    stale_info = {**BILLING_INFO, 'subscription': {'plan': 'sandbox', 'interval': ''}}
+    redis.data['billing_info:tenant-id'] = json.dumps({'fetched_at': time.time() - 120, 'info': stale_info}).encode()
+
+    with app.app_context():
+        assert FeatureService.get_features('tenant-id').billing.subscription.plan == 'sandbox'
+
+    get_info.assert_called_once()
+    assert json.loads(redis.data['billing_info:tenant-id'])['info'] == BILLING_INFO
+    # the refresh lock is released
+    assert 'billing_info_refresh_lock:tenant-id' not in redis.data
+
+    with app.app_context():
+        assert FeatureService.get_features('tenant-id').billing.subscription.plan == 'professional'
+
+
+def test_invalidate_billing_info(app, redis, get_info):
+    with app.app_context():
+        FeatureService.get_features('tenant-id')
+        FeatureService.invalidate_billing_info('tenant-id')
+        FeatureService.get_features('tenant-id')
+
+    assert get_info.call_count == 2
+
+
+def test_billing_error_responses_are_not_cached(app, redis, get_info):
+    get_info.return_value = {'message': 'internal error'}
+    with app.app_context():
+        FeatureService._refresh_billing_info('tenant-id')
+
+    assert redis.data == {}
+
+
+def test_billing_requests_use_pooled_session_with_timeout(app, monkeypatch):
+    assert BillingService._get_session() is BillingService._get_session()
+
+    session = MagicMock()
+    monkeypatch.setattr(BillingService, '_get_session', MagicMock(return_value=session))
+    with app.app_context():
+        BillingService.get_info('tenant-id')
+
+    assert session.request.call_args.kwargs['timeout'] == 10
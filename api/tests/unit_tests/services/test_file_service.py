@@ -0,0 +1,192 @@
+import io
+from unittest.mock import MagicMock
+
+import pytest
+from flask import Flask
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import IntegrityError
+from werkzeug.datastructures import FileStorage
+
+from core.rag.extractor.entity.extract_setting import ExtractSetting
+from core.rag.extractor.extract_processor import ExtractProcessor
+from core.rag.models.document import Document as RagDocument
+from models.account import Account
+from models.dataset import Document
+from models.model import UploadFile, UploadFileBlob
+from services.dataset_service import DocumentService
+from services.errors.file import FileTooLargeError
+from services.file_service import FileService
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config.update({
+        'ETL_TYPE': 'dify',
+        'STORAGE_TYPE': 'local',
+        'UPLOAD_FILE_SIZE_LIMIT': 1,
+        'UPLOAD_IMAGE_FILE_SIZE_LIMIT': 1,
+        'UPLOAD_FILE_DEDUPLICATION_ENABLED': True,
+    })
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture
+def db(monkeypatch):
+    db = MagicMock()
+    monkeypatch.setattr('services.file_service.db', db)
+    return db
+
+
+@pytest.fixture
+def storage(monkeypatch):
+    storage = MagicMock()
+    monkeypatch.setattr('services.file_service.storage', storage)
+    monkeypatch.setattr('core.rag.extractor.extract_processor.storage', storage)
+    return storage
+
+
+def _account() -> Account:
+    account = Account(id='account-id')
+    account._current_tenant = MagicMock(id='tenant-id')
+    return account
+
+
+def _blob_query(db: MagicMock) -> MagicMock:
+    return db.session.query.return_value.filter.return_value.with_for_update.return_value.first
+
+
+def test_upload_file_rejects_too_large_file_while_streaming(app, db, storage):
+    stream = io.BytesIO(b'a' * (1024 * 1024 + 1))
+    file = FileStorage(stream=stream, filename='large.txt', content_type='text/plain')
+
+    with pytest.raises(FileTooLargeError):
+        FileService.upload_file(file, _account())
+
+    storage.save_stream.assert_not_called()
+    db.session.add.assert_not_called()
+
+
+def test_upload_file_reuses_stored_content(app, db, storage):
+    blob = UploadFileBlob(tenant_id='tenant-id', hash='hash', storage_type='local',
+                          key='upload_files/tenant-id/existing.txt', size=5, ref_count=1)
+    _blob_query(db).return_value = blob
+    file = FileStorage(stream=io.BytesIO(b'hello'), filename='hello.txt', content_type='text/plain')
+
+    upload_file = FileService.upload_file(file, _account())
+
+    assert upload_file.key == 'upload_files/tenant-id/existing.txt'
+    assert upload_file.size == 5
+    assert blob.ref_count == 2
+    storage.save_stream.assert_not_called()
+
+
+def test_save_file_content_references_concurrently_stored_content(app, db, storage):
+    blob = UploadFileBlob(tenant_id='tenant-id', hash='hash', storage_type='local',
+                          key='upload_files/tenant-id/concurrent.txt', size=5, ref_count=1)
+    # no blob on the first lookup, then the blob inserted by the concurrent upload
+    _blob_query(db).side_effect = [None, blob]
+    db.session.flush.side_effect = IntegrityError('insert', {}, Exception('duplicate key'))
+
+    file_key = FileService._save_file_content('tenant-id', 'hash', 5, 'txt', io.BytesIO(b'hello'))
+
+    assert file_key == 'upload_files/tenant-id/concurrent.txt'
+    assert blob.ref_count == 2
+    db.session.rollback.assert_called_once()
+    saved_key = storage.save_stream.call_args.args[0]
+    storage.delete.assert_called_once_with(saved_key)
+
+
+def test_save_file_content_stores_content_once_per_storage_type(app, db, storage):
+    app.config['STORAGE_TYPE'] = 's3'
+    # the content is only stored in the previous storage type
+    _blob_query(db).return_value = None
+
+    file_key = FileService._save_file_content('tenant-id', 'hash', 5, 'txt', io.BytesIO(b'hello'))
+
+    criteria = [str(criterion) for criterion in db.session.query.return_value.filter.call_args.args]
+    assert 'upload_file_blobs.storage_type = :storage_type_1' in criteria
+    blob = db.session.add.call_args.args[0]
+    assert (blob.storage_type, blob.key, blob.ref_count) == ('s3', file_key, 1)
+    storage.save_stream.assert_called_once()
+
+
+def test_release_file_keeps_shared_content(app, db, storage):
+    blob = UploadFileBlob(tenant_id='tenant-id', hash='hash', storage_type='local',
+                          key='upload_files/tenant-id/shared.txt', size=5, ref_count=2)
+    _blob_query(db).return_value = blob
+    upload_file = UploadFile(tenant_id='tenant-id', key='upload_files/tenant-id/shared.txt', hash='hash',
+                             extension='txt')
+
+    FileService.release_file(upload_file)
+
+    assert blob.ref_count == 1
+    db.session.delete.assert_called_once_with(upload_file)
+    storage.delete.assert_not_called()
+
+
+def test_release_file_deletes_last_reference(app, db, storage):
+    blob = UploadFileBlob(tenant_id='tenant-id', hash='hash', storage_type='local',
+                          key='upload_files/tenant-id/shared.txt', size=5, ref_count=1)
+    _blob_query(db).return_value = blob
+    upload_file = UploadFile(tenant_id='tenant-id', key='upload_files/tenant-id/shared.txt', hash='hash',
+                             extension='txt')
+
+    FileService.release_file(upload_file)
+
+    db.session.delete.assert_any_call(blob)
+    deleted_keys = [call.args[0] for call in storage.delete.call_args_list]
+    assert 'upload_files/tenant-id/shared.txt' in deleted_keys
+    assert 'upload_files/tenant-id/extractions/hash.dify.custom.txt.json' in deleted_keys
+
+
+def test_extraction_is_cached_by_content_hash(app, storage, monkeypatch):
+    upload_file = UploadFile(id='file-id', tenant_id='tenant-id', key='upload_files/tenant-id/a.txt',
+                             hash='hash', extension='txt')
+    extract_setting = ExtractSetting(datasource_type='upload_file', upload_file=upload_file,
+                                     document_model='text_model')
+    extract = MagicMock(return_value=[RagDocument(page_content='hello', metadata={'source': 'a.txt'})])
+    monkeypatch.setattr(ExtractProcessor, '_extract', extract)
+
+    storage.exists.return_value = False
+    documents = ExtractProcessor.extract(extract_setting)
+    assert documents[0].page_content == 'hello'
+    cache_key, cached = storage.save.call_args.args
+    assert cache_key == 'upload_files/tenant-id/extractions/hash.dify.custom.txt.json'
+
+    storage.exists.return_value = True
+    storage.load_once.return_value = cached
+    documents = ExtractProcessor.extract(extract_setting)
+    assert documents[0].page_content == 'hello'
+    assert documents[0].metadata == {'source': 'a.txt'}
+    extract.assert_called_once()
+
+
+def test_document_is_deleted_before_its_file_is_released(monkeypatch):
+    calls = MagicMock()
+    monkeypatch.setattr('services.dataset_service.db', calls.db)
+    monkeypatch.setattr('services.dataset_service.document_was_deleted', calls.signal)
+    document = Document(id='document-id', dataset_id='dataset-id', doc_form='text_model',
+                        data_source_type='upload_file', data_source_info='{"upload_file_id": "file-id"}')
+
+    DocumentService.delete_document(document)
+
+    assert [call[0] for call in calls.mock_calls] == ['db.session.delete', 'db.session.commit', 'signal.send']
+    calls.signal.send.assert_called_once_with('document-id', dataset_id='dataset-id', doc_form='text_model',
+                                              file_id='file-id')
+
+
+def test_release_unreferenced_file_matches_the_upload_file_id(app, db, storage):
+    db.session.query.return_value.filter.return_value.first.return_value = UploadFile(id='file-id',
+                                                                                      tenant_id='tenant-id')
+    # another document references the file
+    db.session.query.return_value.scalar.return_value = True
+
+    FileService.release_unreferenced_file('file-id')
+
+    criteria = [str(criterion.compile(dialect=postgresql.dialect()))
+                for call in db.session.query.return_value.filter.call_args_list for criterion in call.args]
+    assert "(CAST(documents.data_source_info AS JSONB) ->> %(param_1)s) = %(param_2)s" in criteria
+    db.session.delete.assert_not_called()
+    storage.delete.assert_not_called()
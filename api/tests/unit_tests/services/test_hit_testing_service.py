@@ -0,0 +1,124 @@
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import numpy as np
+import pytest
+from flask import Flask
+
+from core.rag.models.document import Document as RagDocument
+from models import dataset as dataset_module
+from models.dataset import Document, DocumentSegment
+from services import hit_testing_service as hit_testing_module
+from services.hit_testing_service import HitTestingService
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config.update(HIT_TESTING_PROJECTION_METHOD='pca', HIT_TESTING_BATCH_MAX_QUERIES=2)
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture
+def db(monkeypatch):
+    db = MagicMock()
+    monkeypatch.setattr(hit_testing_module, 'db', db)
+    monkeypatch.setattr(dataset_module, 'db', db)
+    return db
+
+
+def _dataset() -> SimpleNamespace:
+    return SimpleNamespace(id='dataset-id', tenant_id='tenant-id', retrieval_model=None,
+                           available_document_count=2, available_segment_count=3, indexing_technique='high_quality',
+                           embedding_model_provider='openai', embedding_model='text-embedding-3-small')
+
+
+def test_batch_retrieve_loads_segments_once(db, monkeypatch):
+    segments = [
+        DocumentSegment(id=f'segment-{i}', index_node_id=f'node-{i}', document_id='document-id', content=f'{i}')
+        for i in range(3)
+    ]
+    document = Document(id='document-id', name='document')
+    db.session.query.side_effect = lambda model: MagicMock(**{
+        'filter.return_value.all.return_value': segments if model is DocumentSegment else [document]
+    })
+    retrieved = {
+        'first': ['node-0', 'node-1'],
+        'second': ['node-2', 'node-deleted', 'node-0'],
+        'third': [],
+    }
+    monkeypatch.setattr(hit_testing_module.RetrievalService, 'retrieve', lambda **kwargs: [
+        RagDocument(page_content='', metadata={'doc_id': doc_id, 'score': 0.5}) for doc_id in retrieved[kwargs['query']]
+    ])
+
+    response = HitTestingService.batch_retrieve(_dataset(), [
+        {'query': 'first', 'expected_segment_ids': ['segment-1', 'segment-2']},
+        {'query': 'second', 'expected_segment_ids': ['segment-0']},
+        {'query': 'third'},
+    ], SimpleNamespace(id='account-id'), {})
+
+    # the segments of all the queries and their documents
+    assert db.session.query.call_count == 2
+    db.session.commit.assert_called_once()
+    assert db.session.add.call_count == 3
+    results = response['results']
+    assert [[record['segment'].id for record in result['records']] for result in results] == [
+        ['segment-0', 'segment-1'], ['segment-2', 'segment-0'], []
+    ]
+    assert results[0]['records'][0]['segment'].document is document
+    assert [result['recall'] for result in results] == [0.5, 1.0, None]
+    assert [result['reciprocal_rank'] for result in results] == [0.5, 0.5, None]
+    assert response['metrics'] == {
+        'query_count': 3, 'evaluated_query_count': 2, 'recall': 0.75, 'hit_rate': 1.0, 'mrr': 0.5
+    }
+
+
+def test_batch_hit_testing_args_check(app):
+    HitTestingService.batch_hit_testing_args_check({'queries': [{'query': 'a'}, {'query': 'b'}]})
+
+    with pytest.raises(ValueError):
+        HitTestingService.batch_hit_testing_args_check({'queries': [{'query': 'a'}] * 3})
+    with pytest.raises(ValueError):
+        HitTestingService.batch_hit_testing_args_check({'queries': [{'query': ''}]})
+    with pytest.raises(ValueError):
+        HitTestingService.batch_hit_testing_args_check({'queries': [{'query': 'a', 'expected_segment_ids': 'id'}]})
+
+
+def test_positions_use_the_cached_embeddings(app, monkeypatch):
+    embeddings = MagicMock()
+    embeddings.get_cached_embeddings.return_value = [[1.0, 0.0, 0.0], None]
+    embeddings.embed_documents.return_value = [[0.0, 1.0, 0.0]]
+    embeddings.embed_query.return_value = [0.0, 0.0, 1.0]
+    monkeypatch.setattr(hit_testing_module, 'ModelManager', MagicMock())
+    monkeypatch.setattr(hit_testing_module, 'CacheEmbedding', lambda model_instance: embeddings)
+    response = {
+        'query': {'content': 'query'},
+        'records': [{'segment': SimpleNamespace(content='cached')}, {'segment': SimpleNamespace(content='missing')}],
+    }
+
+    HitTestingService._add_positions(_dataset(), response)
+
+    # only the segment missing from the cache is embedded
+    embeddings.embed_documents.assert_called_once_with(['missing'])
+    assert set(response['query']['tsne_position']) == {'x', 'y'}
+    assert all('tsne_position' in record for record in response['records'])
+
+
+def test_pca_positions_are_deterministic(app):
+    embeddings = np.random.default_rng(0).normal(size=(11, 64)).tolist()
+
+    positions = HitTestingService.get_positions_from_embeddings(embeddings)
+
+    assert len(positions) == 11
+    assert positions == HitTestingService.get_positions_from_embeddings(embeddings)
+    assert HitTestingService.get_positions_from_embeddings(embeddings[:1]) == [{'x': 0, 'y': 0}]
+    assert len(HitTestingService.get_positions_from_embeddings(embeddings[:2])) == 2
+
+
+def test_benchmark_pca_positions(app, benchmark):
+    embeddings = np.random.default_rng(0).normal(size=(11, 1536)).tolist()
+
+    positions = benchmark(HitTestingService.get_positions_from_embeddings, embeddings)
+
+    assert len(positions) == 11
@@ -0,0 +1,140 @@
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+from flask import Flask
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from models.account import Account, Tenant, TenantAccountJoin
+from models.model import App, EndUser, Site
+from services.identity_cache_service import (
+    IdentityCacheService,
+    _collect_changed_identities,
+    _invalidate_changed_identities,
+)
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def mget(self, keys):
+        return [self.data.get(key) for key in keys]
+
+    def setex(self, key, expire, value):
+        self.data[key] = value.encode('utf-8')
+
+    def incr(self, key):
+        self.data[key] = str(int(self.data.get(key, b'0')) + 1).encode('utf-8')
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config.update({'IDENTITY_CACHE_TTL': 300})
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    redis = FakeRedis()
+    monkeypatch.setattr('services.identity_cache_service.redis_client', redis)
+    return redis
+
+
+@pytest.fixture
+def session(monkeypatch):
+    session = Session(create_engine('sqlite://'))
+    monkeypatch.setattr('services.identity_cache_service.db', SimpleNamespace(session=session))
+    return session
+
+
+def _account_loader():
+    def load(account_id):
+        account = Account(id=account_id, name='name', email='a@example.com', password='hash', password_salt='salt',
+                          status='active', last_active_at=datetime(2024, 1, 1), created_at=datetime(2024, 1, 1))
+        tenant = Tenant(id='tenant-id', name='workspace', plan='basic', status='normal')
+        tenant.current_role = 'admin'
+        account._current_tenant = tenant
+        return account
+
+    return MagicMock(side_effect=load)
+
+
+def test_account_is_cached_with_current_tenant(app, redis, session):
+    loader = _account_loader()
+    IdentityCacheService.load_account('account-id', loader)
+
+    account = IdentityCacheService.load_account('account-id', loader)
+
+    assert loader.call_count == 1
+    assert (account.id, account.email, account.last_active_at) == ('account-id', 'a@example.com', datetime(2024, 1, 1))
+    assert account.current_tenant.id == 'tenant-id'
+    assert account.current_tenant.current_role == 'admin'
+    # attached to the session as persistent rows, without pending changes
+    assert account in session and account not in session.dirty
+    assert b'hash' not in redis.data['identity:account:account-id']
+
+
+def test_account_is_reloaded_when_account_or_tenant_changes(app, redis, session):
+    loader = _account_loader()
+    IdentityCacheService.load_account('account-id', loader)
+
+    IdentityCacheService.invalidate('tenant', 'tenant-id')
+    IdentityCacheService.load_account('account-id', loader)
+    assert loader.call_count == 2
+
+    IdentityCacheService.invalidate('account', 'account-id')
+    session.expunge_all()
+    IdentityCacheService.load_account('account-id', loader)
+    assert loader.call_count == 3
+
+    session.expunge_all()
+    IdentityCacheService.load_account('account-id', loader)
+    assert loader.call_count == 3
+
+
+def test_web_identity_is_cached_until_app_changes(app, redis, session):
+    def load(app_id, app_code, end_user_id):
+        return (App(id=app_id, name='app', mode='chat', enable_site=True, created_at=datetime(2024, 1, 1)),
+                Site(id='site-id', app_id=app_id, code=app_code, title='site'),
+                EndUser(id=end_user_id, app_id=app_id, tenant_id='tenant-id', type='browser', session_id='session'))
+
+    loader = MagicMock(side_effect=load)
+    IdentityCacheService.load_web_identity('app-id', 'code', 'end-user-id', loader)
+
+    app_model, site, end_user = IdentityCacheService.load_web_identity('app-id', 'code', 'end-user-id', loader)
+    assert loader.call_count == 1
+    assert (app_model.id, app_model.enable_site, site.code, end_user.id) == ('app-id', True, 'code', 'end-user-id')
+
+    session.expunge_all()
+    IdentityCacheService.invalidate('app', 'app-id')
+    IdentityCacheService.load_web_identity('app-id', 'code', 'end-user-id', loader)
+    assert loader.call_count == 2
+
+
+def test_committed_changes_invalidate_identities(redis):
+    session = SimpleNamespace(
+        info={},
+        # new end users are in no cached identity
+        new=[EndUser(id='new-end-user-id', app_id='app-1'), TenantAccountJoin(account_id='account-1')],
+        dirty=[Tenant(id='tenant-1'), Site(id='site-id', app_id='app-2')],
+        deleted=[Account(id='account-2')],
+    )
+
+    _collect_changed_identities(session, None)
+    _invalidate_changed_identities(session)
+
+    assert set(redis.data) == {
+        'identity:account_version:account-1',
+        'identity:account_version:account-2',
+        'identity:tenant_version:tenant-1',
+        'identity:app_version:app-2',
+    }
+    assert session.info == {}
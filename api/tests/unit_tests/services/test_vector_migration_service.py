@@ -0,0 +1,179 @@
+import json
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from flask import Flask
+from sqlalchemy import JSON, DateTime, DefaultClause, MetaData, create_engine, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from models import StringUUID
+from models.dataset import Dataset, DatasetCollectionBinding, Document, DocumentSegment, VectorMigrationCheckpoint
+from services import vector_migration_service as migration_module
+from services.vector_migration_service import VectorMigrationService
+
+MODELS = (Dataset, Document, DocumentSegment, DatasetCollectionBinding, VectorMigrationCheckpoint)
+
+
+class FakeVector:
+    collections: dict[str, dict[str, str]] = {}
+    fail_on_batch = None
+    batches = 0
+
+    def __init__(self, dataset: Dataset):
+        self._collection_name = dataset.index_struct_dict['vector_store']['class_prefix']
+        self._type = dataset.index_struct_dict['type']
+
+    def delete(self):
+        self.collections.pop(self._collection_name, None)
+
+    def create(self, documents):
+        FakeVector.batches += 1
+        if FakeVector.batches == self.fail_on_batch:
+            raise ConnectionError('vector store unavailable')
+        collection = self.collections.setdefault(self._collection_name, {})
+        for document in documents:
+            collection[document.metadata['doc_id']] = document.page_content
+
+    def text_exists(self, id):
+        return id in self.collections.get(self._collection_name, {})
+
+    def get_cached_embeddings(self, texts):
+        return [[1.0] if text != 'not cached' else None for text in texts]
+
+    def search_by_embedding(self, embedding, **kwargs):
+        return [SimpleNamespace(metadata={'doc_id': doc_id})
+                for doc_id in list(self.collections.get(self._collection_name, {}))[:kwargs['top_k']]]
+
+
+@pytest.fixture
+def session(monkeypatch):
+    metadata = MetaData()
+    for model in MODELS:
+        table = model.__table__.to_metadata(metadata)
+        for column in table.columns:
+            # the defaults generated by postgresql are generated by sqlite
+            if column.name == 'id':
+                column.server_default = DefaultClause(text('(lower(hex(randomblob(16))))'))
+            elif isinstance(column.type, DateTime) and column.server_default is not None:
+                column.server_default = DefaultClause(text('CURRENT_TIMESTAMP'))
+            else:
+                column.server_default = None
+            if isinstance(column.type, JSONB):
+                column.type = JSON()
+        for index in list(table.indexes):
+            postgresql_options = index.dialect_options['postgresql']
+            if postgresql_options.get('using') or postgresql_options.get('where') is not None:
+                table.indexes.discard(index)
+
+    monkeypatch.setattr(StringUUID, 'process_bind_param', lambda self, value, dialect: value)
+    engine = create_engine('sqlite://', connect_args={'check_same_thread': False}, poolclass=StaticPool)
+    metadata.create_all(engine)
+    # a session per worker thread, as with flask-sqlalchemy
+    session = scoped_session(sessionmaker(bind=engine))
+    monkeypatch.setattr(migration_module, 'db', SimpleNamespace(session=session))
+    monkeypatch.setattr(migration_module, 'Vector', FakeVector)
+    FakeVector.collections = {}
+    FakeVector.fail_on_batch = None
+    FakeVector.batches = 0
+    yield session
+    session.remove()
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    with app.app_context():
+        yield app
+
+
+def _create_dataset(session, dataset_id: str, segment_count: int, vector_type='weaviate'):
+    now = datetime(2024, 7, 1)
+    session.add(Dataset(
+        id=dataset_id, tenant_id='tenant', name=dataset_id, provider='vendor', permission='only_me',
+        data_source_type='upload_file', indexing_technique='high_quality', created_by='account',
+        created_at=now, updated_at=now,
+        index_struct=json.dumps({'type': vector_type, 'vector_store': {'class_prefix': f'Vector_{dataset_id}'}}),
+    ))
+    session.add(Document(
+        id=f'{dataset_id}-document', tenant_id='tenant', dataset_id=dataset_id, position=1,
+        data_source_type='upload_file', batch='batch', name='document', created_from='web', created_by='account',
+        created_at=now, updated_at=now, indexing_status='completed', enabled=True, archived=False, doc_form='text_model',
+    ))
+    for i in range(segment_count):
+        session.add(DocumentSegment(
+            id=f'{dataset_id}-segment-{i:02}', tenant_id='tenant', dataset_id=dataset_id,
+            document_id=f'{dataset_id}-document', position=i, content='not cached' if i == 0 else f'content {i}',
+            word_count=2, tokens=2, index_node_id=f'{dataset_id}-node-{i:02}', index_node_hash='hash',
+            hit_count=0, enabled=True, status='completed', created_by='account', created_at=now, updated_at=now,
+        ))
+    session.commit()
+
+
+def _index_struct(session, dataset_id: str) -> dict:
+    return json.loads(session.query(Dataset).filter(Dataset.id == dataset_id).one().index_struct)
+
+
+def test_datasets_are_migrated_in_batches(app, session):
+    for i in range(3):
+        _create_dataset(session, f'dataset-{i}', segment_count=5)
+    _create_dataset(session, 'dataset-migrated', segment_count=1, vector_type='qdrant')
+
+    stats = VectorMigrationService('qdrant', batch_size=2, workers=2).run()
+
+    assert (stats.migrated_datasets, stats.skipped_datasets, stats.failed_datasets, stats.segments) == (3, 1, 0, 15)
+    assert FakeVector.batches == 9
+    for i in range(3):
+        assert _index_struct(session, f'dataset-{i}') == {
+            'type': 'qdrant', 'vector_store': {'class_prefix': Dataset.gen_collection_name_by_id(f'dataset-{i}')}
+        }
+        assert len(FakeVector.collections[Dataset.gen_collection_name_by_id(f'dataset-{i}')]) == 5
+    checkpoints = session.query(VectorMigrationCheckpoint).all()
+    assert {(checkpoint.status, checkpoint.migrated_count) for checkpoint in checkpoints} == {('completed', 5)}
+
+
+def test_failed_migration_resumes_from_the_checkpoint(app, session):
+    _create_dataset(session, 'dataset', segment_count=5)
+    FakeVector.fail_on_batch = 2
+
+    stats = VectorMigrationService('qdrant', batch_size=2, workers=1).run()
+
+    assert stats.failed_datasets == 1
+    # the dataset still uses its previous vector store
+    assert _index_struct(session, 'dataset')['type'] == 'weaviate'
+    checkpoint = session.query(VectorMigrationCheckpoint).one()
+    assert (checkpoint.status, checkpoint.last_segment_id, checkpoint.migrated_count) == (
+        'failed', 'dataset-segment-01', 2
+    )
+    assert 'vector store unavailable' in checkpoint.error
+    session.remove()
+
+    stats = VectorMigrationService('qdrant', batch_size=2, workers=1).run()
+
+    assert (stats.migrated_datasets, stats.segments) == (1, 3)
+    assert _index_struct(session, 'dataset')['type'] == 'qdrant'
+    # the first batch is not deleted nor written again
+    assert len(FakeVector.collections[Dataset.gen_collection_name_by_id('dataset')]) == 5
+    assert FakeVector.batches == 4
+    checkpoint = session.query(VectorMigrationCheckpoint).one()
+    assert (checkpoint.status, checkpoint.migrated_count, checkpoint.error) == ('completed', 5, None)
+
+
+def test_dry_run_and_verification(app, session):
+    _create_dataset(session, 'dataset', segment_count=5)
+
+    stats = VectorMigrationService('qdrant', dry_run=True).run()
+
+    assert (stats.migrated_datasets, stats.segments, stats.cached_segments) == (1, 5, 4)
+    assert FakeVector.batches == 0
+    assert _index_struct(session, 'dataset')['type'] == 'weaviate'
+    session.remove()
+
+    VectorMigrationService('qdrant').run()
+    session.remove()
+    stats = VectorMigrationService('qdrant', verify=True, sample_size=3).run()
+
+    assert (stats.sampled_segments, stats.found_segments) == (3, 3)
+    assert stats.recalled_segments >= 1